@@ -1,24 +1,29 @@
 """Local-ML assist for /run: in-memory cosine nearest-neighbors over
-MessageEmbedding. Loads the full embedding matrix once per engine and recomputes
-neighbors per-request via a single numpy matmul. No DB writes, no cache table."""
+MessageEmbedding. Loads the full embedding matrix once per engine (so once per
+worker process), reloads it when the message_embedding version changes, and
+recomputes neighbors per-request via a single numpy matmul. No DB writes."""
 from __future__ import annotations
 
 import threading
+import weakref
 
 import numpy as np
-from sqlalchemy import func
 from sqlmodel import Session, select
 
 from sqlalchemy import tuple_
 
+import shared_state
 from concept_service import EMBED_MODEL, embed_messages
 from models import LabelApplication, MessageCache, MessageEmbedding
 
 
 _lock = threading.Lock()
+# One matrix per engine. (Engines have no `.info` dict — only connections do —
+# so a cache parked on `bind.info` was never actually kept.)
+_caches: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
 
 
-def _build_cache(db: Session, fingerprint: tuple[int, int, int]) -> dict:
+def _build_cache(db: Session, fingerprint: int) -> dict:
     rows = db.exec(
         select(
             MessageEmbedding.chatlog_id,
@@ -41,36 +46,40 @@ def _build_cache(db: Session, fingerprint: tuple[int, int, int]) -> dict:
     }
 
 
-def _embedding_fingerprint(db: Session) -> tuple[int, int, int]:
-    """A cheap signal that detects inserts, deletes, and in-place re-embeds.
-    (count, max_id, sum_id) — pure-count was insufficient because re-embedding
-    an existing (chatlog_id, message_index) does not change the row count, but
-    does change which rows we are now serving."""
-    row = db.exec(
-        select(
-            func.count(MessageEmbedding.id),
-            func.coalesce(func.max(MessageEmbedding.id), 0),
-            func.coalesce(func.sum(MessageEmbedding.id), 0),
-        )
-        .where(MessageEmbedding.model_version == EMBED_MODEL)
-    ).one()
-    return (int(row[0]), int(row[1]), int(row[2]))
+def _embedding_fingerprint(db: Session) -> int:
+    """The message_embedding version: bumped by every insert, delete and
+    in-place re-embed in any process, for the price of a primary-key lookup
+    (an aggregate over the table used to run on every request)."""
+    return shared_state.version(db, "message_embedding")
 
 
 def _get_cache(db: Session) -> dict:
-    """Per-engine cached matrix; reloads when the embedding fingerprint diverges."""
+    """Per-engine cached matrix; reloads when the embedding version moves."""
     bind = db.get_bind()
     current = _embedding_fingerprint(db)
     with _lock:
-        cache = bind.info.get("assist_cache") if hasattr(bind, "info") else None
+        cache = _caches.get(bind)
         if cache is not None and cache.get("fingerprint") == current:
             return cache
         cache = _build_cache(db, current)
-        if hasattr(bind, "info"):
-            bind.info["assist_cache"] = cache
+        _caches[bind] = cache
         return cache
 
 
+def embedding_matrix(db: Session) -> tuple[np.ndarray | None, dict[tuple[int, int], int]]:
+    """(L2-normalized embedding matrix, {(chatlog_id, message_index): row}) for
+    EMBED_MODEL, shared with the neighbor lookups here; (None, {}) when nothing
+    is embedded yet. Read-only: callers must not modify the matrix."""
+    cache = _get_cache(db)
+    return cache["matrix"], cache["keys_idx"]
+
+
+def cached_rows(db_engine) -> int:
+    """Rows in the matrix currently held for `db_engine` (0 if none)."""
+    cache = _caches.get(db_engine)
+    return len(cache["keys_idx"]) if cache else 0
+
+
 def _labeled_yes_no_keys(
     db: Session,
     label_id: int,
@@ -143,16 +152,19 @@ def nearest_neighbors(
     message_index: int,
     k: int = 3,
     assignment_id: int | None = None,
+    embed_missing: bool = True,
 ) -> list[dict]:
     """Up to k cosine-nearest human yes/no labeled neighbors of the focused message.
     Returns [] if the focused message has no cache row, cannot be embedded, or no
     other labeled yes/no neighbors exist. When assignment_id is set, neighbors are
     restricted to messages tagged with the same assignment so calibration anchors
-    stay within the same lab/project context.
+    stay within the same lab/project context. With embed_missing=False, messages
+    without a stored embedding are left out instead of embedded (no network).
     Each result: {chatlog_id, message_index, value, similarity, message_text}."""
-    keys = {(chatlog_id, message_index)}
-    keys.update(_labeled_yes_no_keys(db, label_id, assignment_id))
-    _ensure_pair_embeddings(db, keys)
+    if embed_missing:
+        keys = {(chatlog_id, message_index)}
+        keys.update(_labeled_yes_no_keys(db, label_id, assignment_id))
+        _ensure_pair_embeddings(db, keys)
 
     cache = _get_cache(db)
     if cache["matrix"] is None:
@@ -232,7 +244,7 @@ def nearest_neighbors(
 
 def rebuild_cache_if_stale(db: Session, label_id: int) -> bool:
     """No-op kept for callsite compatibility. The in-memory matrix reloads
-    automatically inside nearest_neighbors() when MessageEmbedding count diverges."""
+    automatically inside nearest_neighbors() when the embedding version moves."""
     return False
 
 
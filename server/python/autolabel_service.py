@@ -3,16 +3,15 @@
 Given human-labeled examples and label definitions, classifies unlabeled
 student messages into existing label categories.
 """
+import functools
 import logging
 import os
 import json
-from google import genai
-from google.genai import types
 from typing import List, Dict, Any
 
-log = logging.getLogger(__name__)
+import gemini_gateway
 
-client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY", ""))
+log = logging.getLogger(__name__)
 
 MULTILABEL_THRESHOLD = float(os.environ.get("CHATSIGHT_MULTILABEL_THRESHOLD", "0.5"))
 
@@ -22,30 +21,30 @@ class ClassifyToolMissing(RuntimeError):
     Distinct from network errors so callers can decide whether to retry,
     log+continue, or surface to the UI."""
 
-TOOL = types.Tool(function_declarations=[
-    types.FunctionDeclaration(
-        name="classify_messages",
-        description="Classify student messages into label categories",
-        parameters={
-            "type": "object",
-            "properties": {
-                "classifications": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "index": {"type": "integer", "description": "Index in the input messages array. The same index may appear in multiple entries when several labels apply."},
-                            "label": {"type": "string", "description": "The label name to assign"},
-                            "confidence": {"type": "number", "description": "Your confidence in this classification, 0.0 to 1.0"},
-                        },
-                        "required": ["index", "label", "confidence"],
+
+CLASSIFY_FUNCTION_DECLARATION = dict(
+    name="classify_messages",
+    description="Classify student messages into label categories",
+    parameters={
+        "type": "object",
+        "properties": {
+            "classifications": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "index": {"type": "integer", "description": "Index in the input messages array. The same index may appear in multiple entries when several labels apply."},
+                        "label": {"type": "string", "description": "The label name to assign"},
+                        "confidence": {"type": "number", "description": "Your confidence in this classification, 0.0 to 1.0"},
                     },
+                    "required": ["index", "label", "confidence"],
                 },
             },
-            "required": ["classifications"],
         },
-    )
-])
+        "required": ["classifications"],
+    },
+)
+
 
 _SINGLE_SELECT_INSTRUCTION = (
     "You are classifying student messages from AI tutoring conversations. "
@@ -66,11 +65,20 @@ _MULTI_SELECT_INSTRUCTION = (
 )
 
 
-def _make_config(system_instruction: str) -> types.GenerateContentConfig:
+@functools.cache
+def _tool():
+    from google.genai import types
+    return types.Tool(function_declarations=[
+        types.FunctionDeclaration(**CLASSIFY_FUNCTION_DECLARATION)
+    ])
+
+
+def _make_config(system_instruction: str):
+    from google.genai import types
     return types.GenerateContentConfig(
         system_instruction=system_instruction,
         temperature=0,
-        tools=[TOOL],
+        tools=[_tool()],
         tool_config=types.ToolConfig(
             function_calling_config=types.FunctionCallingConfig(
                 mode="ANY",
@@ -80,8 +88,23 @@ def _make_config(system_instruction: str) -> types.GenerateContentConfig:
     )
 
 
-CONFIG = _make_config(_SINGLE_SELECT_INSTRUCTION)            # default / split flow
-MULTI_SELECT_CONFIG = _make_config(_MULTI_SELECT_INSTRUCTION)  # general auto-label
+# Built on first use (google.genai is slow to import); TOOL / CONFIG /
+# MULTI_SELECT_CONFIG remain readable as module attributes via __getattr__.
+@functools.cache
+def _config(multi_select: bool):
+    if multi_select:
+        return _make_config(_MULTI_SELECT_INSTRUCTION)  # general auto-label
+    return _make_config(_SINGLE_SELECT_INSTRUCTION)     # default / split flow
+
+
+def __getattr__(name: str):
+    if name == "TOOL":
+        return _tool()
+    if name == "CONFIG":
+        return _config(False)
+    if name == "MULTI_SELECT_CONFIG":
+        return _config(True)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def build_prompt(
@@ -135,10 +158,11 @@ def classify_batch(
     """
     prompt = build_prompt(label_definitions, examples_by_label, messages, multi_select)
 
-    response = client.models.generate_content(
+    response = gemini_gateway.generate_content(
         model="gemini-2.5-flash",
         contents=prompt,
-        config=MULTI_SELECT_CONFIG if multi_select else CONFIG,
+        config=_config(multi_select),
+        call_site="autolabel.classify_batch",
     )
 
     if (
@@ -175,7 +199,8 @@ def summarize_message(message_text: str) -> str:
     """Summarize a student message to be concise."""
     if not message_text.strip():
         return ""
-    
+    from google.genai import types
+
     config = types.GenerateContentConfig(
         system_instruction=(
             "You are an expert at simplifying and summarizing student messages in AI tutoring chatlogs. "
@@ -185,9 +210,10 @@ def summarize_message(message_text: str) -> str:
         temperature=0,
     )
     
-    response = client.models.generate_content(
+    response = gemini_gateway.generate_content(
         model="gemini-2.5-flash",
         contents=message_text,
         config=config,
+        call_site="autolabel.summarize_message",
     )
     return response.text.strip()
@@ -0,0 +1,17 @@
+"""Benchmarks for the server's hot paths.
+
+    python -m bench.synth --messages 100k           # build (or reuse) a corpus
+    python -m pytest bench --bench-sizes 10k,100k   # time endpoints against it
+    python -m bench.loadgen --serve 10k --users 8 --classify   # concurrent session replay
+    python -m bench.prefilter_eval --labels 40      # label-prefilter tokens vs. agreement
+
+`bench.synth` writes a deterministic synthetic corpus (the app's SQLite DB plus
+an `events` DB standing in for the external Postgres). The pytest runner in
+this package points the app at that corpus, times each endpoint, and writes a
+JSON report under bench/results/ so runs can be compared across commits.
+`bench.loadgen` drives a running server (or one `bench.serve` starts) with
+concurrent virtual users to surface contention microbenchmarks can't.
+`bench.prefilter_eval` compares auto-label prompts with and without the label
+prefilter on a synthetic in-memory corpus and prints the result as JSON.
+Not collected by the regular test suite (see pyproject `testpaths`).
+"""
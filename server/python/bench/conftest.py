@@ -0,0 +1,215 @@
+"""pytest plumbing for the endpoint benchmarks.
+
+    python -m pytest bench --bench-sizes 10k,100k,500k --bench-rounds 30
+
+Each size gets a synthetic corpus (bench.synth, cached under bench/.data).
+The app's module-level `engine` / `ext_engine` references are repointed at
+that corpus for the duration of the size, the Gemini gateway gets the
+in-process fake (or, with --bench-gemini cache, the real client behind the
+llm_cache record/replay layer), and the `bench` fixture times calls through
+TestClient.
+Results for the whole session are written as one JSON report.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+os.environ.setdefault("PG_PASSWORD", "bench")
+os.environ.setdefault("EXT_DB_URL", "sqlite://")
+os.environ.setdefault("CHATSIGHT_STUDY_LOCK", "0")
+
+import pytest
+from sqlalchemy import create_engine as sa_create_engine
+from sqlmodel import create_engine
+
+from bench import synth
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+_results: list[dict] = []
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("bench")
+    group.addoption("--bench-sizes", default="10k",
+                    help="comma-separated corpus sizes (10k,100k,500k or counts); default 10k")
+    group.addoption("--bench-rounds", type=int, default=20, help="timed calls per benchmark (default 20)")
+    group.addoption("--bench-warmup", type=int, default=2, help="untimed calls first (default 2)")
+    group.addoption("--bench-seed", type=int, default=0)
+    group.addoption("--bench-data", default=str(synth.DEFAULT_DATA_DIR), help="corpus cache directory")
+    group.addoption("--bench-gemini", choices=("fake", "cache"), default="fake",
+                    help="fake: in-process FakeGeminiClient.offline; cache: real client behind the "
+                         "record/replay cache (CHATSIGHT_LLM_CACHE, default replay here)")
+    group.addoption("--bench-json", default=None,
+                    help="report path (default bench/results/<UTC timestamp>-<commit>.json)")
+
+
+def pytest_generate_tests(metafunc):
+    if "corpus" in metafunc.fixturenames:
+        sizes = [s for s in metafunc.config.getoption("bench_sizes").split(",") if s.strip()]
+        metafunc.parametrize("corpus", sizes, indirect=True, scope="session")
+
+
+@pytest.fixture(scope="session")
+def corpus(request):
+    cfg = request.config
+    return synth.generate(
+        synth.parse_size(request.param),
+        seed=cfg.getoption("bench_seed"),
+        out=Path(cfg.getoption("bench_data")),
+    )
+
+
+def _sqlite_engine(url, factory):
+    from sqlalchemy import event
+
+    db_engine = factory(url, connect_args={"check_same_thread": False, "timeout": 30})
+
+    @event.listens_for(db_engine, "connect")
+    def _pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA busy_timeout=30000")
+        cur.close()
+
+    return db_engine
+
+
+@pytest.fixture(scope="session")
+def app_client(request, corpus, tmp_path_factory):
+    """TestClient for `main.app` running against `corpus`."""
+    import database
+    import gemini_gateway
+    import lexical_service
+    import probe_service
+    import queue_service
+    import readiness
+    import study_scope
+    from fake_gemini import FakeGeminiClient
+    from fastapi.testclient import TestClient
+    from main import app
+
+    engine = _sqlite_engine(corpus.app_url, create_engine)
+    database.create_db_and_tables(engine)  # bring a cached corpus up to the current schema
+    ext_engine = _sqlite_engine(corpus.events_url, sa_create_engine)
+    originals = {"engine": database.engine, "ext_engine": database.ext_engine}
+    replacements = {"engine": engine, "ext_engine": ext_engine}
+
+    with pytest.MonkeyPatch.context() as mp:
+        # Modules bind these at import (`from database import engine`), so
+        # repoint every module-level reference, not just database's.
+        for mod in list(sys.modules.values()):
+            for name, original in originals.items():
+                if getattr(mod, name, None) is original:
+                    mp.setattr(mod, name, replacements[name])
+        # Indexes the app saves next to a file-backed DB stay out of the repo.
+        artifacts = tmp_path_factory.mktemp("artifacts")
+        mp.setattr(lexical_service, "LEXICAL_DIR", artifacts / "lexical")
+        mp.setattr(probe_service, "PROBE_DIR", artifacts / "probes")
+        if request.config.getoption("bench_gemini") == "fake":
+            mp.setattr(gemini_gateway, "backend", FakeGeminiClient.offline(embed_dim=corpus.embed_dim))
+        else:
+            import llm_cache
+            mp.setattr(gemini_gateway, "backend", None)
+            if not llm_cache.enabled():
+                mp.setattr(llm_cache, "MODE", "replay")
+        readiness.mark_ready()
+        queue_service._clear_thread_cache()
+        study_scope._scope_cache.clear()
+        yield TestClient(app)
+        probe_service.stop()
+    queue_service._clear_thread_cache()
+    study_scope._scope_cache.clear()
+    engine.dispose()
+    ext_engine.dispose()
+
+
+def _percentile(sorted_values, q):
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+@pytest.fixture
+def bench(request, corpus):
+    """bench(name, call, setup=None) → warmup + timed rounds, stats recorded.
+
+    `call` returns the response; any non-2xx fails the benchmark (a call
+    returning anything else, like an in-process index build, is only timed).
+    With `setup`, each round first runs `setup()` untimed and passes its result to
+    `call(arg)`, so only the request under test is measured."""
+    cfg = request.config
+
+    def run(name, call, setup=None, rounds=None, warmup=None):
+        rounds = rounds or cfg.getoption("bench_rounds")
+        warmup = cfg.getoption("bench_warmup") if warmup is None else warmup
+        times = []
+        for i in range(warmup + rounds):
+            args = (setup(),) if setup is not None else ()
+            start = time.perf_counter()
+            resp = call(*args)
+            elapsed = time.perf_counter() - start
+            if hasattr(resp, "status_code"):
+                assert resp.status_code < 300, (name, resp.status_code, resp.text[:300])
+            if i >= warmup:
+                times.append(elapsed)
+        ordered = sorted(times)
+        result = {
+            "benchmark": name,
+            "n_messages": corpus.n_messages,
+            "rounds": rounds,
+            "min_ms": round(ordered[0] * 1000, 3),
+            "median_ms": round(statistics.median(ordered) * 1000, 3),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+        }
+        _results.append(result)
+        return result
+
+    return run
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _results:
+        return
+    cfg = session.config
+    commit = _git_commit()
+    created = datetime.utcnow()
+    path = cfg.getoption("bench_json")
+    if path is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"{created:%Y%m%dT%H%M%SZ}-{commit or 'nogit'}.json"
+    report = {
+        "commit": commit,
+        "created_at": created.isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": cfg.getoption("bench_seed"),
+        "results": _results,
+    }
+    Path(path).write_text(json.dumps(report, indent=2))
+    reporter = cfg.pluginmanager.get_plugin("terminalreporter")
+    if reporter is not None:
+        reporter.write_sep("-", f"benchmark report: {path}")
+        for r in _results:
+            reporter.write_line(
+                f"{r['benchmark']:<34} n={r['n_messages']:<7} median={r['median_ms']:>9.2f}ms "
+                f"p95={r['p95_ms']:>9.2f}ms"
+            )
@@ -0,0 +1,372 @@
+"""Session-replay load generator for a running server.
+
+N virtual users replay an instructor's /run session: fetch the focused
+message, sometimes open the assist panel, decide, occasionally undo, and now
+and then open the summaries page. Everyone polls handoff status the way the
+summaries page does while a label is classifying. Optionally a classification
+job (handoff) runs for the whole test, so interactive latency is measured
+against background writes.
+
+    python -m bench.loadgen --serve 10k --users 8 --duration 60 --classify
+    python -m bench.loadgen --url http://127.0.0.1:8000 --users 4
+
+`--serve` starts `bench.serve` (real uvicorn, scratch copy of the synthetic
+corpus, fake Gemini) in a subprocess. The report has p50/p95/p99 per action
+plus SQLite busy errors and lock waits scraped from /api/metrics before and
+after the run.
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import urlencode, urlsplit
+
+# Relative weights of what a user does next. Polling is its own loop
+# (POLL_INTERVAL_SECONDS), like the summaries page's setInterval.
+DEFAULT_MIX = {
+    "next": 25,
+    "decide": 45,
+    "assist": 15,
+    "undo": 5,
+    "summaries": 10,
+}
+POLL_INTERVAL_SECONDS = 2.0
+SQLITE_COUNTERS = (
+    "chatsight_sqlite_busy_errors_total",
+    "chatsight_sqlite_lock_waits_total",
+    "chatsight_sqlite_lock_wait_seconds_total",
+)
+
+
+class HttpTransport:
+    """One keep-alive connection per virtual user."""
+
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, params: Optional[dict] = None,
+                body: Optional[dict] = None) -> tuple[int, Any]:
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        for attempt in (0, 1):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=payload, headers=headers)
+                resp = self._conn.getresponse()
+                raw = resp.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+        ctype = resp.getheader("Content-Type", "")
+        data = json.loads(raw) if raw and ctype.startswith("application/json") else raw.decode(errors="replace")
+        return resp.status, data
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def call(self, transport, action: str, method: str, path: str, **kwargs) -> tuple[int, Any]:
+        start = time.perf_counter()
+        try:
+            status, data = transport.request(method, path, **kwargs)
+        except Exception:
+            status, data = 599, None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.setdefault(action, []).append(elapsed)
+            if status >= 400:
+                self.errors[action] = self.errors.get(action, 0) + 1
+        return status, data
+
+    def summary(self, duration: float) -> dict[str, dict]:
+        out = {}
+        with self._lock:
+            for action, values in sorted(self.latencies.items()):
+                ordered = sorted(values)
+                out[action] = {
+                    "count": len(ordered),
+                    "errors": self.errors.get(action, 0),
+                    "per_second": round(len(ordered) / duration, 2) if duration else None,
+                    "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+                    "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+                    "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+                    "max_ms": round(ordered[-1] * 1000, 2),
+                }
+        return out
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already-sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, int(-(-q * len(ordered) // 1)))  # ceil(q·n)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+@dataclass
+class Targets:
+    labeling_label_id: int
+    classify_label_id: Optional[int] = None
+    summary_label_ids: list[int] = field(default_factory=list)
+
+
+class VirtualUser:
+    """One instructor on the /run page. Not thread-safe; one per thread."""
+
+    def __init__(self, transport, recorder: Recorder, targets: Targets, rng: random.Random,
+                 mix: dict[str, float], think_seconds: float):
+        self.t = transport
+        self.rec = recorder
+        self.targets = targets
+        self.rng = rng
+        self.actions = list(mix)
+        self.weights = [mix[a] for a in self.actions]
+        self.think_seconds = think_seconds
+        self.focused: Optional[dict] = None
+
+    @property
+    def _base(self) -> str:
+        return f"/api/single-labels/{self.targets.labeling_label_id}"
+
+    def step(self) -> str:
+        action = self.rng.choices(self.actions, self.weights)[0]
+        if action in ("decide", "assist") and self.focused is None:
+            action = "next"
+        getattr(self, f"do_{action}")()
+        return action
+
+    def do_next(self) -> None:
+        status, data = self.rec.call(self.t, "next", "GET", f"{self._base}/next")
+        self.focused = data if status == 200 and isinstance(data, dict) else None
+
+    def do_decide(self) -> None:
+        value = self.rng.choices(("yes", "no", "skip"), (3, 6, 1))[0]
+        body = {"chatlog_id": self.focused["chatlog_id"],
+                "message_index": self.focused["message_index"], "value": value}
+        status, data = self.rec.call(self.t, "decide", "POST", f"{self._base}/decide", body=body)
+        self.focused = data.get("next") if status == 200 and isinstance(data, dict) else None
+
+    def do_assist(self) -> None:
+        params = {"chatlog_id": self.focused["chatlog_id"], "message_index": self.focused["message_index"]}
+        self.rec.call(self.t, "assist", "GET", f"{self._base}/assist", params=params)
+
+    def do_undo(self) -> None:
+        status, data = self.rec.call(self.t, "undo", "POST", f"{self._base}/undo")
+        if status == 200 and isinstance(data, dict):
+            self.focused = data.get("next")
+
+    def do_summaries(self) -> None:
+        status, items = self.rec.call(self.t, "summaries.list", "GET", "/api/handoff-summaries")
+        ids = [it["label_id"] for it in items] if status == 200 and isinstance(items, list) else []
+        ids = ids or self.targets.summary_label_ids
+        if ids:
+            self.rec.call(self.t, "summaries.detail", "GET", f"/api/single-labels/{self.rng.choice(ids)}")
+
+    def run(self, deadline: float, stop: threading.Event) -> None:
+        while not stop.is_set() and time.monotonic() < deadline:
+            self.step()
+            if self.think_seconds:
+                stop.wait(self.rng.uniform(0.5, 1.5) * self.think_seconds)
+
+
+def poll_handoff_status(transport, recorder: Recorder, deadline: float, stop: threading.Event,
+                        interval: float = POLL_INTERVAL_SECONDS) -> None:
+    while not stop.is_set() and time.monotonic() < deadline:
+        recorder.call(transport, "handoff.poll", "GET", "/api/handoff-summaries")
+        stop.wait(interval)
+
+
+def scrape_sqlite_counters(transport) -> dict[str, float]:
+    try:
+        status, text = transport.request("GET", "/api/metrics")
+    except Exception:
+        return {}
+    if status != 200 or not isinstance(text, str):
+        return {}
+    out = {}
+    for name in SQLITE_COUNTERS:
+        m = re.search(rf"^{name} (\S+)$", text, re.M)
+        if m:
+            out[name] = float(m.group(1))
+    return out
+
+
+def discover_targets(transport, classify_label_id: Optional[int] = None) -> Targets:
+    status, active = transport.request("GET", "/api/single-labels/active")
+    if status != 200 or not active:
+        raise SystemExit("no active single-label run to replay against (activate one first)")
+    _, labels = transport.request("GET", "/api/single-labels")
+    labels = labels if isinstance(labels, list) else []
+    if classify_label_id is None:
+        queued = [l["id"] for l in labels if l.get("phase") == "queued"]
+        classify_label_id = queued[0] if queued else None
+    summary_ids = [l["id"] for l in labels if l.get("phase") in ("handed_off", "reviewing", "complete")]
+    return Targets(active["id"], classify_label_id, summary_ids)
+
+
+def run_load(make_transport, targets: Targets, users: int, duration: float, *, seed: int = 0,
+             mix: Optional[dict] = None, think_seconds: float = 0.5, classify: bool = False,
+             classify_sample: Optional[int] = None, poll_interval: float = POLL_INTERVAL_SECONDS) -> dict:
+    """Drive `users` virtual users for `duration` seconds; returns the report.
+    `make_transport()` is called once per thread."""
+    recorder = Recorder()
+    control = make_transport()
+    before = scrape_sqlite_counters(control)
+
+    handoff = None
+    if classify:
+        if targets.classify_label_id is None:
+            raise SystemExit("--classify needs a label to hand off (none queued; pass --classify-label)")
+        params = {"sample_size": classify_sample} if classify_sample else None
+        status, _ = control.request("POST", f"/api/single-labels/{targets.classify_label_id}/handoff", params=params)
+        handoff = {"label_id": targets.classify_label_id, "status": status}
+
+    stop = threading.Event()
+    start = time.monotonic()
+    deadline = start + duration
+    threads = []
+    transports = []
+    for i in range(users):
+        t = make_transport()
+        transports.append(t)
+        user = VirtualUser(t, recorder, targets, random.Random(seed + i), mix or DEFAULT_MIX, think_seconds)
+        threads.append(threading.Thread(target=user.run, args=(deadline, stop), name=f"vu-{i}", daemon=True))
+    poller = make_transport()
+    transports.append(poller)
+    threads.append(threading.Thread(target=poll_handoff_status,
+                                    args=(poller, recorder, deadline, stop, poll_interval),
+                                    name="vu-poll", daemon=True))
+    for th in threads:
+        th.start()
+    try:
+        for th in threads:
+            th.join()
+    except KeyboardInterrupt:
+        stop.set()
+        for th in threads:
+            th.join()
+    elapsed = time.monotonic() - start
+
+    after = scrape_sqlite_counters(control)
+    if handoff is not None:
+        _, items = control.request("GET", "/api/handoff-summaries")
+        item = next((it for it in items if it["label_id"] == handoff["label_id"]), {}) if isinstance(items, list) else {}
+        handoff.update(phase=item.get("phase"), classified_count=item.get("classified_count"),
+                       classification_total=item.get("classification_total"))
+    for t in transports + [control]:
+        t.close()
+
+    return {
+        "users": users,
+        "duration_seconds": round(elapsed, 2),
+        "seed": seed,
+        "mix": mix or DEFAULT_MIX,
+        "endpoints": recorder.summary(elapsed),
+        "sqlite": {name.removeprefix("chatsight_sqlite_").removesuffix("_total"): after[name] - before.get(name, 0.0)
+                   for name in after},
+        "classification": handoff,
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [f"{report['users']} users, {report['duration_seconds']}s"]
+    lines.append(f"{'action':<18}{'count':>7}{'err':>6}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for action, s in report["endpoints"].items():
+        lines.append(f"{action:<18}{s['count']:>7}{s['errors']:>6}{s['per_second']:>8}"
+                     f"{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}")
+    if report["sqlite"]:
+        lines.append("sqlite: " + ", ".join(f"{k}={round(v, 3)}" for k, v in report["sqlite"].items()))
+    if report["classification"]:
+        lines.append(f"classification: {report['classification']}")
+    return "\n".join(lines)
+
+
+def _wait_ready(base_url: str, proc: subprocess.Popen, timeout: float) -> None:
+    transport = HttpTransport(base_url, timeout=5)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"bench.serve exited with {proc.returncode}")
+        try:
+            if transport.request("GET", "/api/ready")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"server not ready after {timeout}s")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument("--url", default="http://127.0.0.1:8000")
+    where.add_argument("--serve", metavar="SIZE", help="start bench.serve on a synthetic corpus of this size")
+    parser.add_argument("--port", type=int, default=8765, help="port for --serve")
+    parser.add_argument("--gemini-latency", default="lognormal:300:0.4", help="fake Gemini latency spec for --serve")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="mean pause between a user's actions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mix", type=json.loads, default=None, help=f"JSON weights, default {json.dumps(DEFAULT_MIX)}")
+    parser.add_argument("--classify", action="store_true", help="hand off a label first so classification runs throughout")
+    parser.add_argument("--classify-label", type=int, default=None)
+    parser.add_argument("--classify-sample", type=int, default=None, help="handoff sample_size")
+    parser.add_argument("--json", default=None, help="also write the report here")
+    args = parser.parse_args(argv)
+
+    proc = None
+    base_url = args.url
+    if args.serve:
+        base_url = f"http://127.0.0.1:{args.port}"
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "bench.serve", "--messages", args.serve, "--port", str(args.port),
+             "--gemini-latency", args.gemini_latency],
+            cwd=Path(__file__).resolve().parent.parent,
+        )
+    try:
+        if proc is not None:
+            _wait_ready(base_url, proc, timeout=600)
+        targets = discover_targets(HttpTransport(base_url), args.classify_label)
+        report = run_load(
+            lambda: HttpTransport(base_url), targets, args.users, args.duration, seed=args.seed,
+            mix=args.mix, think_seconds=args.think_ms / 1000, classify=args.classify,
+            classify_sample=args.classify_sample,
+        )
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+    print(format_report(report))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Token and agreement check for the label prefilter (label_prefilter.py).
+
+Builds a synthetic multi-label corpus in an in-memory SQLite DB: `--labels`
+label directions in embedding space, human examples for each, and unlabeled
+messages whose embeddings sit near one or two true labels plus noise. The
+unlabeled messages are planned into autolabel batches twice — every label
+in every prompt (the baseline) and prefiltered — and both sets of prompts
+are rendered with autolabel_service.build_prompt.
+
+Tokens use the same 4-characters-per-token estimate as fake_gemini, over the
+prompt plus the multi-select system instruction. Agreement assumes a model
+that applies each offered label exactly when it is a true label of the
+message, so the baseline returns every true label and the prefiltered run
+loses exactly the true labels its prompt did not offer: `exact` is the share
+of messages whose label sets match, `label_recall` the share of baseline
+labels kept.
+
+    python -m bench.prefilter_eval --labels 40 --messages 3000 --top-m 8 --margin 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+os.environ.setdefault("PG_PASSWORD", "bench")
+os.environ.setdefault("EXT_DB_URL", "sqlite://")
+
+_TOPICS = ("merge", "groupby", "histogram", "bootstrap", "permutation", "p-value", "loop", "apply",
+           "arange", "assert", "query", "scatter", "regression", "sampling", "probability",
+           "confidence", "mean", "median", "standard", "correlation", "join", "pivot", "string",
+           "datetime", "index", "column", "boolean", "function", "return", "error")
+
+
+def _approx_tokens(text: str) -> int:
+    from fake_gemini import _approx_tokens as approx
+    return approx(text)
+
+
+def evaluate(n_labels: int = 40, n_messages: int = 3000, top_m: int = 8, margin: float = 0.2,
+             examples: int = 20, embed_dim: int = 64, noise: float = 0.15, seed: int = 0,
+             batch_size: int = 30) -> dict:
+    from sqlmodel import Session, SQLModel, create_engine
+    from sqlmodel.pool import StaticPool
+
+    import autolabel_service
+    import label_prefilter
+    from concept_service import EMBED_MODEL
+    from models import LabelApplication, LabelDefinition, MessageEmbedding
+
+    rng = np.random.default_rng(seed)
+    directions = rng.normal(size=(n_labels, embed_dim))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+
+    def message(true: list[int]) -> tuple[np.ndarray, str]:
+        vec = directions[true].sum(axis=0) + rng.normal(0, noise, embed_dim)
+        words = [_TOPICS[t % len(_TOPICS)] + ("" if t < len(_TOPICS) else f"-{t // len(_TOPICS)}") for t in true]
+        return vec / np.linalg.norm(vec), f"question about {' and '.join(words)}: why does my code fail here?"
+
+    with Session(engine) as db:
+        labels = [LabelDefinition(name=f"label-{j:02d}", mode="multi",
+                                  description=f"Student asks about topic {j} ({_TOPICS[j % len(_TOPICS)]})")
+                  for j in range(n_labels)]
+        db.add_all(labels)
+        db.commit()
+        label_ids = [l.id for l in labels]
+        label_defs = [{"name": l.name, "description": l.description} for l in labels]
+        examples_by_label: dict[str, list[str]] = {}
+        cid = 0
+        for j, label in enumerate(labels):
+            for _ in range(examples):
+                cid += 1
+                vec, text = message([j])
+                db.add(MessageEmbedding(chatlog_id=cid, message_index=0, model_version=EMBED_MODEL,
+                                        embedding=vec.astype(np.float32).tobytes()))
+                db.add(LabelApplication(label_id=label.id, chatlog_id=cid, message_index=0, applied_by="human"))
+                examples_by_label.setdefault(label.name, []).append(text)
+        unlabeled, truth = [], {}
+        for _ in range(n_messages):
+            cid += 1
+            true = sorted(rng.choice(n_labels, size=1 if rng.random() < 0.7 else 2, replace=False).tolist())
+            vec, text = message(true)
+            db.add(MessageEmbedding(chatlog_id=cid, message_index=0, model_version=EMBED_MODEL,
+                                    embedding=vec.astype(np.float32).tobytes()))
+            unlabeled.append({"chatlog_id": cid, "message_index": 0, "message_text": text, "context_before": None})
+            truth[cid] = {label_ids[t] for t in true}
+        db.commit()
+
+        plans = {
+            "baseline": label_prefilter.plan_batches(db, label_ids, unlabeled, batch_size, top_m=0),
+            "prefiltered": label_prefilter.plan_batches(db, label_ids, unlabeled, batch_size, top_m=top_m,
+                                                        margin=margin),
+        }
+    engine.dispose()
+
+    defs_by_id = dict(zip(label_ids, label_defs))
+    instruction = _approx_tokens(autolabel_service._MULTI_SELECT_INSTRUCTION)
+    report: dict = {"labels": n_labels, "messages": n_messages, "top_m": top_m, "margin": margin,
+                    "noise": noise, "batch_size": batch_size}
+    returned: dict[str, dict[int, set[int]]] = {}
+    for name, plan in plans.items():
+        tokens = sum(
+            instruction + _approx_tokens(autolabel_service.build_prompt(
+                [defs_by_id[l] for l in offered], examples_by_label, batch, multi_select=True))
+            for batch, offered in plan
+        )
+        returned[name] = {m["chatlog_id"]: truth[m["chatlog_id"]] & set(offered) for batch, offered in plan for m in batch}
+        report[name] = {
+            "calls": len(plan),
+            "prompt_tokens": tokens,
+            "labels_per_prompt": round(float(np.mean([len(offered) for _b, offered in plan])), 2),
+        }
+    base, pre = returned["baseline"], returned["prefiltered"]
+    kept = sum(len(pre[c]) for c in base)
+    report["token_reduction"] = round(1 - report["prefiltered"]["prompt_tokens"] / report["baseline"]["prompt_tokens"], 4)
+    report["agreement"] = {
+        "exact": round(sum(base[c] == pre[c] for c in base) / len(base), 4),
+        "label_recall": round(kept / sum(len(v) for v in base.values()), 4),
+    }
+    return report
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=40)
+    parser.add_argument("--messages", type=int, default=3000)
+    parser.add_argument("--top-m", type=int, default=8)
+    parser.add_argument("--margin", type=float, default=0.2, help="cosine margin behind the nearest label")
+    parser.add_argument("--examples", type=int, default=20, help="human examples per label")
+    parser.add_argument("--noise", type=float, default=0.15, help="embedding noise (per-dimension std)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    print(json.dumps(evaluate(args.labels, args.messages, args.top_m, args.margin,
+                              args.examples, noise=args.noise, seed=args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Run the real server (uvicorn) against a scratch copy of a synthetic corpus,
+with Gemini answered by the offline fake (CHATSIGHT_GEMINI_BACKEND=fake).
+
+    python -m bench.serve --messages 10k --port 8765 --gemini-latency lognormal:400:0.5
+
+Other CHATSIGHT_FAKE_GEMINI_* settings (429 / timeout rates, see fake_gemini)
+are read from the environment as usual.
+
+The corpus's app.db is copied first so load runs never dirty the cached
+corpus. Used by `bench.loadgen --serve`, which starts this as a subprocess.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from bench import synth
+
+
+def prepare(corpus: synth.Corpus, scratch: Path) -> Path:
+    scratch.mkdir(parents=True, exist_ok=True)
+    for suffix in ("-wal", "-shm"):
+        (scratch / f"app.db{suffix}").unlink(missing_ok=True)
+    shutil.copyfile(corpus.app_db, scratch / "app.db")
+    return scratch / "app.db"
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", default="10k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", default=str(synth.DEFAULT_DATA_DIR))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--gemini-latency", default="lognormal:300:0.4",
+                        help="fake Gemini latency spec (fixed:MS | uniform:LO:HI | lognormal:MEDIAN:SIGMA)")
+    args = parser.parse_args(argv)
+
+    n_messages = synth.parse_size(args.messages)
+    if not (synth.corpus_dir(Path(args.data), n_messages, args.seed, 64) / "manifest.json").exists():
+        # Generating imports database.py, which binds its engines from the
+        # environment at import; do it in a child so this process can still
+        # point them at the scratch copy below.
+        subprocess.run([sys.executable, "-m", "bench.synth", "--messages", str(n_messages),
+                        "--seed", str(args.seed), "--out", args.data], check=True)
+    corpus = synth.generate(n_messages, seed=args.seed, out=Path(args.data))
+    app_db = prepare(corpus, Path(args.data) / f"serve-{args.port}")
+    # database.py reads these at import time.
+    os.environ["DATABASE_URL"] = f"sqlite:///{app_db}"
+    os.environ["EXT_DB_URL"] = corpus.events_url
+    os.environ.setdefault("CHATSIGHT_STUDY_LOCK", "0")
+    os.environ["CHATSIGHT_GEMINI_BACKEND"] = "fake"
+    os.environ["CHATSIGHT_FAKE_GEMINI_LATENCY"] = args.gemini_latency
+
+    import uvicorn
+
+    from main import app
+
+    print(f"[bench.serve] {corpus.n_messages} messages from {corpus.directory} on http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
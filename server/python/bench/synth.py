@@ -0,0 +1,357 @@
+"""Deterministic synthetic corpus for benchmarks and load tests.
+
+Writes two SQLite files into one directory:
+
+- `app.db`: the app schema (via database.create_db_and_tables) with
+  MessageCache rows, unit-norm MessageEmbedding vectors, single-label runs in
+  every phase, multi-label labels, and human + AI LabelApplication rows.
+- `events.db`: an `events` table with the columns and JSON payload keys the
+  server reads from the external Postgres (SQLite ≥ 3.38 understands `->>`).
+  Point EXT_DB_URL at it and ingest, /next threads and chatlog views work.
+
+Same (messages, seed, embed_dim) → byte-for-byte the same rows, so timings are
+comparable across commits. Corpora are cached by those parameters; a
+`manifest.json` is written last and marks a directory as complete.
+
+    python -m bench.synth --messages 500k --out bench/.data
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+# database.py reads these at import time; benchmarks never talk to Postgres.
+os.environ.setdefault("PG_PASSWORD", "bench")
+os.environ.setdefault("EXT_DB_URL", "sqlite://")
+
+SIZES = {"10k": 10_000, "100k": 100_000, "500k": 500_000}
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent / ".data"
+GENERATOR_VERSION = 4  # bump when the generated content changes
+
+SINGLE_PHASES = ("labeling", "queued", "classifying", "handed_off", "reviewing", "complete")
+MULTI_LABELS = ("Debug help", "Concept question", "Answer request", "Copy-paste", "Off topic")
+NOTEBOOKS = tuple(f"lab{i:02d}.ipynb" for i in range(1, 10)) + tuple(f"hw{i:02d}.ipynb" for i in range(1, 9))
+BASE_TIME = datetime(2026, 1, 5, 8, 0, 0)
+INSERT_CHUNK = 20_000
+
+# Fractions of the corpus that carry each kind of application.
+HUMAN_SINGLE_FRACTION = 0.02   # human yes/no/skip per single-label run
+AI_SINGLE_FRACTION = 1.0       # AI yes/no per finished run (handed_off/reviewing/complete)
+HUMAN_MULTI_FRACTION = 0.01
+AI_MULTI_FRACTION = 0.05
+
+_SUBJECTS = ("my for loop", "this groupby", "the merge", "np.arange", "my histogram", "the bootstrap",
+             "this function", "the permutation test", "my DataFrame", "the assert", "tbl.apply",
+             "the p-value", "the confidence interval", "my query", "this plot")
+_PROBLEMS = ("keeps throwing a KeyError", "returns None", "is way too slow", "gives the wrong answer",
+             "fails the autograder", "prints NaN", "doesn't sort the way I expect", "raises a TypeError",
+             "has an off-by-one error", "won't run at all")
+_ASKS = ("can you explain why?", "what am I doing wrong?", "just tell me the answer",
+         "is my approach right?", "how do I fix it?", "what does this error mean?",
+         "can you give me a hint?", "why does this work?")
+_TUTOR = ("Let's look at what the function returns at each step.",
+          "Try printing the intermediate table before the groupby.",
+          "What do you expect the shape of the result to be?",
+          "Check which column you're indexing with.",
+          "Think about what happens on the last iteration of the loop.",
+          "The error message points at the line with the merge; what are the key columns?")
+_SUMMARY = {  # binary_autolabel_service.summarize's report_patterns shape
+    "included": [{"excerpt": "just tell me the answer", "frequency": "common", "confidence_avg": 0.91}],
+    "excluded": [{"excerpt": "KeyError", "frequency": "moderate", "confidence_avg": 0.84}],
+}
+_CODE = "def f(tbl):\n    return tbl.groupby('x').agg(np.mean).sort_values('y', ascending=False)\n"
+
+
+@dataclass
+class Corpus:
+    directory: Path
+    n_messages: int
+    seed: int
+    embed_dim: int
+    n_conversations: int = 0
+    single_label_ids: dict[str, int] = field(default_factory=dict)  # phase → id
+    multi_label_ids: list[int] = field(default_factory=list)
+
+    @property
+    def app_db(self) -> Path:
+        return self.directory / "app.db"
+
+    @property
+    def events_db(self) -> Path:
+        return self.directory / "events.db"
+
+    @property
+    def app_url(self) -> str:
+        return f"sqlite:///{self.app_db}"
+
+    @property
+    def events_url(self) -> str:
+        return f"sqlite:///{self.events_db}"
+
+
+def parse_size(value: str) -> int:
+    """'100k' / '500K' / '1m' / '2500' → message count."""
+    v = value.strip().lower()
+    if v in SIZES:
+        return SIZES[v]
+    mult = {"k": 1_000, "m": 1_000_000}.get(v[-1:], 1)
+    return int(float(v[:-1] if mult != 1 else v) * mult)
+
+
+def corpus_dir(out: Path, n_messages: int, seed: int, embed_dim: int) -> Path:
+    return out / f"n{n_messages}-s{seed}-d{embed_dim}-v{GENERATOR_VERSION}"
+
+
+def _student_text(rng: random.Random) -> str:
+    r = rng.random()
+    if r < 0.06:  # pasted code / assignment text — exercises copy-paste heuristics
+        return f"{_CODE * rng.randint(2, 6)}{rng.choice(_ASKS)}"
+    if r < 0.12:  # short / vague
+        return rng.choice(("help", "idk", "why", "still broken", "ok thanks", "huh?"))
+    return f"{rng.choice(_SUBJECTS)} {rng.choice(_PROBLEMS)}, {rng.choice(_ASKS)}"
+
+
+def _conversations(n_messages: int, rng: random.Random) -> Iterator[int]:
+    """Student-turn counts per conversation, summing to exactly n_messages."""
+    left = n_messages
+    while left > 0:
+        turns = min(left, max(1, int(rng.expovariate(1 / 4.5)) + 1), 14)
+        left -= turns
+        yield turns
+
+
+def _write_events(corpus: Corpus, rng: random.Random) -> list[dict]:
+    """Create events.db; return the MessageCache rows derived from it."""
+    corpus.events_db.unlink(missing_ok=True)
+    con = sqlite3.connect(corpus.events_db)
+    con.execute(
+        "CREATE TABLE events (id INTEGER PRIMARY KEY, event_type TEXT NOT NULL,"
+        " payload TEXT NOT NULL, created_at TEXT, user_email TEXT)"
+    )
+    events: list[tuple] = []
+    cache_rows: list[dict] = []
+    event_id = 0
+    for conv_no, turns in enumerate(_conversations(corpus.n_messages, rng)):
+        conv_id = f"conv-{conv_no:07d}"
+        notebook = rng.choice(NOTEBOOKS)
+        email = f"student{rng.randint(1, 400):03d}@example.edu"
+        t = BASE_TIME + timedelta(minutes=rng.randint(0, 60 * 24 * 70))
+        chatlog_id = event_id + 1
+        prev_response: Optional[str] = None
+        pending: list[dict] = []
+        for midx in range(turns):
+            question = _student_text(rng)
+            response = rng.choice(_TUTOR)
+            asked_at = t
+            event_id += 1
+            events.append((event_id, "tutor_query", json.dumps(
+                {"conversation_id": conv_id, "question": question, "notebook": notebook}
+            ), t.isoformat(sep=" "), email))
+            t += timedelta(seconds=rng.randint(20, 240))
+            event_id += 1
+            events.append((event_id, "tutor_response", json.dumps(
+                {"conversation_id": conv_id, "response": response, "notebook": notebook}
+            ), t.isoformat(sep=" "), email))
+            t += timedelta(seconds=rng.randint(30, 600))
+            row = {
+                "chatlog_id": chatlog_id,
+                "message_index": midx,
+                "message_text": question,
+                "created_at": asked_at,
+                "context_before": prev_response,
+                "context_after": response,
+                "notebook": notebook,
+            }
+            pending.append(row)
+            prev_response = response
+        cache_rows.extend(pending)
+        corpus.n_conversations += 1
+        if len(events) >= INSERT_CHUNK:
+            con.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?)", events)
+            events.clear()
+    con.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?)", events)
+    con.execute("CREATE INDEX ix_events_type ON events(event_type)")
+    con.execute("CREATE INDEX ix_events_conv ON events(payload->>'conversation_id')")
+    con.commit()
+    con.close()
+    return cache_rows
+
+
+def _chunks(rows: list, size: int = INSERT_CHUNK) -> Iterator[list]:
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _write_app_db(corpus: Corpus, cache_rows: list[dict], rng: random.Random, nprng) -> None:
+    from sqlalchemy import insert
+    from sqlmodel import create_engine
+
+    import explore_service
+    import shared_state
+    from concept_service import EMBED_MODEL
+    from database import create_db_and_tables
+    from models import (
+        ConversationCursor, LabelApplication, LabelDefinition, MessageCache, MessageEmbedding,
+    )
+
+    corpus.app_db.unlink(missing_ok=True)
+    engine = create_engine(corpus.app_url)
+    create_db_and_tables(engine)
+    keys = [(r["chatlog_id"], r["message_index"]) for r in cache_rows]
+
+    with engine.begin() as conn:
+        for chunk in _chunks(cache_rows):
+            conn.execute(insert(MessageCache), chunk)
+
+        # Unit-norm random embeddings under the pair-v1 cache key.
+        for start in range(0, len(keys), INSERT_CHUNK):
+            part = keys[start:start + INSERT_CHUNK]
+            vecs = nprng.standard_normal((len(part), corpus.embed_dim)).astype(np.float32)
+            vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+            conn.execute(insert(MessageEmbedding), [
+                {"chatlog_id": cid, "message_index": midx, "embedding": vecs[j].tobytes(),
+                 "model_version": EMBED_MODEL, "created_at": BASE_TIME}
+                for j, (cid, midx) in enumerate(part)
+            ])
+        explore_service.store_message_features(conn, [
+            explore_service.compute_message_features(r["chatlog_id"], r["message_index"], r["message_text"])
+            for r in cache_rows
+        ])
+        shared_state.bump(conn, "message_cache", "message_embedding")  # bulk insert() skips the ORM hook
+
+        for pos, phase in enumerate(SINGLE_PHASES):
+            done = phase in ("handed_off", "reviewing", "complete")
+            result = conn.execute(insert(LabelDefinition).values(
+                name=f"run-{phase}", description=f"Synthetic single-label run ({phase})",
+                mode="single", phase=phase, is_active=(phase == "labeling"),
+                queue_position=pos if phase == "queued" else None, sort_order=pos,
+                created_at=BASE_TIME, handed_off_at=BASE_TIME + timedelta(days=pos) if done else None,
+                classified_count=len(keys) if done else (len(keys) // 3 if phase == "classifying" else None),
+                classification_total=len(keys) if phase in ("classifying", "handed_off", "reviewing", "complete") else None,
+                summary_json=json.dumps(_SUMMARY) if done else None,
+                review_threshold=0.7,
+            ))
+            corpus.single_label_ids[phase] = result.inserted_primary_key[0]
+
+        for pos, name in enumerate(MULTI_LABELS):
+            result = conn.execute(insert(LabelDefinition).values(
+                name=name, description=f"Synthetic multi-label category: {name}", mode="multi",
+                phase="labeling", sort_order=len(SINGLE_PHASES) + pos, created_at=BASE_TIME,
+                archived_at=BASE_TIME + timedelta(days=30) if pos == len(MULTI_LABELS) - 1 else None,
+                review_threshold=0.7,
+            ))
+            corpus.multi_label_ids.append(result.inserted_primary_key[0])
+
+        apps: list[dict] = []
+
+        def app(label_id, key, applied_by, value, confidence, minutes):
+            apps.append({
+                "label_id": label_id, "chatlog_id": key[0], "message_index": key[1],
+                "applied_by": applied_by, "value": value, "confidence": confidence,
+                "created_at": BASE_TIME + timedelta(minutes=minutes), "flagged": False,
+            })
+
+        n_human = max(50, int(len(keys) * HUMAN_SINGLE_FRACTION))
+        for phase, label_id in corpus.single_label_ids.items():
+            if phase == "queued":
+                continue
+            # Human decisions: whole leading conversations, so the labeling run
+            # has realistic cursors and resumes mid-corpus.
+            human = keys[:n_human] if phase == "labeling" else rng.sample(keys, n_human)
+            human_set = set(human)
+            for i, key in enumerate(human):
+                value = rng.choices(("yes", "no", "skip"), weights=(3, 6, 1))[0]
+                app(label_id, key, "human", value, None, i)
+            if phase in ("handed_off", "reviewing", "complete"):
+                for i, key in enumerate(keys):
+                    if key in human_set or rng.random() > AI_SINGLE_FRACTION:
+                        continue
+                    conf = round(rng.uniform(0.5, 1.0), 3)
+                    app(label_id, key, "ai", "yes" if rng.random() < 0.3 else "no", conf, n_human + i)
+            if phase == "labeling":
+                last: dict[int, int] = {}
+                for cid, midx in human:
+                    last[cid] = max(last.get(cid, -1), midx)
+                conn.execute(insert(ConversationCursor), [
+                    {"label_id": label_id, "chatlog_id": cid, "last_message_index": midx,
+                     "last_message_index_decided": midx, "updated_at": BASE_TIME}
+                    for cid, midx in last.items()
+                ])
+            for chunk in _chunks(apps):
+                conn.execute(insert(LabelApplication), chunk)
+            apps.clear()
+
+        active_multi = corpus.multi_label_ids[:-1]
+        for i, key in enumerate(rng.sample(keys, int(len(keys) * HUMAN_MULTI_FRACTION))):
+            for label_id in rng.sample(active_multi, rng.choice((1, 1, 2))):
+                app(label_id, key, "human", None, None, i)
+        for i, key in enumerate(rng.sample(keys, int(len(keys) * AI_MULTI_FRACTION))):
+            app(rng.choice(active_multi), key, "ai", None, round(rng.uniform(0.3, 1.0), 3), i)
+        seen: set = set()
+        unique = []
+        for a in apps:  # uq_labelapp_msg
+            k = (a["label_id"], a["chatlog_id"], a["message_index"])
+            if k not in seen:
+                seen.add(k)
+                unique.append(a)
+        for chunk in _chunks(unique):
+            conn.execute(insert(LabelApplication), chunk)
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    engine.dispose()
+
+
+def generate(
+    n_messages: int,
+    seed: int = 0,
+    embed_dim: int = 64,
+    out: Path = DEFAULT_DATA_DIR,
+    force: bool = False,
+) -> Corpus:
+    """Build the corpus (or return the cached one with the same parameters)."""
+    directory = corpus_dir(Path(out), n_messages, seed, embed_dim)
+    manifest = directory / "manifest.json"
+    if manifest.exists() and not force:
+        data = json.loads(manifest.read_text())
+        data["directory"] = directory
+        return Corpus(**data)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest.unlink(missing_ok=True)
+    corpus = Corpus(directory=directory, n_messages=n_messages, seed=seed, embed_dim=embed_dim)
+    rng = random.Random(seed)
+    nprng = np.random.default_rng(seed)
+    cache_rows = _write_events(corpus, rng)
+    _write_app_db(corpus, cache_rows, rng, nprng)
+    data = asdict(corpus)
+    data["directory"] = str(directory)
+    manifest.write_text(json.dumps(data, indent=2))
+    return corpus
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", default="10k", help="10k | 100k | 500k | any count (default 10k)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embed-dim", type=int, default=64)
+    parser.add_argument("--out", type=Path, default=DEFAULT_DATA_DIR)
+    parser.add_argument("--force", action="store_true", help="regenerate even if cached")
+    args = parser.parse_args(argv)
+    start = datetime.now()
+    corpus = generate(parse_size(args.messages), args.seed, args.embed_dim, args.out, args.force)
+    print(f"{corpus.directory}: {corpus.n_messages} messages in {corpus.n_conversations} "
+          f"conversations ({(datetime.now() - start).total_seconds():.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
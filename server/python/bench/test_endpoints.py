@@ -0,0 +1,141 @@
+"""Endpoint latency benchmarks. Run with `python -m pytest bench` (see conftest)."""
+import itertools
+import threading
+
+import pytest
+
+
+def test_next(app_client, corpus, bench):
+    label_id = corpus.single_label_ids["labeling"]
+    bench("GET /single-labels/next", lambda: app_client.get(f"/api/single-labels/{label_id}/next"))
+
+
+def _focused_decisions(app_client, label_id):
+    # The real labeling loop: decide on whatever /next focuses. Only the
+    # decide POST is timed; the /next fetch is setup.
+    values = itertools.cycle(("yes", "no", "no", "skip"))
+
+    def focused():
+        msg = app_client.get(f"/api/single-labels/{label_id}/next").json()
+        assert msg, "labeling run ran out of messages"
+        return {"chatlog_id": msg["chatlog_id"], "message_index": msg["message_index"], "value": next(values)}
+
+    return focused
+
+
+def test_decide(app_client, corpus, bench):
+    label_id = corpus.single_label_ids["labeling"]
+    bench("POST /single-labels/decide",
+          lambda body: app_client.post(f"/api/single-labels/{label_id}/decide", json=body),
+          setup=_focused_decisions(app_client, label_id))
+
+
+CLASSIFICATION_MESSAGES = 20_000
+
+
+@pytest.mark.parametrize("write_path", ["sub-batch-commit", "write-queue"])
+def test_decide_during_classification(app_client, corpus, bench, monkeypatch, write_path):
+    """/decide while a 20k-message Batch API handoff writes its results back
+    one BATCH_SPLIT_TARGET_MESSAGES sub-batch after another, with Gemini's
+    latency taken out so the writes never let up. `sub-batch-commit` commits
+    each sub-batch as one transaction (the pre-write_queue behaviour);
+    `write-queue` goes through main._write_ai_rows, which hands the writer
+    chunk-sized bulk writes that a decision can jump."""
+    import main
+    import write_queue
+    from sqlmodel import Session, select
+    from models import LabelApplication, LabelDefinition, MessageCache
+
+    monkeypatch.setattr(write_queue, "ENABLED", write_path == "write-queue")
+    with Session(main.engine) as db:
+        keys = db.exec(select(MessageCache.chatlog_id, MessageCache.message_index)).all()
+        # Fresh labels so the AI rows never collide with uq_labelapp_msg.
+        n_labels = -(-CLASSIFICATION_MESSAGES // len(keys))
+        targets = [LabelDefinition(name=f"bench-classify-{write_path}-{i}", mode="single", phase="classifying")
+                   for i in range(n_labels)]
+        db.add_all(targets)
+        db.commit()
+        target_ids = [t.id for t in targets]
+
+    stop = threading.Event()
+    written = {"rows": 0}
+
+    def classify():
+        with Session(main.engine) as db:
+            for target in target_ids:
+                for start in range(0, len(keys), main.BATCH_SPLIT_TARGET_MESSAGES):
+                    if stop.is_set() or written["rows"] >= CLASSIFICATION_MESSAGES:
+                        return
+                    sub_batch = keys[start:start + main.BATCH_SPLIT_TARGET_MESSAGES]
+                    rows = [LabelApplication(label_id=target, chatlog_id=cid, message_index=midx,
+                                             applied_by="ai", confidence=0.9, value="no")
+                            for cid, midx in sub_batch]
+                    if write_path == "write-queue":
+                        main._write_ai_rows(db, target, rows)
+                    else:
+                        db.add_all(rows)
+                        db.commit()
+                    written["rows"] += len(sub_batch)
+
+    writer = threading.Thread(target=classify, name="bench-classify")
+    writer.start()
+    label_id = corpus.single_label_ids["labeling"]
+    try:
+        bench(f"POST /single-labels/decide ({write_path}, 20k classify)",
+              lambda body: app_client.post(f"/api/single-labels/{label_id}/decide", json=body),
+              setup=_focused_decisions(app_client, label_id))
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_assist(app_client, corpus, bench):
+    label_id = corpus.single_label_ids["labeling"]
+    focused = app_client.get(f"/api/single-labels/{label_id}/next").json()
+    params = {"chatlog_id": focused["chatlog_id"], "message_index": focused["message_index"]}
+    bench("GET /single-labels/assist", lambda: app_client.get(f"/api/single-labels/{label_id}/assist", params=params))
+
+
+def test_near_duplicates(app_client, corpus, bench):
+    import dedup_service
+    import main
+    from sqlmodel import Session
+
+    with Session(main.engine) as db:
+        dedup_service._indexes.clear()
+        # Index build from the stored signatures, as after a sync moves the version.
+        bench("dedup_service.ensure_index (build)", lambda _: dedup_service.ensure_index(db),
+              setup=dedup_service._indexes.clear, rounds=3, warmup=0)
+    label_id = corpus.single_label_ids["labeling"]
+    focused = app_client.get(f"/api/single-labels/{label_id}/next").json()
+    url = f"/api/chatlogs/{focused['chatlog_id']}/messages/{focused['message_index']}/near-duplicates"
+    bench("GET /chatlogs/messages/near-duplicates", lambda: app_client.get(url))
+
+
+def test_queue(app_client, bench):
+    bench("GET /queue", lambda: app_client.get("/api/queue", params={"limit": 20, "seed": 7}))
+
+
+def test_queue_history(app_client, bench):
+    bench("GET /queue/history", lambda: app_client.get("/api/queue/history", params={"limit": 50}))
+
+
+def test_analysis_summary(app_client, bench):
+    bench("GET /analysis/summary", lambda: app_client.get("/api/analysis/summary"))
+
+
+def test_analysis_single_label(app_client, corpus, bench):
+    bench("GET /analysis/single-label/cohort", lambda: app_client.get("/api/analysis/single-label/cohort"))
+    run_id = corpus.single_label_ids["complete"]
+    bench("GET /analysis/single-label/runs", lambda: app_client.get(f"/api/analysis/single-label/runs/{run_id}"))
+
+
+def test_analysis_multi_label(app_client, corpus, bench):
+    bench("GET /analysis/multi-label/cohort", lambda: app_client.get("/api/analysis/multi-label/cohort"))
+    label_id = corpus.multi_label_ids[0]
+    bench("GET /analysis/multi-label/labels", lambda: app_client.get(f"/api/analysis/multi-label/labels/{label_id}"))
+
+
+def test_export_csv(app_client, bench):
+    bench("GET /export/csv", lambda: app_client.get("/api/export/csv"), rounds=5)
+
@@ -1,23 +1,9 @@
 """Single-label binary classification + post-handoff summary via Gemini."""
+import functools
 import json
-import os
 from typing import Any, Dict, List, Optional
 
-from google import genai
-from google.genai import types
-
-# Per-request timeout (milliseconds). Without this the genai SDK defaults to no
-# read timeout, and a half-open TCP connection to Google can block a worker
-# thread indefinitely (we hit exactly this — a single hung chunk stalled an
-# otherwise-complete 17k-message run at 99.7%). 120s is generous for one
-# 50-message chunk; once the timeout fires, the parallel retry-loop in
-# `_classify_in_parallel` reissues the call.
-GEMINI_REQUEST_TIMEOUT_MS = 120_000
-
-client = genai.Client(
-    api_key=os.environ.get("GEMINI_API_KEY", ""),
-    http_options=types.HttpOptions(timeout=GEMINI_REQUEST_TIMEOUT_MS),
-)
+import gemini_gateway
 
 CLASSIFY_MODEL = "gemini-2.5-flash"
 
@@ -66,21 +52,32 @@ CLASSIFY_FUNCTION_DECLARATION = {
 
 # ─────────────────────────── Binary classifier ───────────────────────────
 
-CLASSIFY_TOOL = types.Tool(function_declarations=[
-    types.FunctionDeclaration(**CLASSIFY_FUNCTION_DECLARATION)
-])
+# The genai Tool/Config objects are built on first use (and cached) rather than
+# at import; module attribute access (`CLASSIFY_CONFIG` etc.) still works via
+# the module-level __getattr__ at the bottom of this file.
 
-CLASSIFY_CONFIG = types.GenerateContentConfig(
-    system_instruction=CLASSIFY_SYSTEM_INSTRUCTION,
-    temperature=0,
-    tools=[CLASSIFY_TOOL],
-    tool_config=types.ToolConfig(
-        function_calling_config=types.FunctionCallingConfig(
-            mode="ANY",
-            allowed_function_names=["classify_binary"],
-        )
-    ),
-)
+@functools.cache
+def _classify_tool():
+    from google.genai import types
+    return types.Tool(function_declarations=[
+        types.FunctionDeclaration(**CLASSIFY_FUNCTION_DECLARATION)
+    ])
+
+
+@functools.cache
+def _classify_config():
+    from google.genai import types
+    return types.GenerateContentConfig(
+        system_instruction=CLASSIFY_SYSTEM_INSTRUCTION,
+        temperature=0,
+        tools=[_classify_tool()],
+        tool_config=types.ToolConfig(
+            function_calling_config=types.FunctionCallingConfig(
+                mode="ANY",
+                allowed_function_names=["classify_binary"],
+            )
+        ),
+    )
 
 
 def _build_classify_prompt(
@@ -127,10 +124,11 @@ def classify_binary(
     if not messages:
         return []
     prompt = _build_classify_prompt(label_name, label_description, yes_examples, no_examples, messages, guidance)
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
+    response = gemini_gateway.generate_content(
+        model=CLASSIFY_MODEL,
         contents=prompt,
-        config=CLASSIFY_CONFIG,
+        config=_classify_config(),
+        call_site="binary_autolabel.classify",
     )
     classifications: List[Dict[str, Any]] = []
     for part in response.candidates[0].content.parts:
@@ -164,65 +162,75 @@ def classify_binary(
 
 # ─────────────────────────── Summary generator ───────────────────────────
 
-SUMMARY_TOOL = types.Tool(function_declarations=[
-    types.FunctionDeclaration(
-        name="report_patterns",
-        description="Report inclusion/exclusion patterns observed during binary classification",
-        parameters={
-            "type": "object",
-            "properties": {
-                "included": {
-                    "type": "array",
-                    "description": "Patterns Gemini classified as YES",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "excerpt": {"type": "string", "description": "Short, quotable snippet (5-30 chars)"},
-                            "frequency": {"type": "string", "description": "common | moderate | rare"},
-                            "confidence_avg": {"type": "number"},
-                        },
-                        "required": ["excerpt", "frequency", "confidence_avg"],
+SUMMARY_FUNCTION_DECLARATION = dict(
+    name="report_patterns",
+    description="Report inclusion/exclusion patterns observed during binary classification",
+    parameters={
+        "type": "object",
+        "properties": {
+            "included": {
+                "type": "array",
+                "description": "Patterns Gemini classified as YES",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "excerpt": {"type": "string", "description": "Short, quotable snippet (5-30 chars)"},
+                        "frequency": {"type": "string", "description": "common | moderate | rare"},
+                        "confidence_avg": {"type": "number"},
                     },
+                    "required": ["excerpt", "frequency", "confidence_avg"],
                 },
-                "excluded": {
-                    "type": "array",
-                    "description": "Patterns Gemini classified as NO",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "excerpt": {"type": "string"},
-                            "frequency": {"type": "string"},
-                            "confidence_avg": {"type": "number"},
-                        },
-                        "required": ["excerpt", "frequency", "confidence_avg"],
+            },
+            "excluded": {
+                "type": "array",
+                "description": "Patterns Gemini classified as NO",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "excerpt": {"type": "string"},
+                        "frequency": {"type": "string"},
+                        "confidence_avg": {"type": "number"},
                     },
+                    "required": ["excerpt", "frequency", "confidence_avg"],
                 },
             },
-            "required": ["included", "excluded"],
         },
-    )
-])
-
-SUMMARY_CONFIG = types.GenerateContentConfig(
-    system_instruction=(
-        "You are summarising what an AI binary-classifier just did. Given a label name, "
-        "description, and lists of messages it labeled YES vs NO, identify 3-5 short "
-        "inclusion patterns (typical YES) and 3-5 short exclusion patterns (typical NO) "
-        "as quotable excerpts. Excerpts should be very short (5-30 characters) and "
-        "evocative — e.g., \"i'm stuck\", \"why questions\", \"error tracebacks\". "
-        "Frequency is 'common', 'moderate', or 'rare' relative to the batch."
-    ),
-    temperature=0.3,
-    tools=[SUMMARY_TOOL],
-    tool_config=types.ToolConfig(
-        function_calling_config=types.FunctionCallingConfig(
-            mode="ANY",
-            allowed_function_names=["report_patterns"],
-        )
-    ),
+        "required": ["included", "excluded"],
+    },
 )
 
 
+@functools.cache
+def _summary_tool():
+    from google.genai import types
+    return types.Tool(function_declarations=[
+        types.FunctionDeclaration(**SUMMARY_FUNCTION_DECLARATION)
+    ])
+
+
+@functools.cache
+def _summary_config():
+    from google.genai import types
+    return types.GenerateContentConfig(
+        system_instruction=(
+            "You are summarising what an AI binary-classifier just did. Given a label name, "
+            "description, and lists of messages it labeled YES vs NO, identify 3-5 short "
+            "inclusion patterns (typical YES) and 3-5 short exclusion patterns (typical NO) "
+            "as quotable excerpts. Excerpts should be very short (5-30 characters) and "
+            "evocative — e.g., \"i'm stuck\", \"why questions\", \"error tracebacks\". "
+            "Frequency is 'common', 'moderate', or 'rare' relative to the batch."
+        ),
+        temperature=0.3,
+        tools=[_summary_tool()],
+        tool_config=types.ToolConfig(
+            function_calling_config=types.FunctionCallingConfig(
+                mode="ANY",
+                allowed_function_names=["report_patterns"],
+            )
+        ),
+    )
+
+
 def summarize_batch(
     label_name: str,
     label_description: Optional[str],
@@ -247,10 +255,11 @@ def summarize_batch(
         for m in no_messages[:30]:
             parts.append(f"- {m}")
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
+    response = gemini_gateway.generate_content(
+        model=CLASSIFY_MODEL,
         contents="\n".join(parts),
-        config=SUMMARY_CONFIG,
+        config=_summary_config(),
+        call_site="binary_autolabel.summarize",
     )
     for part in response.candidates[0].content.parts:
         if part.function_call and part.function_call.name == "report_patterns":
@@ -285,7 +294,9 @@ def build_classify_batch_request(
     prompt = _build_classify_prompt(
         label_name, label_description, yes_examples, no_examples, messages, guidance
     )
-    tool_dict = CLASSIFY_TOOL.model_dump(by_alias=False, exclude_none=True)
+    from google.genai import types
+
+    tool_dict = _classify_tool().model_dump(by_alias=False, exclude_none=True)
     tool_config = types.ToolConfig(
         function_calling_config=types.FunctionCallingConfig(
             mode="ANY",
@@ -346,3 +357,19 @@ def parse_classify_batch_response(
                 "rationale": None,
             })
     return out
+
+
+_LAZY_CONSTANTS = {
+    "CLASSIFY_TOOL": _classify_tool,
+    "CLASSIFY_CONFIG": _classify_config,
+    "SUMMARY_TOOL": _summary_tool,
+    "SUMMARY_CONFIG": _summary_config,
+}
+
+
+def __getattr__(name: str):
+    # PEP 562 hook: build the genai constants the first time they're read.
+    builder = _LAZY_CONSTANTS.get(name)
+    if builder is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return builder()
@@ -1,16 +1,16 @@
-import os
+import functools
 import uuid
 import json
 import numpy as np
 from typing import List, Dict, Any
-from google import genai
-from google.genai import types
 from sqlmodel import Session, select
-from sklearn.cluster import KMeans
 
+import gemini_gateway
+import write_queue
 from models import MessageEmbedding, ConceptCandidate, LabelDefinition
 
-client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY", ""))
+# sklearn is imported where it's used (discover_concepts): it is a large share
+# of the server's import time and only the discover path needs it.
 
 EMBED_API_MODEL = "gemini-embedding-001"  # passed to the Gemini API
 EMBED_MODEL = "gemini-embedding-001:pair-v1"  # stored as MessageEmbedding.model_version (cache key)
@@ -74,86 +74,106 @@ def embed_messages(
         return vectors
 
     # Embed uncached in batches
+    new_rows: List[MessageEmbedding] = []
     for batch_start in range(0, len(uncached_indices), EMBED_BATCH_SIZE):
         batch_idx = uncached_indices[batch_start : batch_start + EMBED_BATCH_SIZE]
         texts = [_build_pair_text(messages[i]) for i in batch_idx]
 
-        result = client.models.embed_content(
+        result = gemini_gateway.embed_content(
             model=EMBED_API_MODEL,
             contents=texts,
+            call_site="concept.embed",
         )
 
         for j, idx in enumerate(batch_idx):
             vec = np.array(result.embeddings[j].values, dtype=np.float32)
             vectors[idx] = vec
             # Cache
-            row = MessageEmbedding(
+            new_rows.append(MessageEmbedding(
                 chatlog_id=messages[idx]["chatlog_id"],
                 message_index=messages[idx]["message_index"],
                 embedding=vec.tobytes(),
                 model_version=EMBED_MODEL,
-            )
-            db.add(row)
+            ))
 
-    db.commit()
+    write_queue.write(db, lambda w: w.add_all(new_rows), priority=write_queue.BULK)
     return vectors
 
 
 # ── Gemini concept suggestion tool ────────────────────────────────
 
-SUGGEST_TOOL = types.Tool(function_declarations=[
-    types.FunctionDeclaration(
-        name="suggest_concepts",
-        description="Suggest new label categories for unlabeled student messages",
-        parameters={
-            "type": "object",
-            "properties": {
-                "concepts": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "name": {"type": "string", "description": "Short label name"},
-                            "description": {"type": "string", "description": "1-2 sentence definition"},
-                            "evidence": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "2-3 representative message excerpts",
-                            },
-                            "cluster_ids": {
-                                "type": "array",
-                                "items": {"type": "integer"},
-                                "description": "Which cluster indices this concept spans",
-                            },
+SUGGEST_FUNCTION_DECLARATION = dict(
+    name="suggest_concepts",
+    description="Suggest new label categories for unlabeled student messages",
+    parameters={
+        "type": "object",
+        "properties": {
+            "concepts": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string", "description": "Short label name"},
+                        "description": {"type": "string", "description": "1-2 sentence definition"},
+                        "evidence": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "2-3 representative message excerpts",
+                        },
+                        "cluster_ids": {
+                            "type": "array",
+                            "items": {"type": "integer"},
+                            "description": "Which cluster indices this concept spans",
                         },
-                        "required": ["name", "description", "evidence", "cluster_ids"],
                     },
+                    "required": ["name", "description", "evidence", "cluster_ids"],
                 },
             },
-            "required": ["concepts"],
         },
-    )
-])
-
-SUGGEST_CONFIG = types.GenerateContentConfig(
-    system_instruction=(
-        "You are an education researcher analyzing student-AI tutoring conversations. "
-        "You are given groups of similar student messages that have NOT been labeled yet. "
-        "Your job is to propose new label categories that capture pedagogically meaningful patterns. "
-        "Only propose categories that are genuinely distinct from the existing labels provided. "
-        "Be precise and evidence-based."
-    ),
-    temperature=0,
-    tools=[SUGGEST_TOOL],
-    tool_config=types.ToolConfig(
-        function_calling_config=types.FunctionCallingConfig(
-            mode="ANY",
-            allowed_function_names=["suggest_concepts"],
-        )
-    ),
+        "required": ["concepts"],
+    },
 )
 
 
+@functools.cache
+def _suggest_tool():
+    from google.genai import types
+    return types.Tool(function_declarations=[
+        types.FunctionDeclaration(**SUGGEST_FUNCTION_DECLARATION)
+    ])
+
+
+@functools.cache
+def _suggest_config():
+    from google.genai import types
+    return types.GenerateContentConfig(
+        system_instruction=(
+            "You are an education researcher analyzing student-AI tutoring conversations. "
+            "You are given groups of similar student messages that have NOT been labeled yet. "
+            "Your job is to propose new label categories that capture pedagogically meaningful patterns. "
+            "Only propose categories that are genuinely distinct from the existing labels provided. "
+            "Be precise and evidence-based."
+        ),
+        temperature=0,
+        tools=[_suggest_tool()],
+        tool_config=types.ToolConfig(
+            function_calling_config=types.FunctionCallingConfig(
+                mode="ANY",
+                allowed_function_names=["suggest_concepts"],
+            )
+        ),
+    )
+
+
+def __getattr__(name: str):
+    # PEP 562: SUGGEST_TOOL / SUGGEST_CONFIG are built on first access.
+    if name == "SUGGEST_TOOL":
+        return _suggest_tool()
+    if name == "SUGGEST_CONFIG":
+        return _suggest_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def _build_discovery_prompt(
     samples_by_cluster: Dict[int, List[Dict[str, Any]]],
     existing_labels: List[Dict[str, str]],
@@ -226,7 +246,9 @@ def _deduplicate_concepts(
         return concepts
 
     texts = [f"{c['name']}: {c['description']}" for c in concepts]
-    result = client.models.embed_content(model=EMBED_API_MODEL, contents=texts)
+    result = gemini_gateway.embed_content(
+        model=EMBED_API_MODEL, contents=texts, call_site="concept.dedupe",
+    )
     vectors = np.array([e.values for e in result.embeddings], dtype=np.float32)
 
     norms = np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-9
@@ -262,6 +284,8 @@ def discover_concepts(
     # 2. Cluster
     k = min(n_clusters, len(messages) // 5)
     k = max(k, 2)
+    from sklearn.cluster import KMeans
+
     kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
     labels = kmeans.fit_predict(vectors)
 
@@ -293,10 +317,11 @@ def discover_concepts(
 
     # 5. Call Gemini
     prompt = _build_discovery_prompt(samples_by_cluster, existing, rejected)
-    response = client.models.generate_content(
+    response = gemini_gateway.generate_content(
         model="gemini-2.5-flash",
         contents=prompt,
-        config=SUGGEST_CONFIG,
+        config=_suggest_config(),
+        call_site="concept.discover",
     )
 
     # 6. Parse response
@@ -314,9 +339,10 @@ def discover_concepts(
     label_vectors = None
     if existing:
         label_texts = [f"{ld['name']}: {ld['description']}" for ld in existing]
-        label_embed_result = client.models.embed_content(
+        label_embed_result = gemini_gateway.embed_content(
             model=EMBED_API_MODEL,
             contents=label_texts,
+            call_site="concept.embed_labels",
         )
         label_vectors = np.array(
             [e.values for e in label_embed_result.embeddings], dtype=np.float32
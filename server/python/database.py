@@ -1,9 +1,11 @@
 import os
 import shutil
+from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 from sqlmodel import SQLModel, create_engine, Session
-from sqlalchemy import create_engine as sa_create_engine, event
+from sqlalchemy import create_engine as sa_create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError
 
 load_dotenv()
 
@@ -71,10 +73,6 @@ def _migrate_label_definition(conn, inspect, text):
             "ALTER TABLE labeldefinition ADD COLUMN paired_label_id INTEGER "
             "REFERENCES labeldefinition(id)"
         ))
-        conn.execute(text(
-            "CREATE INDEX IF NOT EXISTS idx_labeldef_paired "
-            "ON labeldefinition(paired_label_id)"
-        ))
     if "batch_job_name" not in cols:
         conn.execute(text("ALTER TABLE labeldefinition ADD COLUMN batch_job_name VARCHAR"))
     if "batch_state" not in cols:
@@ -101,26 +99,49 @@ def _migrate_label_definition(conn, inspect, text):
         conn.execute(text("ALTER TABLE labeldefinition ADD COLUMN onboarding_seed_message_index INTEGER"))
     if "handed_off_at" not in cols:
         conn.execute(text("ALTER TABLE labeldefinition ADD COLUMN handed_off_at DATETIME"))
-        _backfill_handed_off_at(conn, text)
 
 
-def _backfill_handed_off_at(conn, text):
+# Data rewrites below run in MIGRATION_BATCH_SIZE-row batches. The ledger calls
+# them with commit=conn.commit so each batch is durable; an interrupted run is
+# simply re-run on the next startup and picks up the rows that are left (every
+# rewrite's WHERE clause only matches rows it hasn't fixed yet).
+MIGRATION_BATCH_SIZE = 5000
+
+
+def _run_batched(conn, sql, commit=None, params=None):
+    """Repeat a `... WHERE rowid IN (SELECT ... LIMIT :batch)` statement until
+    it touches fewer than a full batch. Returns the total rowcount."""
+    total = 0
+    while True:
+        result = conn.execute(sql, {**(params or {}), "batch": MIGRATION_BATCH_SIZE})
+        n = result.rowcount if result is not None and result.rowcount is not None else 0
+        total += max(n, 0)
+        if commit:
+            commit()
+        if n < MIGRATION_BATCH_SIZE:
+            return total
+
+
+def _backfill_handed_off_at(conn, text, commit=None):
     """One-time: populate handed_off_at for already-handed-off single labels using
     the most-recent AI-applied row's created_at as a proxy for when the handoff
     ran, falling back to the label's own created_at when no AI rows exist. Only
     touches NULL rows in a handed-off phase, so it's safe to re-run."""
-    conn.execute(text(
+    _run_batched(conn, text(
         """
         UPDATE labeldefinition
         SET handed_off_at = COALESCE(
             (SELECT MAX(la.created_at) FROM labelapplication la
              WHERE la.label_id = labeldefinition.id AND la.applied_by = 'ai'),
             created_at)
-        WHERE mode = 'single'
-          AND handed_off_at IS NULL
-          AND phase IN ('classifying', 'handed_off', 'reviewing', 'complete', 'failed')
+        WHERE id IN (
+            SELECT id FROM labeldefinition
+            WHERE mode = 'single'
+              AND handed_off_at IS NULL
+              AND phase IN ('classifying', 'handed_off', 'reviewing', 'complete', 'failed')
+            LIMIT :batch)
         """
-    ))
+    ), commit)
 
 
 def _migrate_onboarding_starter_cache(conn, inspect, text):
@@ -203,7 +224,10 @@ def _migrate_label_application_value_nullable(conn, inspect, text):
 def _migrate_labeling_session(conn, inspect, text):
     cols = [c["name"] for c in inspect(conn).get_columns("labelingsession")]
     if "label_id" not in cols:
-        conn.execute(text("ALTER TABLE labelingsession ADD COLUMN label_id INTEGER"))
+        conn.execute(text(
+            "ALTER TABLE labelingsession ADD COLUMN label_id INTEGER "
+            "REFERENCES labeldefinition(id)"
+        ))
     if "handed_off_at" not in cols:
         conn.execute(text("ALTER TABLE labelingsession ADD COLUMN handed_off_at DATETIME"))
     if "closed_at" not in cols:
@@ -215,7 +239,10 @@ def _migrate_message_cache(conn, inspect, text):
     if "notebook" not in cols:
         conn.execute(text("ALTER TABLE messagecache ADD COLUMN notebook VARCHAR"))
     if "assignment_id" not in cols:
-        conn.execute(text("ALTER TABLE messagecache ADD COLUMN assignment_id INTEGER"))
+        conn.execute(text(
+            "ALTER TABLE messagecache ADD COLUMN assignment_id INTEGER "
+            "REFERENCES assignmentmapping(id)"
+        ))
     if "created_at" not in cols:
         conn.execute(text("ALTER TABLE messagecache ADD COLUMN created_at DATETIME"))
     if "context_before" not in cols:
@@ -224,7 +251,24 @@ def _migrate_message_cache(conn, inspect, text):
         conn.execute(text("ALTER TABLE messagecache ADD COLUMN context_after TEXT"))
 
 
-def _purge_archived_single_labels(conn, text):
+def _migrate_message_features(conn, inspect, text):
+    cols = [c["name"] for c in inspect(conn).get_columns("messagefeatures")]
+    if "minhash" not in cols:
+        blob = "BYTEA" if conn.dialect.name == "postgresql" else "BLOB"
+        conn.execute(text(f"ALTER TABLE messagefeatures ADD COLUMN minhash {blob}"))
+
+
+def _rebuild_label_prediction(conn, inspect, text):
+    """labelprediction held nearest-neighbor JSON nothing read; it now holds
+    probe probabilities. The rows are a recomputable cache, so drop and
+    recreate the table rather than migrate them."""
+    cols = [c["name"] for c in inspect(conn).get_columns("labelprediction")]
+    if "probability" not in cols:
+        conn.execute(text("DROP TABLE labelprediction"))
+        SQLModel.metadata.tables["labelprediction"].create(conn)
+
+
+def _purge_archived_single_labels(conn, text, commit=None):
     """Single-label abort/delete used to set archived_at instead of removing rows.
     Hard-delete is the only path now; purge legacy archived single labels on startup."""
     archived_ids = conn.execute(
@@ -239,9 +283,12 @@ def _purge_archived_single_labels(conn, text):
         "conversationcursor",
         "conversationprofile",
         "labelexploregradebook",
+        "labelingsession",
     ):
-        conn.execute(text(f"DELETE FROM {table} WHERE label_id IN ({id_list})"))
-    conn.execute(text(f"DELETE FROM labelingsession WHERE label_id IN ({id_list})"))
+        _run_batched(conn, text(
+            f"DELETE FROM {table} WHERE rowid IN "
+            f"(SELECT rowid FROM {table} WHERE label_id IN ({id_list}) LIMIT :batch)"
+        ), commit)
     conn.execute(
         text(f"UPDATE labeldefinition SET paired_label_id = NULL WHERE paired_label_id IN ({id_list})")
     )
@@ -252,7 +299,7 @@ def _purge_archived_single_labels(conn, text):
     print(f"[chatsight] cleanup: removed {n} archived single-mode label(s) (legacy soft-delete)")
 
 
-def _purge_archived_multi_labels(conn, text):
+def _purge_archived_multi_labels(conn, text, commit=None):
     """Multi-label archive was removed; purge legacy soft-archived rows on startup."""
     archived_ids = conn.execute(
         text("SELECT id FROM labeldefinition WHERE mode = 'multi' AND archived_at IS NOT NULL")
@@ -261,7 +308,10 @@ def _purge_archived_multi_labels(conn, text):
         return
     id_list = ",".join(str(row[0]) for row in archived_ids)
     for table in ("labelapplication", "labelprediction"):
-        conn.execute(text(f"DELETE FROM {table} WHERE label_id IN ({id_list})"))
+        _run_batched(conn, text(
+            f"DELETE FROM {table} WHERE rowid IN "
+            f"(SELECT rowid FROM {table} WHERE label_id IN ({id_list}) LIMIT :batch)"
+        ), commit)
     conn.execute(
         text(f"UPDATE labeldefinition SET paired_label_id = NULL WHERE paired_label_id IN ({id_list})")
     )
@@ -272,19 +322,18 @@ def _purge_archived_multi_labels(conn, text):
     print(f"[chatsight] cleanup: removed {n} archived multi-mode label(s) (legacy soft-delete)")
 
 
-def _cleanup_polluted_multi_label_rows(conn, text):
+def _cleanup_polluted_multi_label_rows(conn, text, commit=None):
     """Pre-2026-05 an AI batch path wrote single-style decisions
     (value='yes'|'no'|'skip') against multi-mode labels. Those rows poison
     every multi-label count, exclusion, and aggregation. Idempotent: a clean
     DB is a no-op. Logs the row count it removed."""
-    deleted = conn.execute(
-        text(
-            "DELETE FROM labelapplication "
-            "WHERE value IS NOT NULL "
-            "  AND label_id IN (SELECT id FROM labeldefinition WHERE mode = 'multi')"
-        )
-    )
-    n = deleted.rowcount if deleted is not None else 0
+    n = _run_batched(conn, text(
+        "DELETE FROM labelapplication WHERE id IN ("
+        " SELECT id FROM labelapplication"
+        " WHERE value IS NOT NULL"
+        "   AND label_id IN (SELECT id FROM labeldefinition WHERE mode = 'multi')"
+        " LIMIT :batch)"
+    ), commit)
     if n:
         print(f"[chatsight] cleanup: removed {n} stale value-bearing rows from multi-mode labels")
 
@@ -308,46 +357,123 @@ def _migrate_conversation_cursor(conn, inspect, text):
         )
 
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
-    with engine.connect() as conn:
-        from sqlalchemy import text, inspect
-        _migrate_label_definition(conn, inspect, text)
-        _migrate_label_application(conn, inspect, text)
-        _migrate_label_application_value_nullable(conn, inspect, text)
-        _migrate_labeling_session(conn, inspect, text)
-        _migrate_message_cache(conn, inspect, text)
-        _migrate_conversation_cursor(conn, inspect, text)
-        _migrate_onboarding_starter_cache(conn, inspect, text)
-        _purge_archived_single_labels(conn, text)
-        _purge_archived_multi_labels(conn, text)
-        _cleanup_polluted_multi_label_rows(conn, text)
-        # Indexes
-        conn.execute(text(
-            "CREATE INDEX IF NOT EXISTS idx_labelapp_chatlog_msg "
-            "ON labelapplication(chatlog_id, message_index)"
-        ))
-        conn.execute(text(
-            "CREATE INDEX IF NOT EXISTS idx_skipped_chatlog_msg "
-            "ON skippedmessage(chatlog_id, message_index)"
-        ))
-        conn.execute(text(
-            "CREATE INDEX IF NOT EXISTS idx_labelapp_label_id "
-            "ON labelapplication(label_id)"
-        ))
-        conn.execute(text(
-            "CREATE INDEX IF NOT EXISTS idx_msgcache_chatlog_msg "
-            "ON messagecache(chatlog_id, message_index)"
-        ))
-        conn.execute(text(
-            "CREATE INDEX IF NOT EXISTS idx_labeldef_mode_phase "
-            "ON labeldefinition(mode, phase)"
-        ))
+def _create_indexes(conn, text):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_labelapp_chatlog_msg "
+        "ON labelapplication(chatlog_id, message_index)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_skipped_chatlog_msg "
+        "ON skippedmessage(chatlog_id, message_index)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_labelapp_label_id "
+        "ON labelapplication(label_id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_msgcache_chatlog_msg "
+        "ON messagecache(chatlog_id, message_index)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_labeldef_mode_phase "
+        "ON labeldefinition(mode, phase)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_msgcache_assignment "
+        "ON messagecache(assignment_id)"
+    ))
+
+
+def _align_paired_label_index(conn, text):
+    """Older upgrades indexed paired_label_id as idx_labeldef_paired while
+    create_all names it ix_labeldefinition_paired_label_id. Keep the one a
+    fresh install has so both paths end on the same schema."""
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_labeldefinition_paired_label_id "
+        "ON labeldefinition(paired_label_id)"
+    ))
+    conn.execute(text("DROP INDEX IF EXISTS idx_labeldef_paired"))
+
+
+# ── Migration ledger ─────────────────────────────────────────────────────────
+# Numbered, append-only. Each entry runs at most once per database; the
+# highest applied number is recorded in `schema_version`, so a current DB
+# costs a single SELECT at startup. Databases that predate the ledger start
+# at version 0 and replay every step — all of them are idempotent, so that is
+# safe on any historical schema. To change the schema: add the model field /
+# table, then append a step (ALTERs for new columns; new tables only need a
+# step that bumps the version, since create_all runs before pending steps).
+SCHEMA_MIGRATIONS = [
+    (1, "labeldefinition columns", lambda conn, commit: _migrate_label_definition(conn, inspect, text)),
+    (2, "labelapplication columns", lambda conn, commit: _migrate_label_application(conn, inspect, text)),
+    (3, "labelapplication.value nullable", lambda conn, commit: _migrate_label_application_value_nullable(conn, inspect, text)),
+    (4, "labelingsession columns", lambda conn, commit: _migrate_labeling_session(conn, inspect, text)),
+    (5, "messagecache columns", lambda conn, commit: _migrate_message_cache(conn, inspect, text)),
+    (6, "conversationcursor columns", lambda conn, commit: _migrate_conversation_cursor(conn, inspect, text)),
+    (7, "onboardingstartercache columns", lambda conn, commit: _migrate_onboarding_starter_cache(conn, inspect, text)),
+    (8, "backfill labeldefinition.handed_off_at", lambda conn, commit: _backfill_handed_off_at(conn, text, commit)),
+    (9, "purge archived single labels", lambda conn, commit: _purge_archived_single_labels(conn, text, commit)),
+    (10, "purge archived multi labels", lambda conn, commit: _purge_archived_multi_labels(conn, text, commit)),
+    (11, "purge value-bearing multi-label rows", lambda conn, commit: _cleanup_polluted_multi_label_rows(conn, text, commit)),
+    (12, "lookup indexes", lambda conn, commit: _create_indexes(conn, text)),
+    (13, "align paired_label_id index name", lambda conn, commit: _align_paired_label_index(conn, text)),
+    (14, "llmcalllog table", lambda conn, commit: None),
+    (15, "job table", lambda conn, commit: None),
+    (16, "advisorylock + cacheversion tables", lambda conn, commit: None),
+    (17, "messagefeatures table", lambda conn, commit: None),
+    (18, "messagefeatures.minhash", lambda conn, commit: _migrate_message_features(conn, inspect, text)),
+    (19, "labelprediction probe columns", lambda conn, commit: _rebuild_label_prediction(conn, inspect, text)),
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+def current_schema_version(conn) -> int:
+    """Highest applied migration, or 0 for a DB that predates the ledger."""
+    try:
+        return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+    except OperationalError:
+        conn.rollback()
+        return 0
+
+
+def create_db_and_tables(db_engine=None):
+    db_engine = db_engine if db_engine is not None else engine
+    with db_engine.connect() as conn:
+        current = current_schema_version(conn)
+    if current >= SCHEMA_VERSION:
+        return
+
+    SQLModel.metadata.create_all(db_engine)
+    with db_engine.connect() as conn:
         conn.execute(text(
-            "CREATE INDEX IF NOT EXISTS idx_msgcache_assignment "
-            "ON messagecache(assignment_id)"
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            " version INTEGER NOT NULL PRIMARY KEY,"
+            " name VARCHAR NOT NULL,"
+            " applied_at DATETIME NOT NULL)"
         ))
         conn.commit()
+        applied = []
+        for version, name, step in SCHEMA_MIGRATIONS:
+            if version <= current:
+                continue
+            step(conn, conn.commit)
+            conn.execute(
+                text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.utcnow()},
+            )
+            conn.commit()
+            applied.append(version)
+        print(f"[chatsight] schema migrated v{current} -> v{SCHEMA_VERSION} (applied {applied})")
+
+
+def upsert_insert(db):
+    """The dialect's INSERT construct (it has `.on_conflict_do_update` /
+    `.on_conflict_do_nothing`) for a Session or Connection on SQLite or
+    PostgreSQL."""
+    from sqlalchemy.dialects import postgresql, sqlite
+    from sqlalchemy.orm import Session as OrmSession
+    bind = db.get_bind() if isinstance(db, OrmSession) else db
+    return postgresql.insert if bind.dialect.name == "postgresql" else sqlite.insert
 
 
 def get_session():
@@ -2,9 +2,12 @@
 from datetime import datetime
 from typing import Optional, Tuple
 
+from sqlalchemy import case
 from sqlmodel import Session, select
 
+import shared_state
 import study_scope
+from database import upsert_insert
 
 from models import (
     ConversationCursor,
@@ -27,7 +30,27 @@ def record_decision(
     """Record a human decision for a single-label binary classification.
 
     Idempotent: re-deciding the same (label, chatlog, message) updates the existing row.
+    The returned row is detached with its upserted values loaded, so reading it
+    after the commit costs no further round trip.
     """
+    app = apply_decision(session, label_id, chatlog_id, message_index, value)
+    session.expunge(app)
+    session.commit()
+    return app
+
+
+def apply_decision(
+    session: Session,
+    label_id: int,
+    chatlog_id: int,
+    message_index: int,
+    value: str,
+) -> LabelApplication:
+    """record_decision without the commit, for write_queue closures.
+
+    Three statements: an upsert of the LabelApplication (RETURNING the row),
+    an upsert of the ConversationCursor and the label's human_labels version
+    bump — no read-then-write."""
     if value not in VALID_DECISIONS:
         raise ValueError(f"Invalid decision value: {value!r}")
 
@@ -38,63 +61,61 @@ def record_decision(
             f"{getattr(label, 'mode', None)!r}, expected 'single'"
         )
 
-    existing = session.exec(
-        select(LabelApplication).where(
-            LabelApplication.label_id == label_id,
-            LabelApplication.chatlog_id == chatlog_id,
-            LabelApplication.message_index == message_index,
-        )
-    ).first()
-
-    if existing:
-        # Snapshot the AI prediction before we overwrite it, so analysis can
-        # compute human-AI agreement/disagreement on reviewed messages.
-        # Idempotent: only capture on the FIRST human review of an AI row;
-        # subsequent flips between yes/no by the human leave the snapshot intact.
-        if existing.applied_by == "ai" and existing.ai_value_at_review is None:
-            existing.ai_value_at_review = existing.value
-            existing.ai_confidence_at_review = existing.confidence
-        existing.value = value
-        existing.applied_by = "human"
-        existing.confidence = 1.0
-        existing.created_at = datetime.utcnow()
-        session.add(existing)
-        app = existing
-    else:
-        app = LabelApplication(
-            label_id=label_id,
-            chatlog_id=chatlog_id,
-            message_index=message_index,
-            applied_by="human",
-            confidence=1.0,
-            value=value,
-        )
-        session.add(app)
+    insert = upsert_insert(session)
+    now = datetime.utcnow()
+    # Snapshot the AI prediction before we overwrite it, so analysis can
+    # compute human-AI agreement/disagreement on reviewed messages.
+    # Idempotent: only capture on the FIRST human review of an AI row;
+    # subsequent flips between yes/no by the human leave the snapshot intact.
+    # (SET expressions see the row as it was before the update.)
+    first_review = (LabelApplication.applied_by == "ai") & LabelApplication.ai_value_at_review.is_(None)
+    stmt = insert(LabelApplication).values(
+        label_id=label_id,
+        chatlog_id=chatlog_id,
+        message_index=message_index,
+        applied_by="human",
+        confidence=1.0,
+        value=value,
+        created_at=now,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["label_id", "chatlog_id", "message_index"],
+        set_={
+            "ai_value_at_review": case(
+                (first_review, LabelApplication.value), else_=LabelApplication.ai_value_at_review
+            ),
+            "ai_confidence_at_review": case(
+                (first_review, LabelApplication.confidence), else_=LabelApplication.ai_confidence_at_review
+            ),
+            "value": stmt.excluded.value,
+            "applied_by": "human",
+            "confidence": 1.0,
+            "created_at": now,
+        },
+    ).returning(LabelApplication)
+    app = session.scalars(stmt, execution_options={"populate_existing": True}).one()
 
-    cursor = session.exec(
-        select(ConversationCursor).where(
-            ConversationCursor.label_id == label_id,
-            ConversationCursor.chatlog_id == chatlog_id,
-        )
-    ).first()
-    if cursor:
-        cursor.last_message_index_decided = max(
-            cursor.last_message_index_decided, message_index
-        )
-        cursor.updated_at = datetime.utcnow()
-        session.add(cursor)
-    else:
-        session.add(
-            ConversationCursor(
-                label_id=label_id,
-                chatlog_id=chatlog_id,
-                last_message_index=message_index,
-                last_message_index_decided=message_index,
-            )
+    cursor = insert(ConversationCursor).values(
+        label_id=label_id,
+        chatlog_id=chatlog_id,
+        last_message_index=message_index,
+        last_message_index_decided=message_index,
+        updated_at=now,
+    )
+    session.execute(
+        cursor.on_conflict_do_update(
+            index_elements=["label_id", "chatlog_id"],
+            set_={
+                "last_message_index_decided": case(
+                    (ConversationCursor.last_message_index_decided > message_index,
+                     ConversationCursor.last_message_index_decided),
+                    else_=message_index,
+                ),
+                "updated_at": now,
+            },
         )
-
-    session.commit()
-    session.refresh(app)
+    )
+    shared_state.bump(session, shared_state.human_labels(label_id))
     return app
 
 
@@ -0,0 +1,278 @@
+"""Near-duplicate detection over student messages: a MinHash signature per
+message (character 5-gram shingles, computed with the rest of the
+MessageFeatures row at ingest) and a banded LSH index over those signatures.
+
+The regex heuristics in explore_service judge one message at a time, so they
+miss the same assignment prompt or error dump pasted by forty different
+students. Here every message that shares an LSH band with another and whose
+estimated Jaccard similarity clears DUPLICATE_THRESHOLD is linked to it, and
+the connected components are duplicate clusters: the explore scorer reads the
+cluster size as a spam and rarity signal, and `near_duplicates` answers "who
+else sent this?" for one message.
+
+One index per engine, keyed by the message_features version (shared_state),
+so a sync that stores new features moves the version and the next query
+rebuilds from the stored signatures — no text is re-read or re-hashed."""
+from __future__ import annotations
+
+import math
+import re
+import threading
+import weakref
+from typing import Optional
+
+import numpy as np
+from sqlmodel import Session, select
+
+import shared_state
+from models import MessageCache, MessageFeatures
+
+# scipy is imported where it's used (building the clusters), like lexical_service.
+
+# Changing any of these changes the signatures: bump explore_service.FEATURES_VERSION
+# so the startup backfill recomputes them.
+SHINGLE = 5          # characters per shingle
+NUM_PERM = 64        # signature length (uint32 minima)
+BANDS = 16           # LSH bands of ROWS values each; candidate pairs share a band
+ROWS = NUM_PERM // BANDS
+_SEED = 20_240_917
+
+DUPLICATE_THRESHOLD = 0.6   # estimated Jaccard at which two messages are duplicates
+DUPLICATE_SATURATION = 32   # cluster size at which duplicate_score reaches 1
+NEAR_DUPLICATE_LIMIT = 20
+_VERIFY_CHUNK = 250_000     # candidate pairs compared per numpy pass
+
+# Multiply-shift permutations: the high 32 bits of a*x + b (mod 2^64), a odd.
+_rng = np.random.default_rng(_SEED)
+_A = _rng.integers(1, 1 << 63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 1 << 63, size=NUM_PERM, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+_DEDUPE_ABOVE = 256  # shingles; longer texts (pastes) repeat enough to be worth np.unique
+_BAND_MIX = np.uint64(0x100000001B3)  # FNV-1a 64-bit prime
+_BAND_BASIS = np.uint64(0xCBF29CE484222325)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+# ── Signatures ───────────────────────────────────────────────────────────────
+
+def _shingles(text: str) -> np.ndarray:
+    """The byte SHINGLE-grams of normalized text packed into uint64s (a text
+    shorter than one shingle is a single shingle)."""
+    data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    k = min(SHINGLE, len(data))
+    n = len(data) - k + 1
+    packed = data[:n].copy()
+    for j in range(1, k):
+        packed <<= np.uint64(8)
+        packed |= data[j:n + j]
+    return np.unique(packed) if n > _DEDUPE_ABOVE else packed
+
+
+def minhash_signature(text: Optional[str]) -> Optional[bytes]:
+    """NUM_PERM little-endian uint32 minima, or None for empty text."""
+    t = _WHITESPACE_RE.sub(" ", (text or "").strip().lower())
+    if not t:
+        return None
+    hashed = np.multiply.outer(_A, _shingles(t))  # uint64 arithmetic wraps
+    hashed += _B[:, None]
+    hashed >>= _SHIFT
+    return hashed.min(axis=1).astype("<u4").tobytes()
+
+
+def estimated_similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity of two signatures' shingle sets."""
+    return float(np.mean(np.frombuffer(a, dtype="<u4") == np.frombuffer(b, dtype="<u4")))
+
+
+def duplicate_score(cluster_size: Optional[int]) -> float:
+    """0 for a message nobody else sent, rising with log(cluster size) to 1
+    at DUPLICATE_SATURATION copies."""
+    if not cluster_size or cluster_size <= 1:
+        return 0.0
+    return min(1.0, math.log(cluster_size) / math.log(DUPLICATE_SATURATION))
+
+
+# ── Index ────────────────────────────────────────────────────────────────────
+
+def _band_keys(signatures: np.ndarray) -> np.ndarray:
+    """(n, BANDS) uint64: each band's ROWS values folded FNV-style."""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    keys = np.full(bands.shape[:2], _BAND_BASIS, dtype=np.uint64)
+    for r in range(ROWS):
+        keys = (keys ^ bands[:, :, r]) * _BAND_MIX
+    return keys
+
+
+def _sorted_bands(band_keys: np.ndarray) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Per band: (sorted keys, row order), for bucket scans and lookups."""
+    bands = []
+    for band in range(BANDS):
+        # Stable: every bucket's representative is its lowest row, so copies
+        # produce the same pair in every band and skip verification.
+        order = np.argsort(band_keys[:, band], kind="stable")
+        bands.append((band_keys[order, band], order))
+    return bands
+
+
+def _candidate_pairs(
+    bands: list[tuple[np.ndarray, np.ndarray]], n: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per band, link every bucket member to the bucket's lowest row (a star
+    is enough for connectivity). Pairs repeated across bands collapse into
+    (left, right, number of bands shared)."""
+    pairs = []
+    for keys, order in bands:
+        starts = np.r_[True, keys[1:] != keys[:-1]]
+        first = order[starts][np.cumsum(starts) - 1]
+        linked = first != order
+        pairs.append(first[linked].astype(np.int64) * n + order[linked])
+    codes = np.sort(np.concatenate(pairs))
+    # sort + run lengths rather than np.unique, which is far slower on this many int64s
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.zeros(0, np.int64)
+    shared = np.diff(np.r_[starts, len(codes)])
+    codes = codes[starts]
+    return codes // n, codes % n, shared
+
+
+def _verified(signatures: np.ndarray, left: np.ndarray, right: np.ndarray,
+              shared: np.ndarray) -> np.ndarray:
+    """Pairs whose estimated similarity clears DUPLICATE_THRESHOLD. Sharing
+    k bands already means k * ROWS equal values, so only pairs that share too
+    few bands to be sure (the minority: copies collide in every band) are compared."""
+    keep = shared * ROWS >= DUPLICATE_THRESHOLD * NUM_PERM
+    unsure = np.flatnonzero(~keep)
+    for start in range(0, len(unsure), _VERIFY_CHUNK):
+        chunk = unsure[start:start + _VERIFY_CHUNK]
+        equal = signatures[left[chunk]] == signatures[right[chunk]]
+        keep[chunk] = equal.mean(axis=1) >= DUPLICATE_THRESHOLD
+    return keep
+
+
+def _fingerprint(session: Session) -> int:
+    return shared_state.version(session, "message_features")
+
+
+def build_index(session: Session, fingerprint: Optional[int] = None) -> dict:
+    """Band every stored signature and cluster the verified duplicate pairs.
+
+    A cluster's id is the smallest MessageCache.id among its members, so it
+    stays put while later syncs only add messages to it."""
+    from scipy import sparse
+    from scipy.sparse.csgraph import connected_components
+
+    fingerprint = _fingerprint(session) if fingerprint is None else fingerprint
+    # Core rows off the session's connection: the ORM result layer costs a
+    # second per 500k rows here and adds nothing to plain column tuples.
+    rows = session.connection().execute(
+        select(MessageCache.id, MessageFeatures.chatlog_id, MessageFeatures.message_index,
+               MessageFeatures.minhash)
+        .join(MessageCache, (MessageCache.chatlog_id == MessageFeatures.chatlog_id)
+              & (MessageCache.message_index == MessageFeatures.message_index))
+        .where(MessageFeatures.minhash != None)  # noqa: E711
+        .order_by(MessageCache.id)
+    ).all()
+    signature_bytes = NUM_PERM * 4
+    rows = [r for r in rows if len(r[3]) == signature_bytes]
+    n = len(rows)
+    keys = [(int(cid), int(midx)) for _id, cid, midx, _sig in rows]
+    if not n:
+        signatures = np.zeros((0, NUM_PERM), dtype=np.uint32)
+        band_keys = np.zeros((0, BANDS), dtype=np.uint64)
+        bands = _sorted_bands(band_keys)
+        cluster_ids = sizes = np.zeros(0, dtype=np.int64)
+        labels = np.zeros(0, dtype=np.int64)
+    else:
+        signatures = np.frombuffer(b"".join(r[3] for r in rows), dtype="<u4").reshape(n, NUM_PERM)
+        band_keys = _band_keys(signatures)
+        bands = _sorted_bands(band_keys)
+        left, right, shared = _candidate_pairs(bands, n)
+        keep = _verified(signatures, left, right, shared)
+        graph = sparse.coo_matrix(
+            (np.ones(int(keep.sum()), dtype=np.int8), (left[keep], right[keep])), shape=(n, n)
+        )
+        _count, labels = connected_components(graph, directed=False)
+        # Rows are ordered by MessageCache.id: a component's first row holds its smallest id.
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        first_row = np.full(labels.max() + 1, n, dtype=np.int64)
+        np.minimum.at(first_row, labels, np.arange(n))
+        cluster_ids = ids[first_row]
+        sizes = np.bincount(labels)
+    return {
+        "fingerprint": fingerprint,
+        "keys": keys,
+        "keys_idx": {k: i for i, k in enumerate(keys)},
+        "signatures": signatures,
+        "band_keys": band_keys,
+        "bands": bands,
+        "labels": labels,
+        "cluster_ids": cluster_ids,
+        "cluster_sizes": sizes,
+    }
+
+
+def ensure_index(session: Session) -> dict:
+    """The engine's index for the current message_features version."""
+    bind = session.get_bind()
+    fingerprint = _fingerprint(session)
+    with _lock:
+        index = _indexes.get(bind)
+        if index is None or index["fingerprint"] != fingerprint:
+            index = build_index(session, fingerprint)
+            _indexes[bind] = index
+        return index
+
+
+def duplicate_cluster(session: Session, chatlog_id: int, message_index: int) -> Optional[dict]:
+    """{cluster_id, cluster_size} for one message, or None if it has no
+    signature (not ingested yet, or empty)."""
+    index = ensure_index(session)
+    row = index["keys_idx"].get((chatlog_id, message_index))
+    if row is None:
+        return None
+    label = index["labels"][row]
+    return {"cluster_id": int(index["cluster_ids"][label]),
+            "cluster_size": int(index["cluster_sizes"][label])}
+
+
+def cluster_sizes(session: Session, keys) -> dict[tuple[int, int], int]:
+    """Duplicate-cluster size for each (chatlog_id, message_index) in `keys`
+    (1 for a message with no signature)."""
+    index = ensure_index(session)
+    keys_idx, labels, sizes = index["keys_idx"], index["labels"], index["cluster_sizes"]
+    out = {}
+    for key in keys:
+        row = keys_idx.get(key)
+        out[key] = 1 if row is None else int(sizes[labels[row]])
+    return out
+
+
+def near_duplicates(
+    session: Session, chatlog_id: int, message_index: int, limit: int = NEAR_DUPLICATE_LIMIT
+) -> list[dict]:
+    """Messages sharing an LSH band with this one whose estimated Jaccard
+    similarity clears DUPLICATE_THRESHOLD, most similar first."""
+    index = ensure_index(session)
+    row = index["keys_idx"].get((chatlog_id, message_index))
+    if row is None:
+        return []
+    hit = np.zeros(len(index["keys"]), dtype=bool)
+    for band, (keys, order) in enumerate(index["bands"]):
+        key = index["band_keys"][row, band]
+        hit[order[np.searchsorted(keys, key, side="left"):np.searchsorted(keys, key, side="right")]] = True
+    hit[row] = False
+    candidates = np.flatnonzero(hit)
+    if not len(candidates):
+        return []
+    signatures = index["signatures"]
+    sims = (signatures[candidates] == signatures[row]).mean(axis=1)
+    keep = sims >= DUPLICATE_THRESHOLD
+    candidates, sims = candidates[keep], sims[keep]
+    top = np.argsort(-sims, kind="stable")[:limit]  # ties: lower MessageCache.id first
+    return [
+        {"chatlog_id": index["keys"][i][0], "message_index": index["keys"][i][1],
+         "similarity": round(float(sim), 4)}
+        for i, sim in zip(candidates[top].tolist(), sims[top].tolist())
+    ]
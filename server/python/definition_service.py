@@ -1,9 +1,6 @@
-import os
-from google import genai
-from google.genai import types
 from typing import List
 
-client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
+import gemini_gateway
 
 
 def generate_label_definition(label_name: str, example_messages: List[str], guidance: str | None = None) -> str:
@@ -30,10 +27,13 @@ An example is 'Responds to AI question or message'. It does not restate any of t
     if guidance:
         prompt += f"\n\nAdditional guidance from the instructor: {guidance}\n\nRevise the definition to incorporate this guidance while remaining grounded in the examples above."
 
-    response = client.models.generate_content(
+    from google.genai import types
+
+    response = gemini_gateway.generate_content(
         model="gemini-2.5-flash",
         contents=prompt,
         config=types.GenerateContentConfig(temperature=0),
+        call_site="definition.generate",
     )
     return response.text.strip()
 
@@ -58,10 +58,13 @@ The following student messages have been labeled "{label_name}" by human instruc
 
 Which single message best exemplifies the description above? It should be the message that most explicitly shows this description. If there are messages that are equally related the description, prioritize the shorter message. Reply with only the number of that message (e.g. "3"). Nothing else."""
 
-    response = client.models.generate_content(
+    from google.genai import types
+
+    response = gemini_gateway.generate_content(
         model="gemini-2.5-flash",
         contents=prompt,
         config=types.GenerateContentConfig(temperature=0),
+        call_site="definition.select_example",
     )
     raw = response.text.strip()
     try:
@@ -7,25 +7,32 @@ conversation similarity; embeddings compare student messages only.
 """
 from __future__ import annotations
 
+import functools
+import heapq
+import itertools
 import json
 import logging
 import os
 import re
 import threading
+import weakref
 from collections import Counter
 from datetime import datetime
 from typing import Any, Optional
 
 import numpy as np
-from google import genai
-from google.genai import types
 from sqlalchemy import func
 from sqlmodel import Session, select
 
 import assist_service
 import binary_autolabel_service
+import dedup_service
+import gemini_gateway
+import shared_state
+import study_scope
+import write_queue
 from concept_service import EMBED_API_MODEL, EMBED_MODEL
-from database import engine
+from database import engine, upsert_insert
 from models import (
     ConversationProfile,
     LabelApplication,
@@ -33,23 +40,14 @@ from models import (
     LabelExploreGradebook,
     MessageCache,
     MessageEmbedding,
+    MessageFeatures,
 )
 
 logger = logging.getLogger(__name__)
 
-_client: genai.Client | None = None
-_warm_lock = threading.Lock()
-
-
-def _gemini_available() -> bool:
-    return bool(os.environ.get("GEMINI_API_KEY", "").strip())
-
-
-def _client_get() -> genai.Client:
-    global _client
-    if _client is None:
-        _client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
-    return _client
+# Prefix of the per-gradebook / per-profile advisory locks (shared_state)
+# taken by warm-ups, so two workers never pay Gemini for the same summary.
+WARM_LOCK = "explore-warm"
 
 
 def _normalize(vec: np.ndarray) -> Optional[np.ndarray]:
@@ -143,15 +141,37 @@ _PASTE_HEADER_PATTERNS: tuple[re.Pattern[str], ...] = (
 )
 
 
+
+def _combine(patterns: tuple[re.Pattern[str], ...]) -> re.Pattern[str]:
+    """One alternation for a list of patterns, each keeping its own flags as a
+    scoped group, so a text costs one regex pass instead of one per pattern."""
+    scoped = []
+    for pat in patterns:
+        flags = "".join(f for f, bit in (("i", re.I), ("m", re.M), ("s", re.S)) if pat.flags & bit)
+        scoped.append(f"(?{flags}:{pat.pattern})" if flags else f"(?:{pat.pattern})")
+    return re.compile("|".join(scoped))
+
+
+_GENERIC_HELP_RE = _combine(_GENERIC_HELP_PATTERNS)
+_SPECIFIC_SIGNALS_RE = re.compile("|".join(re.escape(s) for s in _SPECIFIC_SIGNALS))
+_PASTE_BODY_RE = _combine(_PASTE_BODY_PATTERNS)
+_PASTE_HEADER_RE = _combine(_PASTE_HEADER_PATTERNS)
+_WORD_RE = re.compile(r"[a-zA-Z']+")
+_NUMBERED_LINE_RE = re.compile(r"^\d+[\.)]\s")
+_FIRST_PERSON = frozenset(("i", "i'm", "im", "my", "me", "we", "our", "i've", "i'd"))
+
+
 def _first_person_density(text: str) -> float:
     """Share of words that look like the student speaking in their own voice."""
-    words = re.findall(r"[a-zA-Z']+", text.lower())
+    words = _WORD_RE.findall(text.lower())
     if not words:
         return 0.0
-    first_person = sum(
-        1 for w in words if w in ("i", "i'm", "im", "my", "me", "we", "our", "i've", "i'd")
-    )
-    return first_person / len(words)
+    return sum(1 for w in words if w in _FIRST_PERSON) / len(words)
+
+
+def _repeated_line_count(lines: list[str]) -> int:
+    """How often the most repeated non-empty line occurs (0 for no lines)."""
+    return Counter(lines).most_common(1)[0][1] if lines else 0
 
 
 def student_message_copy_paste_likelihood(text: str) -> float:
@@ -163,17 +183,15 @@ def student_message_copy_paste_likelihood(text: str) -> float:
     lower = t.lower()
     n = len(t)
 
-    for pat in _PASTE_BODY_PATTERNS:
-        if pat.search(t):
-            score = max(score, 0.75)
+    if _PASTE_BODY_RE.search(t):
+        score = max(score, 0.75)
 
-    for pat in _PASTE_HEADER_PATTERNS:
-        if pat.search(t):
-            score = max(score, 0.7)
+    if _PASTE_HEADER_RE.search(t):
+        score = max(score, 0.7)
 
     # Long blocks with almost no student voice → pasted instructions.
-    if n >= 180:
-        fp = _first_person_density(t)
+    fp = _first_person_density(t) if n >= 180 else None
+    if fp is not None:
         if fp < 0.012:
             score = max(score, 0.88)
         elif fp < 0.025 and n >= 350:
@@ -184,41 +202,40 @@ def student_message_copy_paste_likelihood(text: str) -> float:
     # Many lines / bullets like an assignment handout.
     lines = [ln.strip() for ln in t.splitlines() if ln.strip()]
     if n >= 250 and len(lines) >= 6:
-        numbered = sum(1 for ln in lines if re.match(r"^\d+[\.)]\s", ln))
+        numbered = sum(1 for ln in lines if _NUMBERED_LINE_RE.match(ln))
         if numbered >= 3 or len(lines) >= 10:
             score = max(score, 0.72)
 
     # Repeated identical lines (paste spam within one message).
-    if len(lines) >= 3:
-        top = Counter(lines).most_common(1)[0][1]
-        if top >= 3:
-            score = max(score, 0.65)
+    if len(lines) >= 3 and _repeated_line_count(lines) >= 3:
+        score = max(score, 0.65)
 
     # Error dumps without a short student question wrapped around them.
-    if "traceback" in lower and n > 200 and _first_person_density(t) < 0.02:
+    if "traceback" in lower and n > 200 and fp < 0.02:
         score = max(score, 0.9)
 
     return min(1.0, score)
 
 
-def student_help_genericness(text: str) -> float:
-    """How generic / repetitive a student help message is, in [0, 1]."""
+def student_help_genericness(text: str, *, paste: Optional[float] = None) -> float:
+    """How generic / repetitive a student help message is, in [0, 1]. Pass
+    `paste` when the copy-paste likelihood is already known."""
     t = (text or "").strip()
     if not t:
         return 1.0
-    paste = student_message_copy_paste_likelihood(t)
+    if paste is None:
+        paste = student_message_copy_paste_likelihood(t)
     if paste >= 0.7:
         return max(0.88, paste)
 
     if len(t) <= 12:
         return 0.92
-    for pat in _GENERIC_HELP_PATTERNS:
-        if pat.match(t):
-            return 0.9
-    lower = t.lower()
-    if len(t) < 35 and t.count("?") == 0 and not any(s in lower for s in _SPECIFIC_SIGNALS):
+    if _GENERIC_HELP_RE.match(t):
+        return 0.9
+    specific = _SPECIFIC_SIGNALS_RE.search(t.lower()) is not None
+    if len(t) < 35 and t.count("?") == 0 and not specific:
         return max(0.72, paste)
-    if any(s in lower for s in _SPECIFIC_SIGNALS):
+    if specific:
         base = max(0.0, 0.35 - len(t) / 1200.0)
         return max(base, paste * 0.85)
     # Longer original questions — don't treat length alone as specific.
@@ -233,65 +250,299 @@ def student_help_specificity(
 ) -> float:
     """Specific, original student ask — down-ranks paste and corpus-common long text."""
     t = (text or "").strip()
-    generic = student_help_genericness(t)
     paste = student_message_copy_paste_likelihood(t)
-    spec = (1.0 - generic) * (1.0 - paste)
+    generic = student_help_genericness(t, paste=paste)
+    return _rarity_adjusted_specificity((1.0 - generic) * (1.0 - paste), len(t), corpus_rarity)
+
+
+def _rarity_adjusted_specificity(spec: float, length: int, corpus_rarity: Optional[float]) -> float:
     # Same long text pasted by many students → common in embeddings, not novel.
-    if corpus_rarity is not None and len(t) >= 120 and corpus_rarity < 0.3:
+    if corpus_rarity is not None and length >= 120 and corpus_rarity < 0.3:
         spec *= max(0.15, corpus_rarity / 0.3)
     return max(0.0, min(1.0, spec))
 
 
+# ── Per-message feature table ────────────────────────────────────────────────
+# The heuristics above only depend on message_text, so they are computed once
+# per message (at ingest, or by the startup backfill) into MessageFeatures and
+# read in bulk by the explore scorer. Bump FEATURES_VERSION whenever a
+# heuristic changes: older rows then count as missing and are recomputed.
+FEATURES_VERSION = 2  # 2: MinHash signatures (dedup_service)
+
+
+def _code_fence_ratio(text: str) -> float:
+    """Share of characters inside ``` fences (an unclosed fence runs to the end)."""
+    if not text:
+        return 0.0
+    inside = sum(len(part) for part in text.split("```")[1::2])
+    return inside / len(text)
+
+
+def compute_message_features(chatlog_id: int, message_index: int, text: Optional[str]) -> MessageFeatures:
+    """Every text-only explore heuristic for one message, in one pass each."""
+    t = (text or "").strip()
+    paste = student_message_copy_paste_likelihood(t)
+    generic = student_help_genericness(t, paste=paste)
+    return MessageFeatures(
+        chatlog_id=chatlog_id,
+        message_index=message_index,
+        paste_likelihood=paste,
+        genericness=generic,
+        specificity=_rarity_adjusted_specificity((1.0 - generic) * (1.0 - paste), len(t), None),
+        length=len(t),
+        code_fence_ratio=_code_fence_ratio(t),
+        generic_ping=len(t) <= 12 or _GENERIC_HELP_RE.match(t) is not None,
+        repeated_lines=_repeated_line_count([ln.strip() for ln in t.splitlines() if ln.strip()]),
+        minhash=dedup_service.minhash_signature(t),
+        features_version=FEATURES_VERSION,
+    )
+
+
+def store_message_features(db, features: list[MessageFeatures]) -> None:
+    """Upsert computed rows in the caller's transaction (`db` is a Session or
+    Connection), bumping message_features so the duplicate index rebuilds."""
+    if not features:
+        return
+    insert = upsert_insert(db)
+    columns = [c.name for c in MessageFeatures.__table__.columns]
+    for start in range(0, len(features), 500):
+        stmt = insert(MessageFeatures).values([
+            {c: getattr(f, c) for c in columns} for f in features[start:start + 500]
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["chatlog_id", "message_index"],
+            set_={c: stmt.excluded[c] for c in columns if c not in ("chatlog_id", "message_index")},
+        ))
+    shared_state.bump(db, "message_features")
+
+
+def load_message_features(
+    session: Session, texts: dict[tuple[int, int], Optional[str]]
+) -> dict[tuple[int, int], MessageFeatures]:
+    """Features for every (chatlog_id, message_index) in `texts`: stored rows
+    in one bulk read, plus in-memory computation from `texts` for any message
+    the table doesn't cover yet (rows are detached either way)."""
+    out: dict[tuple[int, int], MessageFeatures] = {}
+    cids = sorted({cid for cid, _ in texts})
+    for start in range(0, len(cids), 500):
+        rows = session.exec(
+            select(MessageFeatures).where(
+                MessageFeatures.chatlog_id.in_(cids[start:start + 500]),
+                MessageFeatures.features_version == FEATURES_VERSION,
+            ).execution_options(populate_existing=True)
+        ).all()
+        for row in rows:
+            key = (row.chatlog_id, row.message_index)
+            if key in texts:
+                session.expunge(row)
+                out[key] = row
+    for key, text in texts.items():
+        if key not in out:
+            out[key] = compute_message_features(key[0], key[1], text)
+    return out
+
+
+def specificity_from_features(features: MessageFeatures, corpus_rarity: Optional[float] = None) -> float:
+    """student_help_specificity for a message whose features are precomputed."""
+    return _rarity_adjusted_specificity(features.specificity, features.length, corpus_rarity)
+
+
+# ── Conversation centroids ───────────────────────────────────────────────────
+# Conversation novelty compares a candidate's student-message centroid with
+# the centroids of the label's labeled conversations, all read from memory:
+# - per engine, every conversation's embedding count and unit centroid, built
+#   from assist_service's message matrix and rebuilt whenever that reloads
+#   (the message_embedding version moved);
+# - per (engine, label), the labeled message indices of each conversation and
+#   the dense matrix of the labeled conversations' centroids, keyed by the
+#   label's human_labels version (shared_state). note_human_decision applies
+#   a /decide or /undo in place; a write from anywhere else moves the version
+#   and the next read rebuilds from one query.
+_centroid_lock = threading.Lock()
+_centroid_caches: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_labeled_caches: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _build_conversation_centroids(matrix_cache: dict) -> dict:
+    cache: dict[str, Any] = {
+        "fingerprint": matrix_cache["fingerprint"],
+        "index": {},
+        "counts": np.zeros(0, dtype=np.int64),
+        "unit": np.zeros((0, 0), dtype=np.float32),
+    }
+    matrix = matrix_cache["matrix"]
+    keys_idx = matrix_cache["keys_idx"]
+    if matrix is None or not keys_idx:
+        return cache
+    cids = np.fromiter((cid for cid, _midx in keys_idx), dtype=np.int64, count=len(keys_idx))
+    rows = np.fromiter(keys_idx.values(), dtype=np.int64, count=len(keys_idx))
+    order = np.argsort(cids, kind="stable")
+    cids, rows = cids[order], rows[order]
+    uniq, starts, counts = np.unique(cids, return_index=True, return_counts=True)
+    # Rows are unit vectors: the normalized sum is the normalized mean.
+    sums = np.add.reduceat(matrix[rows], starts, axis=0)
+    norms = np.linalg.norm(sums, axis=1)
+    keep = norms > 1e-12
+    cache["index"] = {int(cid): i for i, cid in enumerate(uniq[keep])}
+    cache["counts"] = counts[keep]
+    cache["unit"] = (sums[keep] / norms[keep, None]).astype(np.float32)
+    return cache
+
+
+def _conversation_centroids(session: Session) -> dict:
+    """{fingerprint, index: {chatlog_id: row}, counts, unit} for this engine."""
+    matrix_cache = assist_service._get_cache(session)
+    bind = session.get_bind()
+    with _centroid_lock:
+        cache = _centroid_caches.get(bind)
+        if cache is None or cache["fingerprint"] != matrix_cache["fingerprint"]:
+            cache = _build_conversation_centroids(matrix_cache)
+            _centroid_caches[bind] = cache
+        return cache
+
+
 def conversation_centroid(session: Session, chatlog_id: int) -> Optional[np.ndarray]:
     """Unit-normalized mean of **student** message embeddings in a conversation."""
-    rows = session.exec(
-        select(MessageEmbedding.embedding)
-        .join(
-            MessageCache,
-            (MessageCache.chatlog_id == MessageEmbedding.chatlog_id)
-            & (MessageCache.message_index == MessageEmbedding.message_index),
-        )
-        .where(
-            MessageEmbedding.chatlog_id == chatlog_id,
-            MessageEmbedding.model_version == EMBED_MODEL,
+    cache = _conversation_centroids(session)
+    row = cache["index"].get(chatlog_id)
+    return None if row is None else cache["unit"][row].copy()
+
+
+def _labeled_messages(session: Session, label_id: int) -> dict[int, set[int]]:
+    out: dict[int, set[int]] = {}
+    for cid, midx in session.exec(
+        select(LabelApplication.chatlog_id, LabelApplication.message_index).where(
+            LabelApplication.label_id == label_id,
+            LabelApplication.applied_by == "human",
+            LabelApplication.value.in_(["yes", "no"]),  # noqa: comparator
         )
-    ).all()
-    if not rows:
-        return None
-    vecs = []
-    for row in rows:
-        emb_bytes = row[0] if isinstance(row, (tuple, list)) else row
-        v = _normalize(np.frombuffer(emb_bytes, dtype=np.float32))
-        if v is not None:
-            vecs.append(v)
-    if not vecs:
-        return None
-    mean = np.mean(np.stack(vecs), axis=0)
-    return _normalize(mean)
+    ).all():
+        out.setdefault(cid, set()).add(midx)
+    return out
+
+
+def _index_labeled(state: dict, centroids: dict) -> None:
+    index = centroids["index"]
+    cids = sorted(cid for cid in state["messages"] if cid in index)
+    state["cids"] = cids
+    state["matrix"] = centroids["unit"][[index[cid] for cid in cids]]
+    state["fingerprint"] = centroids["fingerprint"]
+
+
+def _labeled_centroid_matrix(session: Session, label_id: int) -> tuple[list[int], np.ndarray]:
+    """(chatlog_ids, their unit centroids as rows) for the label's labeled conversations."""
+    centroids = _conversation_centroids(session)
+    current = shared_state.version(session, shared_state.human_labels(label_id))
+    bind = session.get_bind()
+    with _centroid_lock:
+        per_label = _labeled_caches.setdefault(bind, {})
+        state = per_label.get(label_id)
+        if state is None or state["version"] != current:
+            state = {"version": current, "messages": _labeled_messages(session, label_id), "fingerprint": None}
+            per_label[label_id] = state
+        if state["fingerprint"] != centroids["fingerprint"]:
+            _index_labeled(state, centroids)
+        return state["cids"], state["matrix"]
+
+
+def note_human_decision(
+    session: Session,
+    label_id: int,
+    chatlog_id: int,
+    message_index: int,
+    value: Optional[str],
+) -> None:
+    """Apply a just-committed decision (`value` None for an undo) to the
+    label's cached labeled set. Only a state exactly one version behind is
+    patched; otherwise it is dropped and rebuilt on the next read."""
+    current = shared_state.version(session, shared_state.human_labels(label_id))
+    bind = session.get_bind()
+    with _centroid_lock:
+        per_label = _labeled_caches.get(bind)
+        state = per_label.get(label_id) if per_label is not None else None
+        if state is None:
+            return
+        if state["version"] + 1 != current:
+            del per_label[label_id]
+            return
+        state["version"] = current
+        messages = state["messages"].setdefault(chatlog_id, set())
+        was_labeled = bool(messages)
+        if value in ("yes", "no"):
+            messages.add(message_index)
+        else:
+            messages.discard(message_index)
+        if not messages:
+            del state["messages"][chatlog_id]
+        if was_labeled == bool(messages):
+            return
+        centroids = _centroid_caches.get(bind)
+        if centroids is None or centroids["fingerprint"] != state["fingerprint"]:
+            state["fingerprint"] = None
+            return
+        row = centroids["index"].get(chatlog_id)
+        if row is None:
+            return
+        # New arrays, not in-place edits: readers hold (cids, matrix) snapshots.
+        if was_labeled:
+            pos = state["cids"].index(chatlog_id)
+            state["cids"] = state["cids"][:pos] + state["cids"][pos + 1:]
+            state["matrix"] = np.delete(state["matrix"], pos, axis=0)
+        else:
+            state["cids"] = state["cids"] + [chatlog_id]
+            state["matrix"] = np.vstack([state["matrix"], centroids["unit"][row][None, :]])
 
 
 def conversation_spam_penalty(student_texts: list[str]) -> float:
     """Penalize generic pings and copy-paste spam threads, in [0, 1]."""
-    if not student_texts:
-        return 0.0
     paste = [student_message_copy_paste_likelihood(t) for t in student_texts]
+    generic = [student_help_genericness(t, paste=p) for t, p in zip(student_texts, paste)]
+    return _spam_penalty(paste, generic)
+
+
+def spam_penalty_from_features(
+    conversation: list[MessageFeatures],
+    cluster_sizes: Optional[dict[tuple[int, int], int]] = None,
+) -> float:
+    """conversation_spam_penalty over precomputed per-message features. With
+    `cluster_sizes` (dedup_service), a message many students sent counts as
+    pasted even when it doesn't look it."""
+    paste = [f.paste_likelihood for f in conversation]
+    if cluster_sizes:
+        paste = [
+            max(p, dedup_service.duplicate_score(cluster_sizes.get((f.chatlog_id, f.message_index))))
+            for p, f in zip(paste, conversation)
+        ]
+    return _spam_penalty(paste, [f.genericness for f in conversation])
+
+
+def _spam_penalty(paste: list[float], generic: list[float]) -> float:
+    if not paste:
+        return 0.0
     avg_paste = sum(paste) / len(paste)
-    if avg_paste >= 0.75 and len(student_texts) >= 1:
-        return min(1.0, 0.5 + 0.15 * len(student_texts))
-    if len(student_texts) < 2:
+    if avg_paste >= 0.75 and len(paste) >= 1:
+        return min(1.0, 0.5 + 0.15 * len(paste))
+    if len(paste) < 2:
         return 0.0
-    generic = [student_help_genericness(t) for t in student_texts]
     avg = sum(generic) / len(generic)
     if avg < 0.6:
         return max(0.0, avg_paste - 0.4)
     # Many short generic messages in one chat (e.g. repeated "help").
-    if len(student_texts) >= 3 and avg >= 0.75:
-        return min(1.0, 0.45 + 0.12 * (len(student_texts) - 2))
-    if len(student_texts) >= 2 and avg >= 0.85:
+    if len(paste) >= 3 and avg >= 0.75:
+        return min(1.0, 0.45 + 0.12 * (len(paste) - 2))
+    if len(paste) >= 2 and avg >= 0.85:
         return 0.55
     return max(0.0, avg - 0.5, avg_paste - 0.35)
 
 
+def rarity_with_duplicates(rarity: Optional[float], cluster_size: Optional[int]) -> Optional[float]:
+    """Cap corpus rarity by duplicate-cluster size: the embedding check only
+    samples the corpus and can miss the other 40 copies of a pasted prompt."""
+    if rarity is None:
+        return None
+    return min(rarity, 1.0 - dedup_service.duplicate_score(cluster_size))
+
+
 def _corpus_rarity_max_refs() -> int:
     try:
         return max(50, int(os.environ.get("CHATSIGHT_CORPUS_RARITY_MAX_REFS", "512")))
@@ -346,10 +597,24 @@ def explore_candidate_priority(
     rarity: Optional[float] = None
     if use_corpus_rarity:
         rarity = student_message_corpus_rarity(session, chatlog_id, pending_index)
-    spec = student_help_specificity(pending_text, corpus_rarity=rarity)
-    if rarity is None:
-        rarity = spec
-    spam = conversation_spam_penalty(student_texts)
+    return candidate_priority_from_features(
+        compute_message_features(chatlog_id, pending_index, pending_text),
+        [compute_message_features(chatlog_id, i, t) for i, t in enumerate(student_texts)],
+        corpus_rarity=rarity,
+    )
+
+
+def candidate_priority_from_features(
+    pending: MessageFeatures,
+    conversation: list[MessageFeatures],
+    *,
+    corpus_rarity: Optional[float] = None,
+    cluster_sizes: Optional[dict[tuple[int, int], int]] = None,
+) -> float:
+    """explore_candidate_priority over precomputed features (the scorer's path)."""
+    spec = specificity_from_features(pending, corpus_rarity)
+    rarity = spec if corpus_rarity is None else corpus_rarity
+    spam = spam_penalty_from_features(conversation, cluster_sizes)
     return (0.45 * spec + 0.55 * rarity) * (1.0 - spam)
 
 
@@ -360,15 +625,44 @@ def explore_score_pool_cap() -> int:
         return 60
 
 
+def explore_score_budget_seconds() -> float:
+    """Wall-clock budget for the expensive explore components per pick
+    (CHATSIGHT_EXPLORE_SCORE_BUDGET_MS, default 80). At least one candidate
+    is always scored, however long it takes."""
+    try:
+        return max(0.0, float(os.environ.get("CHATSIGHT_EXPLORE_SCORE_BUDGET_MS", "80"))) / 1000.0
+    except (TypeError, ValueError):
+        return 0.08
+
+
 def labeled_student_centroids(
     session: Session, label_id: int
 ) -> dict[int, np.ndarray]:
     """Student-message centroids for each conversation with a human label."""
-    out: dict[int, np.ndarray] = {}
-    for cid in labeled_chatlog_ids(session, label_id):
-        cent = conversation_centroid(session, cid)
-        if cent is not None:
-            out[cid] = cent
+    cids, matrix = _labeled_centroid_matrix(session, label_id)
+    return {cid: matrix[i] for i, cid in enumerate(cids)}
+
+
+def conversation_novelties(
+    session: Session, label_id: int, chatlog_ids: list[int]
+) -> dict[int, Optional[float]]:
+    """conversation_novelty for a candidate pool: one product of the pool's
+    centroids with the labeled-centroid matrix."""
+    out: dict[int, Optional[float]] = {cid: None for cid in chatlog_ids}
+    centroids = _conversation_centroids(session)
+    labeled, matrix = _labeled_centroid_matrix(session, label_id)
+    pool = [cid for cid in chatlog_ids if cid in centroids["index"]]
+    if not pool or not labeled:
+        return out
+    sims = centroids["unit"][[centroids["index"][cid] for cid in pool]] @ matrix.T
+    position = {cid: j for j, cid in enumerate(labeled)}
+    for i, cid in enumerate(pool):
+        j = position.get(cid)
+        if j is not None:
+            if len(labeled) == 1:
+                continue
+            sims[i, j] = -np.inf
+        out[cid] = 1.0 - max(0.0, min(1.0, float(sims[i].max())))
     return out
 
 
@@ -379,11 +673,11 @@ def conversation_novelty(
     labeled_centroids: Optional[dict[int, np.ndarray]] = None,
 ) -> Optional[float]:
     """1 − max cosine similarity to student centroids of other labeled conversations."""
+    if labeled_centroids is None:
+        return conversation_novelties(session, label_id, [chatlog_id])[chatlog_id]
     cand = conversation_centroid(session, chatlog_id)
     if cand is None:
         return None
-    if labeled_centroids is None:
-        labeled_centroids = labeled_student_centroids(session, label_id)
     max_sim = 0.0
     found = False
     for cid, cent in labeled_centroids.items():
@@ -462,7 +756,7 @@ def get_gradebook(session: Session, label_id: int) -> Optional[dict[str, Any]]:
 
 def ensure_gradebook(session: Session, label_id: int) -> Optional[dict[str, Any]]:
     """Build or refresh label gradebook from human yes/no samples (Layer B)."""
-    if not _gemini_available():
+    if not gemini_gateway.available():
         return get_gradebook(session, label_id)
 
     count = human_label_count(session, label_id)
@@ -535,49 +829,56 @@ def ensure_gradebook(session: Session, label_id: int) -> Optional[dict[str, Any]
     return gb
 
 
-_SUMMARY_TOOL = types.Tool(
-    function_declarations=[
-        types.FunctionDeclaration(
-            name="summarize_conversation",
-            description="One-line theme summary for a student-AI tutoring conversation.",
-            parameters=types.Schema(
-                type=types.Type.OBJECT,
-                properties={
-                    "one_liner": types.Schema(
-                        type=types.Type.STRING,
-                        description="Single sentence: what this conversation is mainly about.",
-                    ),
-                    "theme_tags": types.Schema(
-                        type=types.Type.ARRAY,
-                        items=types.Schema(type=types.Type.STRING),
-                        description="3-5 short theme tags.",
-                    ),
-                },
-                required=["one_liner", "theme_tags"],
-            ),
-        )
-    ]
-)
+@functools.cache
+def _summary_tool():
+    from google.genai import types
+    return types.Tool(
+        function_declarations=[
+            types.FunctionDeclaration(
+                name="summarize_conversation",
+                description="One-line theme summary for a student-AI tutoring conversation.",
+                parameters=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "one_liner": types.Schema(
+                            type=types.Type.STRING,
+                            description="Single sentence: what this conversation is mainly about.",
+                        ),
+                        "theme_tags": types.Schema(
+                            type=types.Type.ARRAY,
+                            items=types.Schema(type=types.Type.STRING),
+                            description="3-5 short theme tags.",
+                        ),
+                    },
+                    required=["one_liner", "theme_tags"],
+                ),
+            )
+        ]
+    )
 
-_SUMMARY_CONFIG = types.GenerateContentConfig(
-    system_instruction=(
-        "Summarize ONLY what the student is asking for in their own words — "
-        "ignore how the AI tutor responded. Do NOT treat copy-pasted homework "
-        "prompts, lab instructions, long error tracebacks, or code blocks as "
-        "distinctive themes; flag those as pasted content if they dominate. "
-        "Distinguish generic pings (\"help\", \"question 1.2\") from specific "
-        "original help requests (e.g. wanting an example of groupby in context). "
-        "Keep one_liner under 200 characters; theme_tags are 2-4 words each."
-    ),
-    temperature=0.2,
-    tools=[_SUMMARY_TOOL],
-    tool_config=types.ToolConfig(
-        function_calling_config=types.FunctionCallingConfig(
-            mode="ANY",
-            allowed_function_names=["summarize_conversation"],
-        )
-    ),
-)
+
+@functools.cache
+def _summary_config():
+    from google.genai import types
+    return types.GenerateContentConfig(
+        system_instruction=(
+            "Summarize ONLY what the student is asking for in their own words — "
+            "ignore how the AI tutor responded. Do NOT treat copy-pasted homework "
+            "prompts, lab instructions, long error tracebacks, or code blocks as "
+            "distinctive themes; flag those as pasted content if they dominate. "
+            "Distinguish generic pings (\"help\", \"question 1.2\") from specific "
+            "original help requests (e.g. wanting an example of groupby in context). "
+            "Keep one_liner under 200 characters; theme_tags are 2-4 words each."
+        ),
+        temperature=0.2,
+        tools=[_summary_tool()],
+        tool_config=types.ToolConfig(
+            function_calling_config=types.FunctionCallingConfig(
+                mode="ANY",
+                allowed_function_names=["summarize_conversation"],
+            )
+        ),
+    )
 
 
 def _summarize_conversation_gemini(
@@ -602,10 +903,12 @@ def _summarize_conversation_gemini(
     parts.append("\nStudent messages (in order):")
     for i, t in enumerate(student_texts[:12]):
         parts.append(f"{i + 1}. {t[:500]}")
-    response = _client_get().models.generate_content(
+    response = gemini_gateway.generate_content(
         model="gemini-2.5-flash",
         contents="\n".join(parts),
-        config=_SUMMARY_CONFIG,
+        config=_summary_config(),
+        call_site="explore.summarize",
+        max_attempts=1,
     )
     for part in response.candidates[0].content.parts:
         if part.function_call and part.function_call.name == "summarize_conversation":
@@ -621,9 +924,11 @@ def _embed_summary_text(text: str) -> Optional[np.ndarray]:
     if not text.strip():
         return None
     try:
-        result = _client_get().models.embed_content(
+        result = gemini_gateway.embed_content(
             model=EMBED_API_MODEL,
             contents=[text],
+            call_site="explore.embed_summary",
+            max_attempts=1,
         )
         vec = np.array(result.embeddings[0].values, dtype=np.float32)
         return _normalize(vec)
@@ -632,6 +937,225 @@ def _embed_summary_text(text: str) -> Optional[np.ndarray]:
         return None
 
 
+# ── Batched profiles ─────────────────────────────────────────────────────────
+# The bulk precompute job summarizes PROFILE_BATCH_SIZE conversations per
+# Gemini call (one function call returning a list keyed by chatlog_id) and
+# embeds each batch's summaries in one embedding call.
+PROFILE_BATCH_SIZE = max(1, int(os.environ.get("CHATSIGHT_PROFILE_BATCH_SIZE", "8")))
+
+
+def _summaries_tool():
+    from google.genai import types
+    return types.Tool(
+        function_declarations=[
+            types.FunctionDeclaration(
+                name="summarize_conversations",
+                description="One-line theme summary for each student-AI tutoring conversation.",
+                parameters=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "summaries": types.Schema(
+                            type=types.Type.ARRAY,
+                            items=types.Schema(
+                                type=types.Type.OBJECT,
+                                properties={
+                                    "chatlog_id": types.Schema(
+                                        type=types.Type.INTEGER,
+                                        description="The id from the conversation's header.",
+                                    ),
+                                    "one_liner": types.Schema(
+                                        type=types.Type.STRING,
+                                        description="Single sentence: what this conversation is mainly about.",
+                                    ),
+                                    "theme_tags": types.Schema(
+                                        type=types.Type.ARRAY,
+                                        items=types.Schema(type=types.Type.STRING),
+                                        description="3-5 short theme tags.",
+                                    ),
+                                },
+                                required=["chatlog_id", "one_liner", "theme_tags"],
+                            ),
+                        ),
+                    },
+                    required=["summaries"],
+                ),
+            )
+        ]
+    )
+
+
+@functools.cache
+def _summaries_config():
+    from google.genai import types
+    single = _summary_config()
+    return types.GenerateContentConfig(
+        system_instruction=(
+            single.system_instruction
+            + " Summarize every conversation independently and return exactly one "
+            "summary per conversation, keyed by the chatlog_id in its header."
+        ),
+        temperature=single.temperature,
+        tools=[_summaries_tool()],
+        tool_config=types.ToolConfig(
+            function_calling_config=types.FunctionCallingConfig(
+                mode="ANY",
+                allowed_function_names=["summarize_conversations"],
+            )
+        ),
+    )
+
+
+def _summarize_conversations_gemini(
+    label_name: str,
+    label_description: Optional[str],
+    conversations: list[dict[str, Any]],
+    gradebook: Optional[dict[str, Any]],
+) -> dict[int, dict[str, Any]]:
+    """One call for several conversations ({chatlog_id, notebook, student_texts});
+    returns {chatlog_id: {one_liner, theme_tags}} for the ones the model answered."""
+    parts = [f"Label: {label_name}"]
+    if label_description:
+        parts.append(f"Description: {label_description}")
+    if gradebook:
+        inc = gradebook.get("included") or []
+        exc = gradebook.get("excluded") or []
+        if inc:
+            parts.append("Themes already labeled YES (patterns): " + ", ".join(str(x) for x in inc[:8]))
+        if exc:
+            parts.append("Themes already labeled NO (patterns): " + ", ".join(str(x) for x in exc[:8]))
+    for c in conversations:
+        parts.append(f"\n## Conversation {c['chatlog_id']}")
+        if c.get("notebook"):
+            parts.append(f"Notebook: {c['notebook']}")
+        parts.append("Student messages (in order):")
+        for i, t in enumerate(c["student_texts"][:12]):
+            parts.append(f"{i + 1}. {t[:500]}")
+    response = gemini_gateway.generate_content(
+        model="gemini-2.5-flash",
+        contents="\n".join(parts),
+        config=_summaries_config(),
+        call_site="explore.summarize_batch",
+        max_attempts=1,
+    )
+    wanted = {c["chatlog_id"] for c in conversations}
+    out: dict[int, dict[str, Any]] = {}
+    for part in response.candidates[0].content.parts:
+        if part.function_call and part.function_call.name == "summarize_conversations":
+            for item in (part.function_call.args or {}).get("summaries", []) or []:
+                try:
+                    cid = int(item.get("chatlog_id"))
+                except (TypeError, ValueError):
+                    continue
+                if cid in wanted:
+                    out[cid] = {
+                        "one_liner": str(item.get("one_liner", "")).strip(),
+                        "theme_tags": list(item.get("theme_tags", [])),
+                    }
+    return out
+
+
+def _embed_summary_texts(texts: list[str]) -> list[Optional[np.ndarray]]:
+    """_embed_summary_text for several summaries in one embedding call."""
+    if not texts:
+        return []
+    try:
+        result = gemini_gateway.embed_content(
+            model=EMBED_API_MODEL,
+            contents=texts,
+            call_site="explore.embed_summary",
+            max_attempts=1,
+        )
+        return [_normalize(np.array(e.values, dtype=np.float32)) for e in result.embeddings]
+    except Exception as exc:
+        logger.warning("summary embed failed: %s", exc)
+        return [None] * len(texts)
+
+
+def stale_profile_chatlog_ids(session: Session, label_id: int, chatlog_ids: list[int]) -> list[int]:
+    """The subset of `chatlog_ids` whose profile is missing or was built at
+    least 5 human labels ago (ensure_conversation_profile's rebuild rule)."""
+    count = human_label_count(session, label_id)
+    built = dict(session.exec(
+        select(ConversationProfile.chatlog_id, ConversationProfile.human_label_count_at_build)
+        .where(ConversationProfile.label_id == label_id)
+    ).all())
+    return [cid for cid in chatlog_ids if cid not in built or count - built[cid] >= 5]
+
+
+def ensure_conversation_profiles(
+    session: Session,
+    label_id: int,
+    conversations: list[dict[str, Any]],
+) -> int:
+    """Batched ensure_conversation_profile for up to PROFILE_BATCH_SIZE
+    conversations ({chatlog_id, notebook, student_texts}): one summarize call,
+    one embedding call, one write. Conversations that are already current are
+    skipped. Returns how many profiles were written."""
+    if not gemini_gateway.available():
+        return 0
+    label = session.get(LabelDefinition, label_id)
+    if not label:
+        return 0
+    by_id = {c["chatlog_id"]: c for c in conversations if c.get("student_texts")}
+    todo = [by_id[cid] for cid in stale_profile_chatlog_ids(session, label_id, list(by_id))]
+    if not todo:
+        return 0
+    count = human_label_count(session, label_id)
+    gradebook = ensure_gradebook(session, label_id)
+    try:
+        summaries = _summarize_conversations_gemini(label.name, label.description, todo, gradebook)
+    except Exception as exc:
+        logger.warning("batched summarize failed label=%s chats=%s: %s",
+                       label_id, [c["chatlog_id"] for c in todo], exc)
+        return 0
+    answered = [(cid, s) for cid, s in summaries.items() if s["one_liner"]]
+    vecs = _embed_summary_texts(["Student help: " + s["one_liner"] for _cid, s in answered])
+    now = datetime.utcnow()
+    profiles = [
+        ConversationProfile(
+            label_id=label_id,
+            chatlog_id=cid,
+            one_liner=s["one_liner"],
+            theme_tags_json=json.dumps(s["theme_tags"]),
+            summary_embedding=vec.tobytes(),
+            human_label_count_at_build=count,
+            updated_at=now,
+        )
+        for (cid, s), vec in zip(answered, vecs)
+        if vec is not None
+    ]
+    if profiles:
+        def write(w: Session) -> None:
+            for profile in profiles:
+                w.merge(profile)
+
+        write_queue.write(session, write, priority=write_queue.BULK)
+    return len(profiles)
+
+
+def in_scope_conversations(session: Session, label: LabelDefinition) -> list[dict[str, Any]]:
+    """Every conversation in the label's study scope, as
+    ensure_conversation_profiles input, ordered by chatlog_id."""
+    scope = study_scope.scope_for_mode(label.mode)
+    rows = session.exec(
+        select(
+            MessageCache.chatlog_id,
+            MessageCache.message_index,
+            MessageCache.message_text,
+            MessageCache.notebook,
+        ).order_by(MessageCache.chatlog_id, MessageCache.message_index)
+    ).all()
+    out: dict[int, dict[str, Any]] = {}
+    for cid, _midx, text, notebook in rows:
+        if not study_scope.notebook_in_scope(notebook, scope):
+            continue
+        conv = out.setdefault(cid, {"chatlog_id": cid, "notebook": None, "student_texts": []})
+        conv["student_texts"].append(text)
+        if conv["notebook"] is None:
+            conv["notebook"] = notebook
+    return list(out.values())
+
+
 def ensure_conversation_profile(
     session: Session,
     label_id: int,
@@ -640,7 +1164,7 @@ def ensure_conversation_profile(
     notebook: Optional[str],
 ) -> Optional[ConversationProfile]:
     """Create or refresh cached conversation summary + embedding (Layer B)."""
-    if not _gemini_available() or not student_texts:
+    if not gemini_gateway.available() or not student_texts:
         return session.get(ConversationProfile, (label_id, chatlog_id))
 
     count = human_label_count(session, label_id)
@@ -679,29 +1203,20 @@ def ensure_conversation_profile(
     if vec is None:
         return existing
 
-    now = datetime.utcnow()
-    tags_json = json.dumps(summary.get("theme_tags", []))
-    if existing:
-        existing.one_liner = one_liner
-        existing.theme_tags_json = tags_json
-        existing.summary_embedding = vec.tobytes()
-        existing.human_label_count_at_build = count
-        existing.updated_at = now
-        session.add(existing)
-    else:
-        existing = ConversationProfile(
-            label_id=label_id,
-            chatlog_id=chatlog_id,
-            one_liner=one_liner,
-            theme_tags_json=tags_json,
-            summary_embedding=vec.tobytes(),
-            human_label_count_at_build=count,
-            updated_at=now,
-        )
-        session.add(existing)
-    session.commit()
-    session.refresh(existing)
-    return existing
+    profile = ConversationProfile(
+        label_id=label_id,
+        chatlog_id=chatlog_id,
+        one_liner=one_liner,
+        theme_tags_json=json.dumps(summary.get("theme_tags", [])),
+        summary_embedding=vec.tobytes(),
+        human_label_count_at_build=count,
+        updated_at=datetime.utcnow(),
+    )
+    write_queue.write(session, lambda w: w.merge(profile), priority=write_queue.BULK)
+    if existing is not None:
+        session.refresh(existing)
+        return existing
+    return session.get(ConversationProfile, (label_id, chatlog_id))
 
 
 def _student_texts_for_chatlog(
@@ -711,57 +1226,176 @@ def _student_texts_for_chatlog(
     return [text for _midx, text, _nb in sorted(msgs, key=lambda t: t[0])]
 
 
+# ── Warm-up pool ─────────────────────────────────────────────────────────────
+# Explore picks ask for gradebook + ConversationProfile warm-ups. Requests
+# land in one deduplicating priority queue keyed by (label_id, chatlog_id),
+# drained by up to WARM_CONCURRENCY daemon workers, so a burst of /next calls
+# costs queue entries rather than threads. A new request for a label drops
+# that label's still-queued shortlist entries it no longer names (the labeler
+# has moved past them) and puts its own ahead of everything older. Profiles
+# build in parallel; each one (and each label's gradebook) takes its own
+# advisory lock (shared_state), so no two workers — in this process or
+# another — pay Gemini for the same summary.
+WARM_CONCURRENCY = max(1, int(os.environ.get("CHATSIGHT_EXPLORE_WARM_CONCURRENCY", "4")))
+
+_WARM_SHORTLIST = 1   # tiers: lower runs first
+_WARM_LABELED = 2     # labeled chats' profiles (theme vectors), after the shortlist
+
+_warm_cond = threading.Condition()
+_warm_pending: dict[tuple, dict] = {}   # key -> task; the heap holds (priority, n, key)
+_warm_heap: list[tuple] = []
+_warm_pushes = itertools.count()
+_warm_workers: list[threading.Thread] = []
+_warm_stopping = False
+_warm_seq = 0
+_warm_stats = {
+    "enqueued": 0, "deduped": 0, "dropped_stale": 0, "completed": 0, "failed": 0,
+    "picks": 0, "warm_picks": 0,
+}
+
+
 def warm_explore_candidates(
     label_id: int,
     chatlog_ids: list[int],
     conv: dict[int, list[tuple[int, str, Optional[str]]]],
     notebooks: dict[int, Optional[str]],
 ) -> None:
-    """Background: gradebook + conversation profiles for explore shortlist."""
-    if not _gemini_available() or not chatlog_ids:
+    """Queue gradebook + conversation-profile warm-ups for an explore
+    shortlist (best first); returns immediately."""
+    if not gemini_gateway.available() or not chatlog_ids:
         return
-    ids = list(chatlog_ids)
+    global _warm_seq
+    job_id = gemini_gateway.new_job_id("explore-warm")
+    wanted = set(chatlog_ids)
+    with _warm_cond:
+        _warm_seq += 1
+        for key in [k for k, t in _warm_pending.items()
+                    if k[0] == "profile" and k[1] == label_id and t["tier"] == _WARM_SHORTLIST
+                    and k[2] not in wanted]:
+            del _warm_pending[key]
+            _warm_stats["dropped_stale"] += 1
+        for position, cid in enumerate(chatlog_ids):
+            _enqueue_warm(("profile", label_id, cid), (_WARM_SHORTLIST, -_warm_seq, position), {
+                "texts": _student_texts_for_chatlog(conv, cid),
+                "notebook": notebooks.get(cid),
+                "job_id": job_id,
+            })
+        _enqueue_warm(("labeled", label_id, None), (_WARM_LABELED, -_warm_seq, -1), {
+            "conv": conv, "notebooks": notebooks, "skip": wanted, "job_id": job_id,
+        })
+        _ensure_warm_workers()
+        _warm_cond.notify_all()
+
+
+def _enqueue_warm(key: tuple, priority: tuple, task: dict) -> None:
+    # Called with _warm_cond held. Re-requesting a queued key only moves it up.
+    current = _warm_pending.get(key)
+    if current is not None:
+        _warm_stats["deduped"] += 1
+        if current["priority"] <= priority:
+            return
+    else:
+        _warm_stats["enqueued"] += 1
+    _warm_pending[key] = {**task, "tier": priority[0], "priority": priority}
+    heapq.heappush(_warm_heap, (priority, next(_warm_pushes), key))
+
+
+def _ensure_warm_workers() -> None:
+    # Called with _warm_cond held.
+    _warm_workers[:] = [t for t in _warm_workers if t.is_alive()]
+    while len(_warm_workers) < WARM_CONCURRENCY:
+        worker = threading.Thread(target=_warm_worker, name=f"explore-warm-{len(_warm_workers)}", daemon=True)
+        _warm_workers.append(worker)
+        worker.start()
+
+
+def _next_warm_task() -> Optional[tuple[tuple, dict]]:
+    with _warm_cond:
+        while not _warm_stopping:
+            while _warm_heap:
+                priority, _n, key = heapq.heappop(_warm_heap)
+                task = _warm_pending.get(key)
+                if task is not None and task["priority"] == priority:  # else superseded/dropped
+                    del _warm_pending[key]
+                    return key, task
+            _warm_cond.wait()
+        return None
 
-    def _run() -> None:
+
+def _warm_worker() -> None:
+    while (item := _next_warm_task()) is not None:
+        key, task = item
+        kind, label_id, cid = key
         try:
-            with Session(engine) as session:
-                with _warm_lock:
-                    ensure_gradebook(session, label_id)
-                for cid in ids:
-                    texts = _student_texts_for_chatlog(conv, cid)
-                    if not texts:
-                        continue
-                    with _warm_lock:
-                        ensure_conversation_profile(
-                            session,
-                            label_id,
-                            cid,
-                            texts,
-                            notebooks.get(cid),
-                        )
-                labeled = labeled_chatlog_ids(session, label_id)
-            for cid in labeled:
-                if cid in ids:
-                    continue
-                texts = _student_texts_for_chatlog(conv, cid)
-                if not texts:
-                    continue
-                try:
-                    with Session(engine) as session:
-                        with _warm_lock:
-                            ensure_conversation_profile(
-                                session,
-                                label_id,
-                                cid,
-                                texts,
-                                notebooks.get(cid),
-                            )
-                except Exception as exc:
-                    logger.warning("warm labeled profile %s failed: %s", cid, exc)
+            gemini_gateway.tagged(_run_warm_task, label_id=label_id, job_id=task["job_id"])(
+                kind, label_id, cid, task
+            )
         except Exception as exc:
-            logger.warning("warm_explore_candidates failed: %s", exc)
-
-    threading.Thread(target=_run, daemon=True).start()
+            logger.warning("explore warm %s label=%s chat=%s failed: %s", kind, label_id, cid, exc)
+            outcome = "failed"
+        else:
+            outcome = "completed"
+        with _warm_cond:
+            _warm_stats[outcome] += 1
+
+
+def _run_warm_task(kind: str, label_id: int, cid: Optional[int], task: dict) -> None:
+    # Lock first, then check out a connection: waiting warm-ups then hold
+    # nothing from the pool while they poll.
+    with shared_state.advisory_lock(engine, f"{WARM_LOCK}:gradebook:{label_id}"), Session(engine) as session:
+        ensure_gradebook(session, label_id)
+    if kind == "labeled":
+        with Session(engine) as session:
+            labeled = labeled_chatlog_ids(session, label_id)
+        with _warm_cond:
+            for position, other in enumerate(sorted(labeled - task["skip"])):
+                _enqueue_warm(("profile", label_id, other), (_WARM_LABELED, task["priority"][1], position), {
+                    "texts": _student_texts_for_chatlog(task["conv"], other),
+                    "notebook": task["notebooks"].get(other),
+                    "job_id": task["job_id"],
+                })
+            _warm_cond.notify_all()
+        return
+    if not task["texts"]:
+        return
+    with shared_state.advisory_lock(engine, f"{WARM_LOCK}:{label_id}:{cid}"), Session(engine) as session:
+        ensure_conversation_profile(session, label_id, cid, task["texts"], task["notebook"])
+
+
+def stop_warm_pool(timeout: float = 5.0) -> None:
+    """Drop queued warm-ups and stop the workers once their current task ends
+    (restarted by the next request)."""
+    global _warm_stopping
+    with _warm_cond:
+        _warm_stopping = True
+        _warm_pending.clear()
+        _warm_heap.clear()
+        workers = list(_warm_workers)
+        _warm_cond.notify_all()
+    for worker in workers:
+        worker.join(timeout)
+    with _warm_cond:
+        _warm_workers.clear()
+        _warm_stopping = False
+
+
+def note_pick_warmth(session: Session, label_id: int, chatlog_id: int) -> bool:
+    """Record whether an explore winner already had its profile when picked."""
+    warm = session.get(ConversationProfile, (label_id, chatlog_id)) is not None
+    with _warm_cond:
+        _warm_stats["picks"] += 1
+        _warm_stats["warm_picks"] += int(warm)
+    return warm
+
+
+def warm_queue_depth() -> int:
+    with _warm_cond:
+        return len(_warm_pending)
+
+
+def warm_stats() -> dict[str, int]:
+    with _warm_cond:
+        return dict(_warm_stats)
 
 
 def explore_score_weights() -> dict[str, float]:
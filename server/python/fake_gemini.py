@@ -0,0 +1,453 @@
+# server/python/fake_gemini.py
+"""In-process stand-in for genai.Client, installed via gemini_gateway.backend.
+
+Covers the surface the services use: `models.generate_content`,
+`models.embed_content`, and the Files + Batches APIs the handoff's Batch path
+drives. Responses have the same shape as the SDK's
+(candidates[0].content.parts[*].function_call / .text, embeddings[*].values,
+usage_metadata), so service code runs unmodified against it.
+
+Tests script it directly:
+
+    fake = FakeGeminiClient()
+    fake.on_tool("classify_binary", lambda contents, config: {"classifications": []})
+    fake.fail_next(Exception("429 RESOURCE_EXHAUSTED"), times=2)
+    gemini_gateway.set_backend(fake)
+
+For offline load/throughput runs, `CHATSIGHT_GEMINI_BACKEND=fake` makes the
+gateway build `from_env()` instead of a real client: deterministic,
+schema-valid answers for every tool (classify_binary / classify_messages
+answer each message in the prompt; other tools get arguments generated from
+their declared schema), hash-seeded embeddings, batch jobs that walk through
+QUEUED → PENDING → RUNNING → SUCCEEDED, and configurable latency, 429 and
+timeout rates:
+
+    CHATSIGHT_FAKE_GEMINI_LATENCY       fixed:MS | uniform:LO_MS:HI_MS |
+                                        lognormal:MEDIAN_MS:SIGMA  (default fixed:0)
+    CHATSIGHT_FAKE_GEMINI_429_RATE      fraction of calls raising 429 (default 0)
+    CHATSIGHT_FAKE_GEMINI_TIMEOUT_RATE  fraction of calls that hang, then time out (default 0)
+    CHATSIGHT_FAKE_GEMINI_TIMEOUT_MS    how long a timed-out call hangs (default 1000)
+    CHATSIGHT_FAKE_GEMINI_YES_RATE      share of classify_binary "yes" answers (default 0.3)
+    CHATSIGHT_FAKE_GEMINI_BATCH_STEP_SECONDS  time a batch job spends per state (default 2)
+    CHATSIGHT_FAKE_GEMINI_EMBED_DIM     embedding size (default concept_service.EMBED_DIM)
+    CHATSIGHT_FAKE_GEMINI_SEED          seeds the fault/latency draws (default 0)
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+ToolHandler = Callable[[Any, Any], dict]
+
+BATCH_STATES = ("JOB_STATE_QUEUED", "JOB_STATE_PENDING", "JOB_STATE_RUNNING")
+
+
+def _tool_declaration(config: Any) -> Optional[Any]:
+    """The first function declaration the request's config offers."""
+    for tool in _get(config, "tools") or []:
+        for decl in _get(tool, "function_declarations") or []:
+            if _get(decl, "name"):
+                return decl
+    return None
+
+
+def _tool_name(config: Any) -> Optional[str]:
+    decl = _tool_declaration(config)
+    return _get(decl, "name") if decl is not None else None
+
+
+def _get(obj: Any, key: str) -> Any:
+    """Field access that works on SDK objects and on their dict dumps."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(key)
+    return getattr(obj, key, None)
+
+
+def _text_of(contents: Any) -> str:
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(_text_of(c) for c in contents)
+    if isinstance(contents, dict):
+        if "text" in contents:
+            return str(contents["text"])
+        return _text_of(contents.get("parts", []))
+    return str(contents)
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _unit(*parts: str) -> float:
+    """Deterministic float in [0, 1) from the parts' hash."""
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little") / 2**64
+
+
+def hashed_embedding(text: str, dim: int) -> list[float]:
+    """Unit vector seeded from the text's hash: identical text → identical vector."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim)
+    return (vec / np.linalg.norm(vec)).astype(np.float32).tolist()
+
+
+def function_call_response(name: str, args: dict, prompt_tokens: int = 0) -> Any:
+    part = SimpleNamespace(function_call=SimpleNamespace(name=name, args=args), text=None)
+    return SimpleNamespace(
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))],
+        text=None,
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens, candidates_token_count=_approx_tokens(str(args)),
+        ),
+    )
+
+
+def text_response(text: str, prompt_tokens: int = 0) -> Any:
+    part = SimpleNamespace(function_call=None, text=text)
+    return SimpleNamespace(
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))],
+        text=text,
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens, candidates_token_count=_approx_tokens(text),
+        ),
+    )
+
+
+# ── Deterministic answers ────────────────────────────────────────────────────
+
+_BINARY_MESSAGE_RE = re.compile(r"^\[(\d+)\] (.*)$", re.M)
+_MULTI_MESSAGE_RE = re.compile(r'^(\d+)\. "(.*)"', re.M)
+_LABEL_RE = re.compile(r"^- \*\*(.+?)\*\*", re.M)
+_LABEL_NAME_RE = re.compile(r"^# Label: (.*)$", re.M)
+
+
+def classify_binary_args(prompt: str, yes_rate: float = 0.3) -> dict:
+    """One schema-valid classification per `[i] message` line. The verdict
+    depends only on (label, message), so re-running a chunk agrees with
+    itself."""
+    m = _LABEL_NAME_RE.search(prompt)
+    label = m.group(1) if m else ""
+    out = []
+    for idx, text in _BINARY_MESSAGE_RE.findall(prompt):
+        yes = _unit("binary", label, text) < yes_rate
+        words = text.split()
+        out.append({
+            "index": int(idx),
+            "value": "yes" if yes else "no",
+            "confidence": round(0.55 + 0.44 * _unit("confidence", label, text), 3),
+            "matched_pattern": " ".join(words[:4]) or label,
+            "rationale": f"{'Matches' if yes else 'Does not match'} '{label}'.",
+        })
+    return {"classifications": out}
+
+
+def classify_messages_args(prompt: str) -> dict:
+    """classify_messages answers for autolabel_service.build_prompt: one label
+    per message, or (multi-select prompts) every label whose hash clears
+    ~1.5/len(labels)."""
+    labels = _LABEL_RE.findall(prompt)
+    if not labels:
+        return {"classifications": []}
+    multi = "Assign all that apply" in prompt
+    out = []
+    for idx, text in _MULTI_MESSAGE_RE.findall(prompt):
+        if multi:
+            chosen = [l for l in labels if _unit("multi", l, text) < min(1.0, 1.5 / len(labels))]
+        else:
+            chosen = [labels[int(_unit("single", text) * len(labels))]]
+        for label in chosen:
+            out.append({"index": int(idx), "label": label,
+                        "confidence": round(0.5 + 0.49 * _unit("confidence", label, text), 3)})
+    return {"classifications": out}
+
+
+_CONVERSATION_HEADER_RE = re.compile(r"^## Conversation (\d+)$", re.M)
+
+
+def summarize_conversations_args(prompt: str) -> dict:
+    """summarize_conversations answers for explore_service's batched profile
+    prompt: one summary per `## Conversation <id>` section."""
+    sections = _CONVERSATION_HEADER_RE.split(prompt)[1:]
+    out = []
+    for cid, body in zip(sections[::2], sections[1::2]):
+        tag = f"theme-{int(_unit('summary', body) * 8)}"
+        out.append({"chatlog_id": int(cid),
+                    "one_liner": f"Student asks for help with {tag} (chat {cid}).",
+                    "theme_tags": [tag, "debugging"]})
+    return {"summaries": out}
+
+
+def _schema_type(schema: Any) -> str:
+    t = _get(schema, "type")
+    return str(getattr(t, "value", t) or "").lower()
+
+
+def schema_args(schema: Any, seed: str, name: str = "value") -> Any:
+    """A value conforming to a function-declaration schema (dict or SDK
+    Schema), derived from `seed` so equal prompts get equal answers."""
+    kind = _schema_type(schema)
+    u = _unit(seed, name)
+    if kind == "object":
+        props = _get(schema, "properties") or {}
+        return {key: schema_args(sub, seed, f"{name}.{key}") for key, sub in props.items()}
+    if kind == "array":
+        return [schema_args(_get(schema, "items"), seed, f"{name}[{i}]") for i in range(2 + int(u * 2))]
+    enum = _get(schema, "enum")
+    if enum:
+        return list(enum)[int(u * len(enum))]
+    if kind == "integer":
+        return int(u * 10)
+    if kind == "number":
+        return round(u, 3)
+    if kind == "boolean":
+        return u < 0.5
+    return f"fake {name.rsplit('.', 1)[-1]} {int(u * 1000)}"
+
+
+def _default_text(contents: Any, config: Any) -> str:
+    words = _text_of(contents).split()
+    return "Fake summary: " + " ".join(words[:12])
+
+
+# ── Faults and latency ───────────────────────────────────────────────────────
+
+class FakeAPIError(Exception):
+    """Shaped like genai.errors.APIError (a `code` + status text)."""
+
+    def __init__(self, code: int, status: str, message: str):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """`fixed:MS`, `uniform:LO:HI` or `lognormal:MEDIAN:SIGMA` → sampler
+    returning seconds."""
+    kind, _, rest = (spec or "fixed:0").partition(":")
+    args = [float(x) for x in rest.split(":") if x]
+    if kind == "fixed":
+        ms = args[0] if args else 0.0
+        return lambda rng: ms / 1000
+    if kind == "uniform":
+        lo, hi = args
+        return lambda rng: rng.uniform(lo, hi) / 1000
+    if kind == "lognormal":
+        median, sigma = args
+        return lambda rng: rng.lognormvariate(np.log(median), sigma) / 1000
+    raise ValueError(f"unknown latency spec {spec!r}")
+
+
+@dataclass
+class FakeBehavior:
+    latency: str = "fixed:0"
+    rate_limit_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 1.0
+    yes_rate: float = 0.3
+    batch_step_seconds: float = 2.0
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeBehavior":
+        env = os.environ.get
+        return cls(
+            latency=env("CHATSIGHT_FAKE_GEMINI_LATENCY", "fixed:0"),
+            rate_limit_rate=float(env("CHATSIGHT_FAKE_GEMINI_429_RATE", "0")),
+            timeout_rate=float(env("CHATSIGHT_FAKE_GEMINI_TIMEOUT_RATE", "0")),
+            timeout_seconds=float(env("CHATSIGHT_FAKE_GEMINI_TIMEOUT_MS", "1000")) / 1000,
+            yes_rate=float(env("CHATSIGHT_FAKE_GEMINI_YES_RATE", "0.3")),
+            batch_step_seconds=float(env("CHATSIGHT_FAKE_GEMINI_BATCH_STEP_SECONDS", "2")),
+            seed=int(env("CHATSIGHT_FAKE_GEMINI_SEED", "0")),
+        )
+
+
+# ── Client surface ───────────────────────────────────────────────────────────
+
+class _Models:
+    def __init__(self, owner: "FakeGeminiClient"):
+        self._owner = owner
+
+    def generate_content(self, *, model: str, contents: Any, config: Any = None) -> Any:
+        return self._owner._generate(model, contents, config)
+
+    def embed_content(self, *, model: str, contents: Any, config: Any = None) -> Any:
+        return self._owner._embed(model, contents, config)
+
+
+class _Files:
+    def __init__(self, owner: "FakeGeminiClient"):
+        self._owner = owner
+        self._blobs: dict[str, bytes] = {}
+        self._ids = itertools.count(1)
+
+    def upload(self, *, file: Any, config: Any = None) -> Any:
+        data = open(file, "rb").read() if isinstance(file, (str, os.PathLike)) else file.read()
+        return SimpleNamespace(name=self.put(data))
+
+    def put(self, data: bytes) -> str:
+        name = f"files/fake-{next(self._ids)}"
+        self._blobs[name] = data
+        return name
+
+    def download(self, *, file: str, config: Any = None) -> bytes:
+        return self._blobs[file]
+
+    def delete(self, *, name: str, config: Any = None) -> None:
+        self._blobs.pop(name, None)
+
+
+class _Batches:
+    """Jobs advance one state per `batch_step_seconds` of wall clock and
+    answer every JSONL request when they reach SUCCEEDED."""
+
+    def __init__(self, owner: "FakeGeminiClient"):
+        self._owner = owner
+        self._jobs: dict[str, dict] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create(self, *, model: str, src: str, config: Any = None) -> Any:
+        name = f"batches/fake-{next(self._ids)}"
+        with self._lock:
+            self._jobs[name] = {"model": model, "src": src, "created": time.monotonic(),
+                                "state": BATCH_STATES[0], "dest": None}
+        return self.get(name=name)
+
+    def cancel(self, *, name: str, config: Any = None) -> None:
+        with self._lock:
+            self._jobs[name]["state"] = "JOB_STATE_CANCELLED"
+
+    def get(self, *, name: str, config: Any = None) -> Any:
+        owner = self._owner
+        with self._lock:
+            job = self._jobs[name]
+            if job["state"] in BATCH_STATES:
+                step = int((time.monotonic() - job["created"]) / max(owner.behavior.batch_step_seconds, 1e-9))
+                if step < len(BATCH_STATES):
+                    job["state"] = BATCH_STATES[step]
+                else:
+                    job["dest"] = owner.files.put(owner._answer_batch(job["src"]))
+                    job["state"] = "JOB_STATE_SUCCEEDED"
+            return SimpleNamespace(
+                name=name, model=job["model"], state=SimpleNamespace(name=job["state"]),
+                dest=SimpleNamespace(file_name=job["dest"]) if job["dest"] else None, error=None,
+            )
+
+
+class FakeGeminiClient:
+    """Scriptable fake. Tool calls are answered by handlers registered with
+    `on_tool` (default: `default_tool_handler`, which returns empty args);
+    plain-text prompts by `text_handler` (default: empty string). Every call
+    is appended to `calls`. `behavior` adds latency and random faults."""
+
+    def __init__(self, embed_dim: int = 64, behavior: Optional[FakeBehavior] = None):
+        self.embed_dim = embed_dim
+        self.behavior = behavior or FakeBehavior()
+        self.calls: list[dict] = []
+        self.models = _Models(self)
+        self.files = _Files(self)
+        self.batches = _Batches(self)
+        self.text_handler: Callable[[Any, Any], str] = lambda contents, config: ""
+        self.default_tool_handler: ToolHandler = lambda contents, config: {}
+        self._tool_handlers: dict[str, ToolHandler] = {}
+        self._failures: list[BaseException] = []
+        self._lock = threading.Lock()
+        self._latency = parse_latency(self.behavior.latency)
+        self._rng = random.Random(self.behavior.seed)
+
+    @classmethod
+    def offline(cls, embed_dim: int = 64, behavior: Optional[FakeBehavior] = None) -> "FakeGeminiClient":
+        """Answers everything: classifiers per message, other tools from their
+        schema, plain text with a short fake summary."""
+        fake = cls(embed_dim=embed_dim, behavior=behavior)
+        yes_rate = fake.behavior.yes_rate
+        fake.on_tool("classify_binary", lambda contents, config: classify_binary_args(_text_of(contents), yes_rate))
+        fake.on_tool("classify_messages", lambda contents, config: classify_messages_args(_text_of(contents)))
+        fake.on_tool("summarize_conversations",
+                     lambda contents, config: summarize_conversations_args(_text_of(contents)))
+        fake.default_tool_handler = lambda contents, config: schema_args(
+            _get(_tool_declaration(config), "parameters"), _text_of(contents))
+        fake.text_handler = _default_text
+        return fake
+
+    def on_tool(self, name: str, handler: ToolHandler) -> None:
+        self._tool_handlers[name] = handler
+
+    def fail_next(self, exc: BaseException, times: int = 1) -> None:
+        """Raise `exc` from the next `times` model calls."""
+        with self._lock:
+            self._failures.extend([exc] * times)
+
+    def _record(self, method: str, model: str, contents: Any, config: Any) -> None:
+        b = self.behavior
+        with self._lock:
+            self.calls.append({"method": method, "model": model, "contents": contents, "config": config})
+            exc = self._failures.pop(0) if self._failures else None
+            delay = self._latency(self._rng)
+            roll = self._rng.random()
+        if exc is not None:
+            raise exc
+        if roll < b.timeout_rate:
+            time.sleep(b.timeout_seconds)
+            raise TimeoutError("fake gemini: the read operation timed out")
+        if roll < b.timeout_rate + b.rate_limit_rate:
+            # Quota rejections come back fast, without the model's latency.
+            raise FakeAPIError(429, "RESOURCE_EXHAUSTED", "fake gemini: quota exceeded")
+        if delay > 0:
+            time.sleep(delay)
+
+    def _tool_args(self, name: str, contents: Any, config: Any) -> dict:
+        handler = self._tool_handlers.get(name, self.default_tool_handler)
+        return handler(contents, config)
+
+    def _generate(self, model: str, contents: Any, config: Any) -> Any:
+        self._record("generate_content", model, contents, config)
+        prompt_tokens = _approx_tokens(_text_of(contents))
+        name = _tool_name(config)
+        if name is not None:
+            return function_call_response(name, self._tool_args(name, contents, config), prompt_tokens)
+        return text_response(self.text_handler(contents, config), prompt_tokens)
+
+    def _embed(self, model: str, contents: Any, config: Any) -> Any:
+        self._record("embed_content", model, contents, config)
+        texts = [contents] if isinstance(contents, str) else list(contents)
+        return SimpleNamespace(
+            embeddings=[SimpleNamespace(values=hashed_embedding(_text_of(t), self.embed_dim)) for t in texts]
+        )
+
+    def _answer_batch(self, src: str) -> bytes:
+        """Result JSONL for an uploaded Batch request file, in the REST
+        (camelCase) shape binary_autolabel_service.parse_classify_batch_response reads."""
+        lines = []
+        for line in self.files.download(file=src).decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            request = entry.get("request", {})
+            name = _tool_name(request)
+            args = self._tool_args(name, request.get("contents", []), request) if name else {}
+            response = {"candidates": [{"content": {"parts": [{"functionCall": {"name": name, "args": args}}]}}]}
+            lines.append(json.dumps({"key": entry.get("key"), "response": response}))
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def from_env() -> FakeGeminiClient:
+    """The offline fake configured by CHATSIGHT_FAKE_GEMINI_* (see module docstring)."""
+    from concept_service import EMBED_DIM
+
+    dim = int(os.environ.get("CHATSIGHT_FAKE_GEMINI_EMBED_DIM", EMBED_DIM))
+    return FakeGeminiClient.offline(embed_dim=dim, behavior=FakeBehavior.from_env())
@@ -0,0 +1,421 @@
+# server/python/gemini_gateway.py
+"""Single entry point for every Gemini model call.
+
+Call sites used to build their own genai.Client and (in one place) their own
+retry loop. Routing them through here gives the process:
+
+- one pooled client (built lazily; google.genai is slow to import),
+- a per-model token bucket so concurrent call sites share the project quota
+  instead of each independently tripping 429s,
+- one jittered exponential-backoff retry policy for transient failures
+  (rate limits and network timeouts); everything else fails fast,
+- per-call-site metrics (calls, errors, retries, latency, tokens), plus a
+  listener hook that hands every request to the call ledger (llm_ledger)
+  tagged with the label/job that caused it (`call_context`),
+- an optional record/replay cache in front of the network (llm_cache).
+
+`backend` is the injection point: tests and offline benchmarks assign any
+client-shaped object (see fake_gemini.FakeGeminiClient) and every call site
+uses it instead of the network.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+import llm_cache
+
+logger = logging.getLogger(__name__)
+
+# Per-request timeout (milliseconds). Without this the genai SDK defaults to no
+# read timeout, and a half-open TCP connection to Google can block a worker
+# thread indefinitely (we hit exactly this — a single hung chunk stalled an
+# otherwise-complete 17k-message run at 99.7%). 120s is generous for one
+# 50-message chunk; once the timeout fires, the retry policy below reissues it.
+REQUEST_TIMEOUT_MS = int(os.environ.get("CHATSIGHT_GEMINI_TIMEOUT_MS", "120000"))
+
+# Retry policy for transient errors. Other error classes fail-fast so genuine
+# bugs (auth, malformed request, 500-class) surface immediately.
+RETRY_MAX_ATTEMPTS = int(os.environ.get("CHATSIGHT_GEMINI_RETRY_ATTEMPTS", "4"))  # initial try + 3 retries
+RETRY_BACKOFF_SECONDS = [2.0, 4.0, 8.0]
+RETRY_JITTER = 0.25  # ±25% so worker threads don't all retry in lockstep
+
+# Requests per minute per model. Override one model with
+# CHATSIGHT_GEMINI_RPM_<MODEL> (non-alphanumerics → "_", e.g.
+# CHATSIGHT_GEMINI_RPM_GEMINI_2_5_FLASH=300). 0 disables limiting.
+DEFAULT_RPM = float(os.environ.get("CHATSIGHT_GEMINI_RPM", "600"))
+# Bucket capacity as seconds of traffic at the steady rate.
+BURST_SECONDS = 10.0
+
+# "genai" (the real API) or "fake": fake_gemini.from_env(), a deterministic
+# offline stand-in for load and throughput testing without a key.
+BACKEND_KIND = os.environ.get("CHATSIGHT_GEMINI_BACKEND", "genai").strip().lower()
+
+backend: Any = None  # client-shaped override (tests / fakes); None → CHATSIGHT_GEMINI_BACKEND
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide client: the injected backend if set, else a lazily
+    built genai.Client (or the offline fake when CHATSIGHT_GEMINI_BACKEND=fake).
+    Also used directly for the Batch/Files APIs."""
+    if backend is not None:
+        return backend
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None and BACKEND_KIND == "fake":
+                import fake_gemini
+                _client = fake_gemini.from_env()
+                logger.warning("Gemini calls are served by the offline fake (CHATSIGHT_GEMINI_BACKEND=fake)")
+            elif _client is None:
+                from google import genai
+                from google.genai import types
+                _client = genai.Client(
+                    api_key=os.environ.get("GEMINI_API_KEY", ""),
+                    http_options=types.HttpOptions(timeout=REQUEST_TIMEOUT_MS),
+                )
+    return _client
+
+
+def set_backend(client: Any) -> None:
+    """Install a client-shaped fake (or None to go back to the real API)."""
+    global backend
+    backend = client
+
+
+def available() -> bool:
+    """Whether model calls can be made at all (a key, an injected backend or
+    the configured fake)."""
+    return (backend is not None or BACKEND_KIND == "fake"
+            or bool(os.environ.get("GEMINI_API_KEY", "").strip()))
+
+
+# ── Error classification ─────────────────────────────────────────────────────
+
+def error_kind(exc: BaseException) -> str:
+    """'rate_limited' for Gemini quota/429 responses, otherwise 'error'. Looks
+    at HTTP status, gRPC code, and the message text since the genai SDK
+    surfaces these inconsistently."""
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if status in (429, "RESOURCE_EXHAUSTED"):
+        return "rate_limited"
+    text = (str(exc) or "").lower()
+    if "429" in text or "resource_exhausted" in text or "rate limit" in text or "quota" in text:
+        return "rate_limited"
+    return "error"
+
+
+_TIMEOUT_SIGNALS = ("timeout", "timed out", "deadline exceeded", "readtimeout", "connecttimeout")
+
+
+def is_timeout(exc: BaseException) -> bool:
+    text = (str(exc) or "").lower()
+    name = type(exc).__name__.lower()
+    return any(sig in text or sig in name for sig in _TIMEOUT_SIGNALS)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether the retry policy should retry instead of fail-fast. Covers
+    rate limiting (429 / RESOURCE_EXHAUSTED) and network timeouts — a single
+    hung socket shouldn't tank an otherwise-healthy run."""
+    return error_kind(exc) == "rate_limited" or is_timeout(exc)
+
+
+def _outcome(exc: BaseException) -> str:
+    kind = error_kind(exc)
+    if kind == "rate_limited":
+        return kind
+    return "timeout" if is_timeout(exc) else "error"
+
+
+# ── Rate limiting ────────────────────────────────────────────────────────────
+
+class TokenBucket:
+    """Classic token bucket. `acquire()` blocks until a token is available and
+    returns how long it waited. Thread-safe; one bucket per model."""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, burst if burst is not None else self.rate * BURST_SECONDS)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+_limiters: dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def rpm_for(model: str) -> float:
+    key = "CHATSIGHT_GEMINI_RPM_" + re.sub(r"[^A-Z0-9]", "_", model.upper())
+    return float(os.environ.get(key, DEFAULT_RPM))
+
+
+def limiter_for(model: str) -> TokenBucket:
+    with _limiters_lock:
+        bucket = _limiters.get(model)
+        if bucket is None:
+            bucket = _limiters[model] = TokenBucket(rpm_for(model))
+        return bucket
+
+
+# ── Metrics ──────────────────────────────────────────────────────────────────
+
+_stats: dict[tuple[str, str], dict[str, float]] = {}
+_stats_lock = threading.Lock()
+
+
+def _bump(call_site: str, model: str, **delta: float) -> None:
+    with _stats_lock:
+        s = _stats.setdefault((call_site, model), {
+            "calls": 0, "errors": 0, "retries": 0, "rate_limited": 0,
+            "latency_seconds_total": 0.0, "latency_seconds_max": 0.0,
+            "input_tokens": 0, "output_tokens": 0, "limiter_wait_seconds": 0.0,
+            "cache_hits": 0,
+        })
+        for k, v in delta.items():
+            if k == "latency_seconds_max":
+                s[k] = max(s[k], v)
+            else:
+                s[k] += v
+
+
+def metrics_snapshot() -> list[dict[str, Any]]:
+    """Per (call_site, model) counters since process start (or reset_metrics)."""
+    with _stats_lock:
+        return [
+            {"call_site": site, "model": model, **dict(vals)}
+            for (site, model), vals in sorted(_stats.items())
+        ]
+
+
+def reset_metrics() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+# ── Attribution + listeners ──────────────────────────────────────────────────
+
+# label_id / job_id attached to every call made inside `call_context`. New
+# threads start with an empty context: wrap thread targets with `tagged` (or
+# submit via contextvars.copy_context().run) to carry the tags across.
+_call_tags: contextvars.ContextVar[dict] = contextvars.ContextVar("gemini_call_tags", default={})
+
+
+@contextlib.contextmanager
+def call_context(**tags: Any):
+    token = _call_tags.set({**_call_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _call_tags.reset(token)
+
+
+def tagged(fn: Callable[..., Any], **tags: Any) -> Callable[..., Any]:
+    """`fn` wrapped so its Gemini calls carry `tags`; for thread/background targets."""
+    def run(*args: Any, **kwargs: Any) -> Any:
+        with call_context(**tags):
+            return fn(*args, **kwargs)
+    return run
+
+
+def current_job_id() -> Optional[str]:
+    """job_id of the enclosing `call_context`, if any."""
+    return _call_tags.get().get("job_id")
+
+
+def new_job_id(kind: str) -> str:
+    return f"{kind}-{uuid.uuid4().hex[:8]}"
+
+
+_listeners: list[Callable[[dict], None]] = []
+
+
+def add_listener(fn: Callable[[dict], None]) -> None:
+    """Call `fn(record)` after every model request (success or failure)."""
+    if fn not in _listeners:
+        _listeners.append(fn)
+
+
+def remove_listener(fn: Callable[[dict], None]) -> None:
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+def _notify(**record: Any) -> None:
+    if not _listeners:
+        return
+    record.update(_call_tags.get())
+    for fn in list(_listeners):
+        try:
+            fn(record)
+        except Exception:
+            logger.exception("gemini call listener failed")
+
+
+def _token_count(value: Any) -> int:
+    # Real responses carry ints (or None); fakes/mocks may carry anything.
+    return value if isinstance(value, int) else 0
+
+
+def usage_tokens(response: Any) -> tuple[int, int]:
+    """(input, output) token counts from a response's usage_metadata."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return 0, 0
+    return (
+        _token_count(getattr(usage, "prompt_token_count", None)),
+        _token_count(getattr(usage, "candidates_token_count", None)),
+    )
+
+
+# ── Retry ────────────────────────────────────────────────────────────────────
+
+# Set while a call_with_retry scope is active on this thread/context so nested
+# gateway calls make a single attempt and let the outer scope own the retries
+# (otherwise a chunk-level retry around classify_binary would multiply with the
+# per-request retry inside it).
+_retry_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "gemini_retry_scope", default=None
+)
+
+
+def backoff_seconds(attempt: int) -> float:
+    base = RETRY_BACKOFF_SECONDS[min(attempt, len(RETRY_BACKOFF_SECONDS) - 1)]
+    return base * (1.0 - RETRY_JITTER + random.random() * 2 * RETRY_JITTER)
+
+
+def current_attempt() -> int:
+    """0-based attempt number of the enclosing retry scope (0 outside one)."""
+    scope = _retry_scope.get()
+    return scope["attempt"] if scope else 0
+
+
+def call_with_retry(
+    fn: Callable[[], Any],
+    *,
+    call_site: str,
+    model: str = "",
+    max_attempts: Optional[int] = None,
+) -> Any:
+    """Run `fn()` under the shared retry policy: transient errors back off
+    RETRY_BACKOFF_SECONDS (jittered) and retry up to `max_attempts` total
+    tries; anything else, or the last transient error, propagates."""
+    if _retry_scope.get() is not None:
+        return fn()
+    attempts = max(1, max_attempts if max_attempts is not None else RETRY_MAX_ATTEMPTS)
+    scope = {"attempt": 0, "call_site": call_site}
+    token = _retry_scope.set(scope)
+    try:
+        for attempt in range(attempts):
+            scope["attempt"] = attempt
+            try:
+                return fn()
+            except Exception as e:
+                if not is_transient(e) or attempt == attempts - 1:
+                    raise
+                wait = backoff_seconds(attempt)
+                logger.info(
+                    "%s: transient %s (attempt %d/%d), backing off %.1fs",
+                    call_site, _outcome(e), attempt + 1, attempts, wait,
+                )
+                _bump(call_site, model, retries=1)
+                time.sleep(wait)
+    finally:
+        _retry_scope.reset(token)
+
+
+def _invoke(method: str, call_site: str, model: str, kwargs: dict) -> Any:
+    # Record/replay only stands in for the network; injected fakes are local.
+    cached = backend is None and llm_cache.enabled()
+    if cached:
+        hit = llm_cache.lookup(method, model, kwargs, call_site)
+        if hit is not None:
+            _bump(call_site, model, cache_hits=1)
+            return hit
+    waited = limiter_for(model).acquire()
+    start = time.perf_counter()
+    try:
+        response = getattr(get_client().models, method)(model=model, **kwargs)
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        outcome = _outcome(e)
+        _bump(call_site, model, calls=1, errors=1, rate_limited=int(outcome == "rate_limited"),
+              latency_seconds_total=elapsed, latency_seconds_max=elapsed,
+              limiter_wait_seconds=waited)
+        _notify(call_site=call_site, model=model, input_tokens=0, output_tokens=0,
+                latency_ms=elapsed * 1000.0, retry_count=current_attempt(), outcome=outcome)
+        raise
+    elapsed = time.perf_counter() - start
+    if cached:
+        llm_cache.store(method, model, kwargs, response, call_site)
+    tokens_in, tokens_out = usage_tokens(response)
+    _bump(call_site, model, calls=1, latency_seconds_total=elapsed,
+          latency_seconds_max=elapsed, input_tokens=tokens_in,
+          output_tokens=tokens_out, limiter_wait_seconds=waited)
+    _notify(call_site=call_site, model=model, input_tokens=tokens_in, output_tokens=tokens_out,
+            latency_ms=elapsed * 1000.0, retry_count=current_attempt(), outcome="ok")
+    return response
+
+
+def generate_content(
+    *,
+    model: str,
+    contents: Any,
+    call_site: str,
+    config: Any = None,
+    max_attempts: Optional[int] = None,
+) -> Any:
+    kwargs: dict[str, Any] = {"contents": contents}
+    if config is not None:
+        kwargs["config"] = config
+    return call_with_retry(
+        lambda: _invoke("generate_content", call_site, model, kwargs),
+        call_site=call_site, model=model, max_attempts=max_attempts,
+    )
+
+
+def embed_content(
+    *,
+    model: str,
+    contents: Any,
+    call_site: str,
+    config: Any = None,
+    max_attempts: Optional[int] = None,
+) -> Any:
+    kwargs: dict[str, Any] = {"contents": contents}
+    if config is not None:
+        kwargs["config"] = config
+    return call_with_retry(
+        lambda: _invoke("embed_content", call_site, model, kwargs),
+        call_site=call_site, model=model, max_attempts=max_attempts,
+    )
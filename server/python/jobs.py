@@ -0,0 +1,434 @@
+# server/python/jobs.py
+"""Durable background-job queue on the app DB's `job` table.
+
+The API enqueues work (handoff classification, autolabel, concept discovery,
+split autolabel) as Job rows and reads progress back from them. Workers lease
+a row, run the handler registered for its kind, and record the outcome. The
+workers are either `python -m worker` processes (CHATSIGHT_JOB_RUNNER=worker;
+the API then only enqueues) or, by default, a few daemon threads inside the
+API process (`inline`), so a plain `uvicorn main:app` still runs its jobs.
+
+A lease is (lease_owner, lease_expires_at), claimed with a conditional UPDATE
+so two workers can never both own a row. While a handler runs, a heartbeat
+thread extends the lease every HEARTBEAT_SECONDS and picks up cancellation
+requests. A row still `running` after its lease expired belongs to a worker
+that died: the next worker to poll re-queues it (or fails it once
+max_attempts is used up), so handlers must be safe to re-run — the built-in
+ones skip whatever already landed.
+
+Handlers are `fn(ctx, **payload)`; `ctx` is a JobContext for progress,
+soft errors and cancellation. A dict returned by the handler (or, for a
+handler that returns something else, left in `ctx.result`) is stored as the
+job's result; a handler that raises is retried with exponential backoff until
+max_attempts. Every state change is also published to progress_events
+(topic "job:<id>") for the SSE route.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+import progress_events
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+RUNNERS = ("inline", "worker")
+RUNNER = os.environ.get("CHATSIGHT_JOB_RUNNER", "inline").strip().lower()
+if RUNNER not in RUNNERS:
+    raise ValueError(f"CHATSIGHT_JOB_RUNNER must be one of {RUNNERS}, got {RUNNER!r}")
+LEASE_SECONDS = float(os.environ.get("CHATSIGHT_JOB_LEASE_SECONDS", "60"))
+HEARTBEAT_SECONDS = LEASE_SECONDS / 4
+POLL_SECONDS = float(os.environ.get("CHATSIGHT_JOB_POLL_SECONDS", "1"))
+RETRY_BACKOFF_SECONDS = float(os.environ.get("CHATSIGHT_JOB_RETRY_BACKOFF_SECONDS", "15"))
+INLINE_THREADS = int(os.environ.get("CHATSIGHT_JOB_INLINE_THREADS", "2"))
+DEFAULT_MAX_ATTEMPTS = 3
+
+ACTIVE = ("queued", "running")
+FINISHED = ("succeeded", "failed", "cancelled")
+
+_handlers: dict[str, Callable[..., Any]] = {}
+
+
+class Cancelled(Exception):
+    """Raised by JobContext.checkpoint() once cancellation was requested."""
+
+
+def register(kind: str, fn: Callable[..., Any]) -> None:
+    """Run `fn(ctx, **payload)` for jobs of `kind`."""
+    _handlers[kind] = fn
+
+
+def kinds() -> list[str]:
+    return sorted(_handlers)
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def job_event(job: Job) -> dict:
+    """Progress snapshot of a job, as streamed by GET /api/jobs/{id}/events."""
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "label_id": job.label_id,
+        "status": job.status,
+        "processed": job.processed,
+        "total": job.total,
+        "error": job.error,
+        "done": job.status in FINISHED,
+    }
+
+
+def _publish(job: Job) -> None:
+    progress_events.publish(progress_events.topic("job", job.id), job_event(job))
+
+
+# ── API side ─────────────────────────────────────────────────────────────────
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    *,
+    label_id: Optional[int] = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> Job:
+    """Insert a queued job (committing `db`) and return it."""
+    if kind not in _handlers:
+        raise ValueError(f"no job handler registered for {kind!r}")
+    job = Job(kind=kind, payload_json=json.dumps(payload or {}), label_id=label_id,
+              max_attempts=max_attempts)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def active(db: Session, *job_kinds: str, label_id: Optional[int] = None) -> Optional[Job]:
+    """Newest queued or running job of any of `job_kinds` (for `label_id`, if given)."""
+    stmt = select(Job).where(Job.kind.in_(job_kinds), Job.status.in_(ACTIVE))
+    if label_id is not None:
+        stmt = stmt.where(Job.label_id == label_id)
+    return db.exec(stmt.order_by(Job.id.desc())).first()
+
+
+def latest(db: Session, *job_kinds: str, label_id: Optional[int] = None) -> Optional[Job]:
+    stmt = select(Job).where(Job.kind.in_(job_kinds))
+    if label_id is not None:
+        stmt = stmt.where(Job.label_id == label_id)
+    return db.exec(stmt.order_by(Job.id.desc())).first()
+
+
+def cancel(db: Session, job_id: int) -> Optional[Job]:
+    """Cancel a queued job on the spot; flag a running one so its handler
+    stops at the next checkpoint. Finished jobs are left alone."""
+    now = datetime.utcnow()
+    db.exec(update(Job).where(Job.id == job_id, Job.status == "queued")
+            .values(status="cancelled", finished_at=now))
+    db.exec(update(Job).where(Job.id == job_id, Job.status == "running")
+            .values(cancel_requested=True))
+    db.commit()
+    job = db.get(Job, job_id)
+    if job is not None:
+        db.refresh(job)
+        _publish(job)
+    return job
+
+
+def counts(db: Session) -> dict[tuple[str, str], int]:
+    """(kind, status) → rows, for queued/running jobs (queue depth metrics)."""
+    rows = db.exec(
+        select(Job.kind, Job.status, func.count(Job.id))
+        .where(Job.status.in_(ACTIVE))
+        .group_by(Job.kind, Job.status)
+    ).all()
+    return {(kind, status): n for kind, status, n in rows}
+
+
+# ── Worker side ──────────────────────────────────────────────────────────────
+
+def reclaim_expired(db_engine, now: Optional[datetime] = None) -> int:
+    """Re-queue running jobs whose lease expired (their worker died). Jobs out
+    of attempts fail; jobs that were asked to cancel are cancelled."""
+    now = now or datetime.utcnow()
+    expired = (Job.status == "running", Job.lease_expires_at < now)
+    released = dict(lease_owner=None, lease_expires_at=None)
+    with Session(db_engine) as db:
+        if not db.exec(select(func.count(Job.id)).where(*expired)).one():
+            return 0
+        n = db.exec(update(Job).where(*expired, Job.cancel_requested == True)  # noqa: E712
+                    .values(status="cancelled", finished_at=now, **released)).rowcount
+        n += db.exec(update(Job).where(*expired, Job.attempts >= Job.max_attempts)
+                     .values(status="failed", finished_at=now,
+                             error="lease expired (worker lost) on the last attempt", **released)).rowcount
+        n += db.exec(update(Job).where(*expired)
+                     .values(status="queued", run_after=now, **released)).rowcount
+        db.commit()
+    if n:
+        logger.warning("reclaimed %d job(s) with expired leases", n)
+    return n
+
+
+def lease(
+    db_engine,
+    worker_id: str,
+    job_kinds: Optional[list[str]] = None,
+    *,
+    now: Optional[datetime] = None,
+) -> Optional[Job]:
+    """Claim the oldest runnable queued job, or None.
+
+    Candidates are found with a plain SELECT so idle polling never takes the
+    SQLite write lock; the claim itself is an UPDATE guarded on
+    status='queued', so a worker that loses the race just tries the next row."""
+    now = now or datetime.utcnow()
+    with Session(db_engine) as db:
+        for _ in range(5):
+            q = select(Job.id).where(Job.status == "queued", Job.run_after <= now)
+            if job_kinds:
+                q = q.where(Job.kind.in_(job_kinds))
+            candidate = db.exec(q.order_by(Job.id).limit(1)).first()
+            if candidate is None:
+                return None
+            won = db.exec(
+                update(Job).where(Job.id == candidate, Job.status == "queued").values(
+                    status="running", lease_owner=worker_id, heartbeat_at=now,
+                    lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                    attempts=Job.attempts + 1, started_at=now,
+                )
+            ).rowcount
+            db.commit()
+            if won:
+                job = db.get(Job, candidate)
+                db.expunge(job)
+                return job
+    return None
+
+
+class JobContext:
+    """A handler's view of its job: payload bookkeeping, progress and
+    cancellation. `JobContext()` with no job is a detached context for calling
+    handlers directly (scripts, tests); it only keeps the values in memory."""
+
+    def __init__(self, job: Optional[Job] = None, db_engine=None, worker_id: Optional[str] = None):
+        self.job_id = job.id if job is not None else None
+        self.attempt = job.attempts if job is not None else 1
+        self.processed = 0
+        self.total = 0
+        self.error: Optional[str] = None
+        self.result: Optional[dict] = None
+        self.lease_lost = False
+        self._job = job
+        self._engine = db_engine if job is not None else None
+        self._worker_id = worker_id
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancellation was requested (or the lease was lost)."""
+        return self._cancel.is_set()
+
+    def checkpoint(self) -> None:
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def progress(self, processed: Optional[int] = None, total: Optional[int] = None) -> None:
+        values = {}
+        if processed is not None:
+            self.processed = values["processed"] = processed
+        if total is not None:
+            self.total = values["total"] = total
+        self._write(**values)
+
+    def note_error(self, message: str) -> None:
+        """Record a non-fatal error (the job keeps going and still succeeds)."""
+        self.error = message
+        self._write(error=message)
+
+    def heartbeat(self, now: Optional[datetime] = None) -> bool:
+        """Extend the lease and pick up a cancel request. False (and the
+        context turns cancelled) if another worker has taken the job over."""
+        if self._engine is None:
+            return True
+        now = now or datetime.utcnow()
+        with Session(self._engine) as db:
+            held = db.exec(
+                update(Job).where(*self._owned()).values(
+                    heartbeat_at=now, lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                )
+            ).rowcount
+            cancel = db.exec(select(Job.cancel_requested).where(Job.id == self.job_id)).first()
+            db.commit()
+        if not held:
+            self.lease_lost = True
+        if not held or cancel:
+            self._cancel.set()
+        return bool(held)
+
+    def _owned(self):
+        return (Job.id == self.job_id, Job.lease_owner == self._worker_id, Job.status == "running")
+
+    def _write(self, **values: Any) -> None:
+        if self._engine is None or not values:
+            return
+        with Session(self._engine) as db:
+            db.exec(update(Job).where(*self._owned()).values(**values))
+            db.commit()
+        for key, value in values.items():
+            setattr(self._job, key, value)
+        _publish(self._job)
+
+
+def _heartbeat_loop(ctx: JobContext, stop: threading.Event) -> None:
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            if not ctx.heartbeat():
+                logger.warning("job %s: lease lost to another worker", ctx.job_id)
+                return
+        except Exception:
+            logger.exception("job %s: heartbeat failed", ctx.job_id)
+
+
+def run(db_engine, job: Job, worker_id: str) -> str:
+    """Run a job this worker has leased and record the outcome. Returns the
+    job's new status ('queued' when a failure was scheduled for retry, 'lost'
+    when the lease was taken over and the outcome discarded)."""
+    ctx = JobContext(job, db_engine, worker_id)
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat_loop, args=(ctx, stop),
+                            name=f"job-{job.id}-heartbeat", daemon=True)
+    beat.start()
+    status, error, result = "succeeded", None, None
+    try:
+        handler = _handlers.get(job.kind)
+        if handler is None:
+            raise LookupError(f"no job handler registered for {job.kind!r}")
+        result = handler(ctx, **json.loads(job.payload_json or "{}"))
+        if not isinstance(result, dict):
+            result = ctx.result
+        if ctx.cancelled:
+            status = "cancelled"
+    except Cancelled:
+        status = "cancelled"
+    except Exception as e:
+        logger.exception("job %s (%s) failed on attempt %d", job.id, job.kind, job.attempts)
+        status, error = "failed", str(e) or e.__class__.__name__
+    finally:
+        stop.set()
+        beat.join()
+
+    now = datetime.utcnow()
+    values: dict[str, Any] = dict(lease_owner=None, lease_expires_at=None, error=error or ctx.error)
+    if status == "failed" and not ctx.cancelled and job.attempts < job.max_attempts:
+        status = "queued"
+        values.update(status=status, run_after=now + timedelta(
+            seconds=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)))
+    else:
+        values.update(status=status, finished_at=now,
+                      result_json=json.dumps(result) if isinstance(result, dict) else None)
+    with Session(db_engine) as db:
+        finished = db.exec(update(Job).where(*ctx._owned()).values(**values)).rowcount
+        db.commit()
+    if not finished:
+        logger.warning("job %s: lease lost before it finished; %s outcome discarded", job.id, status)
+        return "lost"
+    for key, value in values.items():
+        setattr(job, key, value)
+    _publish(job)
+    return status
+
+
+def work(
+    db_engine,
+    worker_id: Optional[str] = None,
+    *,
+    job_kinds: Optional[list[str]] = None,
+    stop: Optional[threading.Event] = None,
+    wake: Optional[threading.Event] = None,
+    poll_seconds: float = POLL_SECONDS,
+    max_jobs: Optional[int] = None,
+) -> int:
+    """Lease-and-run loop until `stop` is set (or `max_jobs` ran). Setting
+    `wake` makes an idle loop poll right away. Returns how many jobs ran."""
+    worker_id = worker_id or new_worker_id()
+    stop = stop or threading.Event()
+    ran = 0
+    while not stop.is_set():
+        try:
+            reclaim_expired(db_engine)
+            job = lease(db_engine, worker_id, job_kinds)
+        except Exception:
+            # DB locked / not migrated yet: keep the worker alive and retry.
+            logger.exception("job worker %s: poll failed", worker_id)
+            job = None
+        if job is None:
+            if wake is not None:
+                wake.wait(poll_seconds)
+                wake.clear()
+            else:
+                stop.wait(poll_seconds)
+            continue
+        run(db_engine, job, worker_id)
+        ran += 1
+        if max_jobs is not None and ran >= max_jobs:
+            break
+    return ran
+
+
+# ── In-process runner (CHATSIGHT_JOB_RUNNER=inline) ──────────────────────────
+
+_inline_threads: list[threading.Thread] = []
+_inline_engine = None
+_inline_stop = threading.Event()
+_inline_wake = threading.Event()
+_inline_lock = threading.Lock()
+
+
+def kick(db_engine) -> None:
+    """Make sure INLINE_THREADS in-process workers are polling `db_engine`,
+    and wake them so a just-enqueued job starts without waiting a poll."""
+    global _inline_engine, _inline_stop
+    with _inline_lock:
+        if _inline_engine is not db_engine:
+            _inline_stop.set()
+            _inline_wake.set()
+            _inline_threads.clear()
+            _inline_engine, _inline_stop = db_engine, threading.Event()
+        _inline_threads[:] = [t for t in _inline_threads if t.is_alive()]
+        while len(_inline_threads) < INLINE_THREADS:
+            t = threading.Thread(
+                target=work, args=(db_engine,),
+                kwargs={"stop": _inline_stop, "wake": _inline_wake},
+                name=f"job-runner-{len(_inline_threads)}", daemon=True,
+            )
+            t.start()
+            _inline_threads.append(t)
+    _inline_wake.set()
+
+
+def stop_inline(timeout: float = 5.0) -> None:
+    global _inline_engine
+    with _inline_lock:
+        _inline_engine = None
+        _inline_stop.set()
+        _inline_wake.set()
+        threads = list(_inline_threads)
+        _inline_threads.clear()
+    for t in threads:
+        t.join(timeout)
+
+
+def has_pending(db_engine) -> bool:
+    with Session(db_engine) as db:
+        return bool(db.exec(select(func.count(Job.id)).where(Job.status.in_(ACTIVE))).one())
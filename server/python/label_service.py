@@ -1,50 +1,59 @@
-import os
-from google import genai
-from google.genai import types
+import functools
 from typing import List, Dict, Any
 
-client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
-
-TOOL = types.Tool(function_declarations=[
-    types.FunctionDeclaration(
-        name="generate_labels",
-        description="Generate structured labels for a student-AI chatlog",
-        parameters={
-            "type": "object",
-            "properties": {
-                "inferred_context": {"type": "string"},
-                "labels": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "message_index": {"type": "integer"},
-                            "label": {"type": "string"},
-                            "evidence": {"type": "string"},
-                            "rationale": {"type": "string"},
-                        },
-                        "required": ["message_index", "label", "evidence", "rationale"],
+import gemini_gateway
+
+
+GENERATE_FUNCTION_DECLARATION = dict(
+    name="generate_labels",
+    description="Generate structured labels for a student-AI chatlog",
+    parameters={
+        "type": "object",
+        "properties": {
+            "inferred_context": {"type": "string"},
+            "labels": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "message_index": {"type": "integer"},
+                        "label": {"type": "string"},
+                        "evidence": {"type": "string"},
+                        "rationale": {"type": "string"},
                     },
+                    "required": ["message_index", "label", "evidence", "rationale"],
                 },
             },
-            "required": ["inferred_context", "labels"],
         },
-    )
-])
-
-GENERATE_CONFIG = types.GenerateContentConfig(
-    system_instruction="You are an education researcher analyzing student-AI chatlogs. Your goal is to identify pedagogically meaningful patterns in how students interact with AI tutoring systems. Be precise, evidence-based, and consistent.",
-    temperature=0,
-    tools=[TOOL],
-    tool_config=types.ToolConfig(
-        function_calling_config=types.FunctionCallingConfig(
-            mode="ANY",
-            allowed_function_names=["generate_labels"],
-        )
-    ),
+        "required": ["inferred_context", "labels"],
+    },
 )
 
 
+@functools.cache
+def _tool():
+    from google.genai import types
+    return types.Tool(function_declarations=[
+        types.FunctionDeclaration(**GENERATE_FUNCTION_DECLARATION)
+    ])
+
+
+@functools.cache
+def _generate_config():
+    from google.genai import types
+    return types.GenerateContentConfig(
+        system_instruction="You are an education researcher analyzing student-AI chatlogs. Your goal is to identify pedagogically meaningful patterns in how students interact with AI tutoring systems. Be precise, evidence-based, and consistent.",
+        temperature=0,
+        tools=[_tool()],
+        tool_config=types.ToolConfig(
+            function_calling_config=types.FunctionCallingConfig(
+                mode="ANY",
+                allowed_function_names=["generate_labels"],
+            )
+        ),
+    )
+
+
 def generate_labels(content: str, steering_notes: str = "") -> List[Dict[str, Any]]:
     steering_block = f"\n## Steering Instructions\n{steering_notes}" if steering_notes else "\nUse your best judgment to identify key learning behaviors."
 
@@ -63,10 +72,11 @@ For each student-AI interaction turn, identify:
 
 Call the `generate_labels` tool with a JSON array of label objects. Label every meaningful interaction turn (typically every 1-3 message pairs)."""
 
-    response = client.models.generate_content(
+    response = gemini_gateway.generate_content(
         model="gemini-2.5-flash",
         contents=user_message,
-        config=GENERATE_CONFIG,
+        config=_generate_config(),
+        call_site="label.generate",
     )
 
     for part in response.candidates[0].content.parts:
@@ -0,0 +1,259 @@
+"""Local lexical engine for explore: a TF-IDF matrix over student messages
+(scikit-learn TfidfVectorizer, L2-normalized rows) held as a scipy CSR matrix.
+It answers exact max-similarity rarity for any cached message and keyword
+themes per message and per conversation without embeddings or Gemini, so the
+explore scorer falls back to it when a message has no embedding or a
+conversation has no ConversationProfile.
+
+One index per engine, keyed by the message_text version (shared_state), which
+only moves when a message's text is inserted or changed; assignment and
+notebook writes to MessageCache leave it alone. Fitting happens in
+`ensure_index`, called by startup ingest after each sync and by the
+lexical_index job. Queries never fit: they read the current index, else the
+previous one until the rebuild lands (None before the first build), and
+`is_current` tells /next when to queue that job. For file-backed databases
+the matrix is also saved to CHATSIGHT_LEXICAL_DIR (default database/lexical/
+at the repo root), so a restart, or another process, loads it instead of
+refitting."""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import weakref
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+from sqlmodel import Session, select
+
+import shared_state
+from models import MessageCache
+
+# sklearn and scipy are imported where they're used, like concept_service:
+# only building, loading and querying the index need them.
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_VERSION = 1  # bump when the vectorizer settings change
+LEXICAL_DIR = Path(os.environ.get(
+    "CHATSIGHT_LEXICAL_DIR",
+    str(Path(__file__).resolve().parent.parent.parent / "database" / "lexical"),
+))
+KEYWORDS_PER_THEME = 3
+
+_lock = threading.Lock()  # held while building or loading
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _vectorizer():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(
+        lowercase=True,
+        stop_words="english",
+        token_pattern=r"(?u)\b[a-zA-Z_][a-zA-Z0-9_]+\b",
+        sublinear_tf=True,
+        dtype=np.float32,
+    )
+
+
+def _conversation_matrix(keys: list[tuple[int, int]], matrix) -> tuple[np.ndarray, Any]:
+    """(chatlog_ids, L2-normalized sum of each conversation's message rows)."""
+    from scipy import sparse
+    from sklearn.preprocessing import normalize
+
+    cids = np.array([cid for cid, _midx in keys], dtype=np.int64)
+    conv_ids, member = np.unique(cids, return_inverse=True)
+    indicator = sparse.csr_matrix(
+        (np.ones(len(keys), dtype=np.float32), (member, np.arange(len(keys)))),
+        shape=(len(conv_ids), len(keys)),
+    )
+    return conv_ids, normalize(indicator @ matrix).tocsr()
+
+
+def _assemble(keys: list[tuple[int, int]], matrix, terms: np.ndarray, fingerprint: dict) -> dict:
+    conv_ids, conversations = _conversation_matrix(keys, matrix) if keys else (np.zeros(0, np.int64), None)
+    return {
+        "fingerprint": fingerprint,
+        "keys_idx": {k: i for i, k in enumerate(keys)},
+        "matrix": matrix,
+        "terms": terms,
+        "conv_idx": {int(cid): i for i, cid in enumerate(conv_ids)},
+        "conversations": conversations,
+        "rarity": {},
+    }
+
+
+def _fingerprint(session: Session) -> dict:
+    bind = session.get_bind()
+    return {
+        "db": bind.url.render_as_string(hide_password=True),
+        "message_text": shared_state.version(session, shared_state.MESSAGE_TEXT),
+        "lexical_version": LEXICAL_VERSION,
+    }
+
+
+def _persistent(session: Session) -> bool:
+    url = session.get_bind().url
+    return not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"))
+
+
+def build_index(session: Session, fingerprint: Optional[dict] = None) -> dict:
+    """Fit TF-IDF over every cached student message."""
+    fingerprint = fingerprint or _fingerprint(session)
+    rows = session.exec(
+        select(MessageCache.chatlog_id, MessageCache.message_index, MessageCache.message_text)
+        .order_by(MessageCache.chatlog_id, MessageCache.message_index)
+    ).all()
+    keys = [(int(cid), int(midx)) for cid, midx, _text in rows]
+    if not keys:
+        return _assemble([], None, np.zeros(0, dtype=object), fingerprint)
+    vectorizer = _vectorizer()
+    try:
+        matrix = vectorizer.fit_transform([text or "" for _cid, _midx, text in rows]).tocsr()
+    except ValueError:  # no usable terms at all (empty or stop-word-only corpus)
+        return _assemble([], None, np.zeros(0, dtype=object), fingerprint)
+    return _assemble(keys, matrix, vectorizer.get_feature_names_out(), fingerprint)
+
+
+def _save(index: dict, directory: Path) -> None:
+    from scipy import sparse
+
+    directory.mkdir(parents=True, exist_ok=True)
+    keys = np.array(list(index["keys_idx"]), dtype=np.int64).reshape(-1, 2)
+    # Write under temporary names, then swap in: a reader never sees half an index.
+    sparse.save_npz(directory / "messages.tmp.npz", index["matrix"])
+    np.savez(directory / "meta.tmp.npz", keys=keys, terms=index["terms"].astype(str),
+             fingerprint=json.dumps(index["fingerprint"]))
+    os.replace(directory / "messages.tmp.npz", directory / "messages.npz")
+    os.replace(directory / "meta.tmp.npz", directory / "meta.npz")
+
+
+def _load(directory: Path, fingerprint: dict) -> Optional[dict]:
+    from scipy import sparse
+
+    try:
+        with np.load(directory / "meta.npz") as meta:
+            if json.loads(str(meta["fingerprint"])) != fingerprint:
+                return None
+            keys = [(int(c), int(m)) for c, m in meta["keys"]]
+            terms = meta["terms"]
+        matrix = sparse.load_npz(directory / "messages.npz").tocsr()
+    except (OSError, KeyError, ValueError):
+        return None
+    if matrix.shape[0] != len(keys):
+        return None
+    return _assemble(keys, matrix, terms, fingerprint)
+
+
+def ensure_index(session: Session) -> dict:
+    """The engine's index for the current message_text version: the one in
+    memory, else the saved one, else a fresh fit (saved when persistent).
+    Blocks for the whole fit, so only ingest and the lexical_index job call it."""
+    bind = session.get_bind()
+    fingerprint = _fingerprint(session)
+    with _lock:
+        index = _indexes.get(bind)
+        if index is not None and index["fingerprint"] == fingerprint:
+            return index
+        persistent = _persistent(session)
+        index = _load(LEXICAL_DIR, fingerprint) if persistent else None
+        if index is None:
+            index = build_index(session, fingerprint)
+            if persistent and index["matrix"] is not None:
+                try:
+                    _save(index, LEXICAL_DIR)
+                except OSError as exc:
+                    logger.warning("could not save lexical index to %s: %s", LEXICAL_DIR, exc)
+        _indexes[bind] = index
+        return index
+
+
+def _serving_index(session: Session) -> Optional[dict]:
+    """The index queries read, without ever fitting: the engine's index if it
+    is current, else the saved one if a rebuild in another process has caught
+    it up, else whatever the engine had before (None before the first build).
+    A build in progress is never waited on."""
+    bind = session.get_bind()
+    fingerprint = _fingerprint(session)
+    index = _indexes.get(bind)
+    if index is not None and index["fingerprint"] == fingerprint:
+        return index
+    if _persistent(session) and _lock.acquire(blocking=False):
+        try:
+            loaded = _load(LEXICAL_DIR, fingerprint)
+            if loaded is not None:
+                _indexes[bind] = index = loaded
+        finally:
+            _lock.release()
+    return index
+
+
+def is_current(session: Session) -> bool:
+    """Whether queries read an index of the current message text; False means
+    a rebuild (`ensure_index`) is due."""
+    index = _serving_index(session)
+    return index is not None and index["fingerprint"] == _fingerprint(session)
+
+
+def message_rarity(session: Session, chatlog_id: int, message_index: int) -> Optional[float]:
+    """1 − max TF-IDF cosine of this message to every other cached message
+    (exact), or None if the message has no indexed terms."""
+    index = _serving_index(session)
+    key = (chatlog_id, message_index)
+    row = None if index is None else index["keys_idx"].get(key)
+    if row is None:
+        return None
+    cached = index["rarity"].get(key)
+    if cached is not None:
+        return cached
+    matrix = index["matrix"]
+    focused = matrix[row]
+    if focused.nnz == 0:
+        return None
+    sims = (matrix @ focused.T).toarray().ravel()
+    sims[row] = 0.0
+    rarity = 1.0 - max(0.0, min(1.0, float(sims.max())))
+    index["rarity"][key] = rarity
+    return rarity
+
+
+def _top_terms(index: dict, row_vector, k: int) -> list[str]:
+    if row_vector.nnz == 0:
+        return []
+    order = np.argsort(-row_vector.data, kind="stable")[:k]
+    return [str(index["terms"][row_vector.indices[i]]) for i in order]
+
+
+def message_keywords(session: Session, chatlog_id: int, message_index: int,
+                     k: int = KEYWORDS_PER_THEME) -> list[str]:
+    """Highest-weighted TF-IDF terms of one message."""
+    index = _serving_index(session)
+    row = None if index is None else index["keys_idx"].get((chatlog_id, message_index))
+    return [] if row is None else _top_terms(index, index["matrix"][row], k)
+
+
+def conversation_keywords(session: Session, chatlog_id: int, k: int = KEYWORDS_PER_THEME) -> list[str]:
+    """Highest-weighted TF-IDF terms of a conversation's student messages."""
+    index = _serving_index(session)
+    row = None if index is None else index["conv_idx"].get(chatlog_id)
+    return [] if row is None else _top_terms(index, index["conversations"][row], k)
+
+
+def theme_novelty(session: Session, chatlog_id: int, labeled_chatlog_ids: set[int]) -> Optional[float]:
+    """Lexical stand-in for explore_service.theme_novelty: 1 − max TF-IDF
+    cosine of this conversation to the other labeled conversations."""
+    index = _serving_index(session)
+    if index is None:
+        return None
+    conv_idx = index["conv_idx"]
+    row = conv_idx.get(chatlog_id)
+    others = [conv_idx[c] for c in labeled_chatlog_ids if c != chatlog_id and c in conv_idx]
+    if row is None or not others:
+        return None
+    conversations = index["conversations"]
+    if conversations[row].nnz == 0:
+        return None
+    sims = (conversations[others] @ conversations[row].T).toarray().ravel()
+    return 1.0 - max(0.0, min(1.0, float(sims.max())))
@@ -0,0 +1,219 @@
+# server/python/llm_cache.py
+"""Record/replay cache for Gemini model calls.
+
+Developers and CI re-run discovery, summaries and classification over the
+same fixtures; this lets those runs skip the network. Every
+`generate_content` / `embed_content` that reaches the real client (an
+injected `gemini_gateway.backend` is already local and bypasses the cache) is
+keyed by a SHA-256 over a canonical JSON form of (method, model, contents,
+config — which carries the tool schema and system instruction), and stored in
+a local SQLite file.
+
+CHATSIGHT_LLM_CACHE selects the mode:
+
+- `passthrough` (default): no cache.
+- `record`: serve hits from the file; on a miss call Gemini and store the
+  response.
+- `replay`: serve hits only; a miss raises `LlmCacheMiss` instead of
+  touching the network (no API key needed).
+
+CHATSIGHT_LLM_CACHE_PATH picks the file (default database/llm_cache.db next
+to the app DB). Only successful responses are stored, reduced to the fields
+the services read (candidate parts, text, usage, embedding values) and
+rebuilt as plain objects of the same shape on replay.
+"""
+from __future__ import annotations
+
+import enum
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Optional
+
+MODES = ("passthrough", "record", "replay")
+MODE = os.environ.get("CHATSIGHT_LLM_CACHE", "passthrough").strip().lower()
+DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent / "database" / "llm_cache.db"
+PATH = Path(os.environ.get("CHATSIGHT_LLM_CACHE_PATH", str(DEFAULT_PATH)))
+if MODE not in MODES:
+    raise ValueError(f"CHATSIGHT_LLM_CACHE must be one of {MODES}, got {MODE!r}")
+KEY_VERSION = 1  # bump if canonical() changes, so old entries stop matching
+
+_conn: Optional[sqlite3.Connection] = None
+_conn_path: Optional[Path] = None
+_lock = threading.Lock()
+
+
+class LlmCacheMiss(RuntimeError):
+    """Replay-only mode and the request isn't in the cache."""
+
+
+def configure(mode: Optional[str] = None, path: Optional[os.PathLike] = None) -> None:
+    """Switch mode and/or file at runtime (tests, scripts)."""
+    global MODE, PATH
+    if mode is not None:
+        if mode not in MODES:
+            raise ValueError(f"CHATSIGHT_LLM_CACHE must be one of {MODES}, got {mode!r}")
+        MODE = mode
+    if path is not None:
+        PATH = Path(path)
+    close()
+
+
+def enabled() -> bool:
+    return MODE in ("record", "replay")
+
+
+def close() -> None:
+    global _conn, _conn_path
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = None
+        _conn_path = None
+
+
+def _db() -> sqlite3.Connection:
+    """Shared connection to PATH (callers hold _lock). Replay opens the file
+    read-only, so a checked-in cache is never touched."""
+    global _conn, _conn_path
+    if _conn is None or _conn_path != PATH:
+        if _conn is not None:
+            _conn.close()
+        if MODE == "replay":
+            if not PATH.exists():
+                raise LlmCacheMiss(f"no LLM cache at {PATH}; record one with CHATSIGHT_LLM_CACHE=record")
+            _conn = sqlite3.connect(f"file:{PATH}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            PATH.parent.mkdir(parents=True, exist_ok=True)
+            _conn = sqlite3.connect(str(PATH), check_same_thread=False, timeout=30)
+            _conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, method TEXT NOT NULL, model TEXT NOT NULL,"
+                " call_site TEXT, response TEXT NOT NULL, created_at TEXT NOT NULL)"
+            )
+            _conn.commit()
+        _conn_path = PATH
+    return _conn
+
+
+# ── Keys ─────────────────────────────────────────────────────────────────────
+
+def canonical(value: Any) -> Any:
+    """JSON-able, order-independent form of a request value: SDK (pydantic)
+    objects via model_dump, dict keys sorted by json.dumps, bytes hashed."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, enum.Enum):
+        return canonical(value.value)
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    if isinstance(value, (bytes, bytearray)):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if hasattr(value, "model_dump"):
+        return canonical(value.model_dump(mode="json", exclude_none=True))
+    if isinstance(value, SimpleNamespace):
+        return canonical(vars(value))
+    return str(value)
+
+
+def request_key(method: str, model: str, kwargs: dict) -> str:
+    payload = {"v": KEY_VERSION, "method": method, "model": model,
+               "request": canonical(kwargs)}
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# ── Response (de)serialization ───────────────────────────────────────────────
+
+def encode_response(method: str, response: Any) -> dict:
+    if method == "embed_content":
+        return {"embeddings": [list(e.values) for e in (response.embeddings or [])]}
+    candidates = []
+    for cand in getattr(response, "candidates", None) or []:
+        content = getattr(cand, "content", None)
+        parts = []
+        for part in (getattr(content, "parts", None) or []):
+            fc = getattr(part, "function_call", None)
+            parts.append({
+                "text": getattr(part, "text", None),
+                "function_call": {"name": fc.name, "args": canonical(dict(fc.args or {}))} if fc else None,
+            })
+        candidates.append({"parts": parts})
+    try:
+        text = response.text
+    except Exception:
+        text = None
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "candidates": candidates,
+        "text": text,
+        "usage": [getattr(usage, "prompt_token_count", None) or 0,
+                  getattr(usage, "candidates_token_count", None) or 0],
+    }
+
+
+def decode_response(method: str, data: dict) -> Any:
+    if method == "embed_content":
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=v) for v in data["embeddings"]])
+    candidates = []
+    for cand in data["candidates"]:
+        parts = [
+            SimpleNamespace(
+                text=p["text"],
+                function_call=SimpleNamespace(**p["function_call"]) if p["function_call"] else None,
+            )
+            for p in cand["parts"]
+        ]
+        candidates.append(SimpleNamespace(content=SimpleNamespace(parts=parts)))
+    prompt_tokens, output_tokens = data["usage"]
+    return SimpleNamespace(
+        candidates=candidates,
+        text=data["text"],
+        usage_metadata=SimpleNamespace(prompt_token_count=prompt_tokens,
+                                       candidates_token_count=output_tokens),
+    )
+
+
+# ── Lookup / store ───────────────────────────────────────────────────────────
+
+def lookup(method: str, model: str, kwargs: dict, call_site: str = "") -> Optional[Any]:
+    """Cached response, or None on a miss in record mode. Raises LlmCacheMiss
+    on a miss in replay mode."""
+    key = request_key(method, model, kwargs)
+    with _lock:
+        row = _db().execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+    if row is not None:
+        return decode_response(method, json.loads(row[0]))
+    if MODE == "replay":
+        raise LlmCacheMiss(
+            f"{call_site or method} ({model}) not in {PATH} [key {key[:12]}]; "
+            "re-run with CHATSIGHT_LLM_CACHE=record to capture it"
+        )
+    return None
+
+
+def store(method: str, model: str, kwargs: dict, response: Any, call_site: str = "") -> None:
+    if MODE != "record":
+        return
+    key = request_key(method, model, kwargs)
+    blob = json.dumps(encode_response(method, response), separators=(",", ":"))
+    with _lock:
+        db = _db()
+        db.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, method, model, call_site, response, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, method, model, call_site, blob, datetime.utcnow().isoformat()),
+        )
+        db.commit()
+
+
+def entry_count() -> int:
+    with _lock:
+        return _db().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
@@ -0,0 +1,214 @@
+# server/python/llm_ledger.py
+"""Gemini call ledger: persists one LlmCallLog row per model request and
+aggregates them into cost / throughput reports.
+
+The gateway notifies us synchronously on the calling thread, so `record` only
+appends to an in-memory buffer; a daemon thread flushes the buffer in a single
+multi-row INSERT every FLUSH_INTERVAL_SECONDS. Classification worker threads
+therefore never wait on SQLite for bookkeeping. The buffer is bounded: if the
+writer can't keep up (or the DB is locked for a long stretch) the oldest
+entries are dropped and counted rather than growing without limit. A flush
+that fails puts its rows back at the front of the buffer for the next one.
+"""
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import case, func, insert
+from sqlmodel import Session, select
+
+import gemini_gateway
+from models import LlmCallLog
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = float(os.environ.get("CHATSIGHT_LLM_LEDGER_FLUSH_SECONDS", "2"))
+MAX_BUFFERED = 10_000
+
+# USD per million tokens, (input, output). Override or extend with
+# CHATSIGHT_LLM_PRICING='{"gemini-2.5-flash": [0.3, 2.5]}'. Unknown models
+# cost 0 so a missing entry under-reports instead of failing the endpoint.
+MODEL_PRICING_PER_MTOK: dict[str, tuple[float, float]] = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-embedding-001": (0.15, 0.0),
+}
+MODEL_PRICING_PER_MTOK.update({
+    k: (float(v[0]), float(v[1]))
+    for k, v in json.loads(os.environ.get("CHATSIGHT_LLM_PRICING", "{}")).items()
+})
+
+_COLUMNS = ("call_site", "model", "input_tokens", "output_tokens", "latency_ms",
+            "retry_count", "outcome", "label_id", "job_id")
+
+_buffer: deque = deque()
+_buffer_lock = threading.Lock()
+_dropped = 0
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_engine = None
+
+
+def record(entry: dict) -> None:
+    """Gateway listener: queue one call for the next flush."""
+    global _dropped
+    row = {k: entry.get(k) for k in _COLUMNS}
+    row["created_at"] = datetime.utcnow()
+    with _buffer_lock:
+        if len(_buffer) >= MAX_BUFFERED:
+            _buffer.popleft()
+            _dropped += 1
+        _buffer.append(row)
+
+
+def pending() -> int:
+    return len(_buffer)
+
+
+def dropped() -> int:
+    return _dropped
+
+
+def flush(db_engine=None) -> int:
+    """Write everything buffered so far in one transaction. Returns rows written."""
+    with _buffer_lock:
+        rows = list(_buffer)
+        _buffer.clear()
+    if not rows:
+        return 0
+    if db_engine is None:
+        from database import engine as db_engine
+    try:
+        with Session(db_engine) as db:
+            db.execute(insert(LlmCallLog), rows)
+            db.commit()
+    except Exception:
+        _requeue(rows)
+        raise
+    return len(rows)
+
+
+def _requeue(rows: list[dict]) -> None:
+    """Put rows a failed flush took back at the front of the buffer, for the
+    next flush. Calls recorded since keep their place; anything past
+    MAX_BUFFERED is dropped (oldest first) and counted, as in `record`."""
+    global _dropped
+    with _buffer_lock:
+        _buffer.extendleft(reversed(rows))
+        while len(_buffer) > MAX_BUFFERED:
+            _buffer.popleft()
+            _dropped += 1
+
+
+def _run() -> None:
+    while not _stop.wait(FLUSH_INTERVAL_SECONDS):
+        try:
+            flush(_engine)
+        except Exception:
+            logger.exception("llm ledger flush failed")
+
+
+def start(db_engine=None) -> None:
+    """Begin recording gateway calls and flushing them in the background."""
+    global _thread, _engine
+    _engine = db_engine
+    gemini_gateway.add_listener(record)
+    if _thread is None or not _thread.is_alive():
+        _stop.clear()
+        _thread = threading.Thread(target=_run, name="llm-ledger", daemon=True)
+        _thread.start()
+
+
+def stop() -> None:
+    """Stop recording and write out whatever is still buffered."""
+    global _thread
+    gemini_gateway.remove_listener(record)
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=FLUSH_INTERVAL_SECONDS + 5)
+        _thread = None
+    try:
+        flush(_engine)
+    except Exception:
+        logger.exception("llm ledger final flush failed")
+
+
+def cost_usd(model: str, input_tokens: int, output_tokens: int) -> float:
+    price_in, price_out = MODEL_PRICING_PER_MTOK.get(model, (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+GROUP_COLUMNS = {
+    "label": LlmCallLog.label_id,
+    "job": LlmCallLog.job_id,
+    "day": func.date(LlmCallLog.created_at),
+    "call_site": LlmCallLog.call_site,
+}
+
+
+def usage(
+    db: Session,
+    group_by: str = "day",
+    since: Optional[datetime] = None,
+    label_id: Optional[int] = None,
+) -> list[dict[str, Any]]:
+    """Calls, tokens, latency, cost and throughput per `group_by` key, most
+    recently active first. Aggregated in SQL per (key, model) so cost can be
+    priced per model, then folded into one row per key."""
+    key_col = GROUP_COLUMNS[group_by]
+    stmt = (
+        select(
+            key_col.label("key"),
+            LlmCallLog.model,
+            func.count().label("calls"),
+            func.sum(case((LlmCallLog.retry_count > 0, 1), else_=0)).label("retries"),
+            func.sum(case((LlmCallLog.outcome != "ok", 1), else_=0)).label("errors"),
+            func.sum(case((LlmCallLog.outcome == "rate_limited", 1), else_=0)).label("rate_limited"),
+            func.sum(LlmCallLog.input_tokens).label("input_tokens"),
+            func.sum(LlmCallLog.output_tokens).label("output_tokens"),
+            func.sum(LlmCallLog.latency_ms).label("latency_ms"),
+            func.min(LlmCallLog.created_at).label("first_at"),
+            func.max(LlmCallLog.created_at).label("last_at"),
+        )
+        .group_by(key_col, LlmCallLog.model)
+    )
+    if since is not None:
+        stmt = stmt.where(LlmCallLog.created_at >= since)
+    if label_id is not None:
+        stmt = stmt.where(LlmCallLog.label_id == label_id)
+
+    out: dict[Any, dict[str, Any]] = {}
+    for r in db.exec(stmt).all():
+        row = out.setdefault(r.key, {
+            "key": None if r.key is None else str(r.key),
+            "calls": 0, "retries": 0, "errors": 0, "rate_limited": 0,
+            "input_tokens": 0, "output_tokens": 0, "latency_seconds": 0.0,
+            "cost_usd": 0.0, "first_at": r.first_at, "last_at": r.last_at,
+        })
+        row["calls"] += r.calls
+        row["retries"] += r.retries or 0
+        row["errors"] += r.errors or 0
+        row["rate_limited"] += r.rate_limited or 0
+        row["input_tokens"] += r.input_tokens or 0
+        row["output_tokens"] += r.output_tokens or 0
+        row["latency_seconds"] += (r.latency_ms or 0.0) / 1000.0
+        row["cost_usd"] += cost_usd(r.model, r.input_tokens or 0, r.output_tokens or 0)
+        row["first_at"] = min(row["first_at"], r.first_at)
+        row["last_at"] = max(row["last_at"], r.last_at)
+
+    rows = list(out.values())
+    for row in rows:
+        row["cost_usd"] = round(row["cost_usd"], 6)
+        row["latency_seconds"] = round(row["latency_seconds"], 3)
+        row["avg_latency_ms"] = round(row["latency_seconds"] * 1000.0 / row["calls"], 1)
+        # Wall-clock throughput over the span the group was active; a single
+        # call (zero span) falls back to its own latency.
+        span = (row["last_at"] - row["first_at"]).total_seconds() if row["first_at"] else 0.0
+        span = span if span > 0 else max(row["latency_seconds"], 1e-3)
+        row["calls_per_minute"] = round(row["calls"] * 60.0 / span, 2)
+        row["output_tokens_per_second"] = round(row["output_tokens"] / span, 2)
+    rows.sort(key=lambda r: (r["last_at"] or datetime.min), reverse=True)
+    return rows
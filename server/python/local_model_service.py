@@ -0,0 +1,152 @@
+"""Local multi-label pre-classifier for autolabel: one-vs-rest logistic
+regression over the stored message embeddings, trained on the human
+multi-label applications, one sigmoid-calibrated model per label
+(scikit-learn CalibratedClassifierCV around LogisticRegression).
+
+Each label also gets two cut-offs from out-of-fold probabilities: `apply_at`,
+above which held-out positives reach TARGET_PRECISION, and `reject_at`, below
+which held-out negatives do. A message is decided locally only when every
+active label's probability falls outside its (reject_at, apply_at) band; the
+rest go to Gemini. Labels with fewer than MIN_PER_CLASS embedded positive and
+negative examples have no model, so while any exists every message goes to
+Gemini.
+
+A message a human labeled is a positive for each label applied and a negative
+for every other label. Rows written from here carry applied_by='local-model'."""
+from __future__ import annotations
+
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlmodel import Session, select
+
+import assist_service
+from models import LabelApplication
+
+# sklearn is imported where it's used, like concept_service and probe_service.
+
+APPLIED_BY = "local-model"
+MIN_PER_CLASS = max(3, int(os.environ.get("CHATSIGHT_LOCAL_MODEL_MIN_PER_CLASS", "10")))
+TARGET_PRECISION = float(os.environ.get("CHATSIGHT_LOCAL_MODEL_PRECISION", "0.95"))
+MIN_SUPPORT = 10  # held-out examples beyond a cut-off
+FOLDS = 5
+
+
+def _classifier(n_min: int):
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.linear_model import LogisticRegression
+    return CalibratedClassifierCV(
+        LogisticRegression(max_iter=1000), method="sigmoid", cv=min(3, n_min),
+    )
+
+
+def _training_set(session: Session, label_ids: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    """(embeddings, n × labels 0/1 matrix) for every embedded message a human
+    applied at least one of `label_ids` to."""
+    rows = session.exec(
+        select(LabelApplication.chatlog_id, LabelApplication.message_index, LabelApplication.label_id)
+        .where(
+            LabelApplication.applied_by == "human",
+            LabelApplication.value.is_(None),
+            LabelApplication.label_id.in_(label_ids),
+        )
+    ).all()
+    matrix, keys_idx = assist_service.embedding_matrix(session)
+    applied: dict[tuple[int, int], set[int]] = {}
+    for cid, midx, label_id in rows:
+        if (cid, midx) in keys_idx:
+            applied.setdefault((cid, midx), set()).add(label_id)
+    if matrix is None or not applied:
+        return np.zeros((0, 0), dtype=np.float32), np.zeros((0, len(label_ids)), dtype=np.int64)
+    keys = sorted(applied)
+    y = np.array([[int(l in applied[k]) for l in label_ids] for k in keys], dtype=np.int64)
+    return matrix[[keys_idx[k] for k in keys]], y
+
+
+def _cut(probs: np.ndarray, correct: np.ndarray) -> Optional[float]:
+    """Lowest value of `probs` (already oriented so that higher means more
+    confident) whose tail at or above it is at least TARGET_PRECISION correct
+    with MIN_SUPPORT examples; None if there is none."""
+    order = np.argsort(-probs, kind="stable")
+    ranked = probs[order]
+    precision = np.cumsum(correct[order]) / np.arange(1, len(probs) + 1)
+    cuts = np.flatnonzero(np.r_[ranked[1:] != ranked[:-1], True])
+    good = [i for i in cuts if i + 1 >= MIN_SUPPORT and precision[i] >= TARGET_PRECISION]
+    return float(ranked[good[-1]]) if good else None
+
+
+def _fit_label(x: np.ndarray, y: np.ndarray) -> dict:
+    from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+    n_min = int(min(y.sum(), len(y) - y.sum()))
+    splits = min(FOLDS, n_min)
+    folds = StratifiedKFold(n_splits=splits, shuffle=True, random_state=0)
+    # The smallest training fold holds n_min − ⌈n_min / splits⌉ of the rarer class.
+    held_out = cross_val_predict(_classifier(n_min + (-n_min // splits)), x, y,
+                                 cv=folds, method="predict_proba")[:, 1]
+    apply_at = _cut(held_out, y == 1)
+    # The reject cut is taken below the apply band, so the two never overlap.
+    below = held_out < apply_at if apply_at is not None else np.ones(len(y), dtype=bool)
+    reject_at = _cut(1.0 - held_out[below], y[below] == 0) if below.any() else None
+    reject_at = None if reject_at is None else 1.0 - reject_at
+    return {
+        "model": _classifier(n_min).fit(x, y),
+        "apply_at": apply_at,
+        "reject_at": reject_at,
+        "positives": int(y.sum()),
+        "negatives": int(len(y) - y.sum()),
+    }
+
+
+def train(session: Session, label_ids: list[int]) -> dict:
+    """Fit one calibrated model per label with enough examples:
+    {"labels": {label_id: {model, apply_at, reject_at, positives, negatives}},
+    "untrained": [label_id, ...]}."""
+    x, y = _training_set(session, label_ids)
+    trained, untrained = {}, []
+    for j, label_id in enumerate(label_ids):
+        column = y[:, j]
+        if len(column) == 0 or min(column.sum(), len(column) - column.sum()) < MIN_PER_CLASS:
+            untrained.append(label_id)
+            continue
+        trained[label_id] = _fit_label(x, column)
+    return {"labels": trained, "untrained": untrained}
+
+
+def decide(session: Session, model: dict, keys: Iterable[tuple[int, int]],
+           min_confidence: float = 0.0) -> dict[tuple[int, int], list[tuple[int, float]]]:
+    """The messages every label is confidently decided for, each with the
+    (label_id, probability) pairs to apply — possibly none. Messages without
+    an embedding, or with any label in its uncertain band, are left out."""
+    if model["untrained"] or not model["labels"]:
+        return {}
+    matrix, keys_idx = assist_service.embedding_matrix(session)
+    known = [k for k in keys if k in keys_idx]
+    if not known:
+        return {}
+    x = matrix[[keys_idx[k] for k in known]]
+    confident = np.ones(len(known), dtype=bool)
+    applied = []
+    for label_id, fitted in model["labels"].items():
+        probs = fitted["model"].predict_proba(x)[:, 1]
+        apply_at, reject_at = fitted["apply_at"], fitted["reject_at"]
+        yes = probs >= max(apply_at, min_confidence) if apply_at is not None else np.zeros(len(known), bool)
+        no = probs <= reject_at if reject_at is not None else np.zeros(len(known), bool)
+        confident &= yes | no
+        applied.append((label_id, probs, yes))
+    return {
+        key: [(label_id, float(probs[i])) for label_id, probs, yes in applied if yes[i]]
+        for i, key in enumerate(known) if confident[i]
+    }
+
+
+def summary(model: dict) -> dict:
+    """Per-label training counts and cut-offs, for the autolabel job result."""
+    return {
+        "trained": {
+            str(label_id): {k: fitted[k] for k in ("positives", "negatives", "apply_at", "reject_at")}
+            for label_id, fitted in model["labels"].items()
+        },
+        "untrained": model["untrained"],
+    }
@@ -1,6 +1,7 @@
 from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List, Optional
+import contextvars
 import hashlib
 from collections import defaultdict
 from datetime import datetime, date, timedelta
@@ -15,20 +16,23 @@ import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from calendar import monthrange
-from fastapi import FastAPI, Depends, HTTPException, Query, Response, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import func, or_, text, update
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, insert, or_, text, update
 from sqlalchemy.engine import Connection
 
-from database import create_db_and_tables, get_session, ext_engine, engine
+from database import create_db_and_tables, get_session, ext_engine, engine, upsert_insert
 import json as json_mod
 import assist_service
+import readiness
 from models import (
     LabelDefinition,
     LabelApplication,
     LabelingSession,
     SkippedMessage,
     MessageCache,
+    MessageFeatures,
     ConceptCandidate,
     SuggestionCache,
     RecalibrationEvent,
@@ -36,6 +40,7 @@ from models import (
     LabelPrediction,
     ConversationProfile,
     LabelExploreGradebook,
+    Job,
 )
 from schemas import (
     CreateLabelRequest, DeleteLabelResponse, UpdateLabelRequest, ApplyLabelRequest,
@@ -63,32 +68,63 @@ from schemas import (
     ConversationTurn, MessageDetailResponse,
     FlipRequest, NoteRequest, FlagRequest, LabelUpdateRequest,
     GeminiPreviewResponse,
+    StartupReadyResponse,
+    LlmUsageResponse,
+    NearDuplicate,
+    NearDuplicatesResponse,
+    ProbeStatusResponse,
 )
 import decision_service
+import dedup_service
+import explore_service
 import onboarding_service
+import probe_service
 import queue_service
 import binary_autolabel_service
+import gemini_gateway
+import jobs
+import label_prefilter
+import lexical_service
+import llm_ledger
+import local_model_service
+import metrics
+import progress_events
 import assignment_service
+import shared_state
 import study_scope
+import write_queue
 from models import AssignmentMapping
 
 REVIEW_THRESHOLD = 0.75
 from sqlmodel import Session, delete, select
 
 
+INGEST_FETCH_BATCH = 5000
+
+
 def populate_message_cache():
     """Populate the local MessageCache from the external PostgreSQL events table.
-    Read-only on the external DB. Idempotent: skips if cache already populated."""
+    Read-only on the external DB. Idempotent: skips if cache already populated.
+
+    Rows are streamed from Postgres in INGEST_FETCH_BATCH chunks so progress
+    can be reported through `readiness`; they are written in one transaction
+    so a crash mid-ingest never leaves a partial cache that the next startup
+    would mistake for a complete one."""
     with Session(engine) as db:
         existing = db.exec(select(func.count(MessageCache.id))).one()
         if existing > 0:
             backfill_notebooks_if_missing(db)
             backfill_created_at_if_missing(db)
+            backfill_message_features_if_missing(db)
             return  # Cache already populated
 
+    readiness.set_phase("ingesting")
     try:
         with ext_engine.connect() as conn:
-            rows = conn.execute(text("""
+            readiness.set_total(conn.execute(text(
+                "SELECT COUNT(*) FROM events WHERE event_type = 'tutor_query'"
+            )).scalar())
+            result = conn.execution_options(stream_results=True).execute(text("""
                 WITH student AS (
                     SELECT id,
                            created_at,
@@ -119,22 +155,35 @@ def populate_message_cache():
                      ORDER BY e3.id ASC LIMIT 1) AS context_after
                 FROM student s
                 JOIN chatlog_ids ci ON s.conv_id = ci.conv_id
-            """)).mappings().all()
+            """)).mappings()
+            rows = []
+            for batch in result.partitions(INGEST_FETCH_BATCH):
+                rows.extend(
+                    {
+                        "chatlog_id": r["chatlog_id"],
+                        "message_index": r["message_index"],
+                        "message_text": r["message_text"],
+                        "notebook": r["notebook"],
+                        "created_at": r["created_at"],
+                        "context_before": r["context_before"],
+                        "context_after": r["context_after"],
+                    }
+                    for r in batch
+                )
+                readiness.advance(len(batch))
 
         with Session(engine) as db:
-            for r in rows:
-                db.add(MessageCache(
-                    chatlog_id=r["chatlog_id"],
-                    message_index=r["message_index"],
-                    message_text=r["message_text"],
-                    notebook=r["notebook"],
-                    created_at=r["created_at"],
-                    context_before=r["context_before"],
-                    context_after=r["context_after"],
-                ))
+            for i in range(0, len(rows), INGEST_FETCH_BATCH):
+                db.execute(insert(MessageCache), rows[i:i + INGEST_FETCH_BATCH])
+            explore_service.store_message_features(db, [
+                explore_service.compute_message_features(r["chatlog_id"], r["message_index"], r["message_text"])
+                for r in rows
+            ])
+            shared_state.bump(db, "message_cache", shared_state.MESSAGE_TEXT)
             db.commit()
     except Exception as e:
         print(f"Warning: could not populate message cache: {e}")
+        readiness.warn(f"could not populate message cache: {e}")
 
 
 def backfill_created_at_if_missing(db: Session):
@@ -146,6 +195,7 @@ def backfill_created_at_if_missing(db: Session):
     ).one()
     if missing_count == 0:
         return
+    readiness.set_phase("backfilling", total=missing_count)
 
     missing_pairs = db.exec(
         select(MessageCache.chatlog_id, MessageCache.message_index)
@@ -196,6 +246,7 @@ def backfill_created_at_if_missing(db: Session):
             mc.created_at = ts
             db.add(mc)
             updated += 1
+        readiness.advance(1)
     if updated:
         db.commit()
         print(f"Backfilled created_at for {updated} cache rows.")
@@ -209,6 +260,7 @@ def backfill_notebooks_if_missing(db: Session):
     ).one()
     if missing_count == 0:
         return
+    readiness.set_phase("backfilling", total=missing_count)
 
     chatlog_ids = db.exec(
         select(MessageCache.chatlog_id).distinct().where(MessageCache.notebook == None)  # noqa: E711
@@ -244,16 +296,73 @@ def backfill_notebooks_if_missing(db: Session):
             mc.notebook = nb
             db.add(mc)
             updated += 1
+        readiness.advance(1)
     db.commit()
     if updated:
         print(f"Backfilled notebook for {updated} cache rows.")
 
 
+def backfill_message_features_if_missing(db: Session):
+    """Compute MessageFeatures for cached messages that have none (a cache
+    ingested before the table existed) or were computed by an older
+    FEATURES_VERSION. Commits per INGEST_FETCH_BATCH rows, so an interrupted
+    run resumes where it stopped."""
+    stale = (
+        select(MessageCache.chatlog_id, MessageCache.message_index, MessageCache.message_text)
+        .outerjoin(
+            MessageFeatures,
+            (MessageFeatures.chatlog_id == MessageCache.chatlog_id)
+            & (MessageFeatures.message_index == MessageCache.message_index),
+        )
+        .where(or_(
+            MessageFeatures.chatlog_id == None,  # noqa: E711
+            MessageFeatures.features_version != explore_service.FEATURES_VERSION,
+        ))
+        .limit(INGEST_FETCH_BATCH)
+    )
+    total = 0
+    while rows := db.exec(stale).all():
+        explore_service.store_message_features(
+            db, [explore_service.compute_message_features(cid, midx, text) for cid, midx, text in rows]
+        )
+        db.commit()
+        total += len(rows)
+    if total:
+        print(f"Backfilled message features for {total} cache rows.")
+
+
+def run_startup_ingest():
+    """Background half of startup: fill/backfill MessageCache, then flip
+    readiness so gated routes start serving. Never raises — a failure here
+    must not leave the server stuck returning 503 forever."""
+    try:
+        populate_message_cache()
+        with Session(engine) as db:
+            lexical_service.ensure_index(db)
+            dedup_service.ensure_index(db)
+    except Exception as e:
+        logger.exception("startup ingest failed")
+        readiness.warn(f"startup ingest failed: {e}")
+    finally:
+        readiness.mark_ready()
+        print(f"Startup ingest finished in {readiness.snapshot()['elapsed_seconds']}s.")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
-    populate_message_cache()
+    readiness.reset()
+    llm_ledger.start(engine)  # the engine get_session binds, not a fallback
+    threading.Thread(target=run_startup_ingest, name="startup-ingest", daemon=True).start()
+    if jobs.RUNNER == "inline" and jobs.has_pending(engine):
+        # Resume whatever the previous process left queued or half-run.
+        jobs.kick(engine)
     yield
+    jobs.stop_inline()
+    explore_service.stop_warm_pool()
+    write_queue.stop()
+    probe_service.stop()
+    llm_ledger.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -267,11 +376,164 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so latency covers CORS handling too.
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+metrics.instrument_engine(ext_engine)
 
 from analysis_single_label import router as single_label_analysis_router
 from analysis_multi_label import router as multi_label_analysis_router
-app.include_router(single_label_analysis_router)
-app.include_router(multi_label_analysis_router)
+app.include_router(single_label_analysis_router, dependencies=[Depends(readiness.require_ready)])
+app.include_router(multi_label_analysis_router, dependencies=[Depends(readiness.require_ready)])
+
+
+@app.get("/api/health")
+def health():
+    """Liveness: the process is up. Never touches the database."""
+    return {"status": "ok"}
+
+
+@app.get("/api/ready", response_model=StartupReadyResponse)
+def ready(response: Response):
+    """Startup progress. 200 once the message cache is ready, 503 (with the
+    same body and a Retry-After header) while ingest/backfills are running."""
+    snap = readiness.snapshot()
+    if not snap["ready"]:
+        response.status_code = 503
+        response.headers["Retry-After"] = str(readiness.RETRY_AFTER_SECONDS)
+    return snap
+
+
+metrics.register_gauge(
+    "chatsight_write_queue_depth", "Writes waiting for the DB writer thread.",
+    lambda: [({"priority": p}, write_queue.depth(p)) for p in write_queue.PRIORITIES],
+)
+metrics.register_gauge(
+    "chatsight_write_groups_total", "Group commits by the DB writer thread.",
+    lambda: write_queue.stats()["groups"], kind="counter",
+)
+metrics.register_gauge(
+    "chatsight_write_group_writes_total", "Writes committed by the DB writer thread.",
+    lambda: write_queue.stats()["writes"], kind="counter",
+)
+metrics.register_gauge(
+    "chatsight_explore_warm_queue_depth", "Explore warm-ups (profiles, gradebooks) waiting for a worker.",
+    explore_service.warm_queue_depth,
+)
+metrics.register_gauge(
+    "chatsight_explore_warm_tasks_total", "Explore warm-up requests by outcome.",
+    lambda: [({"outcome": k}, v) for k, v in explore_service.warm_stats().items()
+             if k in ("enqueued", "deduped", "dropped_stale", "completed", "failed")],
+    kind="counter",
+)
+metrics.register_gauge(
+    "chatsight_explore_picks_total", "Explore picks, by whether the winner's profile was already warm.",
+    lambda: [({"warm": "true"}, (st := explore_service.warm_stats())["warm_picks"]),
+             ({"warm": "false"}, st["picks"] - st["warm_picks"])],
+    kind="counter",
+)
+metrics.register_gauge(
+    "chatsight_explore_warm_hit_ratio", "Share of explore picks whose profile was already warm.",
+    lambda: (st := explore_service.warm_stats())["warm_picks"] / st["picks"] if st["picks"] else None,
+)
+metrics.register_gauge(
+    "chatsight_sse_subscribers", "Open progress event streams.",
+    lambda: progress_events.hub.subscriber_count(),
+)
+metrics.register_gauge(
+    "chatsight_cache_entries", "Entries held by in-process caches.",
+    lambda: [
+        ({"cache": "queue_thread"}, len(queue_service._thread_cache)),
+        ({"cache": "study_scope"}, len(study_scope._scope_cache)),
+        ({"cache": "assist_matrix_rows"}, assist_service.cached_rows(engine)),
+        ({"cache": "llm_ledger_buffer"}, llm_ledger.pending()),
+    ],
+)
+for _field, _kind, _help in (
+    ("calls", "counter", "Gemini requests by call site and model."),
+    ("errors", "counter", "Failed Gemini requests by call site and model."),
+    ("retries", "counter", "Gemini retries scheduled by call site."),
+    ("input_tokens", "counter", "Gemini prompt tokens by call site and model."),
+    ("output_tokens", "counter", "Gemini output tokens by call site and model."),
+    ("latency_seconds_total", "counter", "Seconds spent waiting on Gemini by call site and model."),
+    ("cache_hits", "counter", "Gemini requests answered by the record/replay cache."),
+):
+    metrics.register_gauge(
+        f"chatsight_gemini_{_field}" + ("" if _field.endswith("_total") else "_total"),
+        _help,
+        lambda field=_field: [
+            ({"call_site": s["call_site"], "model": s["model"]}, s.get(field, 0))
+            for s in gemini_gateway.metrics_snapshot()
+        ],
+        kind=_kind,
+    )
+
+
+@app.get("/api/metrics")
+def prometheus_metrics(db: Session = Depends(get_session)):
+    """Prometheus scrape endpoint (text exposition format)."""
+    classifying = db.exec(
+        select(LabelDefinition.id, LabelDefinition.classified_count, LabelDefinition.classification_total)
+        .where(LabelDefinition.phase == "classifying")
+    ).all()
+    # Job state lives in the job table (workers may be other processes).
+    latest_jobs = {kind: jobs.latest(db, kind) for kind in jobs.kinds()}
+    depth = jobs.counts(db)
+    ingest = readiness.snapshot()
+    extra = {
+        "chatsight_job_running": (
+            "1 while a background job is running.",
+            [({"job": kind}, bool(j and j.status == "running")) for kind, j in latest_jobs.items()]
+            + [({"job": "startup_ingest"}, not ingest["ready"])],
+        ),
+        "chatsight_job_processed": (
+            "Items processed by the current/last background job.",
+            [({"job": kind}, j.processed if j else 0) for kind, j in latest_jobs.items()]
+            + [({"job": "startup_ingest"}, ingest["rows_processed"])],
+        ),
+        "chatsight_job_total": (
+            "Items the current/last background job will process.",
+            [({"job": kind}, j.total if j else 0) for kind, j in latest_jobs.items()]
+            + [({"job": "startup_ingest"}, ingest["rows_total"] or 0)],
+        ),
+        "chatsight_jobs": (
+            "Queued / running rows in the job table.",
+            [({"job": kind, "status": status}, depth.get((kind, status), 0))
+             for kind in jobs.kinds() for status in jobs.ACTIVE],
+        ),
+        "chatsight_classification_processed": (
+            "Messages classified so far for labels that are being handed off.",
+            [({"label_id": lid}, done or 0) for lid, done, _total in classifying],
+        ),
+        "chatsight_classification_total": (
+            "Messages to classify for labels that are being handed off.",
+            [({"label_id": lid}, total or 0) for lid, _done, total in classifying],
+        ),
+    }
+    return Response(content=metrics.render(extra), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/llm-usage", response_model=LlmUsageResponse)
+def llm_usage(
+    group_by: Literal["label", "job", "day", "call_site"] = "day",
+    days: Optional[int] = Query(None, ge=1),
+    label_id: Optional[int] = None,
+    db: Session = Depends(get_session),
+):
+    """Gemini calls, tokens, latency and estimated cost from the call ledger,
+    aggregated per label, job (handoff/autolabel/discover/warm-up run) or day.
+    Flushes the ledger's in-memory buffer first so the numbers are current."""
+    llm_ledger.flush(db.get_bind())
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+    rows = llm_ledger.usage(db, group_by=group_by, since=since, label_id=label_id)
+    return LlmUsageResponse(
+        group_by=group_by,
+        rows=rows,
+        total_calls=sum(r["calls"] for r in rows),
+        total_cost_usd=round(sum(r["cost_usd"] for r in rows), 6),
+        pending_writes=llm_ledger.pending(),
+        dropped_writes=llm_ledger.dropped(),
+    )
 
 
 from pathlib import Path
@@ -433,7 +695,7 @@ def get_chatlog(
     )
 
 
-@app.get("/api/chatlogs/{chatlog_id}/messages")
+@app.get("/api/chatlogs/{chatlog_id}/messages", dependencies=[Depends(readiness.require_ready)])
 def get_chatlog_messages(
     chatlog_id: int,
     db: Session = Depends(get_session),
@@ -497,6 +759,39 @@ def get_chatlog_messages(
     return messages
 
 
+@app.get("/api/chatlogs/{chatlog_id}/messages/{message_index}/near-duplicates",
+         response_model=NearDuplicatesResponse, dependencies=[Depends(readiness.require_ready)])
+def get_near_duplicates(
+    chatlog_id: int,
+    message_index: int,
+    limit: int = Query(dedup_service.NEAR_DUPLICATE_LIMIT, ge=1, le=200),
+    db: Session = Depends(get_session),
+):
+    """Other student messages that are near-copies of this one (MinHash LSH),
+    with the size of its duplicate cluster."""
+    if db.exec(select(MessageCache.id).where(
+        MessageCache.chatlog_id == chatlog_id, MessageCache.message_index == message_index,
+    )).first() is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    cluster = dedup_service.duplicate_cluster(db, chatlog_id, message_index)
+    matches = dedup_service.near_duplicates(db, chatlog_id, message_index, limit=limit)
+    # chatlog_id IN (...) rides the index; a row-value IN is a full scan on SQLite.
+    texts = {
+        (cid, midx): text for cid, midx, text in db.exec(
+            select(MessageCache.chatlog_id, MessageCache.message_index, MessageCache.message_text)
+            .where(MessageCache.chatlog_id.in_({m["chatlog_id"] for m in matches}))
+        ).all()
+    } if matches else {}
+    return NearDuplicatesResponse(
+        cluster_id=cluster["cluster_id"] if cluster else None,
+        cluster_size=cluster["cluster_size"] if cluster else 1,
+        near_duplicates=[
+            NearDuplicate(**m, message_text=texts.get((m["chatlog_id"], m["message_index"])) or "")
+            for m in matches
+        ],
+    )
+
+
 # ── Label routes ──────────────────────────────────────────────────────────────
 
 
@@ -755,26 +1050,24 @@ def get_session_state(db: Session = Depends(get_session)):
 def apply_label(req: ApplyLabelRequest, db: Session = Depends(get_session)):
     _assert_multi_write(db, req.label_id)
 
-    # Idempotent: don't create duplicate
-    existing = db.exec(
-        select(LabelApplication).where(
-            LabelApplication.label_id == req.label_id,
-            LabelApplication.chatlog_id == req.chatlog_id,
-            LabelApplication.message_index == req.message_index,
-            _is_multi_application(),
-        )
-    ).first()
-    if existing:
-        return {"ok": True, "already_applied": True}
+    def apply(w: Session) -> bool:
+        # Idempotent: one INSERT ... ON CONFLICT DO NOTHING; no row back means
+        # the application already existed.
+        inserted = w.execute(
+            upsert_insert(w)(LabelApplication)
+            .values(
+                label_id=req.label_id,
+                chatlog_id=req.chatlog_id,
+                message_index=req.message_index,
+                applied_by="human",
+            )
+            .on_conflict_do_nothing(index_elements=["label_id", "chatlog_id", "message_index"])
+            .returning(LabelApplication.id)
+        ).first()
+        return inserted is not None
 
-    application = LabelApplication(
-        label_id=req.label_id,
-        chatlog_id=req.chatlog_id,
-        message_index=req.message_index,
-        applied_by="human",
-    )
-    db.add(application)
-    db.commit()
+    if not write_queue.write(db, apply, priority=write_queue.INTERACTIVE):
+        return {"ok": True, "already_applied": True}
     return {"ok": True}
 
 
@@ -935,7 +1228,8 @@ def get_label_messages(label_id: int, db: Session = Depends(get_session)):
 
 
 @app.get(
-    "/api/labels/{label_id}/examples", response_model=List[LabelExampleResponse]
+    "/api/labels/{label_id}/examples", response_model=List[LabelExampleResponse],
+    dependencies=[Depends(readiness.require_ready)],
 )
 def get_label_examples(label_id: int, limit: int = 50, db: Session = Depends(get_session)):
     label = db.get(LabelDefinition, label_id)
@@ -993,7 +1287,7 @@ def unskip_message(chatlog_id: int, message_index: int, db: Session = Depends(ge
     return {"ok": True}
 
 
-@app.get("/api/queue/skipped", response_model=List[QueueItemResponse])
+@app.get("/api/queue/skipped", response_model=List[QueueItemResponse], dependencies=[Depends(readiness.require_ready)])
 def get_skipped_queue(db: Session = Depends(get_session)):
     skipped_rows = db.exec(
         select(SkippedMessage).order_by(SkippedMessage.created_at.asc())
@@ -1020,7 +1314,7 @@ def get_skipped_queue(db: Session = Depends(get_session)):
 
 # ── Queue fetch route ─────────────────────────────────────────────────────────
 
-@app.get("/api/queue", response_model=List[QueueItemResponse])
+@app.get("/api/queue", response_model=List[QueueItemResponse], dependencies=[Depends(readiness.require_ready)])
 def get_queue(limit: int = 20, seed: Optional[int] = None, db: Session = Depends(get_session)):
     # Only exclude messages that have a real multi-label application on a non-archived
     # label. Single-label /run decisions (value="yes"/"no"/"skip") share the table but
@@ -1068,7 +1362,7 @@ def get_queue(limit: int = 20, seed: Optional[int] = None, db: Session = Depends
     return queue
 
 
-@app.get("/api/queue/stats")
+@app.get("/api/queue/stats", dependencies=[Depends(readiness.require_ready)])
 def get_queue_stats(db: Session = Depends(get_session)):
     in_scope = study_scope.in_scope_keys(db, study_scope.QUEUE_SCOPE)
     labeled_pairs = db.exec(
@@ -1090,7 +1384,7 @@ def get_queue_stats(db: Session = Depends(get_session)):
     }
 
 
-@app.get("/api/queue/position")
+@app.get("/api/queue/position", dependencies=[Depends(readiness.require_ready)])
 def get_queue_position(db: Session = Depends(get_session)):
     in_scope = study_scope.in_scope_keys(db, study_scope.QUEUE_SCOPE)
     labeled_pairs = db.exec(
@@ -1111,7 +1405,7 @@ def get_queue_position(db: Session = Depends(get_session)):
     return {"position": position, "total_remaining": total_remaining}
 
 
-@app.get("/api/queue/message")
+@app.get("/api/queue/message", dependencies=[Depends(readiness.require_ready)])
 def get_queue_message(chatlog_id: int, message_index: int, db: Session = Depends(get_session)):
     cached = db.exec(
         select(MessageCache).where(
@@ -1132,7 +1426,7 @@ def get_queue_message(chatlog_id: int, message_index: int, db: Session = Depends
     }
 
 
-@app.get("/api/queue/history")
+@app.get("/api/queue/history", dependencies=[Depends(readiness.require_ready)])
 def get_queue_history(
     limit: int = 20,
     offset: int = 0,
@@ -1182,7 +1476,7 @@ def get_queue_history(
     if filter == "human":
         all_entries = [e for e in all_entries if e["applied_by"] == "human"]
     elif filter == "ai":
-        all_entries = [e for e in all_entries if e["applied_by"] == "ai"]
+        all_entries = [e for e in all_entries if e["applied_by"] in MACHINE_APPLIED_BY]
     elif filter == "skipped":
         all_entries = [e for e in all_entries if e["status"] == "skipped"]
 
@@ -1264,13 +1558,102 @@ def get_queue_history(
     return {"items": result, "total": total}
 
 
+# ── Background jobs ──────────────────────────────────────────────────────────
+
+def _start_job(db: Session, kind: str, payload: Optional[dict] = None, **options: Any):
+    """Enqueue a job; in inline mode, wake the in-process runner so it starts
+    now. With CHATSIGHT_JOB_RUNNER=worker, `python -m worker` picks it up."""
+    job = jobs.enqueue(db, kind, payload, **options)
+    if jobs.RUNNER == "inline":
+        jobs.kick(engine)
+    return job
+
+
+def _register_job(kind: str, fn) -> None:
+    """Register `fn(ctx, **payload)` as the handler for `kind`, with its Gemini
+    calls tagged by the job so /api/llm-usage can group them."""
+    def run(ctx: jobs.JobContext, **payload: Any) -> Any:
+        with gemini_gateway.call_context(job_id=f"{kind}-{ctx.job_id}"):
+            return fn(ctx, **payload)
+    jobs.register(kind, run)
+
+
+def _poll_progress(topics: set[str]) -> list[tuple[str, dict]]:
+    """progress_events watcher (worker mode): current snapshots of the
+    subscribed jobs / labels, whose publishers run in other processes."""
+    ids: dict[str, list[int]] = defaultdict(list)
+    for topic in topics:
+        kind, _, ident = topic.partition(":")
+        ids[kind].append(int(ident))
+    out = []
+    with Session(engine) as db:
+        if ids["job"]:
+            for job in db.exec(select(Job).where(Job.id.in_(ids["job"]))).all():
+                out.append((progress_events.topic("job", job.id), jobs.job_event(job)))
+        if ids["label"]:
+            for label in db.exec(select(LabelDefinition).where(LabelDefinition.id.in_(ids["label"]))).all():
+                out.append((progress_events.topic("label", label.id), _label_progress_event(label)))
+    return out
+
+
+def _event_stream(sub: progress_events.Subscription, first: dict) -> StreamingResponse:
+    if jobs.RUNNER == "worker":
+        progress_events.ensure_watcher(_poll_progress)
+    return StreamingResponse(
+        progress_events.stream(sub, first),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_session)):
+    job = db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.job_event(job)
+
+
+@app.get("/api/jobs/{job_id}/events")
+def stream_job_events(job_id: int, db: Session = Depends(get_session)):
+    """Server-Sent Events: the job's progress snapshot, then every change
+    (coalesced to CHATSIGHT_SSE_MAX_EVENTS_PER_SECOND) until it finishes.
+    Replaces polling /api/queue/autolabel/status and friends."""
+    # Subscribe before reading, so an update can't slip in between.
+    sub = progress_events.subscribe(progress_events.topic("job", job_id))
+    job = db.get(Job, job_id)
+    if job is None:
+        sub.close()
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _event_stream(sub, jobs.job_event(job))
+
+
+def _job_status(job) -> dict:
+    if job is None:
+        return {"running": False, "processed": 0, "total": 0, "error": None}
+    return {
+        "running": job.status in jobs.ACTIVE,
+        "processed": job.processed,
+        "total": job.total,
+        "error": job.error,
+        "job_id": job.id,
+        "status": job.status,
+        "result": json_mod.loads(job.result_json) if job.result_json else None,
+    }
+
+
 # ── Auto-labeling ────────────────────────────────────────────────────────────
 
-_autolabel_status = {"running": False, "processed": 0, "total": 0, "error": None}
-_autolabel_stop_requested = False
+AUTOLABEL_JOB_KINDS = ("autolabel", "split_autolabel")
+# Multi-label rows written by autolabel: Gemini, or the local pre-classifier.
+MACHINE_APPLIED_BY = ("ai", local_model_service.APPLIED_BY)
+# Single-label rows written at handoff: Gemini, or the probe's auto-accepts.
+# Only "ai" rows are Gemini's, so only those get an ai_value_at_review snapshot.
+SINGLE_MACHINE_APPLIED_BY = ("ai", probe_service.APPLIED_BY)
 
 
 def _run_split_autolabel(
+    ctx: jobs.JobContext,
     original_label_id: int,
     original_label_name: str,
     new_label_a_id: int,
@@ -1280,7 +1663,7 @@ def _run_split_autolabel(
     human_examples: List[Dict[str, Any]],  # [{text, label_name}]
     remaining_messages: List[Dict[str, Any]],  # [{chatlog_id, message_index, message_text}]
 ):
-    """Background task: split remaining messages between two new labels using Gemini.
+    """Background job: split remaining messages between two new labels using Gemini.
 
     On full success, deletes the (already-archived) original label and its
     applications. If any batch fails, leaves the original archived-but-intact
@@ -1289,13 +1672,19 @@ def _run_split_autolabel(
     """
     from autolabel_service import classify_batch
 
-    global _autolabel_status
-    _autolabel_status = {
-        "running": True,
-        "processed": 0,
-        "total": len(remaining_messages),
-        "error": None,
-    }
+    # A re-run (after a lost lease) skips messages an earlier attempt already
+    # split, and the conflict-ignoring insert below covers any overlap.
+    with Session(engine) as db:
+        landed = set(db.exec(
+            select(LabelApplication.chatlog_id, LabelApplication.message_index)
+            .where(LabelApplication.label_id.in_([new_label_a_id, new_label_b_id]))
+        ).all())
+    total = len(remaining_messages)
+    remaining_messages = [
+        m for m in remaining_messages if (m["chatlog_id"], m["message_index"]) not in landed
+    ]
+    done = total - len(remaining_messages)
+    ctx.progress(done, total)
 
     label_defs = [
         {"name": new_label_a_name, "description": f"Sub-category of {original_label_name}"},
@@ -1317,7 +1706,7 @@ def _run_split_autolabel(
             # We don't have context_before for these right now, could be added later
             results = classify_batch(label_defs, examples_by_label, batch)
         except Exception as e:
-            _autolabel_status["error"] = f"Gemini error at batch {i}: {str(e)}"
+            ctx.note_error(f"Gemini error at batch {i}: {str(e)}")
             any_batch_failed = True
             continue
 
@@ -1326,23 +1715,28 @@ def _run_split_autolabel(
             # multi-label applications to single-mode labels.
             for lid in set(label_map.values()):
                 _assert_multi_write(db, lid)
+            rows = []
             for r in results:
                 idx = r.get("index")
                 label_name = r.get("label")
                 if idx is None or idx < 0 or idx >= len(batch) or label_name not in label_map:
                     continue
                 msg = batch[idx]
-                db.add(
-                    LabelApplication(
-                        label_id=label_map[label_name],
-                        chatlog_id=msg["chatlog_id"],
-                        message_index=msg["message_index"],
-                        applied_by="ai",
-                    )
+                rows.append({
+                    "label_id": label_map[label_name],
+                    "chatlog_id": msg["chatlog_id"],
+                    "message_index": msg["message_index"],
+                    "applied_by": "ai",
+                })
+            if rows:
+                db.execute(
+                    upsert_insert(db)(LabelApplication)
+                    .values(rows)
+                    .on_conflict_do_nothing(index_elements=["label_id", "chatlog_id", "message_index"])
                 )
             db.commit()
 
-        _autolabel_status["processed"] = min(i + BATCH_SIZE, len(remaining_messages))
+        ctx.progress(done + min(i + BATCH_SIZE, len(remaining_messages)))
 
     # Atomic cleanup: only purge the snapshot once classification succeeded
     # for every batch. Otherwise leave it archived-but-recoverable.
@@ -1358,202 +1752,237 @@ def _run_split_autolabel(
                 db.delete(old)
             db.commit()
 
-    _autolabel_status["running"] = False
 
+_register_job("split_autolabel", _run_split_autolabel)
 
-def _run_autolabel():
-    """Background task: classify all unlabeled messages using Gemini."""
+
+def _run_autolabel(ctx: Optional[jobs.JobContext] = None) -> jobs.JobContext:
+    """Background job: classify all unlabeled messages using Gemini. Progress
+    and soft errors go to `ctx` (a detached context when called directly),
+    which is returned."""
     # module import (not from-import) so tests can monkeypatch autolabel_service.MULTILABEL_THRESHOLD
     import autolabel_service
 
-    global _autolabel_status
-    _autolabel_status = {"running": True, "processed": 0, "total": 0, "error": None}
+    ctx = ctx or jobs.JobContext()
+    with Session(engine) as db:
+        # Multi-label flow: only consider active (non-archived) mode='multi'
+        # labels so the AI batch never writes to archived or single-mode labels.
+        labels = db.exec(
+            select(LabelDefinition)
+            .where(LabelDefinition.mode == "multi")
+            .where(LabelDefinition.archived_at == None)  # noqa: E711
+        ).all()
+        if not labels:
+            ctx.note_error("No labels defined")
+            return ctx
 
-    try:
-        with Session(engine) as db:
-            # Multi-label flow: only consider active (non-archived) mode='multi'
-            # labels so the AI batch never writes to archived or single-mode labels.
-            labels = db.exec(
-                select(LabelDefinition)
-                .where(LabelDefinition.mode == "multi")
-                .where(LabelDefinition.archived_at == None)  # noqa: E711
-            ).all()
-            if not labels:
-                _autolabel_status = {
-                    "running": False,
-                    "processed": 0,
-                    "total": 0,
-                    "error": "No labels defined",
-                }
-                return
-
-            label_map = {l.name: l.id for l in labels}
-            label_defs = [
-                {"name": l.name, "description": l.description} for l in labels
-            ]
+        label_map = {l.name: l.id for l in labels}
+        label_defs = [
+            {"name": l.name, "description": l.description} for l in labels
+        ]
 
-            # Get human-labeled examples for each label — use MessageCache
-            # (populated at startup) to avoid slow external-DB round-trips.
-            examples_by_label: dict[str, list[str]] = {}
-            for label in labels:
-                apps = db.exec(
-                    select(LabelApplication).where(
-                        LabelApplication.label_id == label.id,
-                        LabelApplication.applied_by == "human",
-                        _is_multi_application(),
-                    )
-                ).all()
-                for a in apps[:10]:
-                    cached_text = db.exec(
-                        select(MessageCache.message_text)
-                        .where(MessageCache.chatlog_id == a.chatlog_id)
-                        .where(MessageCache.message_index == a.message_index)
-                    ).first()
-                    if cached_text:
-                        examples_by_label.setdefault(label.name, []).append(cached_text)
-
-            # Get unlabeled messages (multi-label scope — single-label /run
-            # decisions on the same message must not exclude it from the
-            # multi-label autolabel candidate set).
-            labeled_set = {
-                (r.chatlog_id, r.message_index)
-                for r in db.exec(select(LabelApplication).where(_is_multi_application())).all()
-            }
-            skipped_set = {
-                (r.chatlog_id, r.message_index)
-                for r in db.exec(select(SkippedMessage)).all()
-            }
-            excluded = labeled_set | skipped_set
-
-            # Fetch candidates from MessageCache (already populated at startup
-            # from the external DB). Filter to Week 3 scope (QUEUE_SCOPE) so
-            # autolabel stays within the study boundary — same as the live queue.
-            cache_rows = db.exec(
-                select(
-                    MessageCache.chatlog_id,
-                    MessageCache.message_index,
-                    MessageCache.message_text,
-                    MessageCache.context_before,
-                    MessageCache.notebook,
+        # Get human-labeled examples for each label — use MessageCache
+        # (populated at startup) to avoid slow external-DB round-trips.
+        examples_by_label: dict[str, list[str]] = {}
+        for label in labels:
+            apps = db.exec(
+                select(LabelApplication).where(
+                    LabelApplication.label_id == label.id,
+                    LabelApplication.applied_by == "human",
+                    _is_multi_application(),
                 )
             ).all()
+            for a in apps[:10]:
+                cached_text = db.exec(
+                    select(MessageCache.message_text)
+                    .where(MessageCache.chatlog_id == a.chatlog_id)
+                    .where(MessageCache.message_index == a.message_index)
+                ).first()
+                if cached_text:
+                    examples_by_label.setdefault(label.name, []).append(cached_text)
+
+        # Get unlabeled messages (multi-label scope — single-label /run
+        # decisions on the same message must not exclude it from the
+        # multi-label autolabel candidate set).
+        labeled_set = {
+            (r.chatlog_id, r.message_index)
+            for r in db.exec(select(LabelApplication).where(_is_multi_application())).all()
+        }
+        skipped_set = {
+            (r.chatlog_id, r.message_index)
+            for r in db.exec(select(SkippedMessage)).all()
+        }
+        excluded = labeled_set | skipped_set
 
-        in_scope_rows = [
-            row for row in cache_rows
-            if study_scope.notebook_in_scope(row[4], study_scope.QUEUE_SCOPE)
-        ]
+        # Fetch candidates from MessageCache (already populated at startup
+        # from the external DB). Filter to Week 3 scope (QUEUE_SCOPE) so
+        # autolabel stays within the study boundary — same as the live queue.
+        cache_rows = db.exec(
+            select(
+                MessageCache.chatlog_id,
+                MessageCache.message_index,
+                MessageCache.message_text,
+                MessageCache.context_before,
+                MessageCache.notebook,
+            )
+        ).all()
 
-        unlabeled = [
-            {
-                "chatlog_id": row[0],
-                "message_index": row[1],
-                "message_text": row[2],
-                "context_before": row[3],
-            }
-            for row in in_scope_rows
-            if (row[0], row[1]) not in excluded
-        ]
-        _autolabel_status["total"] = len(unlabeled)
-
-        # Process in batches of 30; check stop flag between each batch
-        BATCH_SIZE = 30
-        global _autolabel_stop_requested
-        for i in range(0, len(unlabeled), BATCH_SIZE):
-            if _autolabel_stop_requested:
-                _autolabel_stop_requested = False
-                _autolabel_status["running"] = False
-                return
-            batch = unlabeled[i : i + BATCH_SIZE]
-            try:
-                results = autolabel_service.classify_batch(label_defs, examples_by_label, batch, multi_select=True)
-            except Exception as e:
-                _autolabel_status["error"] = f"Gemini error at batch {i}: {str(e)}"
-                continue
+    in_scope_rows = [
+        row for row in cache_rows
+        if study_scope.notebook_in_scope(row[4], study_scope.QUEUE_SCOPE)
+    ]
+
+    unlabeled = [
+        {
+            "chatlog_id": row[0],
+            "message_index": row[1],
+            "message_text": row[2],
+            "context_before": row[3],
+        }
+        for row in in_scope_rows
+        if (row[0], row[1]) not in excluded
+    ]
+    # Messages the local pre-classifier decides for every label are written
+    # here; only the rest go to Gemini.
+    BATCH_SIZE = 30
+    with Session(engine) as db:
+        local_model = local_model_service.train(db, [l.id for l in labels])
+        local = local_model_service.decide(
+            db, local_model, [(m["chatlog_id"], m["message_index"]) for m in unlabeled],
+            min_confidence=autolabel_service.MULTILABEL_THRESHOLD,
+        )
+        if local:
+            for lid in set(label_map.values()):
+                _assert_multi_write(db, lid)
+            db.add_all([
+                LabelApplication(
+                    label_id=label_id,
+                    chatlog_id=cid,
+                    message_index=midx,
+                    applied_by=local_model_service.APPLIED_BY,
+                    confidence=p,
+                )
+                for (cid, midx), applied in local.items()
+                for label_id, p in applied
+            ])
+            db.commit()
+    total = len(unlabeled)
+    unlabeled = [m for m in unlabeled if (m["chatlog_id"], m["message_index"]) not in local]
+    calls_without = -(-total // BATCH_SIZE)
+    calls_with = -(-len(unlabeled) // BATCH_SIZE)
+    ctx.result = {
+        "messages": total,
+        "local": len(local),
+        "local_fraction": len(local) / total if total else 0.0,
+        "gemini_calls": calls_with,
+        "gemini_calls_avoided": calls_without - calls_with,
+        "calls_avoided_fraction": (calls_without - calls_with) / calls_without if calls_without else 0.0,
+        "local_model": local_model_service.summary(local_model),
+    }
+    logger.info(
+        "autolabel: local model decided %d of %d messages (%d of %d Gemini calls avoided)",
+        len(local), total, calls_without - calls_with, calls_without,
+    )
+    ctx.progress(len(local), total)
 
-            with Session(engine) as db:
-                # Guard once per distinct label_id; if anything is non-multi
-                # we want to fail loudly before writing.
-                for lid in set(label_map.values()):
-                    _assert_multi_write(db, lid)
-                for r in results:
-                    idx = r.get("index")
-                    label_name = r.get("label")
-                    if idx is None or idx < 0 or idx >= len(batch) or label_name not in label_map:
+    # Process in batches of 30, each offered only the labels the embedding
+    # prefilter keeps for its messages; check for a stop request between batches
+    with Session(engine) as db:
+        batches = label_prefilter.plan_batches(db, [l.id for l in labels], unlabeled, BATCH_SIZE)
+    defs_by_id = {l.id: d for l, d in zip(labels, label_defs)}
+    done = len(local)
+    for i, (batch, offered) in enumerate(batches):
+        if ctx.cancelled:
+            return ctx
+        try:
+            results = autolabel_service.classify_batch(
+                [defs_by_id[lid] for lid in offered], examples_by_label, batch, multi_select=True,
+            )
+        except Exception as e:
+            ctx.note_error(f"Gemini error at batch {i * BATCH_SIZE}: {str(e)}")
+            done += len(batch)
+            continue
+
+        with Session(engine) as db:
+            # Guard once per distinct label_id; if anything is non-multi
+            # we want to fail loudly before writing.
+            for lid in set(label_map.values()):
+                _assert_multi_write(db, lid)
+            for r in results:
+                idx = r.get("index")
+                label_name = r.get("label")
+                if idx is None or idx < 0 or idx >= len(batch) or label_name not in label_map:
+                    continue
+                msg = batch[idx]
+                # Check for duplicate
+                existing = db.exec(
+                    select(LabelApplication).where(
+                        LabelApplication.label_id == label_map[label_name],
+                        LabelApplication.chatlog_id == msg["chatlog_id"],
+                        LabelApplication.message_index == msg["message_index"],
+                        _is_multi_application(),
+                    )
+                ).first()
+                if not existing:
+                    conf = r.get("confidence")
+                    if isinstance(conf, (int, float)):
+                        conf = max(0.0, min(1.0, float(conf)))
+                    else:
+                        conf = None
+                    # Multi-select gate: only persist labels the model is
+                    # confident enough about. Missing/non-numeric confidence
+                    # is treated as below threshold (not persisted).
+                    if conf is None or conf < autolabel_service.MULTILABEL_THRESHOLD:
                         continue
-                    msg = batch[idx]
-                    # Check for duplicate
-                    existing = db.exec(
-                        select(LabelApplication).where(
-                            LabelApplication.label_id == label_map[label_name],
-                            LabelApplication.chatlog_id == msg["chatlog_id"],
-                            LabelApplication.message_index == msg["message_index"],
-                            _is_multi_application(),
-                        )
-                    ).first()
-                    if not existing:
-                        conf = r.get("confidence")
-                        if isinstance(conf, (int, float)):
-                            conf = max(0.0, min(1.0, float(conf)))
-                        else:
-                            conf = None
-                        # Multi-select gate: only persist labels the model is
-                        # confident enough about. Missing/non-numeric confidence
-                        # is treated as below threshold (not persisted).
-                        if conf is None or conf < autolabel_service.MULTILABEL_THRESHOLD:
-                            continue
-                        db.add(LabelApplication(
-                            label_id=label_map[label_name],
-                            chatlog_id=msg["chatlog_id"],
-                            message_index=msg["message_index"],
-                            applied_by="ai",
-                            confidence=conf,
-                        ))
-                db.commit()
+                    db.add(LabelApplication(
+                        label_id=label_map[label_name],
+                        chatlog_id=msg["chatlog_id"],
+                        message_index=msg["message_index"],
+                        applied_by="ai",
+                        confidence=conf,
+                    ))
+            db.commit()
 
-            _autolabel_status["processed"] = min(i + BATCH_SIZE, len(unlabeled))
+        done += len(batch)
+        ctx.progress(done)
 
-        _autolabel_status["running"] = False
+    return ctx
 
-    except Exception as e:
-        _autolabel_status = {
-            "running": False,
-            "processed": _autolabel_status["processed"],
-            "total": _autolabel_status["total"],
-            "error": str(e),
-        }
 
+_register_job("autolabel", _run_autolabel)
 
-@app.post("/api/queue/autolabel")
+
+@app.post("/api/queue/autolabel", dependencies=[Depends(readiness.require_ready)])
 def start_autolabel(db: Session = Depends(get_session)):
-    if _autolabel_status["running"]:
+    if jobs.active(db, *AUTOLABEL_JOB_KINDS):
         raise HTTPException(status_code=409, detail="Auto-labeling already in progress")
-    thread = threading.Thread(target=_run_autolabel, daemon=True)
-    thread.start()
-    return {"ok": True, "message": "Auto-labeling started"}
+    job = _start_job(db, "autolabel")
+    return {"ok": True, "message": "Auto-labeling started", "job_id": job.id}
 
 
 @app.get("/api/queue/autolabel/status")
-def get_autolabel_status():
-    return _autolabel_status
+def get_autolabel_status(db: Session = Depends(get_session)):
+    return _job_status(jobs.latest(db, *AUTOLABEL_JOB_KINDS))
 
 
 @app.post("/api/queue/autolabel/stop")
-def stop_autolabel():
-    global _autolabel_stop_requested
-    if not _autolabel_status["running"]:
+def stop_autolabel(db: Session = Depends(get_session)):
+    job = jobs.active(db, "autolabel")
+    if job is None:
         raise HTTPException(status_code=409, detail="Auto-labeling is not running")
-    _autolabel_stop_requested = True
+    jobs.cancel(db, job.id)
     return {"ok": True, "message": "Stop requested — will halt after current batch"}
 
 
 @app.delete("/api/queue/autolabel/results")
 def clear_autolabel_results(db: Session = Depends(get_session)):
-    """Delete all AI-applied multi-label applications so autolabel can be re-run."""
-    if _autolabel_status["running"]:
+    """Delete all AI-applied (Gemini or local-model) multi-label applications
+    so autolabel can be re-run."""
+    if jobs.active(db, *AUTOLABEL_JOB_KINDS):
         raise HTTPException(status_code=409, detail="Auto-labeling is currently running")
     deleted = db.exec(
         select(LabelApplication).where(
-            LabelApplication.applied_by == "ai",
+            LabelApplication.applied_by.in_(MACHINE_APPLIED_BY),
             _is_multi_application(),
         )
     ).all()
@@ -1567,7 +1996,7 @@ def clear_autolabel_results(db: Session = Depends(get_session)):
 # ── Stub routes (feature tracks implement these) ──────────────────────────────
 
 
-@app.post("/api/queue/suggest")
+@app.post("/api/queue/suggest", dependencies=[Depends(readiness.require_ready)])
 def suggest_label(req: SuggestRequest, db: Session = Depends(get_session)):
     labels = db.exec(
         select(LabelDefinition)
@@ -1681,8 +2110,11 @@ def suggest_label(req: SuggestRequest, db: Session = Depends(get_session)):
     try:
         from autolabel_service import classify_batch
 
-        label_defs = [{"name": l.name, "description": l.description} for l in labels]
-        messages = [{"message_text": message_text, "context_before": None}]
+        messages = [{"chatlog_id": req.chatlog_id, "message_index": req.message_index,
+                     "message_text": message_text, "context_before": None}]
+        # Offer only the labels the embedding prefilter keeps for this message.
+        _batch, offered = label_prefilter.plan_batches(db, [l.id for l in labels], messages, 1)[0]
+        label_defs = [{"name": l.name, "description": l.description} for l in labels if l.id in offered]
         results = classify_batch(label_defs, examples_by_label, messages)
         if results:
             label_name = results[0].get("label", "")
@@ -1770,10 +2202,9 @@ def merge_labels(req: MergeLabelRequest, db: Session = Depends(get_session)):
     )
 
 
-@app.post("/api/labels/split-autolabel", response_model=List[LabelDefinitionResponse])
+@app.post("/api/labels/split-autolabel", response_model=List[LabelDefinitionResponse], dependencies=[Depends(readiness.require_ready)])
 def split_label_autolabel(
     req: SplitAutoLabelRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_session),
 ):
     original_label = db.get(LabelDefinition, req.label_id)
@@ -1888,19 +2319,18 @@ def split_label_autolabel(
 
     db.commit()
 
-    # Start background task. It will delete original_label_id (and its
+    # Start the background job. It will delete original_label_id (and its
     # remaining applications) only on full success.
-    background_tasks.add_task(
-        _run_split_autolabel,
-        original_label.id,
-        original_label.name,
-        label_a.id,
-        label_a.name,
-        label_b.id,
-        label_b.name,
-        human_examples,
-        remaining_messages,
-    )
+    _start_job(db, "split_autolabel", {
+        "original_label_id": original_label.id,
+        "original_label_name": original_label.name,
+        "new_label_a_id": label_a.id,
+        "new_label_a_name": label_a.name,
+        "new_label_b_id": label_b.id,
+        "new_label_b_name": label_b.name,
+        "human_examples": human_examples,
+        "remaining_messages": remaining_messages,
+    })
 
     return [
         LabelDefinitionResponse(
@@ -1993,56 +2423,48 @@ def delete_label(
 
 # ── Concept Induction ──────────────────────────────────────────────
 
-_discover_status: dict = {"running": False, "run_id": None, "error": None}
-
-
-def _run_discover():
-    """Background task: embed, cluster, and discover concepts."""
-    import uuid
+def _run_discover(ctx: jobs.JobContext):
+    """Background job: embed, cluster, and discover concepts."""
     from concept_service import discover_concepts
     from database import engine as local_engine
-    global _discover_status
 
-    run_id = str(uuid.uuid4())[:8]
-    _discover_status = {"running": True, "run_id": run_id, "error": None}
+    with Session(local_engine) as db:
+        # Get labeled (chatlog_id, message_index) pairs
+        labeled_keys = set()
+        for la in db.exec(select(LabelApplication)).all():
+            labeled_keys.add((la.chatlog_id, la.message_index))
 
-    try:
-        with Session(local_engine) as db:
-            # Get labeled (chatlog_id, message_index) pairs
-            labeled_keys = set()
-            for la in db.exec(select(LabelApplication)).all():
-                labeled_keys.add((la.chatlog_id, la.message_index))
-
-            # Get all messages from cache that are unlabeled
-            all_messages = []
-            for mc in db.exec(select(MessageCache)).all():
-                key = (mc.chatlog_id, mc.message_index)
-                if key not in labeled_keys:
-                    all_messages.append({
-                        "chatlog_id": mc.chatlog_id,
-                        "message_index": mc.message_index,
-                        "message_text": mc.message_text,
-                        "context_before": mc.context_before,
-                    })
-
-            if not all_messages:
-                _discover_status = {"running": False, "run_id": run_id, "error": "No unlabeled messages found"}
-                return
-
-            discover_concepts(all_messages, db)
-            _discover_status = {"running": False, "run_id": run_id, "error": None}
+        # Get all messages from cache that are unlabeled
+        all_messages = []
+        for mc in db.exec(select(MessageCache)).all():
+            key = (mc.chatlog_id, mc.message_index)
+            if key not in labeled_keys:
+                all_messages.append({
+                    "chatlog_id": mc.chatlog_id,
+                    "message_index": mc.message_index,
+                    "message_text": mc.message_text,
+                    "context_before": mc.context_before,
+                })
+
+        if not all_messages:
+            ctx.note_error("No unlabeled messages found")
+            return
+
+        ctx.progress(0, len(all_messages))
+        candidates = discover_concepts(all_messages, db)
+        ctx.progress(len(all_messages))
+        return {"candidates": len(candidates)}
 
-    except Exception as e:
-        _discover_status = {"running": False, "run_id": _discover_status.get("run_id"), "error": str(e)}
 
+_register_job("discover", _run_discover)
 
-@app.post("/api/concepts/discover", response_model=DiscoverConceptsResponse)
-def start_discover():
-    if _discover_status["running"]:
+
+@app.post("/api/concepts/discover", response_model=DiscoverConceptsResponse, dependencies=[Depends(readiness.require_ready)])
+def start_discover(db: Session = Depends(get_session)):
+    if jobs.active(db, "discover"):
         raise HTTPException(status_code=409, detail="Concept discovery already in progress")
-    thread = threading.Thread(target=_run_discover, daemon=True)
-    thread.start()
-    return DiscoverConceptsResponse(run_id=_discover_status.get("run_id") or "starting", status="running")
+    job = _start_job(db, "discover", max_attempts=1)
+    return DiscoverConceptsResponse(run_id=str(job.id), status="running")
 
 
 @app.get("/api/concepts/candidates", response_model=List[ConceptCandidateResponse])
@@ -2152,7 +2574,7 @@ def resolve_candidate(candidate_id: int, req: ResolveCandidateRequest, db: Sessi
         raise HTTPException(status_code=400, detail="action must be 'accept' or 'reject'")
 
 
-@app.get("/api/concepts/embed-status")
+@app.get("/api/concepts/embed-status", dependencies=[Depends(readiness.require_ready)])
 def get_embed_status(db: Session = Depends(get_session)):
     from models import MessageEmbedding
     cached = db.exec(select(func.count(MessageEmbedding.id))).one()
@@ -2162,16 +2584,17 @@ def get_embed_status(db: Session = Depends(get_session)):
         labeled_keys.add((la.chatlog_id, la.message_index))
     total_cached = db.exec(select(func.count(MessageCache.id))).one()
     total_unlabeled = total_cached - len(labeled_keys)
+    discover = _job_status(jobs.latest(db, "discover"))
 
     return {
         "cached": cached,
         "total_unlabeled": max(total_unlabeled, 0),
-        "running": _discover_status["running"],
-        "error": _discover_status.get("error"),
+        "running": discover["running"],
+        "error": discover["error"],
     }
 
 
-@app.get("/api/multi-labels/autolabel-summary")
+@app.get("/api/multi-labels/autolabel-summary", dependencies=[Depends(readiness.require_ready)])
 def get_multi_label_autolabel_summary(db: Session = Depends(get_session)):
     labels = db.exec(
         select(LabelDefinition)
@@ -2195,7 +2618,7 @@ def get_multi_label_autolabel_summary(db: Session = Depends(get_session)):
         ai_confidences = db.exec(
             select(LabelApplication.confidence)
             .where(LabelApplication.label_id == label.id)
-            .where(LabelApplication.applied_by == "ai")
+            .where(LabelApplication.applied_by.in_(MACHINE_APPLIED_BY))
             .where(_is_multi_application())
         ).all()
         ai_count = len(ai_confidences)
@@ -2212,7 +2635,7 @@ def get_multi_label_autolabel_summary(db: Session = Depends(get_session)):
     return results
 
 
-@app.get("/api/analysis/summary")
+@app.get("/api/analysis/summary", dependencies=[Depends(readiness.require_ready)])
 def get_analysis_summary(db: Session = Depends(get_session)):
     # Phase 1: /analysis is the multi-label dashboard. Count only true multi-label
     # applications (value IS NULL on a mode='multi' label). Single-label /run rows
@@ -2245,7 +2668,7 @@ def get_analysis_summary(db: Session = Depends(get_session)):
         select(LabelDefinition.name, func.count(LabelApplication.id))
         .select_from(LabelApplication)
         .join(LabelDefinition, LabelDefinition.id == LabelApplication.label_id)
-        .where(LabelApplication.applied_by == "ai")
+        .where(LabelApplication.applied_by.in_(MACHINE_APPLIED_BY))
         .where(applies)
         .where(multi_only)
         .group_by(LabelDefinition.name)
@@ -2281,7 +2704,7 @@ def get_analysis_summary(db: Session = Depends(get_session)):
         cid, mid, applied_by = row
         if applied_by == "human":
             human_pairs.add((cid, mid))
-        elif applied_by == "ai":
+        elif applied_by in MACHINE_APPLIED_BY:
             ai_pairs.add((cid, mid))
     human_labeled = len(human_pairs)
     ai_labeled = len(ai_pairs)
@@ -2384,7 +2807,7 @@ def _normalize_heatmap_columns(raw: list[list[float]]) -> list[list[float]]:
     ]
 
 
-@app.get("/api/analysis/temporal")
+@app.get("/api/analysis/temporal", dependencies=[Depends(readiness.require_ready)])
 def get_analysis_temporal(
     db: Session = Depends(get_session),
     calendar_from: Optional[date] = Query(None, alias="calendar_from"),
@@ -2553,7 +2976,7 @@ def get_analysis_temporal(
             ds = d_raw.isoformat() if hasattr(d_raw, "isoformat") else str(d_raw)
             if applied_by == "human":
                 daily[ds]["human"] += int(cnt)
-            elif applied_by == "ai":
+            elif applied_by in MACHINE_APPLIED_BY:
                 daily[ds]["ai"] += int(cnt)
 
         if daily:
@@ -2596,7 +3019,7 @@ def get_analysis_temporal(
     }
 
 
-@app.get("/api/export/onehot-csv")
+@app.get("/api/export/onehot-csv", dependencies=[Depends(readiness.require_ready)])
 def export_onehot_csv(db: Session = Depends(get_session)):
     """Wide-format export for the single-label Summaries page: one row per
     reviewed message, with each non-archived single-mode label as a one-hot
@@ -2699,7 +3122,7 @@ def export_onehot_csv(db: Session = Depends(get_session)):
     )
 
 
-@app.get("/api/export/csv")
+@app.get("/api/export/csv", dependencies=[Depends(readiness.require_ready)])
 def export_csv(db: Session = Depends(get_session)):
     rows = db.exec(
         select(
@@ -2751,7 +3174,7 @@ def export_csv(db: Session = Depends(get_session)):
     )
 
 
-@app.get("/api/session/label-review", response_model=List[LabelReviewResponse])
+@app.get("/api/session/label-review", response_model=List[LabelReviewResponse], dependencies=[Depends(readiness.require_ready)])
 def get_label_review(db: Session = Depends(get_session)):
     labels = db.exec(
         select(LabelDefinition)
@@ -2838,7 +3261,7 @@ def _compute_trend(events: list[RecalibrationEvent]) -> str:
     return "steady"
 
 
-@app.get("/api/session/recalibration")
+@app.get("/api/session/recalibration", dependencies=[Depends(readiness.require_ready)])
 def get_recalibration(force: bool = False, db: Session = Depends(get_session)):
     # 1. Check for active session
     labeling_session = db.exec(
@@ -3050,7 +3473,7 @@ def get_recalibration_stats(db: Session = Depends(get_session)):
     )
 
 
-@app.get("/api/queue/sample")
+@app.get("/api/queue/sample", dependencies=[Depends(readiness.require_ready)])
 def get_sample():
     return {"message": "Sampling strategy not yet implemented"}
 
@@ -3141,7 +3564,7 @@ def get_single_label_detail(label_id: int, db: Session = Depends(get_session)):
     )
     review_count = sum(
         1 for r in rows
-        if r.applied_by == "ai" and (r.confidence or 0) < threshold
+        if r.applied_by in SINGLE_MACHINE_APPLIED_BY and (r.confidence or 0) < threshold
     )
 
     # Agreement vs gold set: among human rows with an AI snapshot, fraction
@@ -3178,7 +3601,7 @@ def get_single_label_detail(label_id: int, db: Session = Depends(get_session)):
     )
 
 
-@app.get("/api/single-labels/{label_id}/messages", response_model=MessageListResponse)
+@app.get("/api/single-labels/{label_id}/messages", response_model=MessageListResponse, dependencies=[Depends(readiness.require_ready)])
 def list_single_label_messages(
     label_id: int,
     bucket: Optional[str] = Query(
@@ -3202,7 +3625,7 @@ def list_single_label_messages(
     threshold = label.review_threshold
 
     def is_review(row: LabelApplication) -> bool:
-        return row.applied_by == "ai" and (row.confidence or 0) < threshold
+        return row.applied_by in SINGLE_MACHINE_APPLIED_BY and (row.confidence or 0) < threshold
 
     # Outer join so rows without a MessageCache entry still appear (with empty text).
     q = (
@@ -3267,7 +3690,8 @@ def list_single_label_messages(
 
 
 @app.get("/api/single-labels/{label_id}/messages/{chatlog_id}",
-         response_model=MessageDetailResponse)
+         response_model=MessageDetailResponse,
+         dependencies=[Depends(readiness.require_ready)])
 def get_single_label_message_detail(
     label_id: int,
     chatlog_id: int,
@@ -3336,7 +3760,7 @@ def get_single_label_message_detail(
     ]
 
     threshold = label.review_threshold
-    is_review = app_row.applied_by == "ai" and (app_row.confidence or 0) < threshold
+    is_review = app_row.applied_by in SINGLE_MACHINE_APPLIED_BY and (app_row.confidence or 0) < threshold
     verdict = "review" if is_review else app_row.value
 
     return MessageDetailResponse(
@@ -3358,7 +3782,7 @@ def get_single_label_message_detail(
     )
 
 
-@app.get("/api/onboarding/starter", response_model=OnboardingStarterResponse)
+@app.get("/api/onboarding/starter", response_model=OnboardingStarterResponse, dependencies=[Depends(readiness.require_ready)])
 def get_onboarding_starter(
     refresh: bool = False,
     chatlog_id: Optional[int] = None,
@@ -3551,7 +3975,24 @@ def close_single_label(label_id: int, db: Session = Depends(get_session)):
     return _label_to_response(db, label)
 
 
-@app.get("/api/single-labels/{label_id}/next", response_model=Optional[FocusedMessageResponse])
+def _run_lexical_index(ctx: jobs.JobContext) -> None:
+    """Background job: refit explore's TF-IDF fallback after the message text
+    changed, so the /next path never fits it inline."""
+    with Session(engine) as db:
+        lexical_service.ensure_index(db)
+
+
+_register_job("lexical_index", _run_lexical_index)
+
+
+def _refresh_lexical_index(db: Session) -> None:
+    """Queue a lexical_index rebuild when the index explore reads is behind the
+    message text; picks keep using the previous one until it lands."""
+    if not lexical_service.is_current(db) and not jobs.active(db, "lexical_index"):
+        _start_job(db, "lexical_index")
+
+
+@app.get("/api/single-labels/{label_id}/next", response_model=Optional[FocusedMessageResponse], dependencies=[Depends(readiness.require_ready)])
 def get_next_focused(
     label_id: int,
     assignment_id: Optional[int] = None,
@@ -3598,6 +4039,7 @@ def get_next_focused(
                 return FocusedMessageResponse(**payload)
 
     assist_service.rebuild_cache_if_stale(db, label_id)
+    _refresh_lexical_index(db)
     payload = queue_service.next_message_for_label(
         db,
         label_id,
@@ -3611,7 +4053,7 @@ def get_next_focused(
     return FocusedMessageResponse(**payload)
 
 
-@app.get("/api/single-labels/{label_id}/assist", response_model=AssistResponse)
+@app.get("/api/single-labels/{label_id}/assist", response_model=AssistResponse, dependencies=[Depends(readiness.require_ready)])
 def get_assist(
     label_id: int,
     chatlog_id: int,
@@ -3655,14 +4097,16 @@ def _decide_response(
     label = db.get(LabelDefinition, label_id)
     explore = _effective_hybrid_explore_fraction(label) if label else None
     assist_service.rebuild_cache_if_stale(db, label_id)
-    payload = queue_service.next_message_for_label(
-        db,
-        label_id,
-        assignment_id,
-        explore_fraction=explore,
-        hint_chatlog_id=hint_chatlog_id,
-    )
-    db.commit()
+    _refresh_lexical_index(db)
+    with write_queue.interactive():  # picking the next message writes its cursor
+        payload = queue_service.next_message_for_label(
+            db,
+            label_id,
+            assignment_id,
+            explore_fraction=explore,
+            hint_chatlog_id=hint_chatlog_id,
+        )
+        db.commit()
     nxt = FocusedMessageResponse(**payload) if payload else None
     readiness = ReadinessResponse(**decision_service.compute_readiness(db, label_id))
     return DecideResponse(next=nxt, readiness=readiness)
@@ -3687,13 +4131,27 @@ def post_decide(
         )
     if req.value not in {"yes", "no", "skip"}:
         raise HTTPException(status_code=400, detail="value must be yes|no|skip")
-    decision_service.record_decision(
+    write_queue.write(
         db,
-        label_id=label_id,
-        chatlog_id=req.chatlog_id,
-        message_index=req.message_index,
-        value=req.value,
+        lambda w: decision_service.apply_decision(
+            w,
+            label_id=label_id,
+            chatlog_id=req.chatlog_id,
+            message_index=req.message_index,
+            value=req.value,
+        ),
+        priority=write_queue.INTERACTIVE,
     )
+    explore_service.note_human_decision(db, label_id, req.chatlog_id, req.message_index, req.value)
+    probe = probe_service.note_decision(db, label_id, req.chatlog_id, req.message_index, req.value)
+    if (
+        probe is not None
+        and probe_service.is_ready(probe)
+        and probe["updates"] % probe_service.PROBE_PREDICT_EVERY == 0
+        and req.value != "skip"
+        and not jobs.active(db, "probe_predictions", label_id=label_id)
+    ):
+        _start_job(db, "probe_predictions", {"label_id": label_id}, label_id=label_id)
     # Stay in the same conversation until its student turns are exhausted.
     return _decide_response(
         db, label_id, assignment_id, hint_chatlog_id=req.chatlog_id
@@ -3735,6 +4193,9 @@ def post_undo(
     if not label or label.mode != "single":
         raise HTTPException(status_code=404, detail="Single-label not found")
     snapshot = decision_service.undo_last_decision(db, label_id)
+    if snapshot is not None:
+        explore_service.note_human_decision(db, label_id, snapshot.chatlog_id, snapshot.message_index, None)
+        probe_service.note_decision(db, label_id, snapshot.chatlog_id, snapshot.message_index, None)
     # Re-focus the exact message we just undid so the instructor lands back on
     # it, instead of the sampler jumping to a fresh conversation.
     if snapshot is not None:
@@ -3769,7 +4230,104 @@ def get_human_decisions(label_id: int, db: Session = Depends(get_session)):
     return [{"chatlog_id": cid, "message_index": midx} for cid, midx in rows]
 
 
-@app.get("/api/single-labels/{label_id}/readiness", response_model=ReadinessResponse)
+def _run_profile_precompute(ctx: jobs.JobContext, label_id: int) -> None:
+    """Background job: build the explore ConversationProfile for every in-scope
+    conversation, PROFILE_BATCH_SIZE conversations per Gemini call. Profiles
+    that are already current are skipped, so a re-run (or a retried job)
+    resumes where the last one stopped."""
+    with Session(engine) as db:
+        label = db.get(LabelDefinition, label_id)
+        if label is None:
+            return
+        conversations = explore_service.in_scope_conversations(db, label)
+        stale = set(explore_service.stale_profile_chatlog_ids(
+            db, label_id, [c["chatlog_id"] for c in conversations]))
+        todo = [c for c in conversations if c["chatlog_id"] in stale]
+        done = len(conversations) - len(todo)
+        ctx.progress(done, len(conversations))
+        for i in range(0, len(todo), explore_service.PROFILE_BATCH_SIZE):
+            ctx.checkpoint()
+            batch = todo[i : i + explore_service.PROFILE_BATCH_SIZE]
+            written = explore_service.ensure_conversation_profiles(db, label_id, batch)
+            if written < len(batch):
+                ctx.note_error(f"{len(batch) - written} of {len(batch)} profiles in batch {i} were not built")
+            done += len(batch)
+            ctx.progress(done)
+
+
+_register_job("profile_precompute", _run_profile_precompute)
+
+
+@app.post("/api/single-labels/{label_id}/profiles/precompute", dependencies=[Depends(readiness.require_ready)])
+def start_profile_precompute(label_id: int, db: Session = Depends(get_session)):
+    """Precompute explore conversation profiles for the label's whole study
+    scope. Poll progress with GET on the same path."""
+    label = db.get(LabelDefinition, label_id)
+    if not label or label.mode != "single":
+        raise HTTPException(status_code=404, detail="Single-label not found")
+    if jobs.active(db, "profile_precompute", label_id=label_id):
+        raise HTTPException(status_code=409, detail="Profile precompute already in progress")
+    job = _start_job(db, "profile_precompute", {"label_id": label_id}, label_id=label_id)
+    return {"ok": True, "message": "Profile precompute started", "job_id": job.id}
+
+
+@app.get("/api/single-labels/{label_id}/profiles/precompute")
+def get_profile_precompute_status(label_id: int, db: Session = Depends(get_session)):
+    return _job_status(jobs.latest(db, "profile_precompute", label_id=label_id))
+
+
+def _run_probe_predictions(ctx: jobs.JobContext, label_id: int) -> None:
+    """Background job: write the label's probe P(yes) for every embedded
+    in-scope message into LabelPrediction."""
+    with Session(engine) as db:
+        if db.get(LabelDefinition, label_id) is None:
+            return
+
+        def progress(done: int, total: int) -> None:
+            ctx.progress(done, total)
+            ctx.checkpoint()
+
+        probe_service.write_predictions(db, label_id, progress=progress)
+
+
+_register_job("probe_predictions", _run_probe_predictions)
+
+
+@app.get("/api/single-labels/{label_id}/probe", response_model=ProbeStatusResponse)
+def get_probe_status(label_id: int, db: Session = Depends(get_session)):
+    """The label's linear probe: labeled counts, readiness and the calibrated
+    auto-accept threshold (null until enough held-out decisions clear it)."""
+    label = db.get(LabelDefinition, label_id)
+    if not label or label.mode != "single":
+        raise HTTPException(status_code=404, detail="Single-label not found")
+    return ProbeStatusResponse(label_id=label_id, **probe_service.status(db, label_id))
+
+
+@app.post("/api/single-labels/{label_id}/probe/predictions", dependencies=[Depends(readiness.require_ready)])
+def start_probe_predictions(label_id: int, db: Session = Depends(get_session)):
+    """Write probe predictions for the label's whole study scope. Also started
+    automatically every CHATSIGHT_PROBE_PREDICT_EVERY decisions. Poll progress
+    with GET on the same path."""
+    label = db.get(LabelDefinition, label_id)
+    if not label or label.mode != "single":
+        raise HTTPException(status_code=404, detail="Single-label not found")
+    if not probe_service.is_ready(probe_service.get_probe(db, label_id)):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Probe needs {probe_service.PROBE_MIN_PER_CLASS} embedded yes and no decisions",
+        )
+    if jobs.active(db, "probe_predictions", label_id=label_id):
+        raise HTTPException(status_code=409, detail="Probe predictions already in progress")
+    job = _start_job(db, "probe_predictions", {"label_id": label_id}, label_id=label_id)
+    return {"ok": True, "message": "Probe predictions started", "job_id": job.id}
+
+
+@app.get("/api/single-labels/{label_id}/probe/predictions")
+def get_probe_predictions_status(label_id: int, db: Session = Depends(get_session)):
+    return _job_status(jobs.latest(db, "probe_predictions", label_id=label_id))
+
+
+@app.get("/api/single-labels/{label_id}/readiness", response_model=ReadinessResponse, dependencies=[Depends(readiness.require_ready)])
 def get_readiness(label_id: int, db: Session = Depends(get_session)):
     label = db.get(LabelDefinition, label_id)
     if not label or label.mode != "single":
@@ -3778,7 +4336,7 @@ def get_readiness(label_id: int, db: Session = Depends(get_session)):
     return ReadinessResponse(**state)
 
 
-@app.get("/api/single-labels/{label_id}/gemini-preview", response_model=GeminiPreviewResponse)
+@app.get("/api/single-labels/{label_id}/gemini-preview", response_model=GeminiPreviewResponse, dependencies=[Depends(readiness.require_ready)])
 def get_gemini_preview(label_id: int, db: Session = Depends(get_session)):
     label = db.get(LabelDefinition, label_id)
     if not label or label.mode != "single":
@@ -3830,12 +4388,10 @@ PARALLEL_CONCURRENCY = 3
 # Serializing whole inline jobs keeps aggregate concurrency at the tuned value
 # and lets each label finish — and become usable — before the next starts. The
 # Batch API path is intentionally NOT gated: Google manages its throughput
-# asynchronously, so local serialization would only stall progress.
-_INLINE_CLASSIFY_LOCK = threading.Lock()
-# Retry settings for the chunk-classifier when Gemini returns 429. Other
-# error classes fail-fast so genuine bugs surface immediately.
-PARALLEL_RETRY_MAX_ATTEMPTS = 4   # initial try + 3 retries
-PARALLEL_RETRY_BACKOFF_SECONDS = [2.0, 4.0, 8.0]
+# asynchronously, so local serialization would only stall progress. The gate is
+# an advisory lock in the app DB (shared_state), so it holds across uvicorn
+# workers and `python -m worker` processes, not just threads of one process.
+INLINE_CLASSIFY_LOCK = "inline-classify"
 # TEMPORARY: bumped from 500 to route label-21 (17,416 msgs) through the
 # parallel-sync path after Google's Batch queue stalled hard. Revert to 500
 # after the label finishes so future large handoffs still get the Batch
@@ -3849,10 +4405,38 @@ BATCH_POLL_INTERVAL_SEC = 15
 BATCH_SPLIT_TARGET_MESSAGES = 4000
 
 
+def _label_progress_event(label: LabelDefinition) -> dict:
+    """Classification progress snapshot, as streamed by
+    GET /api/single-labels/{id}/events."""
+    error = None
+    if label.phase == "failed" and label.summary_json:
+        try:
+            error = json_mod.loads(label.summary_json).get("error")
+        except json_mod.JSONDecodeError:
+            pass
+    return {
+        "label_id": label.id,
+        "phase": label.phase,
+        "classified_count": label.classified_count,
+        "classification_total": label.classification_total,
+        "batch_state": label.batch_state,
+        "batch_completed_count": label.batch_completed_count,
+        "batch_total_count": label.batch_total_count,
+        "error": error,
+        "done": label.phase != "classifying",
+    }
+
+
+def _publish_label_progress(label: LabelDefinition) -> None:
+    """Call after committing a progress change to `label`."""
+    progress_events.publish(progress_events.topic("label", label.id), _label_progress_event(label))
+
+
 def _do_classification(
     db: Session,
     label: LabelDefinition,
     sample_size: Optional[int] = None,
+    auto_accept: bool = False,
 ) -> None:
     """Classify pending messages for `label` and emit a summary. Routes large jobs
     (> BATCH_THRESHOLD) to the Gemini Batch API and small jobs to a parallel
@@ -3863,7 +4447,11 @@ def _do_classification(
     `sample_size` (dev smoke-test): when set, `pending` is reduced to
     `random.sample(pending, min(sample_size, len(pending)))` immediately after
     it is computed. All downstream logic — chunk size, parallel/batch routing,
-    `classification_total`, summary — operates on the sampled subset."""
+    `classification_total`, summary — operates on the sampled subset.
+
+    `auto_accept`: pending messages the label's linear probe (probe_service)
+    is confident about — past its calibrated precision threshold — are written
+    as AI rows straight away, and only the rest go to Gemini."""
     decided_keys = set(
         db.exec(
             select(LabelApplication.chatlog_id, LabelApplication.message_index)
@@ -3926,25 +4514,35 @@ def _do_classification(
     existing_ai_count = db.exec(
         select(func.count(LabelApplication.id)).where(
             LabelApplication.label_id == label.id,
-            LabelApplication.applied_by == "ai",
+            LabelApplication.applied_by.in_(SINGLE_MACHINE_APPLIED_BY),
         )
     ).one()
     label.classification_total = existing_ai_count + len(pending)
     label.classified_count = existing_ai_count
     db.add(label)
     db.commit()
+    _publish_label_progress(label)
 
-    if len(pending) > BATCH_THRESHOLD:
+    probe_yes: list[str] = []
+    probe_no: list[str] = []
+    if auto_accept and pending:
+        pending, probe_yes, probe_no = _accept_probe_confident(db, label, pending)
+
+    if not pending:
+        yes_msgs, no_msgs = [], []
+    elif len(pending) > BATCH_THRESHOLD:
         yes_msgs, no_msgs = _classify_via_batch_api(
             db, label, pending, yes_examples, no_examples
         )
     else:
         # Serialize inline jobs process-wide so N concurrent handoffs don't
-        # multiply Gemini request rate past quota. See _INLINE_CLASSIFY_LOCK.
-        with _INLINE_CLASSIFY_LOCK:
+        # multiply Gemini request rate past quota. See INLINE_CLASSIFY_LOCK.
+        with shared_state.advisory_lock(db.get_bind(), INLINE_CLASSIFY_LOCK):
             yes_msgs, no_msgs = _classify_in_parallel(
                 db, label, pending, yes_examples, no_examples
             )
+    yes_msgs = probe_yes + yes_msgs
+    no_msgs = probe_no + no_msgs
 
     summary = binary_autolabel_service.summarize_batch(
         label_name=label.name,
@@ -3956,6 +4554,63 @@ def _do_classification(
     label.phase = "handed_off"
     db.add(label)
     db.commit()
+    _publish_label_progress(label)
+
+
+def _accept_probe_confident(
+    db: Session, label: LabelDefinition, pending: list,
+) -> tuple[list, list[str], list[str]]:
+    """Write probe rows for the pending messages the probe clears its calibrated
+    threshold on. Returns (still-pending, accepted yes texts, accepted no texts)."""
+    calibration = probe_service.calibrate(db, label.id)
+    accepted = probe_service.auto_accept(db, label.id, [(c, i) for c, i, _t in pending])
+    if not accepted:
+        return pending, [], []
+    rows, yes_msgs, no_msgs, rest = [], [], [], []
+    for cid, midx, text in pending:
+        p = accepted.get((cid, midx))
+        if p is None:
+            rest.append((cid, midx, text))
+            continue
+        value = "yes" if p >= 0.5 else "no"
+        rows.append(LabelApplication(
+            label_id=label.id,
+            chatlog_id=cid,
+            message_index=midx,
+            applied_by=probe_service.APPLIED_BY,
+            confidence=max(p, 1.0 - p),
+            value=value,
+            rationale=(
+                f"Linear probe: P(yes)={p:.2f} (auto-accepted at confidence "
+                f">= {calibration['threshold']:.2f}, held-out precision {calibration['precision']:.2f})"
+            ),
+        ))
+        (yes_msgs if value == "yes" else no_msgs).append(text)
+    _write_ai_rows(db, label.id, rows, (label.classified_count or 0) + len(rows))
+    db.refresh(label)
+    _publish_label_progress(label)
+    logger.info("label %s: probe accepted %d of %d pending messages", label.id, len(rows), len(pending))
+    return rest, yes_msgs, no_msgs
+
+
+def _write_ai_rows(db: Session, label_id: int, rows: list, classified_count: Optional[int] = None) -> None:
+    """Persist AI LabelApplication rows as CLASSIFICATION_CHUNK_SIZE-row bulk
+    writes through write_queue, so a human decision can slip in between the
+    pieces of a large result set (a Batch API sub-batch is thousands of rows)
+    instead of waiting out one long commit. The last piece also advances
+    `classified_count` when given."""
+    pieces = [rows[i:i + CLASSIFICATION_CHUNK_SIZE] for i in range(0, len(rows), CLASSIFICATION_CHUNK_SIZE)]
+    for n, piece in enumerate(pieces, 1):
+        def write(w: Session, piece=piece, last=(n == len(pieces))) -> None:
+            w.add_all(piece)
+            if last and classified_count is not None:
+                w.exec(
+                    update(LabelDefinition)
+                    .where(LabelDefinition.id == label_id)
+                    .values(classified_count=classified_count)
+                )
+
+        write_queue.write(db, write, priority=write_queue.BULK)
 
 
 def _classify_in_parallel(
@@ -3990,59 +4645,40 @@ def _classify_in_parallel(
 
     def run_chunk(chunk):
         chunk_texts = [t for _, _, t in chunk]
-        # Retry on transient errors (rate-limit, read/connect timeout). Other
-        # error classes fail-fast so genuine bugs (auth, malformed request,
-        # 500-class) surface immediately rather than after a long backoff.
-        last_exc: Optional[BaseException] = None
-        for attempt in range(PARALLEL_RETRY_MAX_ATTEMPTS):
-            try:
-                classifications = binary_autolabel_service.classify_binary(
-                    label_name=label_name,
-                    label_description=label_description,
-                    yes_examples=yes_examples,
-                    no_examples=no_examples,
-                    messages=chunk_texts,
-                    guidance=label_guidance,
-                )
-                return chunk, classifications
-            except Exception as e:
-                if not _is_transient_classify_error(e):
-                    raise
-                last_exc = e
-                if attempt == PARALLEL_RETRY_MAX_ATTEMPTS - 1:
-                    break
-                base = PARALLEL_RETRY_BACKOFF_SECONDS[
-                    min(attempt, len(PARALLEL_RETRY_BACKOFF_SECONDS) - 1)
-                ]
-                # ±25% jitter so worker threads don't all retry in lockstep.
-                wait = base * (0.75 + random.random() * 0.5)
-                kind = _classify_error_kind(e)
-                logger.info(
-                    "transient %s (attempt %d/%d), backing off %.1fs",
-                    kind if kind == "rate_limited" else "timeout",
-                    attempt + 1, PARALLEL_RETRY_MAX_ATTEMPTS, wait,
-                )
-                time.sleep(wait)
-        assert last_exc is not None  # only reachable after a transient chain
-        raise last_exc
+        # Transient errors (rate-limit, read/connect timeout) back off and retry
+        # under the gateway's shared policy; anything else fails fast.
+        classifications = gemini_gateway.call_with_retry(
+            lambda: binary_autolabel_service.classify_binary(
+                label_name=label_name,
+                label_description=label_description,
+                yes_examples=yes_examples,
+                no_examples=no_examples,
+                messages=chunk_texts,
+                guidance=label_guidance,
+            ),
+            call_site="handoff.classify_chunk",
+        )
+        return chunk, classifications
 
     # Start from the cumulative count seeded by _do_classification so progress
     # reporting reflects total AI rows written, not just this run's portion.
     completed = label.classified_count or 0
     with ThreadPoolExecutor(max_workers=PARALLEL_CONCURRENCY) as ex:
-        futures = [ex.submit(run_chunk, chunk) for chunk in chunks]
+        # copy_context per chunk so ledger tags (label/job) follow the call
+        # onto the worker threads.
+        futures = [ex.submit(contextvars.copy_context().run, run_chunk, chunk) for chunk in chunks]
         try:
             for fut in as_completed(futures):
                 chunk, classifications = fut.result()
+                rows = []
                 for (cid, midx, text), cls in zip(chunk, classifications):
                     value = cls.get("value", "no")
-                    confidence = float(cls.get("confidence", 0.5))
-                    db.add(LabelApplication(
+                    rows.append(LabelApplication(
                         label_id=label_id,
                         chatlog_id=cid,
                         message_index=midx,
                         applied_by="ai",
-                        confidence=confidence,
+                        confidence=float(cls.get("confidence", 0.5)),
                         value=value,
                         matched_pattern=cls.get("matched_pattern"),
                         rationale=cls.get("rationale"),
@@ -4052,13 +4688,11 @@ def _classify_in_parallel(
                     else:
                         no_msgs.append(text)
                 completed += len(chunk)
+                _write_ai_rows(db, label_id, rows, completed)
                 # Refresh re-reads the row in the main thread, keeping the
-                # ORM instance consistent before we modify+commit it. Bypasses
-                # any expired-attribute weirdness from the prior commit.
+                # ORM instance consistent with what the writer committed.
                 db.refresh(label)
-                label.classified_count = completed
-                db.add(label)
-                db.commit()
+                _publish_label_progress(label)
         finally:
             for f in futures:
                 f.cancel()
@@ -4135,7 +4769,7 @@ def _cleanup_sub_batch_entry(entry, bas) -> None:
         entry["jsonl_path"] = None
     if entry.get("uploaded_name"):
         try:
-            bas.client.files.delete(name=entry["uploaded_name"])
+            gemini_gateway.get_client().files.delete(name=entry["uploaded_name"])
         except Exception:
             pass
         entry["uploaded_name"] = None
@@ -4151,7 +4785,7 @@ def _parse_and_write_sub_batch(db, label, job, entry, bas) -> tuple[list[str], l
     dest = getattr(job, "dest", None)
     result_file_name = getattr(dest, "file_name", None) if dest else None
     if result_file_name:
-        content = bas.client.files.download(file=result_file_name)
+        content = gemini_gateway.get_client().files.download(file=result_file_name)
         text_content = content.decode("utf-8") if isinstance(content, (bytes, bytearray)) else content
         for line in text_content.splitlines():
             if not line.strip():
@@ -4172,6 +4806,7 @@ def _parse_and_write_sub_batch(db, label, job, entry, bas) -> tuple[list[str], l
 
     yes_msgs: list[str] = []
     no_msgs: list[str] = []
+    rows: list[LabelApplication] = []
     for local_idx, chunk in enumerate(entry["chunks"]):
         global_idx = entry["start_chunk_idx"] + local_idx
         row = results_by_key.get(f"chunk-{global_idx}")
@@ -4181,13 +4816,12 @@ def _parse_and_write_sub_batch(db, label, job, entry, bas) -> tuple[list[str], l
         classifications = bas.parse_classify_batch_response(response_obj, len(chunk))
         for (cid, midx, text), cls in zip(chunk, classifications):
             value = cls.get("value", "no")
-            confidence = float(cls.get("confidence", 0.5))
-            db.add(LabelApplication(
+            rows.append(LabelApplication(
                 label_id=label.id,
                 chatlog_id=cid,
                 message_index=midx,
                 applied_by="ai",
-                confidence=confidence,
+                confidence=float(cls.get("confidence", 0.5)),
                 value=value,
                 matched_pattern=cls.get("matched_pattern"),
                 rationale=cls.get("rationale"),
@@ -4196,6 +4830,7 @@ def _parse_and_write_sub_batch(db, label, job, entry, bas) -> tuple[list[str], l
                 yes_msgs.append(text)
             else:
                 no_msgs.append(text)
+    _write_ai_rows(db, label.id, rows)
     return yes_msgs, no_msgs
 
 
@@ -4270,14 +4905,14 @@ def _classify_via_batch_api(
                     )
                     f.write(json_mod.dumps(req) + "\n")
                     global_chunk_idx += 1
-            uploaded = bas.client.files.upload(
+            uploaded = gemini_gateway.get_client().files.upload(
                 file=jsonl_path,
                 config=genai_types.UploadFileConfig(
                     display_name=f"binary-classify-label-{label.id}-sb{sb_idx}",
                     mime_type="jsonl",
                 ),
             )
-            job = bas.client.batches.create(
+            job = gemini_gateway.get_client().batches.create(
                 model=bas.CLASSIFY_MODEL,
                 src=uploaded.name,
                 config={"display_name": f"binary-classify-label-{label.id}-sb{sb_idx}"},
@@ -4320,7 +4955,7 @@ def _classify_via_batch_api(
             time.sleep(BATCH_POLL_INTERVAL_SEC)
             still_in_flight: list[dict] = []
             for entry in in_flight:
-                refreshed = bas.client.batches.get(name=entry["job"].name)
+                refreshed = gemini_gateway.get_client().batches.get(name=entry["job"].name)
                 entry["job"] = refreshed
                 if refreshed.state.name in _BATCH_TERMINAL_STATES:
                     if refreshed.state.name != "JOB_STATE_SUCCEEDED":
@@ -4339,6 +4974,7 @@ def _classify_via_batch_api(
                     label.batch_completed_count = (label.batch_completed_count or 0) + 1
                     db.add(label)
                     db.commit()
+                    _publish_label_progress(label)
                     logger.info(
                         "sub-batch complete: label=%s job=%s (%d/%d)",
                         label.id, refreshed.name,
@@ -4387,39 +5023,14 @@ def _classify_via_batch_api(
 
 
 def _classify_error_kind(exc: BaseException) -> str:
-    """Categorize a classification failure for the UI. Returns 'rate_limited' for
-    Gemini quota/429 responses, otherwise 'error'. Looks at HTTP status, gRPC code,
-    and the message text since the genai SDK surfaces these inconsistently."""
-    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
-    if status in (429, "RESOURCE_EXHAUSTED"):
-        return "rate_limited"
-    text = (str(exc) or "").lower()
-    if "429" in text or "resource_exhausted" in text or "rate limit" in text or "quota" in text:
-        return "rate_limited"
-    return "error"
-
-
-def _is_transient_classify_error(exc: BaseException) -> bool:
-    """Whether the parallel chunk runner should retry instead of fail-fast.
-    Covers two transient classes that an in-progress run shouldn't tank on:
-
-    - Rate-limiting (429 / RESOURCE_EXHAUSTED) — the existing retry case.
-    - Network timeouts — read/connect timeouts from a hung TCP connection to
-      Google. Without retry these turn a single bad socket into a whole-run
-      failure (we hit this at 99.7% on label 21).
-
-    Genuine bugs (auth, malformed request, 500-class errors) fall through to
-    fail-fast so they surface immediately instead of after a long backoff."""
-    if _classify_error_kind(exc) == "rate_limited":
-        return True
-    text = (str(exc) or "").lower()
-    name = type(exc).__name__.lower()
-    timeout_signals = ("timeout", "timed out", "deadline exceeded", "readtimeout", "connecttimeout")
-    return any(sig in text or sig in name for sig in timeout_signals)
-
-
-def _classify_in_background(label_id: int, sample_size: Optional[int] = None) -> None:
-    """Top-level wrapper for FastAPI BackgroundTasks: opens its own session and
+    """Categorize a classification failure for the UI: 'rate_limited' or 'error'."""
+    return gemini_gateway.error_kind(exc)
+
+
+def _classify_in_background(
+    label_id: int, sample_size: Optional[int] = None, auto_accept: bool = False,
+) -> None:
+    """Body of the `handoff` job: opens its own session and
     runs `_do_classification`. On failure, marks the label `phase='failed'` and
     stashes the error in `summary_json` so the instructor can see what went wrong
     on /summaries instead of having the label silently disappear."""
@@ -4436,7 +5047,13 @@ def _classify_in_background(label_id: int, sample_size: Optional[int] = None) ->
             )
             return
         try:
-            _do_classification(db, label, sample_size=sample_size)
+            # Run as a job, the calls keep the job's id so /api/llm-usage can
+            # match them to it; only a bare call gets an id of its own.
+            with gemini_gateway.call_context(
+                label_id=label_id,
+                job_id=gemini_gateway.current_job_id() or gemini_gateway.new_job_id("handoff"),
+            ):
+                _do_classification(db, label, sample_size=sample_size, auto_accept=auto_accept)
         except Exception as e:
             logger.exception(f"Background classification failed for label {label_id}: {e}")
             label.phase = "failed"
@@ -4454,14 +5071,25 @@ def _classify_in_background(label_id: int, sample_size: Optional[int] = None) ->
             label.batch_completed_count = None
             db.add(label)
             db.commit()
+            _publish_label_progress(label)
 
 
-@app.post("/api/single-labels/{label_id}/handoff", response_model=HandoffResponse)
+# Failures are already recorded on the label (phase='failed', retried from the
+# UI), so the job itself only re-runs when its worker died mid-classification;
+# the pending set excludes rows a previous attempt wrote.
+_register_job(
+    "handoff",
+    lambda ctx, label_id, sample_size=None, auto_accept=False:
+        _classify_in_background(label_id, sample_size, auto_accept),
+)
+
+
+@app.post("/api/single-labels/{label_id}/handoff", response_model=HandoffResponse, dependencies=[Depends(readiness.require_ready)])
 def handoff_single_label(
     label_id: int,
-    bg: BackgroundTasks,
     db: Session = Depends(get_session),
     sample_size: Optional[int] = None,
+    auto_accept: Optional[bool] = None,
 ):
     """Hand off a label to Gemini in the background. Returns immediately with
     the next-active label info — the actual classification runs after response.
@@ -4471,13 +5099,17 @@ def handoff_single_label(
     the full pending set. Rejected with HTTP 400 if <= 0. No upper cap — values
     larger than `len(pending)` clamp to all of pending.
 
+    `auto_accept` (default CHATSIGHT_PROBE_AUTO_ACCEPT): accept the linear
+    probe's confident predictions as AI rows and send only the uncertain
+    messages to Gemini.
+
     Behavior:
     - Active label moves to phase = 'classifying' (deactivated)
     - Next queued label (if any) auto-activates and moves to phase = 'labeling'
-    - Background task runs Gemini classification + summary; on success sets phase
+    - A `handoff` job runs Gemini classification + summary; on success sets phase
       to 'handed_off' and stores summary_json
     - The classifying label appears on /api/handoff-summaries with empty patterns
-      until the background task completes."""
+      until the job completes."""
     if sample_size is not None and sample_size <= 0:
         raise HTTPException(
             status_code=400,
@@ -4507,7 +5139,10 @@ def handoff_single_label(
         db.add(next_q)
     db.commit()
 
-    bg.add_task(_classify_in_background, label_id, sample_size)
+    payload = {"label_id": label_id, "sample_size": sample_size}
+    if probe_service.AUTO_ACCEPT if auto_accept is None else auto_accept:
+        payload["auto_accept"] = True
+    _start_job(db, "handoff", payload, label_id=label_id)
 
     return HandoffResponse(
         label_id=label_id,
@@ -4518,15 +5153,14 @@ def handoff_single_label(
     )
 
 
-@app.post("/api/single-labels/{label_id}/retry-handoff", response_model=HandoffResponse)
+@app.post("/api/single-labels/{label_id}/retry-handoff", response_model=HandoffResponse, dependencies=[Depends(readiness.require_ready)])
 def retry_handoff_single_label(
     label_id: int,
-    bg: BackgroundTasks,
     db: Session = Depends(get_session),
 ):
     """Re-run a previously failed classification (e.g. rate-limited). Unlike
     /handoff, this doesn't require the label to be active and doesn't disturb
-    whatever is currently active on the Run page — the background task just
+    whatever is currently active on the Run page — the background job just
     re-runs against `pending`, which already excludes the AI rows from prior
     partial runs."""
     label = db.get(LabelDefinition, label_id)
@@ -4549,7 +5183,10 @@ def retry_handoff_single_label(
     db.add(label)
     db.commit()
 
-    bg.add_task(_classify_in_background, label_id)
+    payload = {"label_id": label_id}
+    if probe_service.AUTO_ACCEPT:
+        payload["auto_accept"] = True
+    _start_job(db, "handoff", payload, label_id=label_id)
 
     return HandoffResponse(
         label_id=label_id,
@@ -4560,7 +5197,20 @@ def retry_handoff_single_label(
     )
 
 
-@app.get("/api/single-labels/{label_id}/summary", response_model=SummaryResponse)
+@app.get("/api/single-labels/{label_id}/events")
+def stream_label_events(label_id: int, db: Session = Depends(get_session)):
+    """Server-Sent Events for a handoff: classification progress snapshots
+    (classified_count / classification_total / batch state) until the label
+    leaves phase='classifying'. Replaces polling /api/handoff-summaries."""
+    sub = progress_events.subscribe(progress_events.topic("label", label_id))
+    label = db.get(LabelDefinition, label_id)
+    if not label or label.mode != "single":
+        sub.close()
+        raise HTTPException(status_code=404, detail="Single-label not found")
+    return _event_stream(sub, _label_progress_event(label))
+
+
+@app.get("/api/single-labels/{label_id}/summary", response_model=SummaryResponse, dependencies=[Depends(readiness.require_ready)])
 def get_summary(label_id: int, db: Session = Depends(get_session)):
     label = db.get(LabelDefinition, label_id)
     if not label or label.mode != "single":
@@ -4570,7 +5220,7 @@ def get_summary(label_id: int, db: Session = Depends(get_session)):
         select(func.count(LabelApplication.id))
         .where(
             LabelApplication.label_id == label_id,
-            LabelApplication.applied_by == "ai",
+            LabelApplication.applied_by.in_(SINGLE_MACHINE_APPLIED_BY),
             LabelApplication.value == "yes",
         )
     ).one()
@@ -4578,7 +5228,7 @@ def get_summary(label_id: int, db: Session = Depends(get_session)):
         select(func.count(LabelApplication.id))
         .where(
             LabelApplication.label_id == label_id,
-            LabelApplication.applied_by == "ai",
+            LabelApplication.applied_by.in_(SINGLE_MACHINE_APPLIED_BY),
             LabelApplication.value == "no",
         )
     ).one()
@@ -4586,7 +5236,7 @@ def get_summary(label_id: int, db: Session = Depends(get_session)):
         select(func.count(LabelApplication.id))
         .where(
             LabelApplication.label_id == label_id,
-            LabelApplication.applied_by == "ai",
+            LabelApplication.applied_by.in_(SINGLE_MACHINE_APPLIED_BY),
             LabelApplication.confidence < REVIEW_THRESHOLD,
         )
     ).one()
@@ -4615,7 +5265,7 @@ def refine_single_label(label_id: int, db: Session = Depends(get_session)):
         select(LabelApplication)
         .where(
             LabelApplication.label_id == label_id,
-            LabelApplication.applied_by == "ai",
+            LabelApplication.applied_by.in_(SINGLE_MACHINE_APPLIED_BY),
         )
     ).all()
     for r in ai_rows:
@@ -4628,7 +5278,7 @@ def refine_single_label(label_id: int, db: Session = Depends(get_session)):
     return _label_to_response(db, label)
 
 
-@app.get("/api/single-labels/{label_id}/review-queue", response_model=List[ReviewItemResponse])
+@app.get("/api/single-labels/{label_id}/review-queue", response_model=List[ReviewItemResponse], dependencies=[Depends(readiness.require_ready)])
 def get_review_queue(
     label_id: int,
     limit: int = 50,
@@ -4641,7 +5291,7 @@ def get_review_queue(
         select(LabelApplication)
         .where(
             LabelApplication.label_id == label_id,
-            LabelApplication.applied_by == "ai",
+            LabelApplication.applied_by.in_(SINGLE_MACHINE_APPLIED_BY),
             LabelApplication.confidence < REVIEW_THRESHOLD,
         )
         .order_by(LabelApplication.confidence)  # type: ignore[arg-type]
@@ -4962,7 +5612,7 @@ def list_assignments(db: Session = Depends(get_session)):
     ]
 
 
-@app.get("/api/assignments/unmapped", response_model=UnmappedCountResponse)
+@app.get("/api/assignments/unmapped", response_model=UnmappedCountResponse, dependencies=[Depends(readiness.require_ready)])
 def get_unmapped_count(db: Session = Depends(get_session)):
     counts = assignment_service.message_count_per_assignment(db)
     return UnmappedCountResponse(
@@ -5020,7 +5670,7 @@ def merge_assignments_endpoint(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.post("/api/assignments/infer", response_model=InferAssignmentsResponse)
+@app.post("/api/assignments/infer", response_model=InferAssignmentsResponse, dependencies=[Depends(readiness.require_ready)])
 def infer_assignments(db: Session = Depends(get_session)):
     """Auto-detect assignments from cached notebook filenames. Read-only on external DB.
     Tries to backfill notebooks first if any cache rows are missing them, then groups
@@ -5044,7 +5694,7 @@ def delete_assignment(assignment_id: int, db: Session = Depends(get_session)):
     return {"ok": True, "cleared": cleared}
 
 
-@app.get("/api/handoff-summaries", response_model=List[HandoffSummaryListItem])
+@app.get("/api/handoff-summaries", response_model=List[HandoffSummaryListItem], dependencies=[Depends(readiness.require_ready)])
 def list_handoff_summaries(db: Session = Depends(get_session)):
     """List every single-label that has been handed off (in-progress, failed, ready
     for review, actively under review, or fully closed). Failed handoffs surface here
@@ -5070,21 +5720,21 @@ def list_handoff_summaries(db: Session = Depends(get_session)):
         yes_count = db.exec(
             select(func.count(LabelApplication.id)).where(
                 LabelApplication.label_id == label.id,
-                LabelApplication.applied_by == "ai",
+                LabelApplication.applied_by.in_(SINGLE_MACHINE_APPLIED_BY),
                 LabelApplication.value == "yes",
             )
         ).one()
         no_count = db.exec(
             select(func.count(LabelApplication.id)).where(
                 LabelApplication.label_id == label.id,
-                LabelApplication.applied_by == "ai",
+                LabelApplication.applied_by.in_(SINGLE_MACHINE_APPLIED_BY),
                 LabelApplication.value == "no",
             )
         ).one()
         review_count = db.exec(
             select(func.count(LabelApplication.id)).where(
                 LabelApplication.label_id == label.id,
-                LabelApplication.applied_by == "ai",
+                LabelApplication.applied_by.in_(SINGLE_MACHINE_APPLIED_BY),
                 LabelApplication.confidence < REVIEW_THRESHOLD,
             )
         ).one()
@@ -0,0 +1,310 @@
+# server/python/metrics.py
+"""Request metrics, exported in Prometheus text format at GET /api/metrics.
+
+`MetricsMiddleware` is a plain ASGI middleware (not BaseHTTPMiddleware, which
+adds a task + memory stream per request) that records, per route template
+(e.g. `/api/single-labels/{label_id}/next`, never the concrete path):
+
+- a request latency histogram,
+- how many SQL statements the request ran and how long they took, counted by
+  `before/after_cursor_execute` listeners on each engine passed to
+  `instrument_engine` (main wires `engine` and `ext_engine`); a statement
+  that raises is closed out by the `handle_error` listener instead,
+- response body bytes.
+
+For SQLite engines it also counts writer-lock contention: `busy` errors
+(`database is locked` after busy_timeout ran out) and lock waits. Python's
+sqlite3 has no busy-handler hook, so a lock wait is approximated as a write
+statement (INSERT/UPDATE/DELETE) slower than CHATSIGHT_SQLITE_LOCK_WAIT_MS;
+under WAL, readers never block, so slow writes are almost always waiting on
+the single writer.
+
+Per-request SQL counters live in a contextvar holding a mutable dict; sync
+routes run on the threadpool with a copy of the request's context, so their
+statements land in the same dict. Statements from background threads (no
+request context) are counted in the `background` series instead.
+
+Gauges (background-job progress, cache sizes) are pulled at scrape time from
+callbacks registered with `register_gauge`, so they cost nothing per request.
+"""
+import contextvars
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional, Union
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+LOCK_WAIT_THRESHOLD_SECONDS = float(os.environ.get("CHATSIGHT_SQLITE_LOCK_WAIT_MS", "50")) / 1000
+_WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLAC")
+
+_request_stats: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "request_sql_stats", default=None
+)
+
+
+class _RouteStats:
+    __slots__ = ("count", "latency_sum", "buckets", "sql_statements", "sql_seconds",
+                 "response_bytes", "errors")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last = +Inf
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.response_bytes = 0
+        self.errors = 0  # 5xx responses
+
+
+_routes: dict[tuple[str, str], _RouteStats] = {}
+_background = {"sql_statements": 0, "sql_seconds": 0.0}
+_sqlite = {"busy_errors": 0, "lock_waits": 0, "lock_wait_seconds": 0.0}
+_lock = threading.Lock()
+
+
+def _bucket_index(seconds: float) -> int:
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(LATENCY_BUCKETS)
+
+
+def observe_request(method: str, route: str, seconds: float, sql_statements: int,
+                    sql_seconds: float, response_bytes: int, status: int) -> None:
+    with _lock:
+        s = _routes.get((method, route))
+        if s is None:
+            s = _routes[(method, route)] = _RouteStats()
+        s.count += 1
+        s.latency_sum += seconds
+        s.buckets[_bucket_index(seconds)] += 1
+        s.sql_statements += sql_statements
+        s.sql_seconds += sql_seconds
+        s.response_bytes += response_bytes
+        if status >= 500:
+            s.errors += 1
+
+
+def reset() -> None:
+    with _lock:
+        _routes.clear()
+        _background.update(sql_statements=0, sql_seconds=0.0)
+        _sqlite.update(busy_errors=0, lock_waits=0, lock_wait_seconds=0.0)
+
+
+def route_snapshot() -> dict[tuple[str, str], dict[str, Any]]:
+    """Plain-dict copy of the per-route counters (for tests and debugging)."""
+    with _lock:
+        return {
+            key: {name: getattr(s, name) for name in _RouteStats.__slots__}
+            for key, s in _routes.items()
+        }
+
+
+def sqlite_snapshot() -> dict[str, Any]:
+    with _lock:
+        return dict(_sqlite)
+
+
+# ── SQL instrumentation ──────────────────────────────────────────────────────
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _count_statement(conn, statement)
+
+
+def _count_statement(conn, statement) -> None:
+    """Pop the statement's start time and add its elapsed time to the current
+    request (or the background totals)."""
+    starts = conn.info.get("metrics_query_start")
+    elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+    stats = _request_stats.get()
+    if stats is not None:
+        stats["sql_statements"] += 1
+        stats["sql_seconds"] += elapsed
+    else:
+        with _lock:
+            _background["sql_statements"] += 1
+            _background["sql_seconds"] += elapsed
+    if (elapsed >= LOCK_WAIT_THRESHOLD_SECONDS and conn.dialect.name == "sqlite"
+            and statement.lstrip()[:6].upper() in _WRITE_VERBS):
+        with _lock:
+            _sqlite["lock_waits"] += 1
+            _sqlite["lock_wait_seconds"] += elapsed
+
+
+def _handle_error(exception_context):
+    # A statement that raises never reaches after_cursor_execute: pop its
+    # start here so it neither lingers on the pooled connection nor goes
+    # missing from sql_seconds.
+    conn = exception_context.connection
+    if (conn is not None and exception_context.statement is not None
+            and conn.info.get("metrics_query_start")):
+        _count_statement(conn, exception_context.statement)
+    if exception_context.dialect.name != "sqlite":
+        return
+    message = str(exception_context.original_exception).lower()
+    if "database is locked" in message or "database table is locked" in message:
+        with _lock:
+            _sqlite["busy_errors"] += 1
+
+
+def instrument_engine(db_engine) -> None:
+    """Count statements and SQL time on `db_engine` (plus lock contention if
+    it's SQLite). Idempotent."""
+    if not event.contains(db_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(db_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(db_engine, "handle_error", _handle_error)
+
+
+# ── Middleware ───────────────────────────────────────────────────────────────
+
+class MetricsMiddleware:
+    def __init__(self, app, exclude_paths: Iterable[str] = ("/api/metrics",)):
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = {"sql_statements": 0, "sql_seconds": 0.0}
+        token = _request_stats.set(stats)
+        status = 500
+        body_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status, body_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            # The router stores the matched route on the scope (shared dict).
+            route = scope.get("route")
+            template = getattr(route, "path", None) or UNMATCHED_ROUTE
+            observe_request(scope["method"], template, elapsed, stats["sql_statements"],
+                            stats["sql_seconds"], body_bytes, status)
+
+
+# ── Gauges ───────────────────────────────────────────────────────────────────
+
+GaugeValue = Union[float, int, bool, None, Iterable[tuple[dict[str, Any], float]]]
+_gauges: dict[str, tuple[str, str, Callable[[], GaugeValue]]] = {}
+
+
+def register_gauge(name: str, help_text: str, fn: Callable[[], GaugeValue], kind: str = "gauge") -> None:
+    """`fn` returns a number, or an iterable of (labels, value) pairs for a
+    labelled family. Called on every scrape; failures skip the family.
+    `kind="counter"` exposes a monotonically increasing value kept elsewhere."""
+    _gauges[name] = (kind, help_text, fn)
+
+
+# ── Exposition ───────────────────────────────────────────────────────────────
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _num(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+def render(extra: Optional[dict[str, tuple[str, GaugeValue]]] = None) -> str:
+    """Everything in Prometheus text exposition format 0.0.4. `extra` maps
+    gauge name → (help, value) for values the caller computed itself (e.g.
+    ones that need the request's DB session)."""
+    lines: list[str] = []
+
+    def family(name: str, kind: str, help_text: str) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    with _lock:
+        routes = sorted(_routes.items())
+        background = dict(_background)
+        sqlite = dict(_sqlite)
+
+    family("chatsight_http_request_duration_seconds", "histogram", "Request latency by route template.")
+    for (method, route), s in routes:
+        base = {"method": method, "route": route}
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS + (math.inf,), s.buckets):
+            cumulative += n
+            le = "+Inf" if math.isinf(bound) else repr(bound)
+            lines.append(f"chatsight_http_request_duration_seconds_bucket{_labels({**base, 'le': le})} {cumulative}")
+        lines.append(f"chatsight_http_request_duration_seconds_sum{_labels(base)} {_num(s.latency_sum)}")
+        lines.append(f"chatsight_http_request_duration_seconds_count{_labels(base)} {s.count}")
+
+    for name, attr, kind, help_text in (
+        ("chatsight_http_errors_total", "errors", "counter", "5xx responses by route template."),
+        ("chatsight_http_response_bytes_total", "response_bytes", "counter", "Response body bytes by route template."),
+        ("chatsight_http_sql_statements_total", "sql_statements", "counter", "SQL statements executed while serving requests."),
+        ("chatsight_http_sql_seconds_total", "sql_seconds", "counter", "Time spent in SQL while serving requests."),
+    ):
+        family(name, kind, help_text)
+        for (method, route), s in routes:
+            lines.append(f"{name}{_labels({'method': method, 'route': route})} {_num(getattr(s, attr))}")
+
+    family("chatsight_background_sql_statements_total", "counter", "SQL statements executed outside any request.")
+    lines.append(f"chatsight_background_sql_statements_total {background['sql_statements']}")
+    family("chatsight_background_sql_seconds_total", "counter", "Time spent in SQL outside any request.")
+    lines.append(f"chatsight_background_sql_seconds_total {_num(background['sql_seconds'])}")
+
+    for name, key, help_text in (
+        ("chatsight_sqlite_busy_errors_total", "busy_errors", "SQLite 'database is locked' errors (busy_timeout exhausted)."),
+        ("chatsight_sqlite_lock_waits_total", "lock_waits", "SQLite writes slower than the lock-wait threshold."),
+        ("chatsight_sqlite_lock_wait_seconds_total", "lock_wait_seconds", "Time spent in those slow SQLite writes."),
+    ):
+        family(name, "counter", help_text)
+        lines.append(f"{name} {_num(sqlite[key])}")
+
+    collected: list[tuple[str, str, str, GaugeValue]] = []
+    for name, (kind, help_text, fn) in sorted(_gauges.items()):
+        try:
+            value = fn()
+            if value is not None and not isinstance(value, (int, float, bool)):
+                value = list(value)
+        except Exception:
+            continue
+        collected.append((name, kind, help_text, value))
+    for name, (help_text, value) in sorted((extra or {}).items()):
+        collected.append((name, "gauge", help_text, value))
+
+    for name, kind, help_text, value in collected:
+        if value is None:
+            continue
+        family(name, kind, help_text)
+        if isinstance(value, (int, float, bool)):
+            lines.append(f"{name} {_num(value)}")
+        else:
+            for labels, v in value:
+                lines.append(f"{name}{_labels(labels)} {_num(v)}")
+
+    return "\n".join(lines) + "\n"
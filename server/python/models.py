@@ -84,9 +84,8 @@ class LabelApplication(SQLModel, table=True):
 
 
 class LabelPrediction(SQLModel, table=True):
-    """Cached nearest-neighbor results for a label's unlabeled messages.
-    Rebuilt lazily by assist_service when the human label count diverges
-    from the stored model_version by >= 5."""
+    """Linear-probe P(yes) for a single label's in-scope messages, written in
+    bulk by probe_service's `probe_predictions` job."""
     __table_args__ = (
         UniqueConstraint("label_id", "chatlog_id", "message_index", name="uq_labelpred_msg"),
     )
@@ -94,8 +93,8 @@ class LabelPrediction(SQLModel, table=True):
     label_id: int = Field(foreign_key="labeldefinition.id", index=True)
     chatlog_id: int = Field(index=True)
     message_index: int
-    nearest_neighbors: str  # JSON-encoded list of AssistNeighbor dicts
-    model_version: int  # = human_label_count at the time of build
+    probability: float  # P(yes) from the label's probe
+    model_version: int  # = the probe's update count when written
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -163,6 +162,25 @@ class MessageCache(SQLModel, table=True):
     assignment_id: Optional[int] = Field(default=None, foreign_key="assignmentmapping.id")
 
 
+class MessageFeatures(SQLModel, table=True):
+    """Text-only explore heuristics per student message, computed once from
+    message_text (explore_service.compute_message_features) at ingest or by
+    the startup backfill, and read in bulk by the explore scorer."""
+    chatlog_id: int = Field(primary_key=True)
+    message_index: int = Field(primary_key=True)
+    paste_likelihood: float    # 0–1: pasted spec / code / error rather than an original ask
+    genericness: float         # 0–1: "help" / "question 1.2" style ping
+    specificity: float         # 0–1, before the corpus-rarity adjustment
+    length: int                # characters, stripped
+    code_fence_ratio: float    # share of characters inside ``` fences
+    # Spam indicators
+    generic_ping: bool         # very short, or matches a generic-help pattern
+    repeated_lines: int        # occurrences of the most repeated line
+    # Near-duplicates: dedup_service.minhash_signature, banded into an LSH index
+    minhash: Optional[bytes] = None
+    features_version: int      # explore_service.FEATURES_VERSION that computed the row
+
+
 class MessageEmbedding(SQLModel, table=True):
     __table_args__ = (
         UniqueConstraint("chatlog_id", "message_index", "model_version"),
@@ -226,3 +244,59 @@ class SuggestionCache(SQLModel, table=True):
     rationale: str
     labels_hash: str  # hash of all active label names; invalidated when labels change
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class LlmCallLog(SQLModel, table=True):
+    """One row per Gemini request (each retry attempt is its own row).
+    Written in batches by llm_ledger; aggregated by GET /api/llm-usage."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    call_site: str  # e.g. "binary_autolabel.classify"
+    model: str
+    input_tokens: int = Field(default=0)   # usage_metadata.prompt_token_count
+    output_tokens: int = Field(default=0)  # usage_metadata.candidates_token_count
+    latency_ms: float
+    retry_count: int = Field(default=0)  # 0 = first attempt
+    outcome: str  # "ok" | "rate_limited" | "timeout" | "error"
+    label_id: Optional[int] = Field(default=None, index=True)
+    job_id: Optional[str] = Field(default=None, index=True)  # e.g. "handoff-1a2b3c4d"
+
+
+class Job(SQLModel, table=True):
+    """One background job (handoff classification, autolabel, discovery...).
+    The API enqueues rows; jobs.py workers lease and run them."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(index=True)  # handler name registered with jobs.register
+    payload_json: str = Field(default="{}")
+    status: str = Field(default="queued", index=True)  # queued | running | succeeded | failed | cancelled
+    label_id: Optional[int] = Field(default=None, index=True)
+    attempts: int = Field(default=0)  # leases taken so far, including the current one
+    max_attempts: int = Field(default=3)
+    run_after: datetime = Field(default_factory=datetime.utcnow)  # retry backoff
+    lease_owner: Optional[str] = Field(default=None)  # worker id holding the lease
+    lease_expires_at: Optional[datetime] = Field(default=None)
+    heartbeat_at: Optional[datetime] = Field(default=None)
+    cancel_requested: bool = Field(default=False)
+    processed: int = Field(default=0)
+    total: int = Field(default=0)
+    error: Optional[str] = Field(default=None)
+    result_json: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+
+
+class AdvisoryLock(SQLModel, table=True):
+    """A named cross-process lock held under a renewable lease (shared_state.py)."""
+    name: str = Field(primary_key=True)  # e.g. "inline-classify"
+    owner: str  # host:pid:thread:nonce of the holder
+    acquired_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime  # free for the taking after this
+
+
+class CacheVersion(SQLModel, table=True):
+    """Change counter behind a process-local cache; bumped by every writer of
+    the cached table (shared_state.py)."""
+    name: str = Field(primary_key=True)  # e.g. "message_embedding"
+    version: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
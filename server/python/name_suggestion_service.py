@@ -3,15 +3,13 @@ import os
 from typing import List, Optional
 
 import numpy as np
-from google import genai
-from google.genai import types as genai_types
+
+import gemini_gateway
 
 SUGGESTION_SIMILARITY_THRESHOLD = 0.75
 _EMBED_MODEL = "gemini-embedding-001"
 _GENERATE_MODEL = "gemini-2.5-flash"
 
-client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY", ""))
-
 # Module-level cache so the on-demand generation only runs once per server session
 _generated_cache: Optional[List[dict]] = None
 
@@ -44,7 +42,9 @@ def filter_suggestions(
         ]
 
     all_texts = candidate_names + existing_names
-    resp = client.models.embed_content(model=_EMBED_MODEL, contents=all_texts)
+    resp = gemini_gateway.embed_content(
+        model=_EMBED_MODEL, contents=all_texts, call_site="name_suggestion.embed",
+    )
     embeddings = [e.values for e in resp.embeddings]
 
     cand_vecs = embeddings[: len(candidate_names)]
@@ -101,10 +101,13 @@ def generate_from_messages(
         '[{"name": "label name", "description": "one sentence description"}, ...]'
     )
 
-    response = client.models.generate_content(
+    from google.genai import types as genai_types
+
+    response = gemini_gateway.generate_content(
         model=_GENERATE_MODEL,
         contents=prompt,
         config=genai_types.GenerateContentConfig(temperature=0.3),
+        call_site="name_suggestion.generate",
     )
 
     text = response.text.strip()
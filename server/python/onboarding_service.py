@@ -13,6 +13,7 @@ from sqlalchemy import func
 from sqlmodel import Session, select
 
 import explore_service
+import gemini_gateway
 import queue_service
 from models import MessageCache, OnboardingStarterCache
 
@@ -86,7 +87,7 @@ def rule_based_label_suggestions(text: str) -> list[str]:
 
 def _ai_label_suggestions_for_turns(turns: list[tuple[int, str]]) -> Optional[dict[int, list[str]]]:
     """Gemini: 2–3 short label names per student message. None if unavailable."""
-    if not explore_service._gemini_available():
+    if not gemini_gateway.available():
         return None
     try:
         blocks = []
@@ -104,9 +105,11 @@ def _ai_label_suggestions_for_turns(turns: list[tuple[int, str]]) -> Optional[di
             + '\n\nRespond with ONLY valid JSON: {"suggestions": [["name1","name2"], ...]} '
             "one inner array per message in order."
         )
-        response = explore_service._client_get().models.generate_content(
+        response = gemini_gateway.generate_content(
             model="gemini-2.5-flash",
             contents=prompt,
+            call_site="onboarding.suggest",
+            max_attempts=1,
         )
         raw = ""
         for part in response.candidates[0].content.parts:
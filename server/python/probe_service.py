@@ -0,0 +1,379 @@
+"""Online linear probe per single label: a logistic regression over the stored
+message embeddings (scikit-learn SGDClassifier, log loss), fitted on the
+label's human yes/no decisions and nudged by `partial_fit` on every new one.
+
+It gives every embedded message an instant P(yes) without Gemini:
+- the explore sampler reads probe uncertainty (1 − |2p − 1|) in place of the
+  per-request k-NN vote once both classes have PROBE_MIN_PER_CLASS examples;
+- the `probe_predictions` job writes P(yes) for the label's whole study scope
+  into LabelPrediction;
+- at handoff, messages whose confidence clears the calibrated threshold can be
+  accepted as rows with applied_by='probe' (APPLIED_BY), so only the uncertain
+  band goes to Gemini.
+
+One probe per (engine, label), keyed by the label's human_labels version
+(shared_state) like explore_service's labeled centroids: a decision that is
+exactly one version ahead is learned incrementally, anything else (an undo, a
+decision from another process, new or re-embedded messages) refits from the
+labeled set. For file-backed
+databases the probe is also pickled to CHATSIGHT_PROBE_DIR (default
+database/probes/ at the repo root), so a restart resumes it instead of refitting:
+a refit is saved at once, while decisions only mark the probe changed and a
+background thread saves changed probes every PROBE_SAVE_SECONDS (and on stop()),
+keeping file I/O off /decide. A probe whose last decisions were never saved
+loads as stale and refits."""
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import threading
+import weakref
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+from sqlmodel import Session, select
+
+import assist_service
+import shared_state
+import study_scope
+import write_queue
+from concept_service import EMBED_MODEL
+from database import upsert_insert
+from models import LabelApplication, LabelPrediction
+
+# sklearn is imported where it's used, like concept_service and lexical_service.
+
+logger = logging.getLogger(__name__)
+
+APPLIED_BY = "probe"
+PROBE_DIR = Path(os.environ.get(
+    "CHATSIGHT_PROBE_DIR",
+    str(Path(__file__).resolve().parent.parent.parent / "database" / "probes"),
+))
+PROBE_MIN_PER_CLASS = max(2, int(os.environ.get("CHATSIGHT_PROBE_MIN_PER_CLASS", "5")))
+PROBE_EPOCHS = 5            # passes over the labeled set when refitting
+PROBE_SAVE_SECONDS = float(os.environ.get("CHATSIGHT_PROBE_SAVE_SECONDS", "30"))
+PROBE_PREDICT_EVERY = max(1, int(os.environ.get("CHATSIGHT_PROBE_PREDICT_EVERY", "25")))
+AUTO_ACCEPT = os.environ.get("CHATSIGHT_PROBE_AUTO_ACCEPT", "0") != "0"
+AUTO_ACCEPT_PRECISION = float(os.environ.get("CHATSIGHT_PROBE_AUTO_ACCEPT_PRECISION", "0.95"))
+AUTO_ACCEPT_MIN_SUPPORT = 20   # held-out decisions at or above the threshold
+PREDICTION_CHUNK = 2000
+
+_lock = threading.Lock()
+_probes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_changed: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()  # bind -> unsaved label ids
+_saver_stop = threading.Event()
+_saver: Optional[threading.Thread] = None
+
+
+def _classifier():
+    from sklearn.linear_model import SGDClassifier
+    return SGDClassifier(loss="log_loss", alpha=1e-4, random_state=0)
+
+
+def _fit(x: np.ndarray, y: np.ndarray):
+    model = _classifier()
+    rng = np.random.default_rng(0)
+    for _ in range(PROBE_EPOCHS):
+        order = rng.permutation(len(y))
+        model.partial_fit(x[order], y[order], classes=[0, 1])
+    return model
+
+
+def _labeled(session: Session, label_id: int) -> tuple[np.ndarray, np.ndarray]:
+    """(embeddings, 1 for yes / 0 for no) of the label's embedded human decisions."""
+    decisions = session.exec(
+        select(LabelApplication.chatlog_id, LabelApplication.message_index, LabelApplication.value)
+        .where(
+            LabelApplication.label_id == label_id,
+            LabelApplication.applied_by == "human",
+            LabelApplication.value.in_(["yes", "no"]),
+        )
+        .order_by(LabelApplication.created_at, LabelApplication.id)
+    ).all()
+    rows, y = [], []
+    if decisions:
+        matrix, keys_idx = assist_service.embedding_matrix(session)
+        for cid, midx, value in decisions if matrix is not None else ():
+            row = keys_idx.get((cid, midx))
+            if row is not None:
+                rows.append(row)
+                y.append(1 if value == "yes" else 0)
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    return matrix[rows], np.array(y, dtype=np.int64)
+
+
+def _path(label_id: int) -> Path:
+    return PROBE_DIR / f"label-{label_id}.pkl"
+
+
+def _persistent(bind) -> bool:
+    url = bind.url
+    return not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"))
+
+
+def _db(session: Session) -> str:
+    return session.get_bind().url.render_as_string(hide_password=True)
+
+
+def _dump(probe: dict) -> bytes:
+    return pickle.dumps({k: v for k, v in probe.items() if k != "calibration"})
+
+
+def _write(label_id: int, blob: bytes) -> None:
+    try:
+        PROBE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = _path(label_id).with_suffix(".tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, _path(label_id))
+    except OSError as exc:
+        logger.warning("could not save probe for label %s to %s: %s", label_id, PROBE_DIR, exc)
+
+
+def _load(session: Session, label_id: int, key: tuple[int, int]) -> Optional[dict]:
+    if not _persistent(session.get_bind()):
+        return None
+    try:
+        with open(_path(label_id), "rb") as fh:
+            probe = pickle.load(fh)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if (probe.get("db"), probe.get("embed_model")) != (_db(session), EMBED_MODEL) or _key(probe) != key:
+        return None
+    return probe
+
+
+def _build(session: Session, label_id: int, key: tuple[int, int]) -> dict:
+    x, y = _labeled(session, label_id)
+    yes = int(y.sum())
+    probe = {
+        "db": _db(session),
+        "embed_model": EMBED_MODEL,
+        "version": key[0],
+        "embeddings": key[1],
+        "model": _fit(x, y) if len(y) else None,
+        "yes": yes,
+        "no": int(len(y) - yes),
+        "updates": int(len(y)),
+    }
+    if _persistent(session.get_bind()):
+        _write(label_id, _dump(probe))
+    return probe
+
+
+def _current_key(session: Session, label_id: int) -> tuple[int, int]:
+    return (
+        shared_state.version(session, shared_state.human_labels(label_id)),
+        shared_state.version(session, "message_embedding"),
+    )
+
+
+def _key(probe: dict) -> tuple[int, int]:
+    return probe["version"], probe["embeddings"]
+
+
+def get_probe(session: Session, label_id: int) -> dict:
+    """The label's probe for the current human_labels and message_embedding
+    versions: in memory, else saved, else refitted from the labeled set."""
+    bind = session.get_bind()
+    key = _current_key(session, label_id)
+    with _lock:
+        probes = _probes.setdefault(bind, {})
+        probe = probes.get(label_id)
+        if probe is None or _key(probe) != key or probe["embed_model"] != EMBED_MODEL:
+            probe = _load(session, label_id, key) or _build(session, label_id, key)
+            probes[label_id] = probe
+        return probe
+
+
+def is_ready(probe: dict) -> bool:
+    return probe["model"] is not None and min(probe["yes"], probe["no"]) >= PROBE_MIN_PER_CLASS
+
+
+def note_decision(session: Session, label_id: int, chatlog_id: int, message_index: int,
+                  value: Optional[str]) -> Optional[dict]:
+    """Learn one new decision (after it is written). When the cached probe is
+    exactly one human_labels version behind this was the only change, so one
+    `partial_fit` step catches it up; otherwise the probe is dropped and the
+    next read refits. Returns the updated probe, or None when dropped."""
+    bind = session.get_bind()
+    version, embeddings = _current_key(session, label_id)
+    with _lock:
+        probes = _probes.setdefault(bind, {})
+        probe = probes.get(label_id)
+        if probe is None or _key(probe) != (version - 1, embeddings) or value is None:
+            probes.pop(label_id, None)
+            return None
+        probe["version"] = version
+        probe.pop("calibration", None)
+        if value in ("yes", "no"):
+            matrix, keys_idx = assist_service.embedding_matrix(session)
+            row = keys_idx.get((chatlog_id, message_index))
+            if row is not None:
+                y = np.array([1 if value == "yes" else 0])
+                if probe["model"] is None:
+                    probe["model"] = _classifier()
+                probe["model"].partial_fit(matrix[row][None, :], y, classes=[0, 1])
+                probe["yes" if value == "yes" else "no"] += 1
+                probe["updates"] += 1
+        if _persistent(bind):
+            _changed.setdefault(bind, set()).add(label_id)
+            _start_saver()
+        return probe
+
+
+def _start_saver() -> None:
+    """Start the background saver unless it is running. Called under _lock."""
+    global _saver
+    if _saver is None or not _saver.is_alive():
+        _saver_stop.clear()
+        _saver = threading.Thread(target=_save_loop, name="probe-saver", daemon=True)
+        _saver.start()
+
+
+def _save_loop() -> None:
+    while not _saver_stop.wait(PROBE_SAVE_SECONDS):
+        try:
+            flush()
+        except Exception:
+            logger.exception("probe save failed")
+
+
+def flush() -> int:
+    """Save every probe a decision changed since its last save; returns how
+    many. Only the pickling happens under the lock, not the file writes."""
+    with _lock:
+        blobs = [
+            (label_id, _dump(_probes[bind][label_id]))
+            for bind, label_ids in _changed.items()
+            for label_id in label_ids
+            if label_id in _probes.get(bind, {})
+        ]
+        _changed.clear()
+    for label_id, blob in blobs:
+        _write(label_id, blob)
+    return len(blobs)
+
+
+def stop() -> None:
+    """Stop the background saver and save whatever is still unsaved."""
+    global _saver
+    _saver_stop.set()
+    if _saver is not None:
+        _saver.join(timeout=5)
+        _saver = None
+    flush()
+
+
+def predict(session: Session, label_id: int,
+            keys: Iterable[tuple[int, int]]) -> dict[tuple[int, int], float]:
+    """P(yes) for every key with an embedding; empty until the probe is ready."""
+    probe = get_probe(session, label_id)
+    if not is_ready(probe):
+        return {}
+    matrix, keys_idx = assist_service.embedding_matrix(session)
+    known = [(k, keys_idx[k]) for k in keys if k in keys_idx]
+    if not known:
+        return {}
+    probs = probe["model"].predict_proba(matrix[[row for _k, row in known]])[:, 1]
+    return {k: float(p) for (k, _row), p in zip(known, probs)}
+
+
+def uncertainties(session: Session, label_id: int,
+                  keys: Iterable[tuple[int, int]]) -> dict[tuple[int, int], float]:
+    """1 − |2·P(yes) − 1| per key: 1 on the decision boundary, 0 when certain."""
+    return {k: 1.0 - abs(2.0 * p - 1.0) for k, p in predict(session, label_id, keys).items()}
+
+
+def calibrate(session: Session, label_id: int) -> Optional[dict]:
+    """The lowest confidence max(p, 1 − p) at which held-out probe predictions
+    reach AUTO_ACCEPT_PRECISION, from out-of-fold predictions over the labeled
+    set: {threshold, precision, support, labeled}. None when too few decisions
+    clear it (or the probe isn't ready)."""
+    probe = get_probe(session, label_id)
+    if "calibration" in probe:
+        return probe["calibration"]
+    calibration = None
+    if is_ready(probe):
+        from sklearn.model_selection import StratifiedKFold
+
+        x, y = _labeled(session, label_id)
+        held_out = np.zeros(len(y))
+        folds = StratifiedKFold(n_splits=min(5, probe["yes"], probe["no"]), shuffle=True, random_state=0)
+        for train, test in folds.split(x, y):
+            held_out[test] = _fit(x[train], y[train]).predict_proba(x[test])[:, 1]
+        confidence = np.maximum(held_out, 1.0 - held_out)
+        correct = (held_out >= 0.5) == (y == 1)
+        order = np.argsort(-confidence, kind="stable")
+        precision = np.cumsum(correct[order]) / np.arange(1, len(y) + 1)
+        # Cut only where the confidence changes, so ties land on one side.
+        cuts = np.flatnonzero(np.r_[confidence[order][1:] != confidence[order][:-1], True])
+        good = [i for i in cuts if i + 1 >= AUTO_ACCEPT_MIN_SUPPORT and precision[i] >= AUTO_ACCEPT_PRECISION]
+        if good:
+            i = good[-1]
+            calibration = {
+                "threshold": float(confidence[order][i]),
+                "precision": float(precision[i]),
+                "support": int(i + 1),
+                "labeled": int(len(y)),
+            }
+    probe["calibration"] = calibration
+    return calibration
+
+
+def auto_accept(session: Session, label_id: int,
+                keys: Iterable[tuple[int, int]]) -> dict[tuple[int, int], float]:
+    """The subset of `keys` confident enough to accept without Gemini, with
+    their P(yes). Empty unless calibration found a threshold."""
+    calibration = calibrate(session, label_id)
+    if calibration is None:
+        return {}
+    return {
+        k: p for k, p in predict(session, label_id, keys).items()
+        if max(p, 1.0 - p) >= calibration["threshold"]
+    }
+
+
+def write_predictions(session: Session, label_id: int,
+                      progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """Upsert P(yes) for every embedded message in the label's study scope into
+    LabelPrediction (model_version = the probe's update count), as
+    PREDICTION_CHUNK-row bulk writes. Returns the number written."""
+    in_scope = study_scope.in_scope_keys(session, study_scope.scope_for_mode("single"))
+    probe = get_probe(session, label_id)
+    probs = predict(session, label_id, sorted(in_scope))
+    items = list(probs.items())
+    version = probe["updates"]
+    for start in range(0, len(items), PREDICTION_CHUNK):
+        chunk = items[start:start + PREDICTION_CHUNK]
+
+        def write(w: Session, chunk=chunk) -> None:
+            insert = upsert_insert(w)
+            stmt = insert(LabelPrediction).values([
+                {"label_id": label_id, "chatlog_id": cid, "message_index": midx,
+                 "probability": p, "model_version": version}
+                for (cid, midx), p in chunk
+            ])
+            w.execute(stmt.on_conflict_do_update(
+                index_elements=["label_id", "chatlog_id", "message_index"],
+                set_={c: stmt.excluded[c] for c in ("probability", "model_version", "updated_at")},
+            ))
+
+        write_queue.write(session, write, priority=write_queue.BULK)
+        if progress is not None:
+            progress(start + len(chunk), len(items))
+    return len(items)
+
+
+def status(session: Session, label_id: int) -> dict:
+    probe = get_probe(session, label_id)
+    return {
+        "ready": is_ready(probe),
+        "yes": probe["yes"],
+        "no": probe["no"],
+        "updates": probe["updates"],
+        "calibration": calibrate(session, label_id),
+    }
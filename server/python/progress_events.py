@@ -0,0 +1,187 @@
+# server/python/progress_events.py
+"""In-process progress broadcaster behind the Server-Sent Events routes.
+
+Job and classification code publish a complete progress snapshot for a topic
+("job:<id>", "label:<id>") right after committing it; SSE subscribers
+(GET /api/jobs/{id}/events, GET /api/single-labels/{id}/events) receive the
+latest snapshot at most MAX_EVENTS_PER_SECOND times a second. Each
+subscription holds a single slot rather than a queue: a newer snapshot
+replaces one that hasn't been delivered yet, so a burst of updates costs a
+slow client nothing and never blocks the publisher. After the initial
+snapshot, streaming does no DB reads at all — unlike the polling endpoints,
+which re-run their count queries on every poll.
+
+Publishers in other processes (`python -m worker`) can't reach this hub, so
+with CHATSIGHT_JOB_RUNNER=worker a single watcher thread re-reads the rows of
+the subscribed topics every WATCH_SECONDS and publishes those that changed:
+one query per tick for all subscribers together, and none while nobody is
+listening.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_EVENTS_PER_SECOND = float(os.environ.get("CHATSIGHT_SSE_MAX_EVENTS_PER_SECOND", "2"))
+KEEPALIVE_SECONDS = 15.0
+WATCH_SECONDS = float(os.environ.get("CHATSIGHT_SSE_WATCH_SECONDS", "1"))
+
+Event = dict[str, Any]
+
+
+def topic(kind: str, ident: int) -> str:
+    return f"{kind}:{ident}"
+
+
+class Subscription:
+    """One subscriber's latest-value slot for a topic."""
+
+    def __init__(self, hub: "Hub", topic_name: str):
+        self.topic = topic_name
+        self.coalesced = 0  # snapshots replaced before they were delivered
+        self._hub = hub
+        self._pending: Optional[Event] = None
+        self._lock = threading.Lock()
+
+    def offer(self, event: Event) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = event
+
+    def take(self) -> Optional[Event]:
+        """The newest undelivered snapshot, or None."""
+        with self._lock:
+            event, self._pending = self._pending, None
+        return event
+
+    def close(self) -> None:
+        self._hub.unsubscribe(self)
+
+
+class Hub:
+    def __init__(self):
+        self._subs: dict[str, set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic_name: str) -> Subscription:
+        sub = Subscription(self, topic_name)
+        with self._lock:
+            self._subs[topic_name].add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.topic]
+
+    def publish(self, topic_name: str, event: Event) -> int:
+        """Offer `event` to every subscriber of the topic; returns how many."""
+        with self._lock:
+            subs = list(self._subs.get(topic_name, ()))
+        for sub in subs:
+            sub.offer(event)
+        return len(subs)
+
+    def topics(self) -> set[str]:
+        with self._lock:
+            return set(self._subs)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subs.values())
+
+
+hub = Hub()
+
+
+def publish(topic_name: str, event: Event) -> int:
+    return hub.publish(topic_name, event)
+
+
+def subscribe(topic_name: str) -> Subscription:
+    return hub.subscribe(topic_name)
+
+
+def format_event(event: Event) -> str:
+    return f"data: {json.dumps(event, default=str)}\n\n"
+
+
+async def stream(
+    sub: Subscription,
+    first: Event,
+    *,
+    max_rate: Optional[float] = None,
+    keepalive: float = KEEPALIVE_SECONDS,
+    sleep: Callable[[float], Any] = asyncio.sleep,
+) -> AsyncIterator[str]:
+    """SSE body: `first` (the DB snapshot), then the subscription's latest
+    snapshot at most `max_rate` times a second, until one is marked `done`.
+    Closes the subscription however the stream ends (incl. disconnects)."""
+    interval = 1.0 / (max_rate or MAX_EVENTS_PER_SECOND)
+    try:
+        yield format_event(first)
+        if first.get("done"):
+            return
+        idle = 0.0
+        while True:
+            await sleep(interval)
+            event = sub.take()
+            if event is None:
+                idle += interval
+                if idle >= keepalive:
+                    idle = 0.0
+                    yield ": keep-alive\n\n"
+                continue
+            idle = 0.0
+            yield format_event(event)
+            if event.get("done"):
+                return
+    finally:
+        sub.close()
+
+
+# ── Cross-process watcher (CHATSIGHT_JOB_RUNNER=worker) ──────────────────────
+
+_watcher: Optional[threading.Thread] = None
+_watcher_lock = threading.Lock()
+
+
+def ensure_watcher(poll: Callable[[set[str]], Iterable[tuple[str, Event]]]) -> None:
+    """Start (once) a thread that calls `poll(subscribed_topics)` every
+    WATCH_SECONDS while anyone is subscribed and publishes the snapshots that
+    differ from the last ones it saw."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is not None and _watcher.is_alive():
+            return
+        _watcher = threading.Thread(target=_watch, args=(poll,), name="progress-watcher", daemon=True)
+        _watcher.start()
+
+
+def _watch(poll: Callable[[set[str]], Iterable[tuple[str, Event]]]) -> None:
+    last: dict[str, Event] = {}
+    while True:
+        time.sleep(WATCH_SECONDS)
+        topics = hub.topics()
+        last = {t: e for t, e in last.items() if t in topics}
+        if not topics:
+            continue
+        try:
+            for topic_name, event in poll(topics):
+                if last.get(topic_name) != event:
+                    last[topic_name] = event
+                    publish(topic_name, event)
+        except Exception:
+            logger.exception("progress watcher poll failed")
@@ -7,6 +7,7 @@ import math
 import os
 import random
 import threading
+import time
 from collections import OrderedDict
 from typing import Iterable, Optional, Tuple
 
@@ -14,7 +15,10 @@ from sqlalchemy import text as sql_text
 from sqlmodel import Session, select
 
 import assist_service
+import dedup_service
 import explore_service
+import lexical_service
+import probe_service
 import study_scope
 from database import ext_engine
 from models import (
@@ -27,12 +31,17 @@ from models import (
 
 logger = logging.getLogger(__name__)
 
+# Clock for the explore scoring budget; tests swap in a fake.
+_clock = time.monotonic
+
 # Virtual label id for pre-label /run browse: uses hybrid sampling without DB rows.
 ONBOARDING_BROWSE_LABEL_ID = 0
 
 # Conversation threads in `events` are immutable once ingested, so a per-process
 # cache keyed by chatlog_id removes redundant Postgres roundtrips during /run
 # (the instructor stays in one conversation across several decide clicks).
+# Immutable entries need no cross-process invalidation: each uvicorn worker
+# keeps its own copy and none can go stale.
 _THREAD_CACHE_MAX = 512
 _thread_cache: "OrderedDict[int, list[dict]]" = OrderedDict()
 _thread_cache_lock = threading.Lock()
@@ -49,10 +58,12 @@ def neighbor_uncertainty_novelty(
     label_id: int,
     chatlog_id: int,
     message_index: int,
+    *,
+    embed_missing: bool = True,
 ) -> Optional[Tuple[float, float]]:
     """From live embedding k-NN (same source as /assist), return (uncertainty, novelty) in [0,1]."""
     neighbors = assist_service.nearest_neighbors(
-        session, label_id, chatlog_id, message_index, k=5
+        session, label_id, chatlog_id, message_index, k=5, embed_missing=embed_missing
     )
     if not neighbors:
         return None
@@ -117,22 +128,35 @@ def compose_explore_pick_explanation(
     expensive k-NN and embedding queries for the winning candidate."""
     if precomputed:
         unc_nov = precomputed.get("unc_nov")
+        probe = precomputed.get("probe", False)
         conv_nov = precomputed.get("conv_nov")
         theme_nov = precomputed.get("theme_nov")
         rarity = precomputed.get("rarity")
         spec = precomputed.get("spec")
+        copies = precomputed.get("duplicates")
     else:
         unc_nov = neighbor_uncertainty_novelty(session, label_id, chatlog_id, message_index)
-        labeled_centroids = explore_service.labeled_student_centroids(session, label_id)
-        conv_nov = explore_service.conversation_novelty(
-            session, label_id, chatlog_id, labeled_centroids
-        )
+        probe_unc = probe_service.uncertainties(session, label_id, [(chatlog_id, message_index)])
+        probe = (chatlog_id, message_index) in probe_unc
+        if probe:
+            unc_nov = (probe_unc[(chatlog_id, message_index)], unc_nov[1] if unc_nov else None)
+        conv_nov = explore_service.conversation_novelty(session, label_id, chatlog_id)
         theme_nov = explore_service.theme_novelty(session, label_id, chatlog_id)
+        if theme_nov is None:
+            theme_nov = lexical_service.theme_novelty(
+                session, chatlog_id, explore_service.labeled_chatlog_ids(session, label_id)
+            )
         rarity = explore_service.student_message_corpus_rarity(session, chatlog_id, message_index)
+        if rarity is None:
+            rarity = lexical_service.message_rarity(session, chatlog_id, message_index)
+        copies = dedup_service.cluster_sizes(session, [(chatlog_id, message_index)])[(chatlog_id, message_index)]
+        rarity = explore_service.rarity_with_duplicates(rarity, copies)
         spec = explore_service.student_help_specificity(
             pending_text or "", corpus_rarity=rarity
         )
-    paste_score = explore_service.student_message_copy_paste_likelihood(pending_text or "")
+    paste_score = (precomputed or {}).get("paste")
+    if paste_score is None:
+        paste_score = explore_service.student_message_copy_paste_likelihood(pending_text or "")
     if spec is None:
         spec = explore_service.student_help_specificity(
             pending_text or "", corpus_rarity=rarity
@@ -148,14 +172,21 @@ def compose_explore_pick_explanation(
         breakdown.append(f"Conv novelty · {_score_tier(conv_nov)}")
     if theme_nov is not None:
         breakdown.append(f"Theme novelty · {_score_tier(theme_nov)}")
+    if copies and copies > 1:
+        breakdown.append(f"Near-duplicates · {copies - 1}")
+    keywords = (precomputed or {}).get("keywords")
+    if keywords:
+        breakdown.append(f"Keywords · {', '.join(keywords)}")
     if unc_nov:
         unc, nov = unc_nov
         if nov is not None:
             breakdown.append(f"Msg novelty · {_score_tier(nov)}")
         if unc is not None:
-            breakdown.append(f"Ambiguity · {_score_tier(unc)}")
+            breakdown.append(f"{'Probe ambiguity' if probe else 'Ambiguity'} · {_score_tier(unc)}")
     if paste >= 0.65:
         breakdown.append("Paste risk · high")
+    if precomputed and precomputed.get("scored") is not None:
+        breakdown.append(f"Scored · {precomputed['scored']} of {precomputed['shortlist']}")
 
     strong: list[str] = []
     if spec is not None and spec >= 0.55 and paste < 0.65:
@@ -167,7 +198,7 @@ def compose_explore_pick_explanation(
     if theme_nov is not None and theme_nov >= 0.5:
         strong.append("new theme")
     if unc_nov and unc_nov[0] is not None and unc_nov[0] >= 0.55 and paste < 0.65:
-        strong.append("neighbor ambiguity")
+        strong.append("probe ambiguity" if probe else "neighbor ambiguity")
 
     if strong:
         summary = _truncate_words(f"Strong {', '.join(strong[:3])}.", 20)
@@ -388,23 +419,39 @@ def _select_next_chatlog_id(
         )
         return pool_sorted[0], "round_robin", None
 
+    started = _clock()
     cap = explore_service.explore_score_pool_cap()
     pool_to_score = pool
     if len(pool) > cap:
         rng = random.Random(_shuffle_key(label_id, 0) ^ len(pool))
         pool_to_score = rng.sample(pool, cap)
 
+    # Text heuristics come precomputed from MessageFeatures, one bulk read.
+    features = explore_service.load_message_features(
+        session, {(cid, i): t for cid in pool_to_score for i, t, _n in conv[cid]}
+    )
+
+    # Duplicate-cluster sizes (MinHash LSH) for the same messages, one index lookup each.
+    duplicates = dedup_service.cluster_sizes(session, features)
+
+    def _conversation_features(cid: int) -> list:
+        return [features[(cid, i)] for i, _t, _n in conv[cid]]
+
     def _shortlist_key(cid: int) -> tuple[float, int]:
         pending = _first_pending_turn(cid, conv[cid], decided)
         if not pending:
             return (0.0, cid)
-        midx, text, _nb = pending
-        texts = [t for _i, t, _n in conv[cid]]
-        pri = explore_service.explore_candidate_priority(
-            session, cid, text, midx, texts, use_corpus_rarity=False
+        midx, _text, _nb = pending
+        pri = explore_service.candidate_priority_from_features(
+            features[(cid, midx)], _conversation_features(cid), cluster_sizes=duplicates
         )
         return (pri, cid)
 
+    # Anytime scoring: the shortlist is ordered by the cheap prior, and the
+    # expensive components (k-NN, centroids, profiles, corpus rarity) run down
+    # it until the budget is spent — so a pick costs about the same whether or
+    # not candidates are missing embeddings or profiles. The pick is drawn from
+    # what was scored; the prior's best candidate is always among them.
     explore_candidates = sorted(pool_to_score, key=lambda c: (-_shortlist_key(c)[0], c))[
         : max(1, (len(pool_to_score) + 3) // 4)
     ]
@@ -424,26 +471,45 @@ def _select_next_chatlog_id(
         notebooks,
     )
 
-    labeled_centroids = explore_service.labeled_student_centroids(session, label_id)
+    conv_novelty = explore_service.conversation_novelties(session, label_id, explore_candidates)
     theme_vectors = explore_service.labeled_theme_vectors(session, label_id)
+    labeled = explore_service.labeled_chatlog_ids(session, label_id)
+    # Once the label's linear probe has both classes it answers uncertainty for
+    # every candidate in one matmul, in place of each candidate's k-NN vote.
+    pending_keys = []
+    for cid in explore_candidates:
+        first = _first_pending_turn(cid, conv[cid], decided)
+        if first:
+            pending_keys.append((cid, first[0]))
+    probe_uncertainty = probe_service.uncertainties(session, label_id, pending_keys)
 
     def _conversation_utility(cid: int) -> Tuple[float, dict]:
         pending = _first_pending_turn(cid, conv[cid], decided)
         if not pending:
             return 0.0, {}
-        midx, text, _notebook = pending
-        student_texts = [t for _i, t, _n in conv[cid]]
-        unc_nov = neighbor_uncertainty_novelty(session, label_id, cid, midx)
+        midx, _text, _notebook = pending
+        # Nothing here calls the network: k-NN skips unembedded messages, and
+        # the lexical engine stands in for missing embeddings and profiles.
+        unc_nov = neighbor_uncertainty_novelty(session, label_id, cid, midx, embed_missing=False)
         uncertainty, msg_nov = (unc_nov if unc_nov else (None, None))
-        conv_nov = explore_service.conversation_novelty(
-            session, label_id, cid, labeled_centroids
-        )
+        probe_unc = probe_uncertainty.get((cid, midx))
+        if probe_unc is not None:
+            uncertainty = probe_unc
+            unc_nov = (uncertainty, msg_nov)
+        conv_nov = conv_novelty[cid]
         theme_nov = explore_service.theme_novelty(
             session, label_id, cid, theme_vectors
         )
+        keywords = None
+        if theme_nov is None:
+            theme_nov = lexical_service.theme_novelty(session, cid, labeled)
+            keywords = lexical_service.conversation_keywords(session, cid)
         rarity = explore_service.student_message_corpus_rarity(session, cid, midx)
-        spec = explore_service.student_help_specificity(text, corpus_rarity=rarity)
-        spam = explore_service.conversation_spam_penalty(student_texts)
+        if rarity is None:
+            rarity = lexical_service.message_rarity(session, cid, midx)
+        rarity = explore_service.rarity_with_duplicates(rarity, duplicates[(cid, midx)])
+        spec = explore_service.specificity_from_features(features[(cid, midx)], rarity)
+        spam = explore_service.spam_penalty_from_features(_conversation_features(cid), duplicates)
         score = explore_service.blended_explore_utility(
             uncertainty,
             msg_nov,
@@ -459,22 +525,31 @@ def _select_next_chatlog_id(
             "theme_nov": theme_nov,
             "rarity": rarity,
             "spec": spec,
+            "paste": features[(cid, midx)].paste_likelihood,
+            "duplicates": duplicates[(cid, midx)],
+            "keywords": keywords,
+            "probe": probe_unc is not None,
         }
         return score, components
 
-    utility_results = {
-        cid: _conversation_utility(cid) for cid in explore_candidates
-    }
-    utility_scores = {cid: score for cid, (score, _) in utility_results.items()}
-    scored = sorted(
-        explore_candidates,
-        key=lambda c: (-utility_scores[c], c),
-    )
+    deadline = started + explore_service.explore_score_budget_seconds()
+    utility_results: dict[int, Tuple[float, dict]] = {}
+    for cid in explore_candidates:
+        if utility_results and _clock() >= deadline:
+            break
+        utility_results[cid] = _conversation_utility(cid)
+    scored = sorted(utility_results, key=lambda c: (-utility_results[c][0], c))
     top_k = max(1, (len(scored) + 3) // 4)
     explore_choices = [c for c in scored[:top_k]]
 
     winner = random.choice(explore_choices)
+    explore_service.note_pick_warmth(session, label_id, winner)
     _, winner_components = utility_results[winner]
+    winner_components = {
+        **winner_components,
+        "scored": len(utility_results),
+        "shortlist": len(explore_candidates),
+    }
     return winner, "explore", winner_components
 
 
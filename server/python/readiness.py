@@ -0,0 +1,116 @@
+# server/python/readiness.py
+"""Startup readiness tracking.
+
+The lifespan hook only runs schema setup synchronously. Populating
+MessageCache from Postgres and the notebook/created_at backfills run on a
+background thread and report their progress here, so the server can accept
+connections immediately. Routes that read the message cache depend on
+`require_ready`, which fails fast with 503 + Retry-After until the startup
+work has finished. Label-definition, static, and health routes are not gated.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+
+# starting → ingesting | backfilling → ready. "ready" is reached even when the
+# external DB is unreachable (same as the old synchronous startup, which only
+# printed a warning); the failure is surfaced in `warning` instead.
+PHASES = ("starting", "ingesting", "backfilling", "ready")
+
+RETRY_AFTER_SECONDS = int(os.environ.get("CHATSIGHT_READY_RETRY_AFTER", "2"))
+
+_lock = threading.Lock()
+_state: dict = {}
+
+
+def reset() -> None:
+    """Return to the `starting` phase. Called at the top of each lifespan."""
+    with _lock:
+        _state.clear()
+        _state.update({
+            "phase": "starting",
+            "rows_processed": 0,
+            "rows_total": None,
+            "started_at": time.monotonic(),
+            "phase_started_at": time.monotonic(),
+            "ready_at": None,
+            "warning": None,
+        })
+
+
+reset()
+
+
+def set_phase(phase: str, total: Optional[int] = None) -> None:
+    if phase not in PHASES:
+        raise ValueError(f"unknown readiness phase {phase!r}")
+    with _lock:
+        _state["phase"] = phase
+        _state["rows_processed"] = 0
+        _state["rows_total"] = total
+        _state["phase_started_at"] = time.monotonic()
+
+
+def set_total(total: Optional[int]) -> None:
+    with _lock:
+        _state["rows_total"] = total
+
+
+def advance(n: int) -> None:
+    with _lock:
+        _state["rows_processed"] += n
+
+
+def warn(message: str) -> None:
+    with _lock:
+        _state["warning"] = message
+
+
+def mark_ready() -> None:
+    with _lock:
+        _state["phase"] = "ready"
+        _state["ready_at"] = time.monotonic()
+
+
+def is_ready() -> bool:
+    return _state.get("phase") == "ready"
+
+
+def snapshot() -> dict:
+    """Current phase, progress, and a rate-based ETA for the running phase."""
+    with _lock:
+        s = dict(_state)
+    now = time.monotonic()
+    phase_elapsed = now - s["phase_started_at"]
+    done, total = s["rows_processed"], s["rows_total"]
+    eta = None
+    if s["phase"] == "ready":
+        eta = 0.0
+    elif total and done > 0:
+        rate = done / max(phase_elapsed, 1e-6)
+        eta = round(max(total - done, 0) / rate, 1)
+    end = s["ready_at"] if s["ready_at"] is not None else now
+    return {
+        "ready": s["phase"] == "ready",
+        "phase": s["phase"],
+        "rows_processed": done,
+        "rows_total": total,
+        "eta_seconds": eta,
+        "elapsed_seconds": round(end - s["started_at"], 2),
+        "warning": s["warning"],
+    }
+
+
+def require_ready() -> None:
+    """FastAPI dependency for routes that need the message cache populated."""
+    if is_ready():
+        return
+    snap = snapshot()
+    raise HTTPException(
+        status_code=503,
+        detail=f"Server is starting up ({snap['phase']}); retry shortly.",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
@@ -349,6 +349,44 @@ class ReadinessResponse(BaseModel):
     hint: Optional[str]
 
 
+class StartupReadyResponse(BaseModel):
+    """Startup progress for GET /api/ready (see readiness.py)."""
+    ready: bool
+    phase: str  # "starting" | "ingesting" | "backfilling" | "ready"
+    rows_processed: int
+    rows_total: Optional[int]
+    eta_seconds: Optional[float]
+    elapsed_seconds: float
+    warning: Optional[str]
+
+
+class LlmUsageRow(BaseModel):
+    """One aggregate bucket of the Gemini call ledger (see llm_ledger.usage)."""
+    key: Optional[str]  # label id, job id, or YYYY-MM-DD depending on group_by
+    calls: int
+    retries: int
+    errors: int
+    rate_limited: int
+    input_tokens: int
+    output_tokens: int
+    latency_seconds: float
+    avg_latency_ms: float
+    cost_usd: float
+    calls_per_minute: float
+    output_tokens_per_second: float
+    first_at: Optional[datetime]
+    last_at: Optional[datetime]
+
+
+class LlmUsageResponse(BaseModel):
+    group_by: Literal["label", "job", "day", "call_site"]
+    rows: List[LlmUsageRow]
+    total_calls: int
+    total_cost_usd: float
+    pending_writes: int  # buffered in memory, not yet flushed
+    dropped_writes: int  # discarded because the buffer was full
+
+
 class DecideResponse(BaseModel):
     """Combined response for decide/undo/skip-conversation: the next focused
     message (or None if nothing left) plus refreshed readiness. Bundling these
@@ -409,6 +447,35 @@ class AssistResponse(BaseModel):
     neighbors: List[AssistNeighbor]
 
 
+class NearDuplicate(BaseModel):
+    chatlog_id: int
+    message_index: int
+    similarity: float  # estimated Jaccard over character 5-grams
+    message_text: str
+
+
+class NearDuplicatesResponse(BaseModel):
+    cluster_id: Optional[int] = None  # None: the message has no signature yet
+    cluster_size: int
+    near_duplicates: List[NearDuplicate]
+
+
+class ProbeCalibration(BaseModel):
+    threshold: float  # confidence max(p, 1 - p) at or above which handoff auto-accepts
+    precision: float  # held-out precision at that threshold
+    support: int  # held-out decisions at or above it
+    labeled: int
+
+
+class ProbeStatusResponse(BaseModel):
+    label_id: int
+    ready: bool
+    yes: int
+    no: int
+    updates: int
+    calibration: Optional[ProbeCalibration] = None
+
+
 # ─── Assignment mappings ───
 
 class CreateAssignmentRequest(BaseModel):
@@ -517,7 +584,7 @@ class MessageListItem(BaseModel):
     text: str
     confidence: Optional[float]
     verdict: Optional[Literal["yes", "no", "skip", "review"]]
-    applied_by: Optional[Literal["ai", "human"]]
+    applied_by: Optional[Literal["ai", "probe", "human"]]
     flagged: bool
     has_note: bool
     notebook: Optional[str]
@@ -542,7 +609,7 @@ class MessageDetailResponse(BaseModel):
     text: str
     confidence: Optional[float]
     verdict: Optional[Literal["yes", "no", "skip", "review"]]
-    applied_by: Optional[Literal["ai", "human"]]
+    applied_by: Optional[Literal["ai", "probe", "human"]]
     matched_pattern: Optional[str]
     rationale: Optional[str]
     flagged: bool
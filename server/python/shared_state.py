@@ -0,0 +1,213 @@
+# server/python/shared_state.py
+"""Cross-process coordination through the app DB.
+
+`uvicorn --workers N` and `python -m worker` run several processes against
+one database, so a threading.Lock or a module-level memo only coordinates the
+threads of one of them. This module keeps that state in the DB instead:
+
+- Advisory locks (`advisorylock` rows, one per lock name). A holder owns the
+  row until it releases it or its lease (LOCK_TTL_SECONDS, renewed by a
+  background thread while held) runs out, so a crashed process can't wedge a
+  lock forever. Taking one is a conditional UPDATE or an INSERT that loses on
+  the primary key — the same claim-by-write trick jobs.py uses for leases.
+- Cache versions (`cacheversion` rows, one counter per name). Caches stay
+  process-local but are keyed by the counter, which costs one primary-key
+  lookup per request; any process that writes the underlying table bumps it
+  in the same transaction. ORM flushes touching a TRACKED model (or a
+  human LabelApplication: `human_labels:<label_id>`, or a MessageCache
+  row's text: `message_text`) bump automatically; bulk `insert()` writers
+  call bump() themselves.
+
+Job status and stop flags live on the job table (jobs.py).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import delete, event, inspect, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from models import AdvisoryLock, CacheVersion, LabelApplication, MessageCache, MessageEmbedding
+
+logger = logging.getLogger(__name__)
+
+LOCK_TTL_SECONDS = float(os.environ.get("CHATSIGHT_LOCK_TTL_SECONDS", "60"))
+LOCK_POLL_SECONDS = 0.25
+
+# Model -> cache-version name bumped whenever an ORM flush writes it.
+TRACKED = {
+    MessageCache: "message_cache",
+    MessageEmbedding: "message_embedding",
+}
+
+
+# Bumped only when a MessageCache row is inserted, deleted or has its
+# message_text changed, for caches of the text itself (lexical_service) that
+# assignment and notebook writes to the same rows must not invalidate.
+MESSAGE_TEXT = "message_text"
+
+
+# ── Advisory locks ───────────────────────────────────────────────────────────
+
+def new_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex[:6]}"
+
+
+def try_acquire(db_engine, name: str, owner: str, *, ttl: Optional[float] = None,
+                now: Optional[datetime] = None) -> bool:
+    """Take (or re-take) lock `name` for `owner` unless someone else holds a
+    live lease on it."""
+    now = now or datetime.utcnow()
+    expires = now + timedelta(seconds=ttl if ttl is not None else LOCK_TTL_SECONDS)
+    with Session(db_engine) as db:
+        taken = db.exec(
+            update(AdvisoryLock)
+            .where(
+                AdvisoryLock.name == name,
+                or_(AdvisoryLock.owner == owner, AdvisoryLock.expires_at < now),
+            )
+            .values(owner=owner, acquired_at=now, expires_at=expires)
+        ).rowcount
+        if taken:
+            db.commit()
+            return True
+        db.add(AdvisoryLock(name=name, owner=owner, acquired_at=now, expires_at=expires))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return False
+        return True
+
+
+def renew(db_engine, name: str, owner: str, *, ttl: Optional[float] = None) -> bool:
+    """Extend `owner`'s lease; False if it no longer holds the lock."""
+    expires = datetime.utcnow() + timedelta(seconds=ttl if ttl is not None else LOCK_TTL_SECONDS)
+    with Session(db_engine) as db:
+        held = db.exec(
+            update(AdvisoryLock)
+            .where(AdvisoryLock.name == name, AdvisoryLock.owner == owner)
+            .values(expires_at=expires)
+        ).rowcount
+        db.commit()
+    return bool(held)
+
+
+def release(db_engine, name: str, owner: str) -> bool:
+    with Session(db_engine) as db:
+        released = db.exec(
+            delete(AdvisoryLock).where(AdvisoryLock.name == name, AdvisoryLock.owner == owner)
+        ).rowcount
+        db.commit()
+    return bool(released)
+
+
+def holder(db_engine, name: str) -> Optional[str]:
+    """Owner of a live lease on `name`, if any."""
+    with Session(db_engine) as db:
+        row = db.get(AdvisoryLock, name)
+        if row is None or row.expires_at < datetime.utcnow():
+            return None
+        return row.owner
+
+
+@contextmanager
+def advisory_lock(db_engine, name: str, *, ttl: Optional[float] = None,
+                  poll: Optional[float] = None, timeout: Optional[float] = None) -> Iterator[str]:
+    """Block until lock `name` is ours (across threads and processes), hold it
+    for the `with` body, then release it. Raises TimeoutError after `timeout`
+    seconds of waiting."""
+    ttl = ttl if ttl is not None else LOCK_TTL_SECONDS
+    poll = poll if poll is not None else LOCK_POLL_SECONDS
+    owner = new_owner()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while not try_acquire(db_engine, name, owner, ttl=ttl):
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f"advisory lock {name!r} held by another worker")
+        time.sleep(poll)
+
+    stop = threading.Event()
+
+    def keep_alive() -> None:
+        while not stop.wait(ttl / 3):
+            try:
+                if not renew(db_engine, name, owner, ttl=ttl):
+                    logger.warning("advisory lock %s was taken over while held by %s", name, owner)
+                    return
+            except Exception:
+                logger.exception("advisory lock %s renew failed", name)
+
+    renewer = threading.Thread(target=keep_alive, name=f"lock-{name}", daemon=True)
+    renewer.start()
+    try:
+        yield owner
+    finally:
+        stop.set()
+        renewer.join()
+        release(db_engine, name, owner)
+
+
+# ── Cache versions ───────────────────────────────────────────────────────────
+
+def human_labels(label_id: int) -> str:
+    """Counter bumped by every write of a label's human LabelApplication rows."""
+    return f"human_labels:{label_id}"
+
+
+def version(db: Session, name: str) -> int:
+    """Current value of counter `name` (0 if never bumped)."""
+    return int(db.exec(select(CacheVersion.version).where(CacheVersion.name == name)).first() or 0)
+
+
+def bump(db, *names: str) -> None:
+    """Increment each counter in the caller's transaction. `db` is a Session
+    or Connection; the bump lands when the caller commits."""
+    dialect = db.get_bind().dialect.name if isinstance(db, OrmSession) else db.dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    now = datetime.utcnow()
+    for name in sorted(set(names)):
+        db.execute(
+            insert(CacheVersion)
+            .values(name=name, version=1, updated_at=now)
+            .on_conflict_do_update(
+                index_elements=["name"],
+                set_={"version": CacheVersion.version + 1, "updated_at": now},
+            )
+        )
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _bump_tracked(session, _flush_context) -> None:
+    # new/dirty/deleted still describe what this flush wrote.
+    names = {
+        TRACKED[type(obj)]
+        for group in (session.new, session.dirty, session.deleted)
+        for obj in group
+        if type(obj) in TRACKED
+    }
+    names.update(
+        human_labels(obj.label_id)
+        for group in (session.new, session.dirty, session.deleted)
+        for obj in group
+        if type(obj) is LabelApplication and obj.applied_by == "human"
+    )
+    if any(
+        type(obj) is MessageCache
+        and (obj not in session.dirty or inspect(obj).attrs.message_text.history.has_changes())
+        for group in (session.new, session.dirty, session.deleted)
+        for obj in group
+    ):
+        names.add(MESSAGE_TEXT)
+    if names:
+        bump(session.connection(), *names)
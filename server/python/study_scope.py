@@ -12,16 +12,17 @@ import os
 import threading
 from typing import Optional
 
-from sqlalchemy import func
 from sqlmodel import Session, select
 
+import shared_state
 from assignment_service import _canonical_name
 from models import MessageCache
 
-# Memoized results keyed by (lock_on, frozenset(names), row_count).
-# row_count keeps test suites isolated (each test seeds a different number of
-# MessageCache rows) and picks up the rare case where the cache is filled after
-# a partial startup. Thread-safe for concurrent FastAPI workers.
+# Memoized results keyed by (lock_on, frozenset(names), message_cache version).
+# The version (shared_state) changes whenever any process writes MessageCache,
+# so each uvicorn worker's memo notices a fill after a partial startup — and
+# tests seeding different rows never collide. Thread-safe for concurrent
+# FastAPI workers.
 _scope_cache: dict = {}
 _scope_cache_lock = threading.Lock()
 
@@ -53,11 +54,9 @@ def in_scope_keys(session: Session, names: set[str]) -> set[tuple[int, int]]:
     When the lock is disabled, every cached message is considered in scope.
 
     Result is memoized in memory: the scope never changes within a server run,
-    and the row_count fingerprint keeps test suites isolated across tests that
-    seed different MessageCache data."""
+    and keying on the message_cache version re-reads it after any write."""
     lock_on = lock_enabled()
-    row_count = int(session.exec(select(func.count(MessageCache.id))).one())
-    cache_key = (lock_on, frozenset(names), row_count)
+    cache_key = (lock_on, frozenset(names), shared_state.version(session, "message_cache"))
 
     with _scope_cache_lock:
         cached = _scope_cache.get(cache_key)
@@ -78,6 +77,8 @@ def in_scope_keys(session: Session, names: set[str]) -> set[tuple[int, int]]:
     )
 
     with _scope_cache_lock:
+        for stale in [k for k in _scope_cache if k[2] != cache_key[2]]:
+            del _scope_cache[stale]
         _scope_cache[cache_key] = result
 
     return result
@@ -10,6 +10,21 @@ os.environ.setdefault("PG_PASSWORD", "test_dummy_password")
 # disable the lock here. test_study_scope.py re-enables it per-test to validate it.
 os.environ.setdefault("CHATSIGHT_STUDY_LOCK", "0")
 
+# No test talks to Gemini. Calls that aren't answered by an injected fake
+# backend are served from the checked-in record/replay cache (llm_cache), and a
+# miss fails fast instead of reaching the network. To refresh it after a prompt
+# change: CHATSIGHT_LLM_CACHE=record pytest <tests> (with GEMINI_API_KEY, or
+# CHATSIGHT_GEMINI_BACKEND=fake for deterministic offline answers).
+os.environ.setdefault("CHATSIGHT_LLM_CACHE", "replay")
+os.environ.setdefault(
+    "CHATSIGHT_LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "fixtures", "llm_cache.db")
+)
+
+# Routes enqueue background jobs but nothing runs them in-process: tests call
+# the handlers (or jobs.work) directly against their own engine, and no poller
+# touches the real app DB behind their back.
+os.environ.setdefault("CHATSIGHT_JOB_RUNNER", "worker")
+
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 import pytest
@@ -17,6 +32,10 @@ from fastapi.testclient import TestClient
 from sqlmodel import SQLModel, create_engine, Session
 from sqlmodel.pool import StaticPool
 
+import lexical_service
+import llm_ledger
+import probe_service
+import readiness
 import study_scope
 from main import app, get_ext_conn
 from database import get_session
@@ -26,14 +45,25 @@ from database import get_session
 def _clear_scope_cache():
     """Wipe the in_scope_keys memo cache before each test.
 
-    Tests seed different numbers of MessageCache rows but may collide on the
-    (lock_on, names, row_count) cache key when row counts happen to match.
-    Clearing per-test gives isolation without coupling to any specific fixture."""
+    Every test starts a fresh DB, so the message_cache version restarts at
+    the same values and (lock_on, names, version) keys would collide across
+    tests. Clearing per-test gives isolation without coupling to any specific
+    fixture."""
     study_scope._scope_cache.clear()
     yield
     study_scope._scope_cache.clear()
 
 
+@pytest.fixture(autouse=True)
+def _artifact_dirs(tmp_path, monkeypatch):
+    """Indexes saved next to file-backed DBs go under the test's tmp_path,
+    never the repo's database/ directory."""
+    monkeypatch.setattr(lexical_service, "LEXICAL_DIR", tmp_path / "lexical")
+    monkeypatch.setattr(probe_service, "PROBE_DIR", tmp_path / "probes")
+    yield
+    probe_service.stop()  # save pending probes while PROBE_DIR is still redirected
+
+
 @pytest.fixture(name="engine")
 def engine_fixture():
     engine = create_engine(
@@ -67,6 +97,13 @@ def client_fixture(session, monkeypatch):
 
     app.dependency_overrides[get_session] = override_session
     app.dependency_overrides[get_ext_conn] = override_ext_conn
+    # The lifespan's background ingest targets the real DB/Postgres; tests seed
+    # their own MessageCache rows, so don't gate data routes on it.
+    app.dependency_overrides[readiness.require_ready] = lambda: None
+    # The lifespan starts the LLM call ledger on the app's engine; record into
+    # the test DB instead so no run writes LlmCallLog rows to database/.
+    start_ledger = llm_ledger.start
+    monkeypatch.setattr(llm_ledger, "start", lambda db_engine=None: start_ledger(session.get_bind()))
     with TestClient(app) as client:
         yield client
     app.dependency_overrides.clear()
@@ -83,7 +83,7 @@ def test_nearest_neighbors_returns_empty_when_no_labeled(session):
     assert out == []
 
 
-@patch("concept_service.client")
+@patch("gemini_gateway.backend")
 def test_nearest_neighbors_embeds_focused_message_when_missing(mock_client, session):
     """Assist must not stay empty when pair-v1 embeddings have not been built yet."""
     from unittest.mock import MagicMock
@@ -197,3 +197,13 @@ def test_build_cache_filters_by_current_model_version(session):
     # Normalized [0, 1] is just [0, 1]. Normalized [1, 0] is [1, 0]. So vec[1] should be ~1.0.
     assert vec[1] > 0.99
     assert vec[0] < 0.01
+
+
+def test_embedding_matrix_exposes_the_shared_normalized_rows(session):
+    assert assist_service.embedding_matrix(session) == (None, {})
+    _seed_message(session, 7, 0, "a", [3.0, 4.0])
+    _seed_message(session, 8, 1, "b", [0.0, 2.0])
+    matrix, keys_idx = assist_service.embedding_matrix(session)
+    assert set(keys_idx) == {(7, 0), (8, 1)}
+    assert np.allclose(matrix[keys_idx[(7, 0)]], [0.6, 0.8])
+    assert np.allclose(matrix[keys_idx[(8, 1)]], [0.0, 1.0])
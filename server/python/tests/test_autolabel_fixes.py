@@ -138,14 +138,12 @@ def test_autolabel_does_not_query_external_db(session, engine, monkeypatch):
         return []
 
     monkeypatch.setattr(autolabel_service, "classify_batch", fake_classify)
-    main._run_autolabel()
+    ctx = main._run_autolabel()
 
     assert ext_connect_calls == [], (
         "_run_autolabel called ext_engine.connect — it should use MessageCache instead"
     )
-    assert main._autolabel_status["error"] is None, (
-        f"autolabel should complete without error; got: {main._autolabel_status['error']}"
-    )
+    assert ctx.error is None, f"autolabel should complete without error; got: {ctx.error}"
 
 
 # ── 4. Explore fraction default ───────────────────────────────────────────────
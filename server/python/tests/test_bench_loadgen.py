@@ -0,0 +1,72 @@
+"""bench.loadgen's virtual users against the app in-process."""
+import random
+import threading
+
+from bench import loadgen
+from models import MessageCache
+
+
+class _ClientTransport:
+    """loadgen transport over TestClient. The test client shares one DB
+    session, so requests are serialized."""
+    _lock = threading.Lock()
+
+    def __init__(self, client):
+        self.client = client
+
+    def request(self, method, path, params=None, body=None):
+        with self._lock:
+            resp = self.client.request(method, path, params=params, json=body)
+        ctype = resp.headers.get("content-type", "")
+        return resp.status_code, resp.json() if ctype.startswith("application/json") else resp.text
+
+    def close(self):
+        pass
+
+
+def _seed_run(client, session):
+    for conv in range(6):
+        for i in range(3):
+            session.add(MessageCache(chatlog_id=500 + conv, message_index=i,
+                                     message_text=f"student question {conv}-{i}", notebook="lab1.ipynb"))
+    session.commit()
+    label = client.post("/api/single-labels", json={"name": "asks for answer"}).json()
+    client.post(f"/api/single-labels/{label['id']}/activate")
+    return label["id"]
+
+
+def test_percentile_nearest_rank():
+    ordered = [float(i) for i in range(1, 101)]
+    assert loadgen.percentile(ordered, 0.50) == 50.0
+    assert loadgen.percentile(ordered, 0.99) == 99.0
+    assert loadgen.percentile([3.0], 0.95) == 3.0
+    assert loadgen.percentile([], 0.5) == 0.0
+
+
+def test_virtual_user_walks_the_labeling_loop(client, session):
+    label_id = _seed_run(client, session)
+    rec = loadgen.Recorder()
+    user = loadgen.VirtualUser(_ClientTransport(client), rec, loadgen.Targets(label_id), random.Random(1),
+                               {"decide": 1}, think_seconds=0)
+    for _ in range(5):
+        user.step()
+    # The first step has nothing focused, so it fetches /next; decide then
+    # keeps following the `next` it returns.
+    assert len(rec.latencies["next"]) == 1
+    assert len(rec.latencies["decide"]) == 4
+    assert not rec.errors
+
+
+def test_run_load_reports_every_action(client, session):
+    label_id = _seed_run(client, session)
+    targets = loadgen.discover_targets(_ClientTransport(client))
+    assert targets.labeling_label_id == label_id
+
+    report = loadgen.run_load(lambda: _ClientTransport(client), targets, users=2, duration=1.0,
+                              mix={"decide": 3, "summaries": 1}, think_seconds=0, poll_interval=0.2)
+    endpoints = report["endpoints"]
+    assert {"next", "decide", "handoff.poll"} <= set(endpoints)
+    for stats in endpoints.values():
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+    assert set(report["sqlite"]) == {"busy_errors", "lock_waits", "lock_wait_seconds"}
+    assert "decide" in loadgen.format_report(report)
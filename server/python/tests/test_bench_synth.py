@@ -0,0 +1,47 @@
+"""The benchmark corpus generator must be deterministic and app-compatible."""
+import hashlib
+import sqlite3
+
+from sqlmodel import Session, create_engine, select
+
+from bench import synth
+from models import LabelDefinition, MessageCache
+
+
+def _digest(path, tables):
+    conn = sqlite3.connect(path)
+    h = hashlib.sha256()
+    for table in tables:
+        for row in conn.execute(f"SELECT * FROM {table} ORDER BY 1"):
+            h.update(repr(row).encode())
+    conn.close()
+    return h.hexdigest()
+
+
+def test_same_parameters_give_identical_rows(tmp_path):
+    a = synth.generate(600, seed=3, embed_dim=8, out=tmp_path / "a")
+    b = synth.generate(600, seed=3, embed_dim=8, out=tmp_path / "b")
+    app_tables = ["messagecache", "messageembedding", "labeldefinition", "labelapplication"]
+    assert _digest(a.app_db, app_tables) == _digest(b.app_db, app_tables)
+    assert _digest(a.events_db, ["events"]) == _digest(b.events_db, ["events"])
+
+    c = synth.generate(600, seed=4, embed_dim=8, out=tmp_path / "a")
+    assert _digest(a.app_db, ["messagecache"]) != _digest(c.app_db, ["messagecache"])
+
+
+def test_corpus_matches_the_app_schema(tmp_path):
+    corpus = synth.generate(600, seed=0, embed_dim=8, out=tmp_path)
+    assert synth.generate(600, seed=0, embed_dim=8, out=tmp_path) == corpus  # cached
+
+    engine = create_engine(corpus.app_url)
+    with Session(engine) as db:
+        assert len(db.exec(select(MessageCache)).all()) == 600
+        phases = {l.phase for l in db.exec(select(LabelDefinition).where(LabelDefinition.mode == "single"))}
+    engine.dispose()
+    assert phases == set(synth.SINGLE_PHASES)
+    assert set(corpus.single_label_ids) == set(synth.SINGLE_PHASES)
+
+
+def test_parse_size():
+    assert synth.parse_size("100k") == 100_000
+    assert synth.parse_size("2500") == 2500
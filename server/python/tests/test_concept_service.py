@@ -17,7 +17,7 @@ def _fake_embed_result(texts):
     return mock_result
 
 
-@patch("concept_service.client")
+@patch("gemini_gateway.backend")
 def test_embed_messages_caches_results(mock_client, session):
     mock_client.models.embed_content.side_effect = (
         lambda **kwargs: _fake_embed_result(kwargs["contents"])
@@ -44,7 +44,7 @@ def test_embed_messages_caches_results(mock_client, session):
     assert np.allclose(vectors, vectors2)
 
 
-@patch("concept_service.client")
+@patch("gemini_gateway.backend")
 def test_discover_concepts_returns_candidates(mock_client, session):
     from concept_service import discover_concepts
 
@@ -93,7 +93,7 @@ def test_discover_concepts_returns_candidates(mock_client, session):
     assert hasattr(candidates[0], "similar_to")
 
 
-@patch("concept_service.client")
+@patch("gemini_gateway.backend")
 def test_deduplicate_concepts_filters_similar(mock_client):
     from concept_service import _deduplicate_concepts
 
@@ -176,7 +176,7 @@ def test_pair_text_treats_whitespace_only_context_as_missing():
     assert out == "[Conversation start]\nStudent: yes"
 
 
-@patch("concept_service.client")
+@patch("gemini_gateway.backend")
 def test_embed_messages_sends_pair_text_to_api(mock_client, session):
     """The string passed to the embedding API must be the pair format, not the bare student text."""
     mock_client.models.embed_content.side_effect = (
@@ -202,7 +202,7 @@ def test_embed_messages_sends_pair_text_to_api(mock_client, session):
     assert contents == ["Tutor: Did that solve it?\nStudent: yes"]
 
 
-@patch("concept_service.client")
+@patch("gemini_gateway.backend")
 def test_embed_messages_uses_new_model_version_as_cache_key(mock_client, session):
     """Cached MessageEmbedding rows must use the bumped model_version (not the raw API model)."""
     mock_client.models.embed_content.side_effect = (
@@ -222,7 +222,7 @@ def test_embed_messages_uses_new_model_version_as_cache_key(mock_client, session
     assert EMBED_MODEL == "gemini-embedding-001:pair-v1"
 
 
-@patch("concept_service.client")
+@patch("gemini_gateway.backend")
 def test_embed_messages_does_not_reuse_old_key_cache(mock_client, session):
     """A pre-existing row stored under the OLD model_version must NOT short-circuit the new flow."""
     mock_client.models.embed_content.side_effect = (
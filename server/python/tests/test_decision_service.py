@@ -1,9 +1,10 @@
 """Tests for decision_service: record_decision, undo, readiness math."""
 import pytest
+from sqlalchemy import event
 from sqlmodel import select
 
 import decision_service
-from models import LabelApplication, LabelDefinition, MessageCache
+from models import ConversationCursor, LabelApplication, LabelDefinition, MessageCache
 
 
 def _make_label(session, name="help"):
@@ -51,6 +52,36 @@ def test_record_decision_rejects_invalid_value(session):
         decision_service.record_decision(session, label.id, 100, 0, "maybe")
 
 
+def test_record_decision_is_one_upsert_per_table(session):
+    """Label lookup, LabelApplication upsert, cursor upsert, version bump: four
+    statements whether the row is new or re-decided, and none to read the
+    result back."""
+    label = _make_label(session)
+    session.add(LabelApplication(label_id=label.id, chatlog_id=100, message_index=1,
+                                 applied_by="ai", confidence=0.8, value="yes"))
+    session.commit()
+    statements: list[str] = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(session.get_bind(), "before_cursor_execute", count)
+    try:
+        for midx, value in ((0, "yes"), (0, "no"), (1, "no"), (1, "yes")):
+            statements.clear()
+            app = decision_service.record_decision(session, label.id, 100, midx, value)
+            assert (app.value, app.applied_by) == (value, "human")
+            assert statements == ["SELECT", "INSERT", "INSERT", "INSERT"]
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", count)
+
+    # The first human review of the AI row kept its prediction; the flip didn't.
+    reviewed = session.exec(select(LabelApplication).where(LabelApplication.message_index == 1)).one()
+    assert (reviewed.value, reviewed.ai_value_at_review, reviewed.ai_confidence_at_review) == ("yes", "yes", 0.8)
+    cursor = session.get(ConversationCursor, (label.id, 100))
+    assert cursor.last_message_index_decided == 1
+
+
 def test_undo_last_removes_most_recent(session):
     label = _make_label(session)
     decision_service.record_decision(session, label.id, 100, 0, "yes")
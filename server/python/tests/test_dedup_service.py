@@ -0,0 +1,107 @@
+"""Tests for dedup_service: MinHash signatures and the LSH duplicate index."""
+import pytest
+from sqlmodel import select
+
+import dedup_service
+import explore_service
+from models import MessageCache
+
+_PROMPT = (
+    "Question 3.2: Write a function called `top_scorers` that takes a DataFrame of "
+    "player statistics and returns the names of the five players with the most points."
+)
+_UNIQUE = [
+    "why does my histogram plot show density instead of counts",
+    "groupby then agg with a lambda returns a series not a dataframe",
+    "my for loop only appends the last value to the list",
+]
+
+
+def _seed(session, messages):
+    for (cid, midx), text in messages.items():
+        session.add(MessageCache(chatlog_id=cid, message_index=midx, message_text=text))
+    session.commit()
+    explore_service.store_message_features(session, [
+        explore_service.compute_message_features(cid, midx, text) for (cid, midx), text in messages.items()
+    ])
+    session.commit()
+
+
+def _corpus():
+    # Six students paste the same prompt, some with their own tail or a typo.
+    messages = {(cid, 0): _PROMPT for cid in range(1, 5)}
+    messages[(5, 0)] = _PROMPT + " I don't get it"
+    messages[(6, 0)] = _PROMPT.replace("points", "pts")
+    for i, text in enumerate(_UNIQUE):
+        messages[(1, i + 1)] = text
+    return messages
+
+
+def test_signatures_estimate_jaccard():
+    a = dedup_service.minhash_signature("How do I merge two dataframes on a key column?")
+    b = dedup_service.minhash_signature("how do i merge two  dataframes on the key column")
+    c = dedup_service.minhash_signature("why does my histogram plot show density")
+    assert len(a) == dedup_service.NUM_PERM * 4
+    assert dedup_service.estimated_similarity(a, b) >= dedup_service.DUPLICATE_THRESHOLD
+    assert dedup_service.estimated_similarity(a, c) < 0.2
+    assert dedup_service.minhash_signature("help") == dedup_service.minhash_signature(" HELP ")
+    assert dedup_service.minhash_signature("  ") is None
+
+
+def test_clusters_group_copies_across_students(session):
+    _seed(session, _corpus())
+    first_id = session.exec(
+        select(MessageCache.id).where(MessageCache.chatlog_id == 1, MessageCache.message_index == 0)
+    ).one()
+
+    cluster = dedup_service.duplicate_cluster(session, 6, 0)
+    assert cluster == {"cluster_id": first_id, "cluster_size": 6}
+    assert dedup_service.duplicate_cluster(session, 1, 1)["cluster_size"] == 1
+    assert dedup_service.duplicate_cluster(session, 99, 0) is None
+
+    matches = dedup_service.near_duplicates(session, 2, 0)
+    assert {(m["chatlog_id"], m["message_index"]) for m in matches} == {(1, 0), (3, 0), (4, 0), (5, 0), (6, 0)}
+    assert matches[0]["similarity"] == 1.0 and matches[-1]["similarity"] >= dedup_service.DUPLICATE_THRESHOLD
+    assert dedup_service.near_duplicates(session, 1, 2) == []
+
+
+def test_index_follows_synced_features(session):
+    _seed(session, _corpus())
+    assert dedup_service.cluster_sizes(session, [(1, 0), (7, 0)]) == {(1, 0): 6, (7, 0): 1}
+
+    # A sync stores features for a new copy: the version moves and the index rebuilds.
+    _seed(session, {(7, 0): _PROMPT})
+    assert dedup_service.cluster_sizes(session, [(1, 0), (7, 0)]) == {(1, 0): 7, (7, 0): 7}
+
+
+def test_cluster_size_feeds_spam_and_rarity(session):
+    _seed(session, _corpus())
+    keys = [(1, 1), (1, 2)]
+    sizes = dedup_service.cluster_sizes(session, keys)
+    features = explore_service.load_message_features(session, {k: None for k in keys})
+    conversation = [features[k] for k in keys]
+
+    # Ordinary questions nobody else sent: no change. The same two texts sent
+    # by dozens of students read as pasted, although no regex fires on them.
+    assert sizes == {(1, 1): 1, (1, 2): 1}
+    assert explore_service.spam_penalty_from_features(conversation, sizes) == \
+        explore_service.spam_penalty_from_features(conversation) == 0.0
+    widespread = {k: dedup_service.DUPLICATE_SATURATION for k in keys}
+    assert explore_service.spam_penalty_from_features(conversation, widespread) > 0.5
+
+    assert explore_service.rarity_with_duplicates(0.9, dedup_service.cluster_sizes(session, [(6, 0)])[(6, 0)]) \
+        == pytest.approx(1.0 - dedup_service.duplicate_score(6))
+    assert explore_service.rarity_with_duplicates(0.9, sizes[(1, 1)]) == 0.9
+    assert explore_service.rarity_with_duplicates(None, 6) is None
+    assert dedup_service.duplicate_score(dedup_service.DUPLICATE_SATURATION * 2) == 1.0
+
+
+def test_near_duplicates_route(client, session):
+    _seed(session, _corpus())
+    body = client.get("/api/chatlogs/5/messages/0/near-duplicates", params={"limit": 2}).json()
+    assert body["cluster_size"] == 6
+    assert len(body["near_duplicates"]) == 2
+    assert all(m["message_text"].startswith("Question 3.2") for m in body["near_duplicates"])
+
+    assert client.get("/api/chatlogs/1/messages/1/near-duplicates").json()["near_duplicates"] == []
+    assert client.get("/api/chatlogs/99/messages/0/near-duplicates").status_code == 404
@@ -1,8 +1,12 @@
 """Tests for explore_service conversation + theme novelty (Layer A/B)."""
 import json
+import threading
+import time
 import numpy as np
 import pytest
-from sqlmodel import Session
+from sqlmodel import Session, select
+
+import explore_service
 
 from concept_service import EMBED_MODEL
 from explore_service import (
@@ -26,6 +30,7 @@ from models import (
     LabelExploreGradebook,
     MessageCache,
     MessageEmbedding,
+    MessageFeatures,
 )
 
 
@@ -176,6 +181,79 @@ def test_explore_priority_specific_over_spam_length(session):
     assert pri_specific > pri_spam
 
 
+_FEATURE_TEXTS = [
+    "help",
+    "Question 1.2",
+    "i'm stuck!",
+    "Can you help me with this?",
+    "Can you give me an example of groupby in the context of this question?",
+    "Traceback (most recent call last):\n  File \"main.py\", line 4\n" + "x" * 300,
+    "```python\ndf.groupby('a').mean()\n```\nwhy does this drop my column?",
+    "Part 3: write a function that returns the mean\n1. load\n2. clean\n3. plot",
+    "same line\nsame line\nsame line\nother",
+    "",
+]
+
+
+def test_combined_patterns_match_the_pattern_lists():
+    for text in _FEATURE_TEXTS:
+        t = text.strip()
+        assert bool(explore_service._PASTE_BODY_RE.search(t)) == any(
+            p.search(t) for p in explore_service._PASTE_BODY_PATTERNS)
+        assert bool(explore_service._GENERIC_HELP_RE.match(t)) == any(
+            p.match(t) for p in explore_service._GENERIC_HELP_PATTERNS)
+
+
+def test_message_features_agree_with_the_text_heuristics(session):
+    texts = {(400, i): t for i, t in enumerate(_FEATURE_TEXTS)}
+    explore_service.store_message_features(
+        session, [explore_service.compute_message_features(c, i, t) for (c, i), t in texts.items()]
+    )
+    session.commit()
+    features = explore_service.load_message_features(session, texts)
+    for (cid, midx), text in texts.items():
+        f = features[(cid, midx)]
+        assert f.paste_likelihood == student_message_copy_paste_likelihood(text)
+        assert f.genericness == student_help_genericness(text)
+        for rarity in (None, 0.1, 0.9):
+            assert explore_service.specificity_from_features(f, rarity) == pytest.approx(
+                student_help_specificity(text, corpus_rarity=rarity))
+    conversation = [features[k] for k in texts]
+    assert explore_service.spam_penalty_from_features(conversation) == pytest.approx(
+        conversation_spam_penalty(_FEATURE_TEXTS))
+    assert features[(400, 6)].code_fence_ratio > 0.3
+    assert features[(400, 0)].generic_ping and features[(400, 8)].repeated_lines == 3
+
+
+def test_load_message_features_reads_stored_rows_and_fills_gaps(session):
+    stored = explore_service.compute_message_features(401, 0, "help")
+    stored.paste_likelihood = 0.42  # only the table could say this
+    stale = explore_service.compute_message_features(401, 1, "help")
+    stale.paste_likelihood = 0.42
+    stale.features_version = explore_service.FEATURES_VERSION - 1
+    explore_service.store_message_features(session, [stored, stale])
+    session.commit()
+
+    features = explore_service.load_message_features(
+        session, {(401, 0): "help", (401, 1): "help", (401, 2): "help"}
+    )
+    assert features[(401, 0)].paste_likelihood == 0.42
+    assert features[(401, 1)].paste_likelihood == 0.0  # older version: recomputed
+    assert features[(401, 2)].paste_likelihood == 0.0  # no row: computed
+
+
+def test_startup_backfill_fills_missing_features(session):
+    import main
+
+    session.add(MessageCache(chatlog_id=402, message_index=0, message_text="help"))
+    session.add(MessageCache(chatlog_id=402, message_index=1, message_text="why does merge drop rows?"))
+    session.commit()
+    main.backfill_message_features_if_missing(session)
+    rows = session.exec(select(MessageFeatures).where(MessageFeatures.chatlog_id == 402)).all()
+    assert {r.message_index for r in rows} == {0, 1}
+    assert all(r.features_version == explore_service.FEATURES_VERSION for r in rows)
+
+
 def test_student_corpus_rarity(session):
     session.add(MessageCache(chatlog_id=30, message_index=0, message_text="help"))
     session.add(MessageCache(chatlog_id=31, message_index=0, message_text="help"))
@@ -264,3 +342,215 @@ def test_ensure_gradebook_persists_with_mock(session, monkeypatch):
 def test_warm_explore_candidates_noop_without_api_key(session, monkeypatch):
     monkeypatch.delenv("GEMINI_API_KEY", raising=False)
     warm_explore_candidates(1, [1, 2], {1: [(0, "hi", None)]}, {1: None})
+
+
+@pytest.fixture
+def warm_pool(monkeypatch):
+    explore_service.stop_warm_pool()
+    monkeypatch.setattr(explore_service.gemini_gateway, "available", lambda: True)
+    yield
+    explore_service.stop_warm_pool()
+
+
+def _convs(*cids):
+    return {cid: [(0, f"chat {cid}", None)] for cid in cids}
+
+
+def test_warm_queue_dedups_and_drops_stale_shortlist_entries(warm_pool, monkeypatch):
+    monkeypatch.setattr(explore_service, "_ensure_warm_workers", lambda: None)
+    before = explore_service.warm_stats()
+    warm_explore_candidates(1, [11, 12, 13], _convs(11, 12, 13), {})
+    # The labeler moved on: 11 and 12 are gone, 13 is requested again, now first.
+    warm_explore_candidates(1, [13, 14], _convs(13, 14), {})
+    warm_explore_candidates(2, [11], _convs(11), {})  # other labels are untouched
+
+    order = []
+    while explore_service.warm_queue_depth():
+        (kind, label_id, cid), _task = explore_service._next_warm_task()
+        order.append((kind, label_id, cid))
+    assert order == [
+        ("profile", 2, 11), ("profile", 1, 13), ("profile", 1, 14),
+        ("labeled", 2, None), ("labeled", 1, None),
+    ]
+    after = explore_service.warm_stats()
+    assert after["dropped_stale"] - before["dropped_stale"] == 2
+    assert after["deduped"] - before["deduped"] == 2  # 13 and label 1's labeled sweep
+
+
+def test_warm_pool_runs_in_parallel_up_to_the_concurrency(warm_pool, monkeypatch):
+    monkeypatch.setattr(explore_service, "WARM_CONCURRENCY", 2)
+    running, peak, done = set(), [0], threading.Event()
+    lock = threading.Lock()
+    ran: list = []
+
+    def fake_task(kind, label_id, cid, task):
+        with lock:
+            running.add(cid)
+            peak[0] = max(peak[0], len(running))
+        time.sleep(0.02)
+        with lock:
+            running.discard(cid)
+            ran.append((kind, cid))
+            if len(ran) == 7:
+                done.set()
+
+    monkeypatch.setattr(explore_service, "_run_warm_task", fake_task)
+    warm_explore_candidates(1, [21, 22, 23, 24, 25, 26], _convs(21, 22, 23, 24, 25, 26), {})
+    assert done.wait(5)
+    assert peak[0] == 2
+    assert sorted(cid for kind, cid in ran if kind == "profile") == [21, 22, 23, 24, 25, 26]
+
+
+def test_pick_warmth_counts_profiles_present_at_pick(session):
+    before = explore_service.warm_stats()
+    label = LabelDefinition(name="warmth", mode="single")
+    session.add(label)
+    session.commit()
+    session.add(ConversationProfile(label_id=label.id, chatlog_id=31, one_liner="x",
+                                    summary_embedding=_emb([1.0, 0.0])))
+    session.commit()
+    assert explore_service.note_pick_warmth(session, label.id, 31)
+    assert not explore_service.note_pick_warmth(session, label.id, 32)
+    after = explore_service.warm_stats()
+    assert (after["picks"] - before["picks"], after["warm_picks"] - before["warm_picks"]) == (2, 1)
+
+
+@pytest.fixture
+def offline_gemini(monkeypatch):
+    from fake_gemini import FakeGeminiClient
+    import gemini_gateway
+
+    fake = FakeGeminiClient.offline(embed_dim=8)
+    monkeypatch.setattr(gemini_gateway, "backend", fake)
+    monkeypatch.setattr(gemini_gateway, "_limiters", {})
+    return fake
+
+
+def _seed_conversations(session, cids):
+    label = LabelDefinition(name="precompute", mode="single", is_active=True, phase="labeling")
+    session.add(label)
+    for cid in cids:
+        for i in range(2):
+            session.add(MessageCache(chatlog_id=cid, message_index=i,
+                                     message_text=f"chat {cid} question {i}", notebook="lab05.ipynb"))
+    session.commit()
+    session.refresh(label)
+    return label
+
+
+def test_batched_profiles_use_one_summarize_and_one_embed_call(session, offline_gemini):
+    label = _seed_conversations(session, [41, 42, 43])
+    convs = explore_service.in_scope_conversations(session, label)
+    assert [c["chatlog_id"] for c in convs] == [41, 42, 43]
+
+    assert explore_service.ensure_conversation_profiles(session, label.id, convs) == 3
+    methods = [c["method"] for c in offline_gemini.calls]
+    assert methods == ["generate_content", "embed_content"]
+    assert len(offline_gemini.calls[1]["contents"]) == 3
+    profiles = session.exec(
+        select(ConversationProfile).where(ConversationProfile.label_id == label.id)
+    ).all()
+    assert {p.chatlog_id: p.one_liner.endswith(f"(chat {p.chatlog_id}).") for p in profiles} == {
+        41: True, 42: True, 43: True,
+    }
+    # Already current: nothing to ask for.
+    assert explore_service.ensure_conversation_profiles(session, label.id, convs) == 0
+    assert len(offline_gemini.calls) == 2
+
+
+def test_profile_precompute_job_batches_and_resumes(session, engine, offline_gemini, monkeypatch):
+    import jobs
+    import main
+
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(explore_service, "PROFILE_BATCH_SIZE", 2)
+    label = _seed_conversations(session, [51, 52, 53, 54, 55])
+    session.add(ConversationProfile(label_id=label.id, chatlog_id=52, one_liner="done",
+                                    summary_embedding=_emb([1.0, 0.0])))
+    session.commit()
+
+    ctx = jobs.JobContext()
+    main._run_profile_precompute(ctx, label.id)
+    summarize = [c for c in offline_gemini.calls if c["method"] == "generate_content"]
+    assert len(summarize) == 2  # 4 missing profiles, 2 per call; 52 was skipped
+    assert "## Conversation 52" not in "".join(c["contents"] for c in summarize)
+    assert (ctx.processed, ctx.total, ctx.error) == (5, 5, None)
+
+    ctx = jobs.JobContext()
+    main._run_profile_precompute(ctx, label.id)
+    assert len(offline_gemini.calls) == 4
+    assert (ctx.processed, ctx.total) == (5, 5)
+
+
+def test_profile_precompute_endpoints(client, session):
+    label = _seed_conversations(session, [61])
+    r = client.get(f"/api/single-labels/{label.id}/profiles/precompute")
+    assert r.json() == {"running": False, "processed": 0, "total": 0, "error": None}
+
+    r = client.post(f"/api/single-labels/{label.id}/profiles/precompute")
+    assert r.status_code == 200
+    job_id = r.json()["job_id"]
+    assert client.post(f"/api/single-labels/{label.id}/profiles/precompute").status_code == 409
+    status = client.get(f"/api/single-labels/{label.id}/profiles/precompute").json()
+    assert (status["job_id"], status["running"]) == (job_id, True)
+
+
+def _seed_centroid_corpus(session, n=6):
+    label = LabelDefinition(name="centroids", mode="single", is_active=True, phase="labeling")
+    session.add(label)
+    rng = np.random.default_rng(7)
+    for cid in range(n):
+        for i in range(2):
+            session.add(MessageCache(chatlog_id=cid, message_index=i, message_text=f"c{cid} m{i}"))
+            session.add(MessageEmbedding(chatlog_id=cid, message_index=i, model_version=EMBED_MODEL,
+                                         embedding=_emb(rng.standard_normal(4))))
+    session.commit()
+    session.refresh(label)
+    return label
+
+
+def test_conversation_novelties_match_the_pairwise_definition(session):
+    import decision_service
+
+    label = _seed_centroid_corpus(session)
+    for cid in (0, 1, 2):
+        decision_service.record_decision(session, label.id, cid, 0, "yes")
+
+    pool = [0, 1, 3, 4, 5, 99]
+    batch = explore_service.conversation_novelties(session, label.id, pool)
+    pairwise = {cid: explore_service.conversation_centroid(session, cid) for cid in (0, 1, 2)}
+    assert batch[99] is None  # no embeddings
+    for cid in pool[:-1]:
+        assert batch[cid] == pytest.approx(conversation_novelty(session, label.id, cid, pairwise), abs=1e-5)
+
+
+def test_labeled_centroids_follow_decide_and_undo_in_place(session, monkeypatch):
+    import decision_service
+
+    label = _seed_centroid_corpus(session)
+    decision_service.record_decision(session, label.id, 0, 0, "yes")
+    assert set(explore_service.labeled_student_centroids(session, label.id)) == {0}
+
+    def no_rebuild(*_a):
+        raise AssertionError("labeled set re-read from the DB")
+
+    with monkeypatch.context() as m:
+        m.setattr(explore_service, "_labeled_messages", no_rebuild)
+        decision_service.record_decision(session, label.id, 1, 0, "no")
+        explore_service.note_human_decision(session, label.id, 1, 0, "no")
+        decision_service.record_decision(session, label.id, 1, 1, "yes")
+        explore_service.note_human_decision(session, label.id, 1, 1, "yes")
+        assert set(explore_service.labeled_student_centroids(session, label.id)) == {0, 1}
+
+        snapshot = decision_service.undo_last_decision(session, label.id)
+        explore_service.note_human_decision(session, label.id, snapshot.chatlog_id, snapshot.message_index, None)
+        assert set(explore_service.labeled_student_centroids(session, label.id)) == {0, 1}
+        decision_service.record_decision(session, label.id, 1, 0, "skip")
+        explore_service.note_human_decision(session, label.id, 1, 0, "skip")
+        assert set(explore_service.labeled_student_centroids(session, label.id)) == {0}
+
+    # A write that never reported in moves the version: the next read rebuilds.
+    session.add(LabelApplication(label_id=label.id, chatlog_id=4, message_index=0,
+                                 applied_by="human", value="yes"))
+    session.commit()
+    assert set(explore_service.labeled_student_centroids(session, label.id)) == {0, 4}
@@ -0,0 +1,136 @@
+"""The offline fake (CHATSIGHT_GEMINI_BACKEND=fake): schema-valid answers,
+batch lifecycle, configurable faults."""
+import json
+import random
+import time
+
+import pytest
+
+import autolabel_service
+import binary_autolabel_service as bas
+import gemini_gateway
+from fake_gemini import FakeBehavior, FakeGeminiClient, parse_latency, schema_args
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    def install(**behavior):
+        client = FakeGeminiClient.offline(embed_dim=8, behavior=FakeBehavior(**behavior))
+        monkeypatch.setattr(gemini_gateway, "backend", client)
+        monkeypatch.setattr(gemini_gateway, "_limiters", {})
+        return client
+    yield install
+    gemini_gateway.reset_metrics()
+
+
+def _classify(messages):
+    return bas.classify_binary(label_name="asks for answer", label_description="wants the solution",
+                               yes_examples=["just tell me"], no_examples=["why is this"], messages=messages)
+
+
+def test_classify_binary_answers_every_message_deterministically(offline):
+    offline(yes_rate=0.5)
+    messages = [f"message number {i}" for i in range(40)]
+    first = _classify(messages)
+    assert [c["index"] for c in first] == list(range(40))
+    assert {c["value"] for c in first} == {"yes", "no"}
+    assert all(0.5 <= c["confidence"] <= 1 and c["rationale"] and c["matched_pattern"] for c in first)
+    # Same (label, message) → same verdict, whatever chunk it lands in.
+    assert _classify(messages[::-1]) == [dict(c, index=i) for i, c in enumerate(first[::-1])]
+
+
+def test_classify_messages_uses_only_defined_labels(offline):
+    offline()
+    labels = [{"name": n, "description": None} for n in ("Debugging", "Concepts", "Answer seeking")]
+    msgs = [{"message_text": f"help with thing {i}"} for i in range(25)]
+    single = autolabel_service.classify_batch(labels, {}, msgs, multi_select=False)
+    assert sorted(c["index"] for c in single) == list(range(25))
+    multi = autolabel_service.classify_batch(labels, {}, msgs, multi_select=True)
+    assert {c["label"] for c in single + multi} <= {"Debugging", "Concepts", "Answer seeking"}
+    assert len(multi) != len(single)
+
+
+def test_other_tools_get_schema_valid_arguments():
+    args = schema_args(bas.SUMMARY_FUNCTION_DECLARATION["parameters"], "prompt text")
+    assert set(args) == {"included", "excluded"}
+    for pattern in args["included"] + args["excluded"]:
+        assert isinstance(pattern["excerpt"], str)
+        assert isinstance(pattern["confidence_avg"], float)
+    assert args == schema_args(bas.SUMMARY_FUNCTION_DECLARATION["parameters"], "prompt text")
+
+
+def test_summarize_batch_through_sdk_schema_objects(offline):
+    offline()
+    out = bas.summarize_batch("asks for answer", None, ["just tell me"], ["why is it None"])
+    assert out["included"] and all("excerpt" in p for p in out["included"])
+
+
+def test_rate_limit_and_timeout_faults_are_classified(offline, monkeypatch):
+    monkeypatch.setattr(gemini_gateway, "RETRY_MAX_ATTEMPTS", 1)
+    offline(rate_limit_rate=1.0)
+    with pytest.raises(Exception) as exc:
+        _classify(["hi"])
+    assert gemini_gateway.error_kind(exc.value) == "rate_limited"
+
+    offline(timeout_rate=1.0, timeout_seconds=0.0)
+    with pytest.raises(Exception) as exc:
+        _classify(["hi"])
+    assert gemini_gateway.is_timeout(exc.value)
+
+
+def test_retries_absorb_a_partial_429_rate(offline, monkeypatch):
+    monkeypatch.setattr(gemini_gateway, "RETRY_BACKOFF_SECONDS", [0.0, 0.0, 0.0])
+    fake = offline(rate_limit_rate=0.3, seed=7)
+    for i in range(20):
+        _classify([f"msg {i}"])
+    stats = {s["call_site"]: s for s in gemini_gateway.metrics_snapshot()}["binary_autolabel.classify"]
+    assert stats["rate_limited"] > 0
+    assert len(fake.calls) == 20 + stats["retries"]
+
+
+def test_latency_specs():
+    rng = random.Random(0)
+    assert parse_latency("fixed:250")(rng) == 0.25
+    assert 0.1 <= parse_latency("uniform:100:200")(rng) <= 0.2
+    draws = sorted(parse_latency("lognormal:300:0.5")(rng) for _ in range(2001))
+    assert 0.25 < draws[1000] < 0.35
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
+
+
+def test_batch_job_lifecycle(tmp_path, offline):
+    fake = offline(batch_step_seconds=0.02)
+    chunks = [["just tell me the answer", "why does my loop fail"], ["what is a p-value"]]
+    src = tmp_path / "batch.jsonl"
+    src.write_text("\n".join(json.dumps(bas.build_classify_batch_request(
+        key=f"chunk-{i}", label_name="asks for answer", label_description=None,
+        yes_examples=[], no_examples=[], messages=msgs)) for i, msgs in enumerate(chunks)))
+
+    uploaded = fake.files.upload(file=str(src))
+    job = fake.batches.create(model=bas.CLASSIFY_MODEL, src=uploaded.name)
+    seen = [job.state.name]
+    while job.state.name != "JOB_STATE_SUCCEEDED":
+        time.sleep(0.005)
+        job = fake.batches.get(name=job.name)
+        if job.state.name != seen[-1]:
+            seen.append(job.state.name)
+    assert seen == ["JOB_STATE_QUEUED", "JOB_STATE_PENDING", "JOB_STATE_RUNNING", "JOB_STATE_SUCCEEDED"]
+
+    rows = [json.loads(l) for l in fake.files.download(file=job.dest.file_name).decode().splitlines()]
+    assert [r["key"] for r in rows] == ["chunk-0", "chunk-1"]
+    parsed = bas.parse_classify_batch_response(rows[0]["response"], 2)
+    assert parsed == _classify(chunks[0])
+
+
+def test_env_selects_the_offline_fake(monkeypatch):
+    monkeypatch.setattr(gemini_gateway, "backend", None)
+    monkeypatch.setattr(gemini_gateway, "_client", None)
+    monkeypatch.setattr(gemini_gateway, "BACKEND_KIND", "fake")
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    monkeypatch.setenv("CHATSIGHT_FAKE_GEMINI_LATENCY", "fixed:1")
+    monkeypatch.setenv("CHATSIGHT_FAKE_GEMINI_EMBED_DIM", "16")
+    assert gemini_gateway.available()
+    client = gemini_gateway.get_client()
+    assert isinstance(client, FakeGeminiClient)
+    assert client.behavior.latency == "fixed:1" and client.embed_dim == 16
+    assert gemini_gateway.get_client() is client
@@ -0,0 +1,122 @@
+"""Tests for the shared Gemini gateway: retry policy, rate limiting, metrics,
+and routing service calls through an injected fake backend."""
+from unittest.mock import patch
+
+import pytest
+
+import binary_autolabel_service
+import concept_service
+import gemini_gateway
+from fake_gemini import FakeGeminiClient
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    client = FakeGeminiClient(embed_dim=8)
+    monkeypatch.setattr(gemini_gateway, "backend", client)
+    monkeypatch.setattr(gemini_gateway, "_limiters", {})
+    gemini_gateway.reset_metrics()
+    yield client
+    gemini_gateway.reset_metrics()
+
+
+def test_service_calls_route_through_backend_and_record_metrics(fake):
+    fake.on_tool("classify_binary", lambda contents, config: {"classifications": [
+        {"index": 0, "value": "yes", "confidence": 0.9},
+    ]})
+    out = binary_autolabel_service.classify_binary(
+        label_name="help", label_description=None,
+        yes_examples=[], no_examples=[], messages=["how do I loop?"],
+    )
+    assert out[0]["value"] == "yes"
+    assert fake.calls[0]["model"] == binary_autolabel_service.CLASSIFY_MODEL
+
+    stats = {s["call_site"]: s for s in gemini_gateway.metrics_snapshot()}
+    site = stats["binary_autolabel.classify"]
+    assert site["calls"] == 1 and site["errors"] == 0
+    assert site["input_tokens"] > 0 and site["output_tokens"] > 0
+
+
+def test_embeddings_are_deterministic_per_text(fake):
+    a = gemini_gateway.embed_content(model="m", contents=["x", "y"], call_site="t")
+    b = gemini_gateway.embed_content(model="m", contents=["x"], call_site="t")
+    assert a.embeddings[0].values == b.embeddings[0].values
+    assert a.embeddings[0].values != a.embeddings[1].values
+
+
+def test_transient_errors_retry_with_backoff(fake):
+    fake.fail_next(Exception("429 RESOURCE_EXHAUSTED"), times=2)
+    with patch("gemini_gateway.time.sleep") as sleep:
+        gemini_gateway.generate_content(model="m", contents="hi", call_site="t")
+    assert len(fake.calls) == 3
+    waits = [c.args[0] for c in sleep.call_args_list]
+    assert len(waits) == 2
+    assert 1.5 <= waits[0] <= 2.5 and 3.0 <= waits[1] <= 5.0
+    (site,) = gemini_gateway.metrics_snapshot()
+    assert site["retries"] == 2 and site["rate_limited"] == 2 and site["calls"] == 3
+
+
+def test_non_transient_errors_fail_fast(fake):
+    fake.fail_next(Exception("401 UNAUTHENTICATED"))
+    with patch("gemini_gateway.time.sleep") as sleep, pytest.raises(Exception, match="401"):
+        gemini_gateway.generate_content(model="m", contents="hi", call_site="t")
+    assert len(fake.calls) == 1
+    sleep.assert_not_called()
+
+
+def test_nested_scope_does_not_multiply_retries(fake):
+    """An outer call_with_retry owns the policy; gateway calls inside it make
+    one attempt each, so total attempts stay at RETRY_MAX_ATTEMPTS."""
+    fake.fail_next(Exception("deadline exceeded"), times=100)
+    with patch("gemini_gateway.time.sleep"), pytest.raises(Exception, match="deadline"):
+        gemini_gateway.call_with_retry(
+            lambda: gemini_gateway.generate_content(model="m", contents="hi", call_site="inner"),
+            call_site="outer",
+        )
+    assert len(fake.calls) == gemini_gateway.RETRY_MAX_ATTEMPTS
+
+
+def test_max_attempts_one_disables_retry(fake):
+    fake.fail_next(Exception("429"), times=1)
+    with pytest.raises(Exception, match="429"):
+        gemini_gateway.generate_content(model="m", contents="hi", call_site="t", max_attempts=1)
+    assert len(fake.calls) == 1
+
+
+def test_token_bucket_waits_once_burst_is_spent():
+    clock = [0.0]
+    slept = []
+
+    def fake_sleep(s):
+        slept.append(s)
+        clock[0] += s
+
+    with patch("gemini_gateway.time.monotonic", side_effect=lambda: clock[0]), \
+         patch("gemini_gateway.time.sleep", side_effect=fake_sleep):
+        bucket = gemini_gateway.TokenBucket(rate_per_minute=60, burst=2)
+        assert bucket.acquire() == 0.0
+        assert bucket.acquire() == 0.0
+        waited = bucket.acquire()
+    assert waited == pytest.approx(1.0)
+    assert sum(slept) == pytest.approx(1.0)
+
+
+def test_per_model_rate_override(monkeypatch):
+    monkeypatch.setenv("CHATSIGHT_GEMINI_RPM_GEMINI_2_5_FLASH", "30")
+    assert gemini_gateway.rpm_for("gemini-2.5-flash") == 30.0
+    assert gemini_gateway.rpm_for("gemini-embedding-001") == gemini_gateway.DEFAULT_RPM
+
+
+def test_error_kind_and_transience():
+    assert gemini_gateway.error_kind(Exception("429 quota")) == "rate_limited"
+    assert gemini_gateway.error_kind(Exception("500 internal")) == "error"
+    assert gemini_gateway.is_transient(Exception("Read timed out"))
+    assert not gemini_gateway.is_transient(Exception("400 bad request"))
+
+
+def test_concept_embeddings_use_gateway(fake, session):
+    msgs = [{"chatlog_id": 1, "message_index": 0, "message_text": "hello", "context_before": None}]
+    with patch.object(concept_service, "EMBED_DIM", 8):
+        vecs = concept_service.embed_messages(msgs, session)
+    assert vecs.shape == (1, 8)
+    assert fake.calls[0]["method"] == "embed_content"
@@ -6,7 +6,9 @@ from unittest.mock import MagicMock, patch
 from sqlmodel import SQLModel, Session, create_engine, select
 from sqlmodel.pool import StaticPool
 
+import gemini_gateway
 import main
+import shared_state
 from models import LabelApplication, LabelDefinition, MessageCache
 
 
@@ -236,7 +238,7 @@ def test_parallel_classify_retries_on_rate_limit_then_succeeds(client, session):
 
 
 def test_parallel_classify_gives_up_after_max_retries_on_rate_limit(client, session):
-    """If 429s keep coming past PARALLEL_RETRY_MAX_ATTEMPTS, the chunk runner
+    """If 429s keep coming past gemini_gateway.RETRY_MAX_ATTEMPTS, the chunk runner
     surfaces the 429 to the caller. The exception handler in
     `_classify_in_background` then marks the label rate_limited."""
     _seed(session, conversations=1, per_conv=2)
@@ -795,7 +797,7 @@ def test_batch_state_persists_through_poll_loop_and_clears_on_success(session):
         {"index": i, "value": "yes", "confidence": 0.9} for i in range(len(pending))
     ]
 
-    with patch.object(bas, "client", fake_client), \
+    with patch.object(gemini_gateway, "backend", fake_client), \
          patch("main.time.sleep"), \
          patch.object(bas, "parse_classify_batch_response", return_value=fake_classifications):
         main._classify_via_batch_api(session, label, pending, [], [])
@@ -981,7 +983,7 @@ def test_multi_batch_path_advances_counts_as_sub_batches_land(session):
         {"index": i, "value": "yes", "confidence": 0.9} for i in range(n)
     ]
 
-    with patch.object(bas, "client", fake_client), \
+    with patch.object(gemini_gateway, "backend", fake_client), \
          patch("main.time.sleep", side_effect=fake_sleep), \
          patch.object(bas, "parse_classify_batch_response", side_effect=fake_classifications):
         main._classify_via_batch_api(session, label, pending, [], [])
@@ -1041,7 +1043,7 @@ def test_multi_batch_partial_failure_preserves_succeeded_sub_batch_rows(session)
         {"index": i, "value": "yes", "confidence": 0.9} for i in range(n)
     ]
 
-    with patch.object(bas, "client", fake_client), \
+    with patch.object(gemini_gateway, "backend", fake_client), \
          patch("main.time.sleep"), \
          patch.object(bas, "parse_classify_batch_response", side_effect=fake_classifications):
         import pytest as _pytest
@@ -1083,7 +1085,7 @@ def test_n_eq_1_path_when_pending_at_or_below_split_target(session):
         {"index": i, "value": "yes", "confidence": 0.9} for i in range(n)
     ]
 
-    with patch.object(bas, "client", fake_client), \
+    with patch.object(gemini_gateway, "backend", fake_client), \
          patch("main.time.sleep"), \
          patch.object(bas, "parse_classify_batch_response", side_effect=fake_classifications):
         main._classify_via_batch_api(session, label, pending, [], [])
@@ -1122,25 +1124,23 @@ def test_handoff_summaries_surfaces_batch_count_fields(client, session):
 # ─── Inline classification concurrency gate ───────────────────────────────
 
 
-def _isolated_engine_with_pending(label_name, n_msgs=4):
-    """Build a standalone in-memory engine seeded with a single-label and
-    `n_msgs` undecided cached messages so `_do_classification` reaches the
-    inline classify call. Returns (engine, label_id). Each engine is its own
-    DB so two threads can run `_do_classification` without write contention —
-    the thing under test (the serialization lock) is process-global, not
-    per-DB."""
-    engine = create_engine(
-        "sqlite://",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    SQLModel.metadata.create_all(engine)
+def _isolated_engine_with_pending(label_name, n_msgs=4, engine=None, chatlog_id=700):
+    """Build a standalone in-memory engine (or seed `engine`) with a
+    single-label and `n_msgs` undecided cached messages so `_do_classification`
+    reaches the inline classify call. Returns (engine, label_id)."""
+    if engine is None:
+        engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        SQLModel.metadata.create_all(engine)
     with Session(engine) as db:
         label = LabelDefinition(name=label_name, mode="single", phase="classifying")
         db.add(label)
         for i in range(n_msgs):
             db.add(MessageCache(
-                chatlog_id=700, message_index=i,
+                chatlog_id=chatlog_id, message_index=i,
                 message_text=f"msg {i}", notebook="lab3.ipynb",
             ))
         db.commit()
@@ -1148,10 +1148,11 @@ def _isolated_engine_with_pending(label_name, n_msgs=4):
         return engine, label.id
 
 
-def test_concurrent_inline_classifications_are_serialized():
+def test_concurrent_inline_classifications_are_serialized(tmp_path):
     """Two inline classifications running at once must not overlap — the
-    process-wide lock keeps aggregate Gemini concurrency at the tuned value
-    instead of multiplying it per in-flight handoff."""
+    advisory lock in the app DB keeps aggregate Gemini concurrency at the
+    tuned value instead of multiplying it per in-flight handoff. A file DB so
+    the two threads get their own connections, as two workers would."""
     active = {"n": 0, "peak": 0}
     active_lock = threading.Lock()
     barrier = threading.Barrier(2)
@@ -1169,8 +1170,10 @@ def test_concurrent_inline_classifications_are_serialized():
     def fake_summary(*args, **kwargs):
         return {"included": [], "excluded": []}
 
-    engine_a, label_a = _isolated_engine_with_pending("alpha")
-    engine_b, label_b = _isolated_engine_with_pending("beta")
+    shared = create_engine(f"sqlite:///{tmp_path / 'app.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(shared)
+    engine_a, label_a = _isolated_engine_with_pending("alpha", engine=shared)
+    engine_b, label_b = _isolated_engine_with_pending("beta", engine=shared, chatlog_id=701)
 
     def run(engine, label_id):
         barrier.wait()  # ensure both threads contend for the lock together
@@ -1220,7 +1223,7 @@ def test_batch_classification_not_gated_by_inline_lock(monkeypatch):
          patch("binary_autolabel_service.summarize_batch", side_effect=fake_summary):
         # Hold the inline lock for the whole duration — a correctly-scoped gate
         # leaves the batch path free to proceed.
-        with main._INLINE_CLASSIFY_LOCK:
+        with shared_state.advisory_lock(engine, main.INLINE_CLASSIFY_LOCK):
             t = threading.Thread(target=run)
             t.start()
             finished = completed.wait(timeout=3)
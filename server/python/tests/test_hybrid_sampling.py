@@ -259,6 +259,7 @@ def test_explore_walk_msg2_stays_explore_after_decide(client, session, monkeypat
     assert first is not None
     assert first["sampling_pick"] == "explore"
     assert first["explore_pick_summary"]
+    assert "Scored · 1 of 1" in first["explore_pick_breakdown"]
     cid = first["chatlog_id"]
     session.expire_all()
     body = client.post(
@@ -298,3 +299,67 @@ def test_decide_response_carries_sampling_on_next(client, session, monkeypatch):
     if nxt is not None:
         assert "sampling_pick" in nxt
         assert "sampling_hint" in nxt
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _explore_pool(n):
+    # Distinct specificity so the cheap prior has a strict order: longer,
+    # more specific asks rank first.
+    conv = {
+        900 + i: [(0, "Can you show an example of merge " + "in my code " * i + "?", None)]
+        for i in range(n)
+    }
+    return conv, {cid: None for cid in conv}
+
+
+def test_explore_scoring_stops_at_the_budget(session, monkeypatch):
+    """Each expensive evaluation costs 50ms on the fake clock; an 80ms budget
+    scores two shortlisted candidates and picks among them."""
+    clock = _FakeClock()
+    monkeypatch.setattr(queue_service, "_clock", clock)
+    monkeypatch.setenv("CHATSIGHT_EXPLORE_SCORE_BUDGET_MS", "80")
+    monkeypatch.setattr(queue_service.random, "random", lambda: 0.0)
+    evaluated: list[int] = []
+
+    def slow_knn(session, label_id, chatlog_id, message_index, **_kwargs):
+        evaluated.append(chatlog_id)
+        clock.now += 0.05
+        return None
+
+    monkeypatch.setattr(queue_service, "neighbor_uncertainty_novelty", slow_knn)
+    conv, assign = _explore_pool(20)
+    cid, mode, components = queue_service._select_next_chatlog_id(
+        session, label_id=1, conv=conv, assign_by_cid=assign, decided=set(),
+        in_progress=[], not_started=list(conv), explore_fraction=1.0,
+    )
+    assert mode == "explore"
+    assert (components["scored"], components["shortlist"]) == (2, 5)
+    assert evaluated == [919, 918]  # best prior first
+    assert cid in evaluated
+
+    explanation = queue_service.compose_explore_pick_explanation(
+        session, 1, cid, 0, conv[cid][0][1], precomputed=components
+    )
+    assert "Scored · 2 of 5" in explanation["breakdown"]
+
+
+def test_explore_scoring_always_scores_one_candidate(session, monkeypatch):
+    clock = _FakeClock()
+    clock.now = 100.0
+    monkeypatch.setattr(queue_service, "_clock", clock)
+    monkeypatch.setenv("CHATSIGHT_EXPLORE_SCORE_BUDGET_MS", "0")
+    monkeypatch.setattr(queue_service.random, "random", lambda: 0.0)
+    conv, assign = _explore_pool(20)
+    cid, mode, components = queue_service._select_next_chatlog_id(
+        session, label_id=1, conv=conv, assign_by_cid=assign, decided=set(),
+        in_progress=[], not_started=list(conv), explore_fraction=1.0,
+    )
+    assert (cid, mode, components["scored"]) == (919, "explore", 1)
+
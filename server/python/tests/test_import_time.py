@@ -0,0 +1,53 @@
+# server/python/tests/test_import_time.py
+"""Import-time budget for the API process.
+
+Heavy optional dependencies (scikit-learn, google.genai) are imported inside
+the functions that use them, and Gemini clients are built on first call, so
+`import main` stays fast and works without GEMINI_API_KEY. Runs a fresh
+interpreter under `python -X importtime` so modules already imported by the
+test session don't hide regressions."""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+# Cumulative microseconds for `import main`. ~1.6s on a dev laptop after lazy
+# imports (vs ~4.3s before); the budget leaves headroom for slower CI boxes.
+IMPORT_BUDGET_US = int(os.environ.get("CHATSIGHT_IMPORT_BUDGET_MS", "3000")) * 1000
+
+EAGER_FORBIDDEN = ("sklearn", "google.genai", "scipy")
+
+
+def _importtime():
+    env = {k: v for k, v in os.environ.items() if k != "GEMINI_API_KEY"}
+    env.setdefault("PG_PASSWORD", "test_dummy_password")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=SERVER_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(cumulative_us)))
+    return rows
+
+
+def test_import_main_within_budget_and_no_heavy_deps():
+    rows = _importtime()
+    names = [name for name, _ in rows]
+    eager = [n for n in names if any(n == m or n.startswith(m + ".") for m in EAGER_FORBIDDEN)]
+    assert not eager, f"importing main eagerly loads {sorted(set(eager))[:10]}"
+
+    main_us = next(us for name, us in rows if name == "main")
+    assert main_us <= IMPORT_BUDGET_US, (
+        f"import main took {main_us / 1000:.0f}ms (budget {IMPORT_BUDGET_US / 1000:.0f}ms)"
+    )
@@ -0,0 +1,196 @@
+"""Tests for the durable job queue (jobs.py) and the routes that enqueue into it."""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import SQLModel, Session, create_engine, select
+
+import jobs
+import main
+from models import Job, LabelDefinition
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """Isolated handler registry; tests add their own kinds."""
+    registry = {}
+    monkeypatch.setattr(jobs, "_handlers", registry)
+    return registry
+
+
+def _job(session, job_id):
+    session.expire_all()
+    return session.get(Job, job_id)
+
+
+def test_lease_run_records_progress_and_result(engine, session, handlers):
+    def count(ctx, n):
+        ctx.progress(0, n)
+        ctx.progress(n)
+        return {"counted": n}
+
+    jobs.register("count", count)
+    job = jobs.enqueue(session, "count", {"n": 3})
+
+    leased = jobs.lease(engine, "w1")
+    assert leased.id == job.id and leased.attempts == 1
+    assert jobs.lease(engine, "w2") is None  # already owned
+    assert jobs.run(engine, leased, "w1") == "succeeded"
+
+    row = _job(session, job.id)
+    assert (row.status, row.processed, row.total, row.lease_owner) == ("succeeded", 3, 3, None)
+    assert json.loads(row.result_json) == {"counted": 3}
+    assert row.finished_at is not None
+
+
+def test_failure_retries_with_backoff_then_fails(engine, session, handlers):
+    def boom(ctx):
+        raise RuntimeError("gemini down")
+
+    jobs.register("boom", boom)
+    job = jobs.enqueue(session, "boom", max_attempts=2)
+
+    assert jobs.run(engine, jobs.lease(engine, "w1"), "w1") == "queued"
+    row = _job(session, job.id)
+    assert row.error == "gemini down" and row.run_after > datetime.utcnow()
+    assert jobs.lease(engine, "w1") is None  # still backing off
+
+    later = row.run_after + timedelta(seconds=1)
+    assert jobs.run(engine, jobs.lease(engine, "w1", now=later), "w1") == "failed"
+    row = _job(session, job.id)
+    assert (row.status, row.attempts) == ("failed", 2)
+
+
+def test_cancel_queued_and_running(engine, session, handlers):
+    seen = []
+
+    def loop(ctx):
+        for i in range(5):
+            if i == 2:
+                with Session(engine) as other:
+                    jobs.cancel(other, ctx.job_id)
+                ctx.heartbeat()
+            ctx.checkpoint()
+            seen.append(i)
+
+    jobs.register("loop", loop)
+    queued = jobs.enqueue(session, "loop")
+    assert jobs.cancel(session, queued.id).status == "cancelled"
+    assert jobs.lease(engine, "w1") is None
+
+    running = jobs.enqueue(session, "loop")
+    assert jobs.run(engine, jobs.lease(engine, "w1"), "w1") == "cancelled"
+    assert seen == [0, 1]
+    assert _job(session, running.id).status == "cancelled"
+
+
+def test_orphaned_job_is_released_to_another_worker(engine, session, handlers):
+    jobs.register("noop", lambda ctx: None)
+    job = jobs.enqueue(session, "noop")
+    dead = jobs.lease(engine, "dead-worker")
+
+    assert jobs.reclaim_expired(engine) == 0  # lease still live
+    expired = datetime.utcnow() + timedelta(seconds=jobs.LEASE_SECONDS + 1)
+    assert jobs.reclaim_expired(engine, now=expired) == 1
+    row = _job(session, job.id)
+    assert (row.status, row.lease_owner) == ("queued", None)
+
+    fresh = jobs.lease(engine, "w2", now=expired)
+    assert fresh.id == job.id and fresh.attempts == 2
+    # The dead worker's context notices it lost the lease; its outcome is dropped.
+    assert jobs.JobContext(dead, engine, "dead-worker").heartbeat() is False
+    assert jobs.run(engine, dead, "dead-worker") == "lost"
+    assert jobs.run(engine, fresh, "w2") == "succeeded"
+
+
+def test_orphan_out_of_attempts_fails(engine, session, handlers):
+    jobs.register("noop", lambda ctx: None)
+    job = jobs.enqueue(session, "noop", max_attempts=1)
+    jobs.lease(engine, "dead-worker")
+    jobs.reclaim_expired(engine, now=datetime.utcnow() + timedelta(seconds=jobs.LEASE_SECONDS + 1))
+    row = _job(session, job.id)
+    assert row.status == "failed" and "lease expired" in row.error
+
+
+def test_worker_processes_never_run_a_job_twice(tmp_path):
+    db_path = tmp_path / "jobs.db"
+    db_engine = create_engine(f"sqlite:///{db_path}")
+    SQLModel.metadata.create_all(db_engine, tables=[Job.__table__])
+    jobs._handlers["touch"] = lambda ctx, n: None
+    try:
+        with Session(db_engine) as db:
+            for n in range(40):
+                jobs.enqueue(db, "touch", {"n": n})
+    finally:
+        jobs._handlers.pop("touch")
+
+    child = textwrap.dedent(f"""
+        import os, sqlite3, sys
+        sys.path.insert(0, {os.path.dirname(os.path.dirname(__file__))!r})
+        from sqlmodel import create_engine
+        import jobs
+        path = {str(db_path)!r}
+        engine = create_engine("sqlite:///" + path, connect_args={{"timeout": 30}})
+
+        def touch(ctx, n):
+            con = sqlite3.connect(path, timeout=30)
+            con.execute("INSERT INTO ran (n, pid) VALUES (?, ?)", (n, os.getpid()))
+            con.commit()
+            con.close()
+
+        jobs.register("touch", touch)
+        worker_id = jobs.new_worker_id()
+        while (job := jobs.lease(engine, worker_id)) is not None:
+            jobs.run(engine, job, worker_id)
+    """)
+    con = sqlite3.connect(db_path)
+    con.execute("CREATE TABLE ran (n INTEGER, pid INTEGER)")
+    con.commit()
+
+    procs = [subprocess.Popen([sys.executable, "-c", child]) for _ in range(3)]
+    assert all(p.wait(timeout=120) == 0 for p in procs)
+
+    ran = [n for (n,) in con.execute("SELECT n FROM ran")]
+    con.close()
+    assert sorted(ran) == list(range(40))  # every job exactly once
+    with Session(db_engine) as db:
+        assert {j.status for j in db.exec(select(Job)).all()} == {"succeeded"}
+
+
+# ── Routes ───────────────────────────────────────────────────────────────────
+
+def test_handoff_enqueues_a_job(client, session):
+    label = client.post("/api/single-labels", json={"name": "help"}).json()
+    client.post(f"/api/single-labels/{label['id']}/activate")
+
+    assert client.post(f"/api/single-labels/{label['id']}/handoff?sample_size=5").status_code == 200
+    job = session.exec(select(Job).where(Job.kind == "handoff")).one()
+    assert (job.status, job.label_id) == ("queued", label["id"])
+    assert json.loads(job.payload_json) == {"label_id": label["id"], "sample_size": 5}
+
+
+def test_autolabel_status_and_stop_read_the_job_table(client, session, engine, monkeypatch):
+    session.add(LabelDefinition(name="topic", mode="multi"))
+    session.commit()
+    assert client.get("/api/queue/autolabel/status").json()["running"] is False
+
+    assert client.post("/api/queue/autolabel").status_code == 200
+    assert client.post("/api/queue/autolabel").status_code == 409
+    status = client.get("/api/queue/autolabel/status").json()
+    assert status["running"] is True and status["status"] == "queued"
+
+    assert client.post("/api/queue/autolabel/stop").status_code == 200
+    assert client.get("/api/queue/autolabel/status").json()["status"] == "cancelled"
+    assert client.post("/api/queue/autolabel/stop").status_code == 409
+
+    # A worker picks up the next one and reports progress through the row.
+    assert client.post("/api/queue/autolabel").status_code == 200
+    monkeypatch.setattr(main, "engine", engine)
+    assert jobs.run(engine, jobs.lease(engine, "w1"), "w1") == "succeeded"
+    status = client.get("/api/queue/autolabel/status").json()
+    assert status["running"] is False and status["status"] == "succeeded"
@@ -1,9 +1,9 @@
 """Verify the LabelPrediction model is registered and round-trips correctly."""
-import json
-
 import sqlalchemy.exc
+from sqlalchemy import inspect, text
 from sqlmodel import select
 
+import database
 from models import LabelDefinition, LabelPrediction
 
 
@@ -13,15 +13,11 @@ def test_label_prediction_inserts_and_reads(session):
     session.commit()
     session.refresh(label)
 
-    neighbors = [
-        {"chatlog_id": 1, "message_index": 0, "value": "yes", "similarity": 0.84, "message_text": "i'm stuck"},
-        {"chatlog_id": 2, "message_index": 1, "value": "no", "similarity": 0.71, "message_text": "what is variance"},
-    ]
     pred = LabelPrediction(
         label_id=label.id,
         chatlog_id=10,
         message_index=2,
-        nearest_neighbors=json.dumps(neighbors),
+        probability=0.84,
         model_version=12,
     )
     session.add(pred)
@@ -34,9 +30,7 @@ def test_label_prediction_inserts_and_reads(session):
     assert fresh.chatlog_id == 10
     assert fresh.message_index == 2
     assert fresh.model_version == 12
-    decoded = json.loads(fresh.nearest_neighbors)
-    assert len(decoded) == 2
-    assert decoded[0]["value"] == "yes"
+    assert fresh.probability == 0.84
 
 
 def test_label_prediction_unique_per_message(session):
@@ -46,15 +40,29 @@ def test_label_prediction_unique_per_message(session):
     session.refresh(label)
 
     a = LabelPrediction(label_id=label.id, chatlog_id=1, message_index=0,
-                        nearest_neighbors="[]", model_version=1)
+                        probability=0.5, model_version=1)
     session.add(a)
     session.commit()
 
     b = LabelPrediction(label_id=label.id, chatlog_id=1, message_index=0,
-                        nearest_neighbors="[]", model_version=2)
+                        probability=0.5, model_version=2)
     session.add(b)
     try:
         session.commit()
         raise AssertionError("expected unique constraint violation")
     except sqlalchemy.exc.IntegrityError:
         session.rollback()
+
+
+def test_old_neighbor_table_is_rebuilt(engine):
+    with engine.connect() as conn:
+        conn.execute(text("DROP TABLE labelprediction"))
+        conn.execute(text(
+            "CREATE TABLE labelprediction (id INTEGER PRIMARY KEY, label_id INTEGER, chatlog_id INTEGER,"
+            " message_index INTEGER, nearest_neighbors VARCHAR, model_version INTEGER, updated_at DATETIME)"
+        ))
+        database._rebuild_label_prediction(conn, inspect, text)
+        cols = {c["name"] for c in inspect(conn).get_columns("labelprediction")}
+        database._rebuild_label_prediction(conn, inspect, text)  # idempotent
+        conn.commit()
+    assert "probability" in cols and "nearest_neighbors" not in cols
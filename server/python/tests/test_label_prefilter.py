@@ -0,0 +1,120 @@
+"""Tests for label_prefilter: offering each auto-label batch only its nearest labels."""
+import numpy as np
+from sqlmodel import select
+
+import autolabel_service
+import label_prefilter
+import main
+from concept_service import EMBED_MODEL
+from models import LabelApplication, LabelDefinition, MessageCache, MessageEmbedding
+
+_DIM = 12
+
+
+def _emb(axis):
+    vec = np.zeros(_DIM, dtype=np.float32)
+    vec[axis] = 1.0
+    return vec.tobytes()
+
+
+def _seed(session, n_labels=10, examples=6):
+    """Label j's human examples point along axis j. One more label, "rare",
+    has only two examples, too few for a centroid."""
+    labels = []
+    for j in range(n_labels):
+        labels.append(LabelDefinition(name=f"topic {j}", mode="multi", description=f"axis {j}"))
+    labels.append(LabelDefinition(name="rare", mode="multi"))
+    session.add_all(labels)
+    session.commit()
+    cid = 0
+    for j, label in enumerate(labels):
+        for _ in range(examples if label.name != "rare" else 2):
+            cid += 1
+            session.add(MessageCache(chatlog_id=cid, message_index=0, message_text=f"example {label.name}"))
+            session.add(MessageEmbedding(chatlog_id=cid, message_index=0, embedding=_emb(j % _DIM),
+                                         model_version=EMBED_MODEL))
+            session.add(LabelApplication(label_id=label.id, chatlog_id=cid, message_index=0, applied_by="human"))
+    session.commit()
+    return labels
+
+
+def _unlabeled(session, axes, start=500):
+    """One unlabeled message per entry of `axes`; None means no embedding."""
+    messages = []
+    for n, axis in enumerate(axes):
+        cid = start + n
+        session.add(MessageCache(chatlog_id=cid, message_index=0, message_text=f"about {axis}"))
+        if axis is not None:
+            session.add(MessageEmbedding(chatlog_id=cid, message_index=0, embedding=_emb(axis),
+                                         model_version=EMBED_MODEL))
+        messages.append({"chatlog_id": cid, "message_index": 0, "message_text": f"about {axis}",
+                         "context_before": None})
+    session.commit()
+    return messages
+
+
+def test_centroids_and_candidates(session):
+    labels = _seed(session)
+    ids = [l.id for l in labels]
+    centroids = label_prefilter.label_centroids(session, ids)
+    assert centroids["label_ids"] == ids[:-1] and centroids["untrusted"] == [labels[-1].id]
+    assert centroids["matrix"].shape == (10, _DIM)
+
+    messages = _unlabeled(session, [3, None])
+    keys = [(m["chatlog_id"], m["message_index"]) for m in messages]
+    # Every other label is orthogonal, so only the nearest is within the margin.
+    assert label_prefilter.candidate_labels(session, centroids, keys, top_m=4) == \
+        {keys[0]: [labels[3].id, labels[-1].id]}
+    wide = label_prefilter.candidate_labels(session, centroids, keys, top_m=4, margin=2.0)
+    assert len(wide[keys[0]]) == 5 and wide[keys[0]][0] == labels[3].id
+
+
+def test_plan_batches_without_a_usable_prefilter_offers_every_label(session):
+    labels = _seed(session)
+    ids = [l.id for l in labels]
+    messages = _unlabeled(session, [0, 1, 2, 3, 4])
+    for top_m in (0, len(ids)):
+        plan = label_prefilter.plan_batches(session, ids, messages, 2, top_m=top_m)
+        assert [batch for batch, _ in plan] == [messages[0:2], messages[2:4], messages[4:5]]
+        assert all(offered == ids for _, offered in plan)
+
+
+def test_plan_batches_groups_messages_by_their_candidate_labels(session):
+    labels = _seed(session)
+    ids = [l.id for l in labels]
+    messages = _unlabeled(session, [5, 2, None, 5, 2])
+    plan = label_prefilter.plan_batches(session, ids, messages, 2, top_m=3)
+    assert [[m["message_text"] for m in batch] for batch, _ in plan] == \
+        [["about 2", "about 2"], ["about 5", "about 5"], ["about None"]]
+    assert [offered for _, offered in plan] == \
+        [[labels[2].id, labels[-1].id], [labels[5].id, labels[-1].id], ids]
+
+
+def test_autolabel_sends_each_batch_only_its_candidate_labels(session, engine, monkeypatch):
+    monkeypatch.setattr(main, "engine", engine)
+    labels = _seed(session)
+    _unlabeled(session, [1, 7, 1])
+    offered = []
+
+    def fake_classify(label_defs, examples_by_label, messages, multi_select=False):
+        offered.append(([d["name"] for d in label_defs], sorted(m["message_text"] for m in messages)))
+        return [{"index": i, "label": label_defs[0]["name"], "confidence": 0.9} for i in range(len(messages))]
+
+    monkeypatch.setattr(autolabel_service, "classify_batch", fake_classify)
+    monkeypatch.setattr(label_prefilter, "PREFILTER_TOP_M", 3)
+    ctx = main._run_autolabel()
+
+    assert offered == [(["topic 1", "topic 7", "rare"], ["about 1", "about 1", "about 7"])]
+    assert (ctx.processed, ctx.total) == (3, 3)
+    rows = session.exec(select(LabelApplication).where(LabelApplication.applied_by == "ai")).all()
+    assert sorted(r.chatlog_id for r in rows) == [500, 501, 502]
+
+
+def test_prefilter_eval_cuts_tokens_and_keeps_agreement():
+    from bench import prefilter_eval
+
+    report = prefilter_eval.evaluate(n_labels=40, n_messages=300, examples=8, seed=1)
+    assert report["baseline"]["labels_per_prompt"] == 40
+    assert report["prefiltered"]["calls"] == report["baseline"]["calls"] == 10
+    assert report["token_reduction"] > 0.4
+    assert report["agreement"]["exact"] > 0.9 and report["agreement"]["label_recall"] > 0.9
@@ -0,0 +1,164 @@
+"""Tests for lexical_service: the TF-IDF fallback for explore rarity/themes."""
+import numpy as np
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+import gemini_gateway
+import lexical_service
+import queue_service
+from models import Job, LabelApplication, LabelDefinition, MessageCache
+
+
+_TEXTS = {
+    1: ["how do I merge two dataframes on a key column", "the merge drops rows"],
+    2: ["how do I merge two dataframes on a key column"],
+    3: ["why does my histogram plot show density instead of counts"],
+    4: ["groupby then agg with a lambda returns a series not a dataframe"],
+}
+
+
+def _seed(session):
+    """Cache the messages and build the index, as startup ingest does."""
+    for cid, texts in _TEXTS.items():
+        for i, text in enumerate(texts):
+            session.add(MessageCache(chatlog_id=cid, message_index=i, message_text=text))
+    session.commit()
+    lexical_service.ensure_index(session)
+
+
+def test_rarity_is_the_exact_max_similarity(session):
+    _seed(session)
+    assert lexical_service.message_rarity(session, 2, 0) == pytest.approx(0.0, abs=1e-6)  # duplicate of (1, 0)
+
+    index = lexical_service.ensure_index(session)
+    dense = index["matrix"].toarray()
+    row = index["keys_idx"][(3, 0)]
+    sims = dense @ dense[row]
+    sims[row] = 0.0
+    assert lexical_service.message_rarity(session, 3, 0) == pytest.approx(1.0 - sims.max(), abs=1e-6)
+    assert lexical_service.message_rarity(session, 99, 0) is None
+
+
+def test_keywords_and_theme_novelty(session):
+    _seed(session)
+    assert "merge" in lexical_service.conversation_keywords(session, 1)
+    assert "histogram" in lexical_service.message_keywords(session, 3, 0)
+
+    # Conversation 2 repeats conversation 1's question; 3 shares nothing with it.
+    assert lexical_service.theme_novelty(session, 2, {1}) < 0.5
+    assert lexical_service.theme_novelty(session, 3, {1}) == pytest.approx(1.0)
+    assert lexical_service.theme_novelty(session, 1, {1}) is None  # nothing else labeled
+
+
+def test_index_is_saved_and_reloaded_until_the_text_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical_service, "LEXICAL_DIR", tmp_path / "lexical")
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        _seed(session)
+        built = lexical_service.ensure_index(session)
+        assert (tmp_path / "lexical" / "messages.npz").exists()
+
+    lexical_service._indexes.clear()
+    with Session(engine) as session, monkeypatch.context() as m:
+        m.setattr(lexical_service, "build_index", lambda *a: pytest.fail("refit instead of loading"))
+        loaded = lexical_service.ensure_index(session)
+        assert loaded["keys_idx"] == built["keys_idx"]
+        assert np.allclose(loaded["matrix"].toarray(), built["matrix"].toarray())
+
+        # A sync writes new messages: the version moves and the index refits.
+        session.add(MessageCache(chatlog_id=5, message_index=0, message_text="seaborn heatmap colors"))
+        session.commit()
+    with Session(engine) as session:
+        assert not lexical_service.is_current(session)
+        assert (5, 0) in lexical_service.ensure_index(session)["keys_idx"]
+
+    # Another process serving the same DB loads the rebuilt index from disk.
+    lexical_service._indexes.clear()
+    with Session(engine) as session, monkeypatch.context() as m:
+        m.setattr(lexical_service, "build_index", lambda *a: pytest.fail("refit on the query path"))
+        assert lexical_service.is_current(session)
+        assert lexical_service.message_keywords(session, 5, 0)
+    engine.dispose()
+
+
+def test_queries_never_refit_and_assignment_writes_keep_the_index(session, monkeypatch):
+    _seed(session)
+    served = lexical_service.ensure_index(session)
+    monkeypatch.setattr(lexical_service, "build_index", lambda *a: pytest.fail("refit on the query path"))
+
+    # Assignment matching rewrites MessageCache rows but not their text.
+    for row in session.exec(select(MessageCache)).all():
+        row.assignment_id = 1
+    session.commit()
+    assert lexical_service.is_current(session)
+    assert lexical_service.ensure_index(session) is served
+
+    # New text: queries keep serving the previous index until a rebuild.
+    session.add(MessageCache(chatlog_id=5, message_index=0, message_text="seaborn heatmap colors"))
+    session.commit()
+    assert not lexical_service.is_current(session)
+    assert lexical_service.message_rarity(session, 2, 0) == pytest.approx(0.0, abs=1e-6)
+    assert lexical_service.message_rarity(session, 5, 0) is None
+
+
+def test_queries_before_the_first_build_have_no_signal(session):
+    session.add(MessageCache(chatlog_id=1, message_index=0, message_text="merge two dataframes"))
+    session.commit()
+    assert not lexical_service.is_current(session)
+    assert lexical_service.message_rarity(session, 1, 0) is None
+    assert lexical_service.conversation_keywords(session, 1) == []
+    assert lexical_service.theme_novelty(session, 1, {2}) is None
+
+
+def test_next_queues_one_rebuild_job_when_the_text_moves(client, session, engine, monkeypatch):
+    import jobs
+    import main
+
+    monkeypatch.setattr(main, "engine", engine)
+    _seed(session)
+    label = client.post("/api/single-labels", json={"name": "help"}).json()
+    client.post(f"/api/single-labels/{label['id']}/activate")
+    assert client.get(f"/api/single-labels/{label['id']}/next").status_code == 200
+    assert jobs.active(session, "lexical_index") is None
+
+    session.add(MessageCache(chatlog_id=5, message_index=0, message_text="seaborn heatmap colors"))
+    session.commit()
+    with monkeypatch.context() as m:
+        m.setattr(lexical_service, "build_index", lambda *a: pytest.fail("refit on the /next path"))
+        for _ in range(2):
+            assert client.get(f"/api/single-labels/{label['id']}/next").status_code == 200
+    queued = session.exec(select(Job).where(Job.kind == "lexical_index")).all()
+    assert [job.status for job in queued] == ["queued"]
+
+    assert jobs.run(engine, jobs.lease(engine, "w1"), "w1") == "succeeded"
+    assert lexical_service.is_current(session)
+    assert (5, 0) in lexical_service.ensure_index(session)["keys_idx"]
+
+
+def test_explore_scores_unembedded_chats_without_the_network(session, monkeypatch):
+    """No embeddings and no profiles: rarity and theme novelty come from the
+    lexical engine and nothing calls Gemini."""
+    def offline(*_a, **_k):
+        raise AssertionError("network call on the explore path")
+
+    monkeypatch.setattr(gemini_gateway, "embed_content", offline)
+    monkeypatch.setattr(gemini_gateway, "generate_content", offline)
+    monkeypatch.setattr(queue_service.explore_service, "warm_explore_candidates", lambda *a, **k: None)
+    _seed(session)
+    label = LabelDefinition(name="lexical", mode="single", is_active=True, phase="labeling")
+    session.add(label)
+    session.commit()
+    session.add(LabelApplication(label_id=label.id, chatlog_id=1, message_index=0,
+                                 applied_by="human", value="yes"))
+    session.commit()
+
+    conv = {cid: [(i, t, None) for i, t in enumerate(texts)] for cid, texts in _TEXTS.items() if cid != 1}
+    cid, mode, components = queue_service._select_next_chatlog_id(
+        session, label_id=label.id, conv=conv, assign_by_cid={c: None for c in conv},
+        decided=set(), in_progress=[], not_started=list(conv), explore_fraction=1.0,
+    )
+    assert mode == "explore"
+    assert components["rarity"] is not None
+    assert components["theme_nov"] is not None
+    assert components["keywords"]
@@ -0,0 +1,91 @@
+"""Record/replay cache in front of the Gemini client (llm_cache)."""
+import pytest
+
+import binary_autolabel_service as bas
+import concept_service
+import gemini_gateway
+import llm_cache
+from fake_gemini import FakeGeminiClient
+
+
+class _Offline:
+    """Stands in for the network: any call fails the test."""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"network touched: {name}")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    mode, path = llm_cache.MODE, llm_cache.PATH
+    network = FakeGeminiClient.offline(embed_dim=concept_service.EMBED_DIM)
+    monkeypatch.setattr(gemini_gateway, "backend", None)
+    monkeypatch.setattr(gemini_gateway, "_client", network)
+    monkeypatch.setattr(gemini_gateway, "_limiters", {})
+    gemini_gateway.reset_metrics()
+    llm_cache.configure("record", tmp_path / "cache.db")
+    yield network
+    llm_cache.configure(mode, path)
+    gemini_gateway.reset_metrics()
+
+
+def _classify():
+    return bas.classify_binary(label_name="asks for answer", label_description=None,
+                               yes_examples=[], no_examples=[], messages=["just tell me", "why?"])
+
+
+def _embed():
+    resp = gemini_gateway.embed_content(model="gemini-embedding-001", contents=["how do I merge"],
+                                        call_site="concept.embed")
+    return [list(e.values) for e in resp.embeddings]
+
+
+def test_record_then_replay_without_network(cache, monkeypatch):
+    recorded = _classify()
+    vectors = _embed()
+    assert len(cache.calls) == 2 and llm_cache.entry_count() == 2
+
+    llm_cache.configure("replay")
+    monkeypatch.setattr(gemini_gateway, "_client", _Offline())
+    assert _classify() == recorded
+    assert _embed() == vectors
+    hits = {s["call_site"]: s["cache_hits"] for s in gemini_gateway.metrics_snapshot()}
+    assert hits == {"binary_autolabel.classify": 1, "concept.embed": 1}
+
+
+def test_replay_miss_fails_fast(cache, monkeypatch):
+    llm_cache.configure("replay")
+    monkeypatch.setattr(gemini_gateway, "_client", _Offline())
+    with pytest.raises(llm_cache.LlmCacheMiss):
+        _classify()
+    # Not transient: no retries, no backoff.
+    assert all(s["retries"] == 0 for s in gemini_gateway.metrics_snapshot())
+
+
+def test_record_mode_serves_hits(cache):
+    _classify()
+    _classify()
+    assert len(cache.calls) == 1
+
+
+def test_passthrough_and_injected_backends_skip_the_cache(cache, tmp_path, monkeypatch):
+    llm_cache.configure("passthrough", tmp_path / "unused.db")
+    _classify()
+    _classify()
+    assert len(cache.calls) == 2
+    assert not (tmp_path / "unused.db").exists()
+
+    llm_cache.configure("replay", tmp_path / "missing.db")
+    fake = FakeGeminiClient.offline(embed_dim=8)
+    monkeypatch.setattr(gemini_gateway, "backend", fake)
+    _classify()
+    assert len(fake.calls) == 1
+
+
+def test_key_is_canonical():
+    config = bas._classify_config()
+    key = llm_cache.request_key("generate_content", "m", {"contents": "p", "config": config})
+    assert key == llm_cache.request_key("generate_content", "m", {"config": config, "contents": "p"})
+    assert key != llm_cache.request_key("generate_content", "m", {"contents": "p!", "config": config})
+    assert key != llm_cache.request_key("generate_content", "other", {"contents": "p", "config": config})
+    assert key != llm_cache.request_key("generate_content", "m", {"contents": "p"})
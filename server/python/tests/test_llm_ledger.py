@@ -0,0 +1,200 @@
+"""Tests for the Gemini call ledger (llm_ledger) and GET /api/llm-usage."""
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlmodel import select
+
+import gemini_gateway
+import llm_ledger
+from fake_gemini import FakeGeminiClient
+from models import LlmCallLog
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    client = FakeGeminiClient(embed_dim=8)
+    monkeypatch.setattr(gemini_gateway, "backend", client)
+    monkeypatch.setattr(gemini_gateway, "_listeners", [llm_ledger.record])
+    llm_ledger._buffer.clear()
+    yield client
+    llm_ledger._buffer.clear()
+
+
+def test_calls_are_buffered_then_flushed_with_tags(fake, engine, session):
+    with gemini_gateway.call_context(label_id=7, job_id="handoff-abc"):
+        gemini_gateway.generate_content(model="gemini-2.5-flash", contents="hello there", call_site="t.gen")
+    gemini_gateway.embed_content(model="gemini-embedding-001", contents=["x"], call_site="t.embed")
+
+    assert session.exec(select(LlmCallLog)).all() == []
+    assert llm_ledger.pending() == 2
+    assert llm_ledger.flush(engine) == 2
+    assert llm_ledger.pending() == 0
+
+    rows = {r.call_site: r for r in session.exec(select(LlmCallLog)).all()}
+    gen = rows["t.gen"]
+    assert (gen.label_id, gen.job_id, gen.outcome, gen.retry_count) == (7, "handoff-abc", "ok", 0)
+    assert gen.input_tokens > 0 and gen.output_tokens > 0 and gen.latency_ms >= 0
+    assert rows["t.embed"].label_id is None and rows["t.embed"].job_id is None
+
+
+def test_each_retry_attempt_is_its_own_row(fake, engine, session):
+    fake.fail_next(Exception("429 RESOURCE_EXHAUSTED"), times=1)
+    with patch("gemini_gateway.time.sleep"):
+        gemini_gateway.generate_content(model="gemini-2.5-flash", contents="hi", call_site="t")
+    llm_ledger.flush(engine)
+    rows = session.exec(select(LlmCallLog).order_by(LlmCallLog.id)).all()
+    assert [(r.retry_count, r.outcome) for r in rows] == [(0, "rate_limited"), (1, "ok")]
+
+
+def test_tags_follow_tagged_thread_targets(fake, engine, session):
+    def work():
+        gemini_gateway.generate_content(model="m", contents="hi", call_site="t")
+
+    t = threading.Thread(target=gemini_gateway.tagged(work, label_id=3, job_id="explore-warm-1"))
+    t.start()
+    t.join()
+    llm_ledger.flush(engine)
+    (row,) = session.exec(select(LlmCallLog)).all()
+    assert (row.label_id, row.job_id) == (3, "explore-warm-1")
+
+
+def test_buffer_is_bounded(monkeypatch):
+    monkeypatch.setattr(llm_ledger, "MAX_BUFFERED", 3)
+    monkeypatch.setattr(llm_ledger, "_dropped", 0)
+    llm_ledger._buffer.clear()
+    for _ in range(5):
+        llm_ledger.record({"call_site": "t", "model": "m", "latency_ms": 1.0, "outcome": "ok"})
+    assert llm_ledger.pending() == 3
+    assert llm_ledger.dropped() == 2
+    llm_ledger._buffer.clear()
+
+
+def test_failed_flush_keeps_its_rows_for_the_next_one(engine, session, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+    from sqlmodel import create_engine
+
+    monkeypatch.setattr(llm_ledger, "MAX_BUFFERED", 3)
+    monkeypatch.setattr(llm_ledger, "_dropped", 0)
+    llm_ledger._buffer.clear()
+    for site in ("a", "b"):
+        llm_ledger.record({"call_site": site, "model": "m", "latency_ms": 1.0, "outcome": "ok"})
+    no_tables = create_engine("sqlite://")  # every INSERT fails, as a locked DB would
+    with pytest.raises(OperationalError):
+        llm_ledger.flush(no_tables)
+    assert (llm_ledger.pending(), llm_ledger.dropped()) == (2, 0)
+
+    # Calls recorded meanwhile queue behind the retried rows; overflow is counted.
+    for site in ("c", "d"):
+        llm_ledger.record({"call_site": site, "model": "m", "latency_ms": 1.0, "outcome": "ok"})
+    assert (llm_ledger.pending(), llm_ledger.dropped()) == (3, 1)
+    with pytest.raises(OperationalError):
+        llm_ledger.flush(no_tables)
+    assert (llm_ledger.pending(), llm_ledger.dropped()) == (3, 1)
+    assert llm_ledger.flush(engine) == 3
+    assert [r.call_site for r in session.exec(select(LlmCallLog).order_by(LlmCallLog.id)).all()] == ["b", "c", "d"]
+    no_tables.dispose()
+
+
+def _log(session, **kw):
+    row = dict(call_site="binary_autolabel.classify", model="gemini-2.5-flash",
+               input_tokens=1_000_000, output_tokens=100_000, latency_ms=2000.0,
+               retry_count=0, outcome="ok")
+    row.update(kw)
+    session.add(LlmCallLog(**row))
+
+
+def test_usage_endpoint_aggregates_cost_per_label_job_and_day(client, session):
+    now = datetime.utcnow()
+    _log(session, label_id=1, job_id="handoff-a", created_at=now - timedelta(seconds=60))
+    _log(session, label_id=1, job_id="handoff-a", created_at=now, retry_count=1, outcome="rate_limited",
+         input_tokens=0, output_tokens=0)
+    _log(session, label_id=2, job_id="handoff-b", created_at=now - timedelta(days=3))
+    _log(session, label_id=2, job_id="handoff-b", model="gemini-embedding-001",
+         output_tokens=0, created_at=now - timedelta(days=3))
+    session.commit()
+
+    by_label = client.get("/api/llm-usage", params={"group_by": "label"}).json()
+    rows = {r["key"]: r for r in by_label["rows"]}
+    assert rows["1"]["calls"] == 2 and rows["1"]["retries"] == 1 and rows["1"]["rate_limited"] == 1
+    # 1M input @ $0.30 + 100k output @ $2.50 per MTok
+    assert rows["1"]["cost_usd"] == pytest.approx(0.55)
+    # Flash call + embedding call (1M input @ $0.15)
+    assert rows["2"]["cost_usd"] == pytest.approx(0.70)
+    assert rows["1"]["calls_per_minute"] == pytest.approx(2.0)
+    assert by_label["total_calls"] == 4
+    assert by_label["total_cost_usd"] == pytest.approx(1.25)
+
+    by_job = client.get("/api/llm-usage", params={"group_by": "job"}).json()
+    assert {r["key"] for r in by_job["rows"]} == {"handoff-a", "handoff-b"}
+
+    by_day = client.get("/api/llm-usage", params={"group_by": "day"}).json()
+    assert len(by_day["rows"]) == 2
+    assert by_day["rows"][0]["key"] == now.date().isoformat()
+
+    recent = client.get("/api/llm-usage", params={"group_by": "job", "days": 1}).json()
+    assert [r["key"] for r in recent["rows"]] == ["handoff-a"]
+
+
+def test_ledger_flushes_to_the_engine_it_was_started_with(fake, engine, session, monkeypatch):
+    monkeypatch.setattr(llm_ledger, "_engine", None)
+    llm_ledger.start(engine)
+    try:
+        gemini_gateway.generate_content(model="gemini-2.5-flash", contents="hi", call_site="t.started")
+    finally:
+        llm_ledger.stop()
+    assert [r.call_site for r in session.exec(select(LlmCallLog)).all()] == ["t.started"]
+
+
+def test_app_lifespan_starts_the_ledger_on_the_app_engine(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    started = []
+    monkeypatch.setattr(llm_ledger, "start", started.append)
+    monkeypatch.setattr(llm_ledger, "stop", lambda: None)
+    with TestClient(main.app):
+        pass
+    assert started == [main.engine]
+
+
+def test_handoff_run_as_a_job_logs_its_calls_under_the_job(fake, engine, session, monkeypatch):
+    import jobs
+    import main
+    from models import LabelApplication, LabelDefinition, MessageCache
+
+    monkeypatch.setattr(main, "engine", engine)
+    label = LabelDefinition(name="help", mode="single")
+    session.add(label)
+    session.commit()
+    for i in range(6):
+        session.add(MessageCache(chatlog_id=900, message_index=i, message_text=f"msg {i}"))
+    for i, value in enumerate(("yes", "no")):
+        session.add(LabelApplication(label_id=label.id, chatlog_id=900, message_index=i,
+                                     applied_by="human", value=value))
+    session.commit()
+
+    job = main._start_job(session, "handoff", {"label_id": label.id}, label_id=label.id)
+    assert jobs.run(engine, jobs.lease(engine, "w1"), "w1") == "succeeded"
+    llm_ledger.flush(engine)
+
+    rows = session.exec(select(LlmCallLog)).all()
+    assert rows and {(r.label_id, r.job_id) for r in rows} == {(label.id, f"handoff-{job.id}")}
+
+
+def test_handoff_outside_a_job_gets_its_own_job_id(fake, engine, session, monkeypatch):
+    import main
+    from models import LabelDefinition, MessageCache
+
+    monkeypatch.setattr(main, "engine", engine)
+    label = LabelDefinition(name="help", mode="single")
+    session.add(label)
+    session.add(MessageCache(chatlog_id=901, message_index=0, message_text="msg"))
+    session.commit()
+
+    main._classify_in_background(label.id)
+    llm_ledger.flush(engine)
+    (job_id,) = {r.job_id for r in session.exec(select(LlmCallLog)).all()}
+    assert job_id.startswith("handoff-")
@@ -0,0 +1,125 @@
+"""Tests for local_model_service: the one-vs-rest pre-classifier ahead of Gemini autolabel."""
+import numpy as np
+from sqlmodel import select
+
+import autolabel_service
+import jobs
+import local_model_service
+import main
+from concept_service import EMBED_MODEL
+from models import LabelApplication, LabelDefinition, MessageCache, MessageEmbedding
+
+_AXES = {"debugging": 0, "concept": 1, "logistics": 2}
+
+
+def _emb(vec):
+    return np.asarray(vec, dtype=np.float32).tobytes()
+
+
+def _seed(session, per_label=15, unlabeled=6):
+    """Each label's messages point along its own axis. Humans label
+    `per_label` of them; the unlabeled pool has `unlabeled` more per label
+    plus two messages halfway between debugging and concept."""
+    rng = np.random.default_rng(3)
+    labels = {}
+    for name in _AXES:
+        label = LabelDefinition(name=name, mode="multi")
+        session.add(label)
+        session.commit()
+        labels[name] = label
+    cid = 1000
+    for name, axis in _AXES.items():
+        for n in range(per_label + unlabeled):
+            cid += 1
+            vec = np.zeros(8)
+            vec[axis] = 1.0
+            vec += rng.normal(0, 0.08, 8)
+            session.add(MessageCache(chatlog_id=cid, message_index=0, message_text=f"{name} {n}", notebook="lab01.ipynb"))
+            session.add(MessageEmbedding(chatlog_id=cid, message_index=0, embedding=_emb(vec), model_version=EMBED_MODEL))
+            if n < per_label:
+                session.add(LabelApplication(label_id=labels[name].id, chatlog_id=cid, message_index=0,
+                                             applied_by="human"))
+    for cid in (2001, 2002):
+        session.add(MessageCache(chatlog_id=cid, message_index=0, message_text="halfway", notebook="lab01.ipynb"))
+        session.add(MessageEmbedding(chatlog_id=cid, message_index=0, embedding=_emb([1, 1, 0, 0, 0, 0, 0, 0]),
+                                     model_version=EMBED_MODEL))
+    session.commit()
+    return labels
+
+
+def _unlabeled(session):
+    labeled = set(session.exec(select(LabelApplication.chatlog_id, LabelApplication.message_index)).all())
+    return [k for k in session.exec(select(MessageCache.chatlog_id, MessageCache.message_index)).all()
+            if k not in labeled]
+
+
+def test_confident_messages_are_decided_locally(session):
+    labels = _seed(session)
+    ids = [l.id for l in labels.values()]
+    model = local_model_service.train(session, ids)
+    assert model["untrained"] == [] and set(model["labels"]) == set(ids)
+    for fitted in model["labels"].values():
+        assert (fitted["positives"], fitted["negatives"]) == (15, 30)
+        assert fitted["reject_at"] < fitted["apply_at"]
+
+    decided = local_model_service.decide(session, model, _unlabeled(session), min_confidence=0.5)
+    assert (2001, 0) not in decided and (2002, 0) not in decided
+    assert len(decided) == 18
+    for (cid, _midx), applied in decided.items():
+        text = session.exec(select(MessageCache.message_text).where(MessageCache.chatlog_id == cid)).one()
+        assert [label_id for label_id, _p in applied] == [labels[text.split()[0]].id]
+
+
+def test_a_label_without_enough_examples_sends_everything_to_gemini(session):
+    labels = _seed(session)
+    rare = LabelDefinition(name="rare", mode="multi")
+    session.add(rare)
+    session.commit()
+    session.add(LabelApplication(label_id=rare.id, chatlog_id=1001, message_index=0, applied_by="human"))
+    session.commit()
+
+    model = local_model_service.train(session, [l.id for l in labels.values()] + [rare.id])
+    assert model["untrained"] == [rare.id]
+    assert local_model_service.decide(session, model, _unlabeled(session)) == {}
+
+
+def test_autolabel_routes_only_ambiguous_messages_to_gemini(session, engine, monkeypatch):
+    monkeypatch.setattr(main, "engine", engine)
+    labels = _seed(session)
+    sent = []
+
+    def fake_classify(label_defs, examples_by_label, messages, multi_select=False):
+        sent.extend(m["message_text"] for m in messages)
+        return [{"index": i, "label": "concept", "confidence": 0.9} for i in range(len(messages))]
+
+    monkeypatch.setattr(autolabel_service, "classify_batch", fake_classify)
+    ctx = main._run_autolabel()
+
+    assert sent == ["halfway", "halfway"]
+    rows = session.exec(select(LabelApplication).where(LabelApplication.applied_by != "human")).all()
+    local = [r for r in rows if r.applied_by == local_model_service.APPLIED_BY]
+    assert len(local) == 18 and all(r.confidence >= 0.5 for r in local)
+    assert {(r.chatlog_id, r.label_id) for r in rows if r.applied_by == "ai"} == \
+        {(2001, labels["concept"].id), (2002, labels["concept"].id)}
+    assert ctx.result["messages"] == 20 and ctx.result["local"] == 18
+    assert ctx.result["local_fraction"] == 0.9
+    assert (ctx.result["gemini_calls"], ctx.result["gemini_calls_avoided"]) == (1, 0)
+    assert (ctx.processed, ctx.total) == (20, 20)
+
+    # Clearing autolabel results removes both sources.
+    assert main.clear_autolabel_results(db=session)["deleted"] == 20
+
+
+def test_job_result_can_be_left_on_the_context(engine, session, monkeypatch):
+    monkeypatch.setattr(jobs, "_handlers", {})
+
+    def handler(ctx):
+        ctx.result = {"local": 3}
+        return ctx
+
+    jobs.register("stats", handler)
+    job = jobs.enqueue(session, "stats")
+    assert jobs.run(engine, jobs.lease(engine, "w1"), "w1") == "succeeded"
+    session.expire_all()
+    assert main._job_status(session.get(type(job), job.id))["result"] == {"local": 3}
+
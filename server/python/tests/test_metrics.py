@@ -0,0 +1,142 @@
+"""Tests for request metrics middleware and GET /api/metrics."""
+import pytest
+from sqlmodel import Session, select, text
+
+import gemini_gateway
+import metrics
+from models import LabelDefinition, MessageCache
+
+
+@pytest.fixture
+def instrumented(engine):
+    metrics.instrument_engine(engine)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _seed(session):
+    for i in range(3):
+        session.add(MessageCache(chatlog_id=400, message_index=i, message_text=f"msg {i}", notebook="lab3.ipynb"))
+    session.commit()
+
+
+def test_records_route_template_sql_and_bytes(client, session, instrumented):
+    _seed(session)
+    label = client.post("/api/single-labels", json={"name": "help"}).json()
+    client.post(f"/api/single-labels/{label['id']}/activate")
+
+    resp = client.get(f"/api/single-labels/{label['id']}/next")
+    assert resp.status_code == 200
+
+    snap = metrics.route_snapshot()
+    stats = snap[("GET", "/api/single-labels/{label_id}/next")]
+    assert stats["count"] == 1
+    assert stats["sql_statements"] > 0
+    assert stats["sql_seconds"] > 0
+    assert stats["response_bytes"] == len(resp.content)
+    assert sum(stats["buckets"]) == 1
+    # Concrete paths never become their own series.
+    assert not any(str(label["id"]) in route for _, route in snap)
+
+
+def test_sql_statement_count_is_per_request(client, session, instrumented):
+    client.get("/api/labels")
+    client.get("/api/labels")
+    stats = metrics.route_snapshot()[("GET", "/api/labels")]
+    assert stats["count"] == 2
+    assert stats["sql_statements"] % 2 == 0 and stats["sql_statements"] >= 2
+
+
+def test_unmatched_paths_share_one_series(client, instrumented):
+    client.get("/api/does-not-exist/1")
+    client.get("/api/does-not-exist/2")
+    assert metrics.route_snapshot()[("GET", metrics.UNMATCHED_ROUTE)]["count"] == 2
+
+
+def test_sql_outside_requests_counts_as_background(engine, instrumented):
+    with Session(engine) as db:
+        db.exec(text("SELECT 1"))
+    assert "chatsight_background_sql_statements_total 1" in metrics.render()
+
+
+def test_prometheus_exposition(client, session, instrumented, monkeypatch):
+    session.add(LabelDefinition(name="c", mode="single", phase="classifying",
+                                classified_count=40, classification_total=100))
+    session.commit()
+    lid = session.exec(select(LabelDefinition.id)).first()
+    monkeypatch.setattr(gemini_gateway, "_stats", {
+        ("binary_autolabel.classify", "gemini-2.5-flash"): {
+            "calls": 3, "errors": 1, "retries": 1, "rate_limited": 1,
+            "latency_seconds_total": 1.5, "latency_seconds_max": 1.0,
+            "input_tokens": 10, "output_tokens": 5, "limiter_wait_seconds": 0.0,
+        },
+    })
+    client.get("/api/labels")
+
+    resp = client.get("/api/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+
+    assert '# TYPE chatsight_http_request_duration_seconds histogram' in body
+    assert 'chatsight_http_request_duration_seconds_bucket{method="GET",route="/api/labels",le="+Inf"} 1' in body
+    assert 'chatsight_http_request_duration_seconds_count{method="GET",route="/api/labels"} 1' in body
+    assert 'chatsight_http_sql_statements_total{method="GET",route="/api/labels"}' in body
+    assert f'chatsight_classification_processed{{label_id="{lid}"}} 40' in body
+    assert f'chatsight_classification_total{{label_id="{lid}"}} 100' in body
+    assert 'chatsight_job_running{job="autolabel"} 0' in body
+    assert 'chatsight_cache_entries{cache="queue_thread"}' in body
+    assert 'chatsight_gemini_calls_total{call_site="binary_autolabel.classify",model="gemini-2.5-flash"} 3' in body
+    # The scrape endpoint doesn't measure itself.
+    assert 'route="/api/metrics"' not in body
+
+
+def test_histogram_buckets_are_cumulative(instrumented):
+    metrics.observe_request("GET", "/x", 0.003, 0, 0.0, 0, 200)
+    metrics.observe_request("GET", "/x", 0.2, 0, 0.0, 0, 200)
+    metrics.observe_request("GET", "/x", 30.0, 0, 0.0, 0, 503)
+    body = metrics.render()
+    assert 'chatsight_http_request_duration_seconds_bucket{method="GET",route="/x",le="0.005"} 1' in body
+    assert 'chatsight_http_request_duration_seconds_bucket{method="GET",route="/x",le="0.25"} 2' in body
+    assert 'chatsight_http_request_duration_seconds_bucket{method="GET",route="/x",le="10.0"} 2' in body
+    assert 'chatsight_http_request_duration_seconds_bucket{method="GET",route="/x",le="+Inf"} 3' in body
+    assert 'chatsight_http_errors_total{method="GET",route="/x"} 1' in body
+
+
+def test_failed_statement_is_timed_and_leaves_no_start_behind(engine, instrumented):
+    with engine.connect() as conn:
+        with pytest.raises(Exception):
+            conn.exec_driver_sql("SELECT * FROM no_such_table")
+        assert conn.info["metrics_query_start"] == []
+        conn.exec_driver_sql("SELECT 1")
+        assert conn.info["metrics_query_start"] == []
+    assert "chatsight_background_sql_statements_total 2" in metrics.render()
+
+
+def test_sqlite_lock_contention_counters(tmp_path, instrumented, monkeypatch):
+    from sqlmodel import create_engine
+
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'c.db'}", connect_args={"timeout": 0.05})
+    metrics.instrument_engine(db_engine)
+    with db_engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+
+    # Any write over the threshold counts as a lock wait.
+    monkeypatch.setattr(metrics, "LOCK_WAIT_THRESHOLD_SECONDS", 0.0)
+    with db_engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO t VALUES (1)")
+        conn.exec_driver_sql("SELECT x FROM t")
+    assert metrics.sqlite_snapshot()["lock_waits"] == 1
+
+    # A second writer behind an open write transaction gets SQLITE_BUSY.
+    holder = db_engine.connect()
+    holder.exec_driver_sql("BEGIN IMMEDIATE")
+    with pytest.raises(Exception):
+        with db_engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO t VALUES (2)")
+    holder.rollback()
+    holder.close()
+    assert metrics.sqlite_snapshot()["busy_errors"] == 1
+    assert "chatsight_sqlite_busy_errors_total 1" in metrics.render()
+    db_engine.dispose()
@@ -1,5 +1,8 @@
 """Tests for multi-label auto-labeling (multi_select + confidence threshold)."""
+from unittest.mock import MagicMock
+
 import autolabel_service
+import gemini_gateway
 
 
 def test_multilabel_threshold_default_is_half(monkeypatch):
@@ -58,7 +61,9 @@ def test_classify_batch_uses_multi_config(monkeypatch):
         captured["config"] = config
         return _FakeResp()
 
-    monkeypatch.setattr(autolabel_service.client.models, "generate_content", fake_generate)
+    backend = MagicMock()
+    backend.models.generate_content.side_effect = fake_generate
+    monkeypatch.setattr(gemini_gateway, "backend", backend)
 
     label_defs = [{"name": "confused", "description": ""}]
     messages = [{"message_text": "huh", "message_index": 0, "chatlog_id": 1}]
@@ -116,7 +121,7 @@ def test_run_autolabel_applies_multiple_labels_and_gates(session, engine, monkey
         ]
 
     monkeypatch.setattr(_als, "classify_batch", fake_classify)
-    main._run_autolabel()
+    ctx = main._run_autolabel()
 
     assert multi_select_seen["value"] is True, "general autolabel must call with multi_select=True"
 
@@ -131,7 +136,7 @@ def test_run_autolabel_applies_multiple_labels_and_gates(session, engine, monkey
     assert all(app.chatlog_id == 1 for app in ai_apps), "only message 1 should be labeled"
     for app in ai_apps:
         assert app.confidence is not None and app.confidence >= 0.5
-    assert main._autolabel_status["error"] is None
+    assert ctx.error is None
 
 
 def test_run_autolabel_skips_nonnumeric_confidence(session, engine, monkeypatch):
@@ -146,13 +151,13 @@ def test_run_autolabel_skips_nonnumeric_confidence(session, engine, monkeypatch)
         return [{"index": 0, "label": "label-a", "confidence": "not-a-number"}]
 
     monkeypatch.setattr(_als, "classify_batch", fake_classify)
-    main._run_autolabel()
+    ctx = main._run_autolabel()
 
     ai_apps = session.exec(
         select(LabelApplication).where(LabelApplication.applied_by == "ai")
     ).all()
     assert ai_apps == [], "non-numeric confidence must not be persisted"
-    assert main._autolabel_status["error"] is None
+    assert ctx.error is None
 
 
 import inspect
@@ -166,3 +171,40 @@ def test_split_flow_calls_classify_batch_single_select():
     assert src.count("multi_select=True") == 1, (
         "Exactly one call site (the general autolabel) should pass multi_select=True"
     )
+
+
+def test_split_autolabel_rerun_skips_what_already_landed(session, engine, monkeypatch):
+    """A re-queued split job (lease lost mid-run) must not re-insert the rows
+    its first attempt wrote, or the unique constraint fails every retry and the
+    original label is never cleaned up."""
+    import jobs
+
+    monkeypatch.setattr(main, "engine", engine)
+    original = LabelDefinition(name="help", mode="multi", is_archived=True)
+    a = LabelDefinition(name="help-debug", mode="multi")
+    b = LabelDefinition(name="help-concept", mode="multi")
+    session.add_all([original, a, b])
+    session.commit()
+    messages = [{"chatlog_id": c, "message_index": 0, "message_text": f"m{c}"} for c in (1, 2, 3)]
+    session.add(LabelApplication(label_id=original.id, chatlog_id=9, message_index=0, applied_by="human"))
+    # The first attempt split message 1 before its lease ran out.
+    session.add(LabelApplication(label_id=a.id, chatlog_id=1, message_index=0, applied_by="ai"))
+    session.commit()
+    sent = []
+
+    def fake_classify(label_defs, examples_by_label, batch, multi_select=False):
+        sent.extend(m["chatlog_id"] for m in batch)
+        return [{"index": i, "label": "help-concept"} for i in range(len(batch))]
+
+    monkeypatch.setattr(_als, "classify_batch", fake_classify)
+    original_id = original.id
+    ctx = jobs.JobContext()
+    main._run_split_autolabel(ctx, original_id, "help", a.id, "help-debug", b.id, "help-concept",
+                              [], messages)
+
+    assert sent == [2, 3]
+    assert (ctx.processed, ctx.total, ctx.error) == (3, 3, None)
+    session.expire_all()
+    rows = session.exec(select(LabelApplication.label_id, LabelApplication.chatlog_id)).all()
+    assert sorted(rows) == sorted([(a.id, 1), (b.id, 2), (b.id, 3)])
+    assert session.get(LabelDefinition, original_id) is None
@@ -1,6 +1,14 @@
 import pytest
 from unittest.mock import MagicMock, patch
 
+import gemini_gateway
+
+
+@pytest.fixture(autouse=True)
+def fake_backend(monkeypatch):
+    """Route the module's Gemini calls to a mock client instead of the network."""
+    monkeypatch.setattr(gemini_gateway, "backend", MagicMock())
+
 
 def _emb(values):
     e = MagicMock()
@@ -46,7 +54,7 @@ def test_filter_removes_synonym(monkeypatch):
     mock = _mock_embed(
         [[0.99, 0.14, 0.0], [0.0, 0.0, 1.0], [1.0, 0.0, 0.0]],
     )
-    with patch.object(svc.client.models, "embed_content", mock):
+    with patch.object(gemini_gateway.backend.models, "embed_content", mock):
         result = svc.filter_suggestions(
             candidate_names=["puzzled", "code syntax help"],
             candidate_descriptions=["lost student", "syntax questions"],
@@ -60,7 +68,7 @@ def test_filter_removes_synonym(monkeypatch):
 
 def test_filter_returns_all_when_no_existing_labels():
     import name_suggestion_service as svc
-    with patch.object(svc.client.models, "embed_content") as mock_embed:
+    with patch.object(gemini_gateway.backend.models, "embed_content") as mock_embed:
         result = svc.filter_suggestions(
             candidate_names=["error tracing"],
             candidate_descriptions=["tracing errors"],
@@ -80,7 +88,7 @@ def test_filter_keeps_candidate_at_exact_threshold(monkeypatch):
     b = [1.0, 0.0, 0.0]
 
     mock = _mock_embed([a, b])
-    with patch.object(svc.client.models, "embed_content", mock):
+    with patch.object(gemini_gateway.backend.models, "embed_content", mock):
         result = svc.filter_suggestions(
             candidate_names=["borderline"],
             candidate_descriptions=["exactly at threshold"],
@@ -125,7 +133,7 @@ def test_endpoint_filters_and_returns_suggestions(client, session):
     mock = _mock_embed(
         [[0.99, 0.14, 0.0], [0.0, 0.0, 1.0], [1.0, 0.0, 0.0]],
     )
-    with patch.object(svc.client.models, "embed_content", mock):
+    with patch.object(gemini_gateway.backend.models, "embed_content", mock):
         resp = client.get("/api/concepts/name-suggestions")
 
     assert resp.status_code == 200
@@ -145,7 +153,7 @@ def test_endpoint_returns_empty_on_gemini_error(client, session):
     ))
     session.commit()
 
-    with patch.object(svc.client.models, "embed_content", side_effect=Exception("network")):
+    with patch.object(gemini_gateway.backend.models, "embed_content", side_effect=Exception("network")):
         resp = client.get("/api/concepts/name-suggestions")
 
     assert resp.status_code == 200
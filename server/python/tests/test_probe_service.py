@@ -0,0 +1,181 @@
+"""Tests for probe_service: the online per-label linear probe over embeddings."""
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+import decision_service
+import main
+import probe_service
+from concept_service import EMBED_MODEL
+from models import Job, LabelApplication, LabelDefinition, LabelPrediction, MessageCache, MessageEmbedding
+
+
+def _emb(vec):
+    return np.asarray(vec, dtype=np.float32).tobytes()
+
+
+def _seed(session, labeled=15):
+    """Help requests point along the first axis, concept questions along the
+    second; conversation 900 sits halfway between them."""
+    rng = np.random.default_rng(1)
+    label = LabelDefinition(name="seeking answer", mode="single", is_active=True, phase="labeling")
+    session.add(label)
+    session.commit()
+    for cid in range(100, 138):
+        yes = cid % 2 == 0
+        vec = np.array([1.0, 0.0, 0.0, 0.0] if yes else [0.0, 1.0, 0.0, 0.0]) + rng.normal(0, 0.1, 4)
+        session.add(MessageCache(chatlog_id=cid, message_index=0, message_text=f"message {cid}"))
+        session.add(MessageEmbedding(chatlog_id=cid, message_index=0, embedding=_emb(vec), model_version=EMBED_MODEL))
+    session.add(MessageCache(chatlog_id=900, message_index=0, message_text="halfway"))
+    session.add(MessageEmbedding(chatlog_id=900, message_index=0, embedding=_emb([1.0, 1.0, 0.0, 0.0]),
+                                 model_version=EMBED_MODEL))
+    session.commit()
+    for cid in range(100, 100 + 2 * labeled):
+        decide(session, label.id, cid, "yes" if cid % 2 == 0 else "no")
+    return label
+
+
+def decide(session, label_id, cid, value):
+    decision_service.apply_decision(session, label_id, cid, 0, value)
+    session.commit()
+    return probe_service.note_decision(session, label_id, cid, 0, value)
+
+
+def test_probe_learns_each_decision_without_refitting(session, monkeypatch):
+    label = _seed(session, labeled=4)
+    probe = probe_service.get_probe(session, label.id)
+    assert (probe["yes"], probe["no"]) == (4, 4)
+    assert not probe_service.is_ready(probe)
+    assert probe_service.predict(session, label.id, [(130, 0)]) == {}
+
+    monkeypatch.setattr(probe_service, "_build", lambda *a: pytest.fail("refit instead of partial_fit"))
+    for cid in (108, 109, 110, 111, 112):
+        probe = decide(session, label.id, cid, "yes" if cid % 2 == 0 else "no")
+        assert probe is not None
+    decide(session, label.id, 113, "skip")
+    probe = probe_service.get_probe(session, label.id)
+    assert (probe["yes"], probe["no"], probe["updates"]) == (7, 6, 13)
+    assert probe_service.is_ready(probe)
+
+    probs = probe_service.predict(session, label.id, [(130, 0), (131, 0), (999, 0)])
+    assert probs[(130, 0)] > 0.8 and probs[(131, 0)] < 0.2
+    assert (999, 0) not in probs
+    unc = probe_service.uncertainties(session, label.id, [(130, 0), (900, 0)])
+    assert unc[(900, 0)] > unc[(130, 0)]
+
+
+def test_undo_refits_from_the_labeled_set(session):
+    label = _seed(session, labeled=6)
+    probe_service.get_probe(session, label.id)
+    decision_service.undo_last_decision(session, label.id)
+    assert probe_service.note_decision(session, label.id, 111, 0, None) is None
+    probe = probe_service.get_probe(session, label.id)
+    assert (probe["yes"], probe["no"]) == (6, 5)
+
+
+def test_probe_is_saved_and_reloaded(tmp_path, monkeypatch):
+    monkeypatch.setattr(probe_service, "PROBE_DIR", tmp_path / "probes")
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(probe_service, "PROBE_SAVE_SECONDS", 3600)
+    saved = tmp_path / "probes"
+    with Session(engine) as session:
+        label = _seed(session, labeled=6)
+        probe_service.get_probe(session, label.id)
+        refit = (saved / f"label-{label.id}.pkl").read_bytes()
+
+        # A decision only marks the probe changed; the file is written later.
+        built = decide(session, label.id, 112, "yes")
+        assert (saved / f"label-{label.id}.pkl").read_bytes() == refit
+        assert probe_service.flush() == 1
+        assert (saved / f"label-{label.id}.pkl").read_bytes() != refit
+        assert probe_service.flush() == 0
+    probe_service.stop()
+
+    probe_service._probes.clear()
+    with Session(engine) as session, monkeypatch.context() as m:
+        m.setattr(probe_service, "_build", lambda *a: pytest.fail("refit instead of loading"))
+        loaded = probe_service.get_probe(session, label.id)
+        assert loaded["updates"] == built["updates"]
+        assert np.allclose(loaded["model"].coef_, built["model"].coef_)
+    engine.dispose()
+
+
+def test_calibrated_handoff_sends_only_the_uncertain_band_to_gemini(session):
+    label = _seed(session)
+    calibration = probe_service.calibrate(session, label.id)
+    assert calibration["precision"] >= probe_service.AUTO_ACCEPT_PRECISION
+    assert calibration["support"] >= probe_service.AUTO_ACCEPT_MIN_SUPPORT
+
+    sent = []
+
+    def fake_classify(label_name, label_description, yes_examples, no_examples, messages, guidance=None):
+        sent.extend(messages)
+        return [{"index": i, "value": "no", "confidence": 0.6} for i in range(len(messages))]
+
+    def fake_summary(label_name, label_description, yes_messages, no_messages):
+        assert len(yes_messages) + len(no_messages) == 9
+        return {"included": [], "excluded": []}
+
+    with patch("binary_autolabel_service.classify_binary", side_effect=fake_classify), \
+         patch("binary_autolabel_service.summarize_batch", side_effect=fake_summary):
+        main._do_classification(session, label, auto_accept=True)
+
+    assert sent == ["halfway"]
+    rows = session.exec(
+        select(LabelApplication).where(LabelApplication.label_id == label.id, LabelApplication.applied_by != "human")
+    ).all()
+    probe_rows = {r.chatlog_id: r for r in rows if r.applied_by == probe_service.APPLIED_BY}
+    assert set(probe_rows) == set(range(130, 138))
+    assert all(r.value == ("yes" if r.chatlog_id % 2 == 0 else "no") for r in probe_rows.values())
+    assert all(r.rationale.startswith("Linear probe") for r in probe_rows.values())
+    assert [r.chatlog_id for r in rows if r.applied_by == "ai"] == [900]
+    session.refresh(label)
+    assert (label.classified_count, label.classification_total, label.phase) == (9, 9, "handed_off")
+
+    # Probe rows count toward the handoff's results but are not Gemini's: a
+    # human review leaves no AI snapshot, and refine clears them with the rest.
+    summary = main.get_summary(label.id, db=session)
+    assert summary.yes_count + summary.no_count == 9
+    decision_service.apply_decision(session, label.id, 130, 0, "no")
+    session.commit()
+    reviewed = session.exec(select(LabelApplication).where(
+        LabelApplication.label_id == label.id, LabelApplication.chatlog_id == 130)).one()
+    assert (reviewed.applied_by, reviewed.ai_value_at_review) == ("human", None)
+    main.refine_single_label(label.id, db=session)
+    assert session.exec(select(LabelApplication).where(
+        LabelApplication.label_id == label.id, LabelApplication.applied_by != "human")).all() == []
+
+
+def test_prediction_job_and_status_route(client, session, engine, monkeypatch):
+    import jobs
+
+    monkeypatch.setattr(main, "engine", engine)
+    label = _seed(session, labeled=2)
+    body = client.get(f"/api/single-labels/{label.id}/probe").json()
+    assert (body["ready"], body["calibration"]) == (False, None)
+    assert client.post(f"/api/single-labels/{label.id}/probe/predictions").status_code == 409
+
+    for cid in range(104, 114):
+        decide(session, label.id, cid, "yes" if cid % 2 == 0 else "no")
+    body = client.get(f"/api/single-labels/{label.id}/probe").json()
+    assert (body["ready"], body["yes"], body["no"]) == (True, 7, 7)
+
+    ctx = jobs.JobContext()
+    main._run_probe_predictions(ctx, label.id)
+    predictions = session.exec(select(LabelPrediction).where(LabelPrediction.label_id == label.id)).all()
+    assert len(predictions) == len(session.exec(select(MessageEmbedding)).all())
+    assert (ctx.processed, ctx.total) == (len(predictions), len(predictions))
+    assert {p.model_version for p in predictions} == {14}
+    by_cid = {p.chatlog_id: p.probability for p in predictions}
+    assert by_cid[130] > 0.5 > by_cid[131]
+
+
+def test_handoff_route_passes_auto_accept_to_the_job(client, session):
+    label = _seed(session, labeled=1)
+    assert client.post(f"/api/single-labels/{label.id}/handoff?auto_accept=true").status_code == 200
+    job = session.exec(select(Job).where(Job.kind == "handoff")).one()
+    assert json.loads(job.payload_json) == {"label_id": label.id, "sample_size": None, "auto_accept": True}
@@ -0,0 +1,143 @@
+"""Tests for the SSE progress broadcaster (progress_events) and its routes."""
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+import jobs
+import metrics
+import progress_events
+from database import get_session
+from main import app
+from models import LabelDefinition
+
+
+def _data(chunks):
+    return [json.loads(c[len("data: "):]) for c in chunks if c.startswith("data: ")]
+
+
+def _drain(agen):
+    async def collect():
+        return [chunk async for chunk in agen]
+    return asyncio.run(collect())
+
+
+def test_subscription_keeps_only_the_latest_snapshot():
+    hub = progress_events.Hub()
+    sub = hub.subscribe("job:1")
+    assert hub.publish("job:2", {"n": 0}) == 0  # nobody listening: dropped
+    for n in range(100):
+        hub.publish("job:1", {"n": n})
+    assert sub.take() == {"n": 99}
+    assert sub.coalesced == 99
+    assert sub.take() is None
+    sub.close()
+    assert hub.topics() == set()
+
+
+def test_stream_is_rate_limited_and_ends_when_done():
+    hub = progress_events.Hub()
+    sub = hub.subscribe("job:1")
+    ticks = {"n": 0}
+
+    async def fake_sleep(seconds):
+        # Each delivery interval, the job publishes five updates.
+        assert seconds == pytest.approx(0.5)
+        ticks["n"] += 1
+        for k in range(5):
+            processed = (ticks["n"] - 1) * 5 + k + 1
+            hub.publish("job:1", {"processed": processed, "done": processed == 20})
+
+    chunks = _drain(progress_events.stream(sub, {"processed": 0, "done": False}, max_rate=2, sleep=fake_sleep))
+    assert [e["processed"] for e in _data(chunks)] == [0, 5, 10, 15, 20]
+    assert sub.coalesced == 16
+    assert hub.topics() == set()  # closed when the stream ended
+
+
+def test_stream_sends_keepalives_while_idle():
+    hub = progress_events.Hub()
+    sub = hub.subscribe("job:1")
+    calls = {"n": 0}
+
+    async def fake_sleep(seconds):
+        calls["n"] += 1
+        if calls["n"] == 6:
+            hub.publish("job:1", {"done": True})
+
+    chunks = _drain(progress_events.stream(sub, {"done": False}, max_rate=1, keepalive=2, sleep=fake_sleep))
+    assert chunks.count(": keep-alive\n\n") == 2
+    assert _data(chunks)[-1] == {"done": True}
+
+
+@pytest.fixture
+def file_db(client, tmp_path):
+    """The app on a file-backed WAL database, so a worker thread and the
+    request can use separate connections at the same time."""
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(db_engine)
+
+    def override_session():
+        with Session(db_engine) as s:
+            yield s
+
+    app.dependency_overrides[get_session] = override_session
+    metrics.instrument_engine(db_engine)
+    metrics.reset()
+    yield db_engine
+    metrics.reset()
+
+
+def test_job_events_cost_o_updates_db_reads_not_o_polls(client, file_db, monkeypatch):
+    """A 5-minute job reporting progress every 10s: 30 updates. Polling its
+    status every 2s is 150 requests, each reading the DB; one SSE stream
+    reads the job once and is fed the rest by the job code."""
+    monkeypatch.setattr(progress_events, "MAX_EVENTS_PER_SECOND", 1000.0)
+    updates = 30
+
+    def crunch(ctx):
+        topic = progress_events.topic("job", ctx.job_id)
+        while topic not in progress_events.hub.topics():  # wait for the stream
+            time.sleep(0.005)
+        for i in range(1, updates + 1):
+            ctx.progress(i, updates)
+
+    monkeypatch.setitem(jobs._handlers, "crunch", crunch)
+    with Session(file_db) as db:
+        job_id = jobs.enqueue(db, "crunch").id
+    worker = threading.Thread(target=jobs.run, args=(file_db, jobs.lease(file_db, "w1"), "w1"))
+    worker.start()
+    resp = client.get(f"/api/jobs/{job_id}/events")
+    worker.join()
+
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _data(resp.text.split("\n\n"))
+    assert events[0]["status"] == "running"
+    assert events[-1]["status"] == "succeeded" and events[-1]["done"] is True
+    assert events[-1]["processed"] == updates
+
+    sse_reads = metrics.route_snapshot()[("GET", "/api/jobs/{job_id}/events")]["sql_statements"]
+    client.get(f"/api/jobs/{job_id}")
+    per_poll = metrics.route_snapshot()[("GET", "/api/jobs/{job_id}")]["sql_statements"]
+    polls = 5 * 60 // 2
+    assert sse_reads <= 2
+    assert sse_reads < updates <= polls * per_poll
+
+
+def test_label_events_snapshot_and_404(client, session):
+    label = LabelDefinition(name="help", mode="single", phase="handed_off",
+                            classified_count=10, classification_total=10)
+    session.add(label)
+    session.commit()
+
+    resp = client.get(f"/api/single-labels/{label.id}/events")
+    assert resp.status_code == 200
+    (event,) = _data(resp.text.split("\n\n"))
+    assert event["phase"] == "handed_off" and event["done"] is True
+    assert event["classified_count"] == 10
+
+    assert client.get("/api/single-labels/9999/events").status_code == 404
+    assert client.get("/api/jobs/9999/events").status_code == 404
+    assert progress_events.hub.topics() == set()
@@ -0,0 +1,105 @@
+# server/python/tests/test_readiness.py
+"""Startup readiness gating: the lifespan returns before MessageCache ingest
+finishes, data routes 503 with Retry-After until it does, and label/health
+routes answer immediately."""
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import readiness
+from main import app
+from database import get_session
+
+
+@pytest.fixture
+def slow_startup(session, monkeypatch):
+    """A client whose background ingest blocks until the test releases it."""
+    release = threading.Event()
+    entered = threading.Event()
+
+    def fake_populate():
+        readiness.set_phase("ingesting")
+        readiness.set_total(100)
+        readiness.advance(25)
+        entered.set()
+        release.wait(timeout=10)
+
+    monkeypatch.setattr(main, "populate_message_cache", fake_populate)
+
+    def override_session():
+        yield session
+
+    app.dependency_overrides[get_session] = override_session
+    with TestClient(app) as client:
+        assert entered.wait(timeout=5)
+        yield client, release
+        release.set()
+    app.dependency_overrides.clear()
+
+
+def _wait_ready(timeout=5.0):
+    import time
+    deadline = time.monotonic() + timeout
+    while not readiness.is_ready() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return readiness.is_ready()
+
+
+def test_ready_reports_phase_progress_and_eta(slow_startup):
+    client, _ = slow_startup
+    r = client.get("/api/ready")
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == str(readiness.RETRY_AFTER_SECONDS)
+    body = r.json()
+    assert body["ready"] is False
+    assert body["phase"] == "ingesting"
+    assert body["rows_processed"] == 25
+    assert body["rows_total"] == 100
+    assert body["eta_seconds"] is not None and body["eta_seconds"] >= 0
+
+
+def test_data_routes_fail_fast_until_ready(slow_startup):
+    client, release = slow_startup
+    r = client.get("/api/queue")
+    assert r.status_code == 503
+    assert "Retry-After" in r.headers
+    assert client.get("/api/analysis/summary").status_code == 503
+    assert client.get("/api/analysis/single-label/cohort").status_code == 503
+
+    release.set()
+    assert _wait_ready()
+    assert client.get("/api/queue").status_code == 200
+    r = client.get("/api/ready")
+    assert r.status_code == 200
+    assert r.json()["phase"] == "ready"
+
+
+def test_label_and_health_routes_serve_during_ingest(slow_startup):
+    client, _ = slow_startup
+    assert client.get("/api/health").json() == {"status": "ok"}
+    assert client.get("/api/labels").status_code == 200
+    assert client.get("/api/single-labels").status_code == 200
+    r = client.post("/api/labels", json={"name": "during-startup"})
+    assert r.status_code == 200
+
+
+def test_startup_failure_still_becomes_ready(session, monkeypatch):
+    def boom():
+        raise RuntimeError("postgres down")
+
+    monkeypatch.setattr(main, "populate_message_cache", boom)
+
+    def override_session():
+        yield session
+
+    app.dependency_overrides[get_session] = override_session
+    try:
+        with TestClient(app) as client:
+            assert _wait_ready()
+            body = client.get("/api/ready").json()
+            assert body["ready"] is True
+            assert "postgres down" in body["warning"]
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,193 @@
+# server/python/tests/test_schema_migrations.py
+"""Versioned migration ledger: an upgrade from the oldest supported schema ends
+on exactly the schema a fresh install gets, and a current DB costs one SELECT."""
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, text
+
+import database
+
+# The oldest schema the ledger still upgrades: every column / table that a
+# SCHEMA_MIGRATIONS step (or create_all) adds is absent here.
+OLDEST_SCHEMA = [
+    """CREATE TABLE labeldefinition (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name VARCHAR NOT NULL,
+        description VARCHAR,
+        created_at DATETIME NOT NULL)""",
+    """CREATE TABLE labelapplication (
+        id INTEGER NOT NULL PRIMARY KEY,
+        label_id INTEGER NOT NULL REFERENCES labeldefinition (id),
+        chatlog_id INTEGER NOT NULL,
+        message_index INTEGER NOT NULL,
+        applied_by VARCHAR NOT NULL,
+        created_at DATETIME NOT NULL,
+        CONSTRAINT uq_labelapp_msg UNIQUE (label_id, chatlog_id, message_index))""",
+    """CREATE TABLE labelingsession (
+        id INTEGER NOT NULL PRIMARY KEY,
+        started_at DATETIME NOT NULL,
+        last_active DATETIME NOT NULL,
+        labeled_count INTEGER NOT NULL)""",
+    """CREATE TABLE skippedmessage (
+        id INTEGER NOT NULL PRIMARY KEY,
+        chatlog_id INTEGER NOT NULL,
+        message_index INTEGER NOT NULL,
+        created_at DATETIME NOT NULL)""",
+    """CREATE TABLE messagecache (
+        id INTEGER NOT NULL PRIMARY KEY,
+        chatlog_id INTEGER NOT NULL,
+        message_index INTEGER NOT NULL,
+        message_text VARCHAR NOT NULL)""",
+    """CREATE TABLE conversationcursor (
+        label_id INTEGER NOT NULL REFERENCES labeldefinition (id),
+        chatlog_id INTEGER NOT NULL,
+        last_message_index_decided INTEGER NOT NULL,
+        updated_at DATETIME NOT NULL,
+        PRIMARY KEY (label_id, chatlog_id))""",
+    """CREATE TABLE onboardingstartercache (
+        id INTEGER NOT NULL PRIMARY KEY,
+        chatlog_id INTEGER NOT NULL,
+        seed_message_index INTEGER NOT NULL,
+        message_cache_count INTEGER NOT NULL,
+        computed_at DATETIME NOT NULL)""",
+    # What the pre-ledger startup used to create for paired_label_id.
+    "CREATE INDEX idx_labeldef_paired ON labeldefinition(id)",
+]
+
+
+def _affinity(decl: str) -> str:
+    """SQLite type affinity (https://sqlite.org/datatype3.html §3.1). ALTER
+    TABLE steps spell some columns TEXT where create_all says VARCHAR; both
+    are stored identically, so compare by affinity rather than spelling."""
+    t = (decl or "").upper()
+    if "INT" in t:
+        return "INTEGER"
+    if any(k in t for k in ("CHAR", "CLOB", "TEXT")):
+        return "TEXT"
+    if not t or "BLOB" in t:
+        return "BLOB"
+    if any(k in t for k in ("REAL", "FLOA", "DOUB")):
+        return "REAL"
+    return "NUMERIC"
+
+
+def _schema(engine) -> dict:
+    """Order-insensitive description of every table: columns (affinity,
+    NOT NULL, PK position), named and constraint indexes, and foreign keys.
+    Column defaults are omitted — SQLite requires one on ALTER ... ADD COLUMN
+    NOT NULL, and the ORM always writes these columns explicitly."""
+    out = {}
+    with engine.connect() as conn:
+        tables = [r[0] for r in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        ))]
+        for t in tables:
+            cols = {
+                r[1]: (_affinity(r[2]), bool(r[3]), r[5])
+                for r in conn.exec_driver_sql(f"PRAGMA table_info('{t}')")
+            }
+            indexes = set()
+            for r in conn.exec_driver_sql(f"PRAGMA index_list('{t}')"):
+                name, unique, origin = r[1], bool(r[2]), r[3]
+                idx_cols = tuple(c[2] for c in conn.exec_driver_sql(f"PRAGMA index_info('{name}')"))
+                indexes.add((name if origin == "c" else origin, unique, idx_cols))
+            fks = {
+                (r[3], r[2], r[4])
+                for r in conn.exec_driver_sql(f"PRAGMA foreign_key_list('{t}')")
+            }
+            out[t] = {"columns": cols, "indexes": indexes, "foreign_keys": fks}
+    return out
+
+
+def _file_engine(tmp_path, name):
+    return create_engine(f"sqlite:///{tmp_path / name}")
+
+
+def test_upgrade_from_oldest_schema_matches_fresh_install(tmp_path):
+    fresh = _file_engine(tmp_path, "fresh.db")
+    database.create_db_and_tables(fresh)
+
+    old = _file_engine(tmp_path, "old.db")
+    with old.begin() as conn:
+        for ddl in OLDEST_SCHEMA:
+            conn.execute(text(ddl))
+        conn.execute(text(
+            "INSERT INTO labeldefinition (id, name, created_at) VALUES (1, 'legacy', :t)"
+        ), {"t": datetime(2026, 1, 1)})
+        conn.execute(text(
+            "INSERT INTO labelapplication (label_id, chatlog_id, message_index, applied_by, created_at)"
+            " VALUES (1, 10, 0, 'human', :t)"
+        ), {"t": datetime(2026, 1, 1)})
+    database.create_db_and_tables(old)
+
+    fresh_schema, old_schema = _schema(fresh), _schema(old)
+    assert old_schema.keys() == fresh_schema.keys()
+    for table in fresh_schema:
+        assert old_schema[table] == fresh_schema[table], table
+
+    with old.connect() as conn:
+        assert database.current_schema_version(conn) == database.SCHEMA_VERSION
+        # Legacy rows survive and pick up the migrated defaults.
+        row = conn.execute(text("SELECT mode, phase FROM labeldefinition WHERE id = 1")).one()
+        assert tuple(row) == ("multi", "labeling")
+        assert conn.execute(text("SELECT COUNT(*) FROM labelapplication")).scalar() == 1
+
+
+def test_current_database_costs_one_select(tmp_path):
+    eng = _file_engine(tmp_path, "current.db")
+    database.create_db_and_tables(eng)
+
+    statements = []
+    event.listen(eng, "before_cursor_execute",
+                 lambda conn, cursor, stmt, *a: statements.append(stmt))
+    database.create_db_and_tables(eng)
+    assert len(statements) == 1
+    assert statements[0].lstrip().upper().startswith("SELECT")
+
+
+def test_only_pending_steps_run(tmp_path, monkeypatch):
+    eng = _file_engine(tmp_path, "partial.db")
+    database.create_db_and_tables(eng)
+
+    ran = []
+    extra = (database.SCHEMA_VERSION + 1, "test step", lambda conn, commit: ran.append(True))
+    monkeypatch.setattr(database, "SCHEMA_MIGRATIONS", database.SCHEMA_MIGRATIONS + [extra])
+    monkeypatch.setattr(database, "SCHEMA_VERSION", extra[0])
+    database.create_db_and_tables(eng)
+    database.create_db_and_tables(eng)
+    assert ran == [True]
+    with eng.connect() as conn:
+        assert database.current_schema_version(conn) == extra[0]
+
+
+def test_batched_rewrite_resumes_after_interruption(engine, session, monkeypatch):
+    """Each batch commits on its own, so a crash mid-purge leaves the finished
+    batches applied and a re-run finishes the rest."""
+    from models import LabelApplication, LabelDefinition
+
+    label = LabelDefinition(name="polluted", mode="multi")
+    session.add(label)
+    session.commit()
+    session.refresh(label)
+    for i in range(7):
+        session.add(LabelApplication(label_id=label.id, chatlog_id=1, message_index=i,
+                                     applied_by="ai", value="yes"))
+    session.commit()
+
+    monkeypatch.setattr(database, "MIGRATION_BATCH_SIZE", 3)
+    commits = []
+
+    def crash_after_first_batch():
+        commits.append(1)
+        if len(commits) == 1:
+            conn.commit()
+            raise RuntimeError("killed")
+
+    with engine.connect() as conn:
+        try:
+            database._cleanup_polluted_multi_label_rows(conn, text, crash_after_first_batch)
+        except RuntimeError:
+            pass
+        assert conn.execute(text("SELECT COUNT(*) FROM labelapplication")).scalar() == 4
+        database._cleanup_polluted_multi_label_rows(conn, text, conn.commit)
+        assert conn.execute(text("SELECT COUNT(*) FROM labelapplication")).scalar() == 0
@@ -0,0 +1,138 @@
+"""Tests for cross-process advisory locks and cache versions (shared_state.py)."""
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlmodel import SQLModel, Session, create_engine, select
+
+import assist_service
+import jobs
+import shared_state
+from concept_service import EMBED_MODEL
+from models import Job, MessageEmbedding
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(db_engine)
+    return db_engine
+
+
+def test_lock_excludes_other_owners_until_released_or_expired(engine):
+    assert shared_state.try_acquire(engine, "gate", "a")
+    assert shared_state.try_acquire(engine, "gate", "a")  # re-entrant for the holder
+    assert not shared_state.try_acquire(engine, "gate", "b")
+    assert shared_state.holder(engine, "gate") == "a"
+
+    assert not shared_state.release(engine, "gate", "b")
+    assert shared_state.release(engine, "gate", "a")
+    assert shared_state.try_acquire(engine, "gate", "b")
+
+    # A holder that died stops renewing; its lease runs out and the lock frees up.
+    later = datetime.utcnow() + timedelta(seconds=shared_state.LOCK_TTL_SECONDS + 1)
+    assert shared_state.try_acquire(engine, "gate", "c", now=later)
+    assert not shared_state.renew(engine, "gate", "b")
+
+
+def test_advisory_lock_times_out_while_held(engine):
+    with shared_state.advisory_lock(engine, "gate") as owner:
+        assert shared_state.holder(engine, "gate") == owner
+        with pytest.raises(TimeoutError):
+            with shared_state.advisory_lock(engine, "gate", poll=0.01, timeout=0.05):
+                pass
+    assert shared_state.holder(engine, "gate") is None
+
+
+def test_orm_writes_bump_the_tracked_version(session):
+    assert shared_state.version(session, "message_embedding") == 0
+    row = MessageEmbedding(chatlog_id=1, message_index=0, embedding=b"\0" * 4, model_version=EMBED_MODEL)
+    session.add(row)
+    session.commit()
+    assert shared_state.version(session, "message_embedding") == 1
+
+    row.embedding = b"\1" * 4  # in-place re-embed
+    session.add(row)
+    session.commit()
+    session.delete(row)
+    session.commit()
+    assert shared_state.version(session, "message_embedding") == 3
+
+    shared_state.bump(session, "message_cache", "message_cache")
+    session.commit()
+    assert shared_state.version(session, "message_cache") == 1
+
+
+def test_assist_matrix_reloads_after_another_process_writes(file_engine, tmp_path):
+    """Two engines on one DB stand in for two uvicorn workers, each with its
+    own matrix cache."""
+    other = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+
+    def add(db_engine, cid):
+        vec = np.ones(4, dtype=np.float32) / 2
+        with Session(db_engine) as db:
+            db.add(MessageEmbedding(chatlog_id=cid, message_index=0, embedding=vec.tobytes(),
+                                    model_version=EMBED_MODEL))
+            db.commit()
+
+    add(file_engine, 1)
+    with Session(file_engine) as db:
+        assert set(assist_service._get_cache(db)["keys_idx"]) == {(1, 0)}
+    add(other, 2)
+    with Session(file_engine) as db:
+        assert set(assist_service._get_cache(db)["keys_idx"]) == {(1, 0), (2, 0)}
+
+
+def test_two_worker_processes_never_run_a_job_twice_or_overlap_the_gate(file_engine, tmp_path):
+    """Two processes drain one queue; every job runs once, and the critical
+    sections guarded by the shared advisory lock never overlap."""
+    db_path = tmp_path / "app.db"
+    jobs._handlers["gated"] = lambda ctx, n: None
+    try:
+        with Session(file_engine) as db:
+            for n in range(30):
+                jobs.enqueue(db, "gated", {"n": n})
+    finally:
+        jobs._handlers.pop("gated")
+    con = sqlite3.connect(db_path)
+    con.execute("CREATE TABLE ran (n INTEGER, pid INTEGER, started REAL, ended REAL)")
+    con.commit()
+
+    child = textwrap.dedent(f"""
+        import os, sqlite3, sys, time
+        sys.path.insert(0, {os.path.dirname(os.path.dirname(__file__))!r})
+        from sqlmodel import create_engine
+        import jobs, shared_state
+        path = {str(db_path)!r}
+        engine = create_engine("sqlite:///" + path, connect_args={{"timeout": 30}})
+
+        def gated(ctx, n):
+            with shared_state.advisory_lock(engine, "inline-classify", poll=0.005):
+                started = time.time()
+                time.sleep(0.01)
+                ended = time.time()
+            con = sqlite3.connect(path, timeout=30)
+            con.execute("INSERT INTO ran VALUES (?, ?, ?, ?)", (n, os.getpid(), started, ended))
+            con.commit()
+            con.close()
+
+        jobs.register("gated", gated)
+        worker_id = jobs.new_worker_id()
+        while (job := jobs.lease(engine, worker_id)) is not None:
+            jobs.run(engine, job, worker_id)
+    """)
+    procs = [subprocess.Popen([sys.executable, "-c", child]) for _ in range(2)]
+    assert all(p.wait(timeout=120) == 0 for p in procs)
+
+    ran = con.execute("SELECT n, pid, started, ended FROM ran ORDER BY started").fetchall()
+    con.close()
+    assert sorted(n for n, *_ in ran) == list(range(30))  # every job exactly once
+    for (_, _, _, ended), (_, _, started, _) in zip(ran, ran[1:]):
+        assert ended <= started  # never two holders at once
+    with Session(file_engine) as db:
+        assert {j.status for j in db.exec(select(Job)).all()} == {"succeeded"}
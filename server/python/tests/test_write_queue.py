@@ -0,0 +1,116 @@
+"""Tests for the single-writer group-commit queue (write_queue.py)."""
+import threading
+
+import pytest
+from sqlmodel import SQLModel, Session, create_engine, select
+
+import write_queue
+from models import LabelDefinition, MessageCache
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(db_engine)
+    yield db_engine
+    write_queue.stop()
+
+
+def _blocker(file_engine):
+    """Occupy the writer until the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+
+    def hold(w):
+        started.set()
+        release.wait(5)
+
+    with Session(file_engine) as db:
+        future = write_queue.submit(db, hold, priority=write_queue.BULK)
+    assert started.wait(5)
+    return release, future
+
+
+def _add_label(name, order=None):
+    def write(w):
+        if order is not None:
+            order.append(name)
+        w.add(LabelDefinition(name=name))
+        return name
+    return write
+
+
+def test_queued_writes_share_group_commits(file_engine):
+    release, first = _blocker(file_engine)
+    before = write_queue.stats()
+    with Session(file_engine) as db:
+        futures = [write_queue.submit(db, _add_label(f"l{i}"), priority=write_queue.INTERACTIVE)
+                   for i in range(20)]
+    release.set()
+    assert [f.result(5) for f in futures] == [f"l{i}" for i in range(20)]
+    first.result(5)
+
+    after = write_queue.stats()
+    assert after["writes"] - before["writes"] == 21
+    assert after["groups"] - before["groups"] == 2  # the blocker, then all 20 together
+    with Session(file_engine) as db:
+        assert len(db.exec(select(LabelDefinition)).all()) == 20
+
+
+def test_interactive_writes_jump_the_bulk_queue(file_engine):
+    release, _ = _blocker(file_engine)
+    order: list[str] = []
+    with Session(file_engine) as db:
+        bulk = [write_queue.submit(db, _add_label(f"bulk{i}", order)) for i in range(3 * write_queue.MAX_BULK_PER_GROUP)]
+        human = write_queue.submit(db, _add_label("human", order), priority=write_queue.INTERACTIVE)
+    release.set()
+    human.result(5)
+    for f in bulk:
+        f.result(5)
+    assert order[0] == "human"
+    assert order[1:] == [f"bulk{i}" for i in range(len(bulk))]
+
+
+def test_failing_write_only_fails_itself(file_engine):
+    release, _ = _blocker(file_engine)
+
+    def boom(w):
+        w.add(LabelDefinition(name="doomed"))
+        raise ValueError("bad write")
+
+    with Session(file_engine) as db:
+        ok_a = write_queue.submit(db, _add_label("a"), priority=write_queue.INTERACTIVE)
+        bad = write_queue.submit(db, boom, priority=write_queue.INTERACTIVE)
+        ok_b = write_queue.submit(db, _add_label("b"), priority=write_queue.INTERACTIVE)
+    release.set()
+    assert ok_a.result(5) == "a" and ok_b.result(5) == "b"
+    with pytest.raises(ValueError, match="bad write"):
+        bad.result(5)
+    assert write_queue.stats()["split_groups"] >= 1
+    with Session(file_engine) as db:
+        assert sorted(l.name for l in db.exec(select(LabelDefinition)).all()) == ["a", "b"]
+
+
+def test_caller_holding_writes_runs_inline(file_engine):
+    """A session with its own pending writes can't wait on the writer thread
+    (the writer would wait on its lock): the closure runs on that session and
+    commits both."""
+    with Session(file_engine) as db:
+        db.add(LabelDefinition(name="pending"))
+        seen = write_queue.write(db, lambda w: w is db)
+    assert seen is True
+    with Session(file_engine) as db:
+        assert {l.name for l in db.exec(select(LabelDefinition)).all()} == {"pending"}
+
+
+def test_decide_goes_through_the_writer(client, session):
+    label = client.post("/api/single-labels", json={"name": "help"}).json()
+    client.post(f"/api/single-labels/{label['id']}/activate")
+    before = write_queue.stats()["writes"]
+    session.add(MessageCache(chatlog_id=1, message_index=0, message_text="hi"))
+    session.commit()
+
+    resp = client.post(f"/api/single-labels/{label['id']}/decide",
+                       json={"chatlog_id": 1, "message_index": 0, "value": "yes"})
+    assert resp.status_code == 200
+    assert resp.json()["readiness"]["yes_count"] == 1
+    assert write_queue.stats()["writes"] == before + 1
@@ -0,0 +1,95 @@
+"""Out-of-process job workers.
+
+    python -m worker --processes 4
+
+Starts N processes that lease rows from the app DB's job table and run them
+(see jobs.py), so classification / autolabel / discovery stop competing with
+request handling for the API process's GIL. Run the API with
+CHATSIGHT_JOB_RUNNER=worker so it only enqueues. Both sides bind the DB from
+the same environment (DATABASE_URL etc., see database.py).
+
+The supervisor restarts a worker process that dies; whatever that process
+was running is re-leased by the others once its lease expires
+(CHATSIGHT_JOB_LEASE_SECONDS). SIGTERM / Ctrl-C lets each worker finish its
+current job before exiting.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+
+logger = logging.getLogger("worker")
+
+SHUTDOWN_GRACE_SECONDS = 30
+LOG_FORMAT = "%(asctime)s %(processName)s %(levelname)s %(message)s"
+
+
+def _run_worker(index: int, job_kinds: list[str] | None, poll_seconds: float) -> None:
+    """Body of one worker process."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor turns Ctrl-C into SIGTERM
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+    import jobs
+    import llm_ledger
+    import main  # noqa: F401  registers the job handlers
+    from database import engine
+
+    llm_ledger.start(engine)
+    worker_id = f"{jobs.new_worker_id()}#{index}"
+    logger.info("worker %s polling for %s", worker_id, job_kinds or "all jobs")
+    try:
+        jobs.work(engine, worker_id, job_kinds=job_kinds, stop=stop, poll_seconds=poll_seconds)
+    finally:
+        llm_ledger.stop()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run background job worker processes.")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--kinds", default="", help="comma-separated job kinds to take (default: all)")
+    parser.add_argument("--poll", type=float, default=None, help="idle poll interval in seconds")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+    import jobs
+    from database import create_db_and_tables
+
+    # Migrate once here rather than racing N children to do it.
+    create_db_and_tables()
+    job_kinds = [k.strip() for k in args.kinds.split(",") if k.strip()] or None
+    poll_seconds = args.poll if args.poll is not None else jobs.POLL_SECONDS
+
+    ctx = multiprocessing.get_context("spawn")
+    stopping = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopping.set())
+
+    def spawn(index: int):
+        p = ctx.Process(target=_run_worker, args=(index, job_kinds, poll_seconds), name=f"worker-{index}")
+        p.start()
+        return p
+
+    procs = {i: spawn(i) for i in range(args.processes)}
+    while not stopping.wait(1.0):
+        for i, p in procs.items():
+            if not p.is_alive():
+                logger.warning("worker-%d exited with %s; restarting", i, p.exitcode)
+                procs[i] = spawn(i)
+
+    for p in procs.values():
+        p.terminate()  # SIGTERM: finish the current job, then exit
+    deadline = time.monotonic() + SHUTDOWN_GRACE_SECONDS
+    for p in procs.values():
+        p.join(max(0.0, deadline - time.monotonic()))
+        if p.is_alive():
+            p.kill()  # its job is re-leased once the lease expires
+
+
+if __name__ == "__main__":
+    main()
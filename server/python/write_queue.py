@@ -0,0 +1,250 @@
+# server/python/write_queue.py
+"""Single-writer group commit for app-DB writes.
+
+Under WAL every write transaction serializes on SQLite's one writer lock, in
+no particular order: a /decide that arrives while classification, embedding
+and profile writes are queued at the lock can sit behind all of them (for up
+to busy_timeout). Instead, callers hand a closure `fn(session)` to one writer
+thread per process and get a Future back. The writer drains its queue in
+groups, runs each group's closures in one transaction and commits once, so N
+small writes cost one commit. Interactive writes (human decisions) are always
+taken before bulk ones (classification results, embeddings, profiles), and a
+group carries at most MAX_BULK_PER_GROUP bulk closures, so an interactive
+write waits for at most one short group. Bulk-only groups wait up to
+GROUP_WINDOW_SECONDS for company before committing, and are held back
+entirely (up to MAX_BULK_DEFER_SECONDS) while a request is inside
+`interactive()` — the request's other commits, such as the cursor writes of
+picking the next message, then find SQLite's lock free instead of polling for
+it against a stream of bulk commits.
+
+Closures must not commit. If one raises, its group is rolled back and each
+member re-run in its own transaction so only the failing write errors —
+closures must therefore touch nothing but the session. A closure runs in the
+submitter's contextvars context, so per-request SQL metrics and Gemini tags
+still attribute to the caller.
+
+If the caller's own session already has writes pending or an open SQLite
+write transaction, the closure runs right there instead (the writer would
+otherwise wait on the caller's lock while the caller waits on the writer).
+This orders writers within one process; `python -m worker` processes still
+meet the API at SQLite's lock. CHATSIGHT_WRITE_QUEUE=0 runs every closure
+inline on its caller's session.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+from sqlmodel import Session
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+ENABLED = os.environ.get("CHATSIGHT_WRITE_QUEUE", "1") != "0"
+GROUP_WINDOW_SECONDS = float(os.environ.get("CHATSIGHT_WRITE_GROUP_MS", "2")) / 1000.0
+MAX_GROUP = 64
+MAX_BULK_PER_GROUP = 4
+MAX_BULK_DEFER_SECONDS = 0.5
+
+WriteFn = Callable[[Session], Any]
+
+
+class _Write:
+    __slots__ = ("fn", "db_engine", "priority", "context", "future")
+
+    def __init__(self, fn: WriteFn, db_engine, priority: str):
+        self.fn = fn
+        self.db_engine = db_engine
+        self.priority = priority
+        self.context = contextvars.copy_context()
+        self.future: Future = Future()
+
+
+_queues: dict[str, deque] = {p: deque() for p in PRIORITIES}
+_cond = threading.Condition()
+_thread: Optional[threading.Thread] = None
+_stopping = False
+_interactive_active = 0
+_stats = {"groups": 0, "writes": 0, "split_groups": 0}
+
+
+def submit(db: Session, fn: WriteFn, *, priority: str = BULK) -> Future:
+    """Queue `fn(session)` for the writer; the Future resolves to its return
+    value once the group it ran in has committed."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {PRIORITIES}, got {priority!r}")
+    if not ENABLED or _holds_write_lock(db) or threading.current_thread() is _thread:
+        return _run_inline(db, fn)
+    write = _Write(fn, db.get_bind(), priority)
+    with _cond:
+        _queues[priority].append(write)
+        _ensure_thread()
+        _cond.notify()
+    return write.future
+
+
+def write(db: Session, fn: WriteFn, *, priority: str = BULK, timeout: Optional[float] = None) -> Any:
+    """submit() and wait for the result (re-raising the closure's exception)."""
+    return submit(db, fn, priority=priority).result(timeout)
+
+
+@contextmanager
+def interactive():
+    """Hold back bulk groups while the caller (an interactive request) runs."""
+    global _interactive_active
+    with _cond:
+        _interactive_active += 1
+    try:
+        yield
+    finally:
+        with _cond:
+            _interactive_active -= 1
+            _cond.notify()
+
+
+def depth(priority: Optional[str] = None) -> int:
+    with _cond:
+        if priority is not None:
+            return len(_queues[priority])
+        return sum(len(q) for q in _queues.values())
+
+
+def stats() -> dict[str, int]:
+    with _cond:
+        return dict(_stats)
+
+
+def stop(timeout: float = 10.0) -> None:
+    """Drain what is queued, then stop the writer (restarted by the next submit)."""
+    global _thread, _stopping
+    with _cond:
+        thread = _thread
+        _stopping = True
+        _cond.notify()
+    if thread is not None:
+        thread.join(timeout)
+    with _cond:
+        _thread = None
+        _stopping = False
+
+
+def _holds_write_lock(db: Session) -> bool:
+    if db.new or db.dirty or db.deleted:
+        return True
+    if db.get_transaction() is None:
+        return False
+    raw = db.connection().connection.dbapi_connection
+    return bool(getattr(raw, "in_transaction", False))
+
+
+def _run_inline(db: Session, fn: WriteFn) -> Future:
+    future: Future = Future()
+    try:
+        result = fn(db)
+        db.commit()
+    except BaseException as exc:
+        db.rollback()
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+    return future
+
+
+def _ensure_thread() -> None:
+    # Called with _cond held.
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _thread = threading.Thread(target=_run, name="db-writer", daemon=True)
+        _thread.start()
+
+
+def _take_group() -> list[_Write]:
+    """Interactive writes first, then up to MAX_BULK_PER_GROUP bulk ones, all
+    for the same engine as the first. Called with _cond held."""
+    head = (_queues[INTERACTIVE] or _queues[BULK])[0]
+    group: list[_Write] = []
+    for priority, cap in ((INTERACTIVE, MAX_GROUP), (BULK, MAX_BULK_PER_GROUP)):
+        queue, skipped, taken = _queues[priority], [], 0
+        while queue and taken < cap and len(group) < MAX_GROUP:
+            item = queue.popleft()
+            if item.db_engine is head.db_engine:
+                group.append(item)
+                taken += 1
+            else:
+                skipped.append(item)
+        queue.extendleft(reversed(skipped))
+    return group
+
+
+def _run() -> None:
+    while True:
+        with _cond:
+            while not any(_queues.values()):
+                if _stopping:
+                    return
+                _cond.wait()
+            if not _queues[INTERACTIVE] and len(_queues[BULK]) < MAX_BULK_PER_GROUP and not _stopping:
+                # Bulk only: give more bulk writes (or an interactive one) a
+                # moment to arrive and share the commit.
+                deadline = time.monotonic() + GROUP_WINDOW_SECONDS
+                while (not _queues[INTERACTIVE] and len(_queues[BULK]) < MAX_BULK_PER_GROUP
+                       and (remaining := deadline - time.monotonic()) > 0):
+                    _cond.wait(remaining)
+            if not _queues[INTERACTIVE] and _interactive_active and not _stopping:
+                deadline = time.monotonic() + MAX_BULK_DEFER_SECONDS
+                while (not _queues[INTERACTIVE] and _interactive_active
+                       and (remaining := deadline - time.monotonic()) > 0):
+                    _cond.wait(remaining)
+            group = _take_group()
+        try:
+            _commit_group(group)
+        except Exception:  # never let the writer die with futures outstanding
+            logger.exception("write group failed")
+            for item in group:
+                if not item.future.done():
+                    item.future.set_exception(RuntimeError("write group failed"))
+
+
+def _commit_group(group: list[_Write]) -> None:
+    live = [item for item in group if item.future.set_running_or_notify_cancel()]
+    if not live:
+        return
+    try:
+        results = _execute(live)
+    except Exception as exc:
+        if len(live) == 1:
+            live[0].future.set_exception(exc)
+            return
+        # Someone in the group failed: isolate it by re-running each alone.
+        with _cond:
+            _stats["split_groups"] += 1
+        for item in live:
+            try:
+                (result,) = _execute([item])
+            except Exception as solo_exc:
+                item.future.set_exception(solo_exc)
+            else:
+                item.future.set_result(result)
+        return
+    for item, result in zip(live, results):
+        item.future.set_result(result)
+
+
+def _execute(items: list[_Write]) -> list[Any]:
+    with Session(items[0].db_engine, expire_on_commit=False) as db:
+        results = [item.context.run(item.fn, db) for item in items]
+        db.commit()
+    with _cond:
+        _stats["groups"] += 1
+        _stats["writes"] += len(items)
+    return results
@@ -16,7 +16,7 @@ export function FocusedMessage({
   detail, reviewThreshold, onAccept, onFlip, onFlag, onSaveNote,
 }: FocusedMessageProps) {
   const nearThreshold =
-    detail.applied_by === 'ai' &&
+    (detail.applied_by === 'ai' || detail.applied_by === 'probe') &&
     detail.confidence !== null &&
     Math.abs(detail.confidence - reviewThreshold) < 0.1
 
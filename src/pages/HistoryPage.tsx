@@ -134,11 +134,11 @@ export function HistoryPage() {
                 className="flex items-center gap-3 px-4 py-3 border-b border-edge-subtle last:border-b-0 cursor-pointer hover:bg-elevated/60 transition-colors group"
               >
                 <span className={`font-mono text-[9px] rounded-sm px-1.5 py-0.5 uppercase tracking-wide shrink-0 ${
-                  item.applied_by === 'ai' ? 'bg-ochre text-bg-warm border border-ochre'
+                  item.applied_by === 'ai' || item.applied_by === 'local-model' ? 'bg-ochre text-bg-warm border border-ochre'
                   : item.status === 'skipped' ? 'bg-stone/15 text-stone border border-stone/50'
                   : 'bg-ochre/15 text-ochre border border-ochre-dim'
                 }`}>
-                  {item.applied_by === 'ai' ? 'AI' : item.status === 'skipped' ? 'S' : 'H'}
+                  {item.applied_by === 'ai' ? 'AI' : item.applied_by === 'local-model' ? 'LM' : item.status === 'skipped' ? 'S' : 'H'}
                 </span>
                 {item.message_text?.trim() ? (
                   <span className="font-serif text-[14px] text-on-surface flex-1 truncate">{item.message_text}</span>
@@ -184,7 +184,7 @@ export interface HistoryItem {
   context_after: string | null
   labels: string[]
   status: 'labeled' | 'skipped'
-  applied_by: 'human' | 'ai' | null
+  applied_by: 'human' | 'ai' | 'local-model' | null
   confidence: number | null
   processed_at: string
 }
@@ -665,7 +665,7 @@ export interface MessageListItem {
   text: string
   confidence: number | null
   verdict: MessageVerdict | null
-  applied_by: 'ai' | 'human' | null
+  applied_by: 'ai' | 'probe' | 'human' | null
   flagged: boolean
   has_note: boolean
   notebook: string | null
@@ -691,7 +691,7 @@ export interface MessageDetail {
   text: string
   confidence: number | null
   verdict: MessageVerdict | null
-  applied_by: 'ai' | 'human' | null
+  applied_by: 'ai' | 'probe' | 'human' | null
   matched_pattern: string | null
   rationale: string | null
   flagged: boolean